@@ -0,0 +1,55 @@
+"""Add avito_webhook_inbox table for asynchronous webhook processing
+
+Revision ID: a7b8c9d0e1f2
+Revises: f6a7b8c9d0e1
+Create Date: 2026-10-17 20:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'a7b8c9d0e1f2'
+down_revision: Union[str, Sequence[str], None] = 'f6a7b8c9d0e1'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    insp = sa.inspect(op.get_bind())
+    if 'avito_webhook_inbox' in insp.get_table_names():
+        return
+
+    op.create_table(
+        'avito_webhook_inbox',
+        sa.Column('id', sa.Integer(), primary_key=True),
+        sa.Column('dedupe_key', sa.String(), nullable=False, unique=True),
+        sa.Column('event_type', sa.String(), nullable=False),
+        sa.Column('booking_key', sa.String(), nullable=True),
+        sa.Column('body', sa.Text(), nullable=False),
+        sa.Column(
+            'status',
+            sa.Enum('PENDING', 'DONE', 'DEAD', name='inboxstatus'),
+            nullable=False,
+        ),
+        sa.Column('attempts', sa.Integer(), nullable=False, server_default='0'),
+        sa.Column('next_attempt_at', sa.DateTime(), nullable=False),
+        sa.Column('last_error', sa.String(), nullable=True),
+        sa.Column('received_at', sa.DateTime(), nullable=False),
+        sa.Column('processed_at', sa.DateTime(), nullable=True),
+    )
+    op.create_index(
+        'ix_avito_webhook_inbox_booking_key', 'avito_webhook_inbox', ['booking_key']
+    )
+    op.create_index(
+        'ix_avito_webhook_inbox_status_id', 'avito_webhook_inbox', ['status', 'id']
+    )
+
+
+def downgrade() -> None:
+    insp = sa.inspect(op.get_bind())
+    if 'avito_webhook_inbox' in insp.get_table_names():
+        op.drop_table('avito_webhook_inbox')
@@ -0,0 +1,87 @@
+"""Add normalized phone_last10 columns to bookings and users
+
+Revision ID: b7c1d2e3f4a5
+Revises: a1b2c3d4e5f6
+Create Date: 2026-10-17 12:00:00.000000
+
+"""
+import re
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'b7c1d2e3f4a5'
+down_revision: Union[str, Sequence[str], None] = 'a1b2c3d4e5f6'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def _last10(raw):
+    """Копия app.utils.phone.phone_last10 — миграция не зависит от кода приложения."""
+    if not raw:
+        return None
+    p = re.sub(r"[^0-9]", "", raw)
+    if p.startswith("8") and len(p) == 11:
+        p = "7" + p[1:]
+    if len(p) == 10:
+        p = "7" + p
+    p = p[-10:] if len(p) >= 10 else p
+    return p or None
+
+
+def _backfill(bind, table: str, source_col: str, target_col: str) -> None:
+    rows = bind.execute(
+        sa.text(f"SELECT id, {source_col} FROM {table} WHERE {source_col} IS NOT NULL")
+    ).fetchall()
+    params = [
+        {"id": row_id, "value": _last10(phone)}
+        for row_id, phone in rows
+        if _last10(phone)
+    ]
+    if params:
+        bind.execute(
+            sa.text(f"UPDATE {table} SET {target_col} = :value WHERE id = :id"),
+            params,
+        )
+
+
+def upgrade() -> None:
+    bind = op.get_bind()
+    insp = sa.inspect(bind)
+
+    booking_cols = {c["name"] for c in insp.get_columns("bookings")}
+    booking_idxs = {i["name"] for i in insp.get_indexes("bookings")}
+    user_cols = {c["name"] for c in insp.get_columns("users")}
+    user_idxs = {i["name"] for i in insp.get_indexes("users")}
+
+    if "guest_phone_last10" not in booking_cols:
+        op.add_column("bookings", sa.Column("guest_phone_last10", sa.String(), nullable=True))
+    if "phone_last10" not in user_cols:
+        op.add_column("users", sa.Column("phone_last10", sa.String(), nullable=True))
+
+    _backfill(bind, "bookings", "guest_phone", "guest_phone_last10")
+    _backfill(bind, "users", "phone", "phone_last10")
+
+    if "ix_bookings_guest_phone_last10" not in booking_idxs:
+        op.create_index("ix_bookings_guest_phone_last10", "bookings", ["guest_phone_last10"])
+    if "ix_users_phone_last10" not in user_idxs:
+        op.create_index("ix_users_phone_last10", "users", ["phone_last10"])
+
+
+def downgrade() -> None:
+    bind = op.get_bind()
+    insp = sa.inspect(bind)
+
+    booking_idxs = {i["name"] for i in insp.get_indexes("bookings")}
+    user_idxs = {i["name"] for i in insp.get_indexes("users")}
+
+    if "ix_users_phone_last10" in user_idxs:
+        op.drop_index("ix_users_phone_last10", table_name="users")
+    if "ix_bookings_guest_phone_last10" in booking_idxs:
+        op.drop_index("ix_bookings_guest_phone_last10", table_name="bookings")
+
+    op.drop_column("users", "phone_last10")
+    op.drop_column("bookings", "guest_phone_last10")
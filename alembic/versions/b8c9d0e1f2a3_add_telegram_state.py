@@ -0,0 +1,41 @@
+"""Add telegram_state table (persistent bot conversation/FSM state)
+
+Revision ID: b8c9d0e1f2a3
+Revises: a7b8c9d0e1f2
+Create Date: 2026-10-17 21:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'b8c9d0e1f2a3'
+down_revision: Union[str, Sequence[str], None] = 'a7b8c9d0e1f2'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    insp = sa.inspect(op.get_bind())
+    if 'telegram_state' in insp.get_table_names():
+        return
+
+    op.create_table(
+        'telegram_state',
+        sa.Column('namespace', sa.String(), primary_key=True),
+        sa.Column('key', sa.String(), primary_key=True),
+        sa.Column('value', sa.Text(), nullable=False),
+        sa.Column('expires_at', sa.DateTime(), nullable=False),
+    )
+    op.create_index(
+        'ix_telegram_state_expires_at', 'telegram_state', ['expires_at']
+    )
+
+
+def downgrade() -> None:
+    insp = sa.inspect(op.get_bind())
+    if 'telegram_state' in insp.get_table_names():
+        op.drop_table('telegram_state')
@@ -0,0 +1,61 @@
+"""Add composite indexes for hot booking query shapes
+
+Revision ID: c3d4e5f6a7b8
+Revises: b7c1d2e3f4a5
+Create Date: 2026-10-17 14:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'c3d4e5f6a7b8'
+down_revision: Union[str, Sequence[str], None] = 'b7c1d2e3f4a5'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+INDEXES = [
+    ("ix_bookings_house_dates", ["house_id", "check_in", "check_out"], False),
+    ("ix_bookings_status_check_in", ["status", "check_in"], False),
+    ("ix_bookings_status_check_out", ["status", "check_out"], False),
+    ("uq_bookings_source_external_id", ["source", "external_id"], True),
+]
+
+
+def upgrade() -> None:
+    bind = op.get_bind()
+    insp = sa.inspect(bind)
+    idxs = {i["name"] for i in insp.get_indexes("bookings")}
+
+    if "uq_bookings_source_external_id" not in idxs:
+        duplicates = bind.execute(
+            sa.text(
+                "SELECT source, external_id, COUNT(*) FROM bookings "
+                "WHERE external_id IS NOT NULL "
+                "GROUP BY source, external_id HAVING COUNT(*) > 1"
+            )
+        ).fetchall()
+        if duplicates:
+            listed = ", ".join(f"{src}:{ext} x{cnt}" for src, ext, cnt in duplicates[:20])
+            raise RuntimeError(
+                "Cannot create unique index on bookings(source, external_id): "
+                f"duplicate rows exist ({listed}). Resolve them and re-run the migration."
+            )
+
+    for name, columns, unique in INDEXES:
+        if name not in idxs:
+            op.create_index(name, "bookings", columns, unique=unique)
+
+
+def downgrade() -> None:
+    bind = op.get_bind()
+    insp = sa.inspect(bind)
+    idxs = {i["name"] for i in insp.get_indexes("bookings")}
+
+    for name, _columns, _unique in reversed(INDEXES):
+        if name in idxs:
+            op.drop_index(name, table_name="bookings")
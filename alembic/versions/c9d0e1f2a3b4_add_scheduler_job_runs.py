@@ -0,0 +1,52 @@
+"""Add scheduler_job_runs table (scheduler run history)
+
+Revision ID: c9d0e1f2a3b4
+Revises: b8c9d0e1f2a3
+Create Date: 2026-10-17 22:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'c9d0e1f2a3b4'
+down_revision: Union[str, Sequence[str], None] = 'b8c9d0e1f2a3'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    insp = sa.inspect(op.get_bind())
+    if 'scheduler_job_runs' in insp.get_table_names():
+        return
+
+    op.create_table(
+        'scheduler_job_runs',
+        sa.Column('id', sa.Integer(), primary_key=True),
+        sa.Column('job_id', sa.String(), nullable=False),
+        sa.Column(
+            'outcome',
+            sa.Enum('OK', 'ERROR', 'SKIPPED', 'MISSED', name='jobrunoutcome'),
+            nullable=False,
+        ),
+        sa.Column('scheduled_at', sa.DateTime(), nullable=True),
+        sa.Column('started_at', sa.DateTime(), nullable=False),
+        sa.Column('finished_at', sa.DateTime(), nullable=True),
+        sa.Column('duration_ms', sa.Integer(), nullable=True),
+        sa.Column('error', sa.String(), nullable=True),
+    )
+    op.create_index(
+        'ix_scheduler_job_runs_job_started', 'scheduler_job_runs', ['job_id', 'started_at']
+    )
+    op.create_index(
+        'ix_scheduler_job_runs_started_at', 'scheduler_job_runs', ['started_at']
+    )
+
+
+def downgrade() -> None:
+    insp = sa.inspect(op.get_bind())
+    if 'scheduler_job_runs' in insp.get_table_names():
+        op.drop_table('scheduler_job_runs')
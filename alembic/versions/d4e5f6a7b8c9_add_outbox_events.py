@@ -0,0 +1,54 @@
+"""Add outbox_events table for booking side effects
+
+Revision ID: d4e5f6a7b8c9
+Revises: c3d4e5f6a7b8
+Create Date: 2026-10-17 16:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'd4e5f6a7b8c9'
+down_revision: Union[str, Sequence[str], None] = 'c3d4e5f6a7b8'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    insp = sa.inspect(op.get_bind())
+    if 'outbox_events' in insp.get_table_names():
+        return
+
+    op.create_table(
+        'outbox_events',
+        sa.Column('id', sa.Integer(), primary_key=True),
+        sa.Column('kind', sa.String(), nullable=False),
+        sa.Column('target_key', sa.String(), nullable=False),
+        sa.Column('idempotency_key', sa.String(), nullable=False),
+        sa.Column('payload_json', sa.String(), nullable=False),
+        sa.Column(
+            'status',
+            sa.Enum('PENDING', 'DONE', 'SUPERSEDED', 'FAILED', name='outboxstatus'),
+            nullable=False,
+        ),
+        sa.Column('attempts', sa.Integer(), nullable=False, server_default='0'),
+        sa.Column('next_attempt_at', sa.DateTime(), nullable=False),
+        sa.Column('last_error', sa.String(), nullable=True),
+        sa.Column('created_at', sa.DateTime(), nullable=False),
+        sa.Column('processed_at', sa.DateTime(), nullable=True),
+        sa.UniqueConstraint('idempotency_key'),
+    )
+    op.create_index('ix_outbox_events_target_key', 'outbox_events', ['target_key'])
+    op.create_index(
+        'ix_outbox_events_status_next_attempt', 'outbox_events', ['status', 'next_attempt_at']
+    )
+
+
+def downgrade() -> None:
+    insp = sa.inspect(op.get_bind())
+    if 'outbox_events' in insp.get_table_names():
+        op.drop_table('outbox_events')
@@ -0,0 +1,46 @@
+"""Add channel_push_state table for deduplicated calendar/price pushes
+
+Revision ID: e5f6a7b8c9d0
+Revises: d4e5f6a7b8c9
+Create Date: 2026-10-17 18:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'e5f6a7b8c9d0'
+down_revision: Union[str, Sequence[str], None] = 'd4e5f6a7b8c9'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    insp = sa.inspect(op.get_bind())
+    if 'channel_push_state' in insp.get_table_names():
+        return
+
+    op.create_table(
+        'channel_push_state',
+        sa.Column('id', sa.Integer(), primary_key=True),
+        sa.Column('platform', sa.String(), nullable=False),
+        sa.Column('item_id', sa.String(), nullable=False),
+        sa.Column('kind', sa.String(), nullable=False),
+        sa.Column('payload_hash', sa.String(), nullable=False),
+        sa.Column('pushed_at', sa.DateTime(), nullable=False),
+    )
+    op.create_index(
+        'uq_channel_push_state_target',
+        'channel_push_state',
+        ['platform', 'item_id', 'kind'],
+        unique=True,
+    )
+
+
+def downgrade() -> None:
+    insp = sa.inspect(op.get_bind())
+    if 'channel_push_state' in insp.get_table_names():
+        op.drop_table('channel_push_state')
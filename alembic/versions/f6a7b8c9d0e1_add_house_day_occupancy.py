@@ -0,0 +1,72 @@
+"""Add house_day_occupancy table (materialized per-house nightly occupancy)
+
+Revision ID: f6a7b8c9d0e1
+Revises: e5f6a7b8c9d0
+Create Date: 2026-10-17 19:00:00.000000
+
+"""
+from datetime import date, timedelta
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'f6a7b8c9d0e1'
+down_revision: Union[str, Sequence[str], None] = 'e5f6a7b8c9d0'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def _as_date(value):
+    return value if isinstance(value, date) else date.fromisoformat(str(value)[:10])
+
+
+def upgrade() -> None:
+    bind = op.get_bind()
+    insp = sa.inspect(bind)
+    if 'house_day_occupancy' in insp.get_table_names():
+        # Таблицу мог создать init_db() (create_all) раньше миграции —
+        # тогда она пустая, и заполнение ниже всё равно нужно.
+        occupancy = sa.table(
+            'house_day_occupancy',
+            sa.column('house_id', sa.Integer()),
+            sa.column('day', sa.Date()),
+            sa.column('booking_id', sa.Integer()),
+        )
+        if bind.execute(sa.select(occupancy.c.house_id).limit(1)).first() is not None:
+            return
+    else:
+        occupancy = op.create_table(
+            'house_day_occupancy',
+            sa.Column('house_id', sa.Integer(), primary_key=True),
+            sa.Column('day', sa.Date(), primary_key=True),
+            sa.Column('booking_id', sa.Integer(), primary_key=True),
+        )
+        op.create_index(
+            'ix_house_day_occupancy_booking_id', 'house_day_occupancy', ['booking_id']
+        )
+
+    # Заполнение из существующих броней: ночи [check_in, check_out)
+    bookings = bind.execute(sa.text(
+        "SELECT id, house_id, check_in, check_out FROM bookings "
+        "WHERE status != 'CANCELLED'"
+    )).fetchall()
+    rows = []
+    for booking_id, house_id, check_in, check_out in bookings:
+        check_in, check_out = _as_date(check_in), _as_date(check_out)
+        for i in range((check_out - check_in).days):
+            rows.append({
+                'house_id': house_id,
+                'day': check_in + timedelta(days=i),
+                'booking_id': booking_id,
+            })
+    if rows:
+        op.bulk_insert(occupancy, rows)
+
+
+def downgrade() -> None:
+    insp = sa.inspect(op.get_bind())
+    if 'house_day_occupancy' in insp.get_table_names():
+        op.drop_table('house_day_occupancy')
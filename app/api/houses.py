@@ -7,14 +7,13 @@ Endpoint /api/houses/{id}/availability — фундамент для агрег
 
 from datetime import date, timedelta
 from typing import Optional
-from fastapi import APIRouter, Depends, Query
+from fastapi import APIRouter, Depends, HTTPException, Query
 from pydantic import BaseModel
-from sqlalchemy import select, and_
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.database import AsyncSessionLocal
-from app.models import Booking, BookingStatus
 from app.services.house_service import HouseService
+from app.services.occupancy_service import OccupancyService
 from app.services.pricing_service import PricingService
 
 
@@ -52,9 +51,13 @@ async def list_houses(db: AsyncSession = Depends(get_db)):
     from app.data.house_descriptions import get_short_description
 
     houses = await HouseService.get_all_houses(db)
+    today = date.today()
+    prices = await PricingService.get_price_matrix(
+        db, houses, today, today + timedelta(days=1)
+    )
     result = []
     for house in houses:
-        price_info = await PricingService.get_display_price(db, house.id)
+        price_info = prices[house.id][0]
         desc = house.description or get_short_description(house.name)
         result.append(HousePublicOut(
             id=house.id,
@@ -82,18 +85,19 @@ async def house_price_calendar(
         return []
 
     today = date.today()
-    result = []
-    for i in range(days):
-        target = today + timedelta(days=i)
-        info = await PricingService.get_price_for_date(db, house_id, target)
-        result.append(HousePriceCalendarEntry(
-            date=target,
+    prices = await PricingService.get_price_range(
+        db, house_id, today, today + timedelta(days=days)
+    )
+    return [
+        HousePriceCalendarEntry(
+            date=info["date"],
             price=info["price"],
             final_price=info["final_price"],
             discount_percent=info["discount_percent"],
             season_label=info.get("season_label"),
-        ))
-    return result
+        )
+        for info in prices
+    ]
 
 
 @router.get("/{house_id}/calculate")
@@ -108,6 +112,74 @@ async def calculate_stay(
     return result
 
 
+class AvailabilityMatrixRow(BaseModel):
+    house_id: int
+    name: str
+    available: list[bool]
+    price: list[int]
+    final_price: list[int]
+    discount_percent: list[int]
+
+
+class AvailabilityMatrixOut(BaseModel):
+    date_from: date
+    date_to: date
+    dates: list[date]
+    houses: list[AvailabilityMatrixRow]
+
+
+MATRIX_MAX_DAYS = 366
+
+
+@router.get("/availability-matrix", response_model=AvailabilityMatrixOut)
+async def availability_matrix(
+    date_from: Optional[date] = Query(default=None, alias="from"),
+    date_to: Optional[date] = Query(default=None, alias="to"),
+    db: AsyncSession = Depends(get_db),
+):
+    """Сетка домик × дата для всех домиков одним запросом (для сайта и OTA).
+
+    Период — полуинтервал [from, to), по умолчанию 90 дней от сегодня.
+    Значения по дням лежат в массивах, выровненных по `dates`. На весь
+    ответ — один запрос занятости, один сезонных цен и один скидок.
+    """
+    date_from = date_from or date.today()
+    date_to = date_to or date_from + timedelta(days=90)
+    days = (date_to - date_from).days
+    if days <= 0:
+        raise HTTPException(status_code=422, detail="'to' must be after 'from'")
+    if days > MATRIX_MAX_DAYS:
+        raise HTTPException(
+            status_code=422, detail=f"Period must not exceed {MATRIX_MAX_DAYS} days"
+        )
+
+    houses = await HouseService.get_all_houses(db)
+    available = await OccupancyService.availability(
+        db, [house.id for house in houses], date_from, date_to
+    )
+
+    prices = await PricingService.get_price_matrix(db, houses, date_from, date_to)
+
+    rows = []
+    for house in houses:
+        house_prices = prices[house.id]
+        rows.append(AvailabilityMatrixRow(
+            house_id=house.id,
+            name=house.name,
+            available=available[house.id],
+            price=[info["price"] for info in house_prices],
+            final_price=[info["final_price"] for info in house_prices],
+            discount_percent=[info["discount_percent"] for info in house_prices],
+        ))
+
+    return AvailabilityMatrixOut(
+        date_from=date_from,
+        date_to=date_to,
+        dates=[date_from + timedelta(days=i) for i in range(days)],
+        houses=rows,
+    )
+
+
 class AvailabilityEntry(BaseModel):
     date: date
     available: bool
@@ -137,29 +209,18 @@ async def house_availability(
     today = date.today()
     end = today + timedelta(days=days)
 
-    booked_dates: set[date] = set()
-    stmt = select(Booking).where(
-        Booking.house_id == house_id,
-        Booking.status != BookingStatus.CANCELLED,
-        and_(Booking.check_in < end, Booking.check_out > today),
-    )
-    result = await db.execute(stmt)
-    for b in result.scalars().all():
-        d = max(b.check_in, today)
-        while d < min(b.check_out, end):
-            booked_dates.add(d)
-            d += timedelta(days=1)
-
-    entries = []
-    for i in range(days):
-        target = today + timedelta(days=i)
-        info = await PricingService.get_price_for_date(db, house_id, target)
-        entries.append(AvailabilityEntry(
-            date=target,
-            available=target not in booked_dates,
+    # Маска по дням окна — скан занятых ночей домика (house_day_occupancy)
+    available = (await OccupancyService.availability(db, [house_id], today, end))[house_id]
+
+    prices = await PricingService.get_price_range(db, house_id, today, end)
+    return [
+        AvailabilityEntry(
+            date=info["date"],
+            available=available[(info["date"] - today).days],
             price=info["price"],
             final_price=info["final_price"],
             discount_percent=info["discount_percent"],
             season_label=info.get("season_label"),
-        ))
-    return entries
+        )
+        for info in prices
+    ]
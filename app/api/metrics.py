@@ -0,0 +1,21 @@
+import hmac
+
+from fastapi import APIRouter, Header, HTTPException
+from fastapi.responses import PlainTextResponse
+
+from app.core.config import settings
+from app.core.metrics import registry
+
+router = APIRouter()
+
+
+@router.get("/metrics", tags=["system"], response_class=PlainTextResponse)
+async def prometheus_metrics(authorization: str = Header(default="")):
+    """Метрики процесса в формате Prometheus (text exposition 0.0.4)"""
+    if settings.metrics_token and not hmac.compare_digest(
+        authorization, f"Bearer {settings.metrics_token}"
+    ):
+        raise HTTPException(status_code=401, detail="Invalid metrics token")
+    return PlainTextResponse(
+        registry.render(), media_type="text/plain; version=0.0.4; charset=utf-8"
+    )
@@ -11,6 +11,7 @@
 Идемпотентность: если в payload передан `external_ref`, повторный POST
 с тем же значением вернёт ту же бронь (по `Booking.external_id`).
 """
+import asyncio
 import logging
 from datetime import date, datetime, timezone
 from decimal import Decimal
@@ -27,6 +28,7 @@ from app.models import Booking, BookingSource, BookingStatus, House
 from app.schemas.booking import BookingCreate
 from app.services.booking_service import BookingService
 from app.services.notification_service import send_safe
+from app.services.telegram_dispatcher import Priority
 
 logger = logging.getLogger(__name__)
 router = APIRouter(prefix="/api", tags=["site"])
@@ -195,8 +197,15 @@ async def _notify_admins(booking: Booking, source: str, comment: str | None) ->
             ]]
         )
 
-        for aid in admin_ids:
-            await send_safe(bot, aid, text, reply_markup=kb, context=f"site_lead admin={aid}")
+        await asyncio.gather(
+            *(
+                send_safe(
+                    bot, aid, text, reply_markup=kb,
+                    context=f"site_lead admin={aid}", priority=Priority.HIGH,
+                )
+                for aid in admin_ids
+            )
+        )
     except Exception as e:
         logger.error(f"site_lead admin notify failed: {e}", exc_info=True)
 
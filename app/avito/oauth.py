@@ -4,7 +4,6 @@ OAuth авторизация для Avito API
 
 from fastapi import APIRouter, Request
 from fastapi.responses import HTMLResponse
-import requests
 import logging
 
 from app.core.config import settings
@@ -88,6 +87,8 @@ async def oauth_callback(request: Request, code: str = None, error: str = None):
 
     # Обмен кода на токен
     try:
+        import requests
+
         response = requests.post(
             "https://api.avito.ru/token",
             data={
@@ -1,6 +1,10 @@
 """
 Avito webhook handler with signature verification and idempotency.
 
+The endpoint only verifies the signature and stores the raw event in the
+inbox (avito_webhook_inbox); processing happens in the background
+(app.services.avito_inbox_service), so Avito gets 200 in milliseconds.
+
 Modes (via AVITO_WEBHOOK_MODE env var):
 - "off": No signature verification (backward compatible)
 - "warn": Log warning on invalid/missing signature, but allow request
@@ -47,8 +51,9 @@ async def avito_webhook(request: Request):
     Default: 30 requests per minute per IP (Avito may retry on transient errors).
     Uses @limiter.limit decorator with SlowAPIMiddleware.
 
-    Idempotency: Only blocks duplicate CREATE events. UPDATE events
-    (status changes, payment updates) are allowed for existing bookings.
+    Idempotency: repeated deliveries of the same event are stored once
+    (dedupe key). While processing, only duplicate CREATE events are
+    skipped; UPDATE events (status changes, payment updates) are applied.
 
     Signature verification modes:
     - off: Accept all requests (default, backward compatible)
@@ -87,55 +92,28 @@ async def avito_webhook(request: Request):
         logger.error(f"Failed to parse webhook payload as JSON: {e}")
         return JSONResponse(status_code=400, content={"error": "Invalid JSON payload"})
 
-    event_type = event_data.get("event_type", "unknown")
-    payload = event_data.get("payload", {})
+    if not isinstance(event_data, dict):
+        logger.error("Webhook payload is not a JSON object")
+        return JSONResponse(status_code=400, content={"error": "Invalid JSON payload"})
 
-    logger.info("Received Avito webhook: %s", event_type)
+    logger.info("Received Avito webhook: %s", event_data.get("event_type", "unknown"))
 
-    # Process booking webhook
+    # Store only; processing runs in the background (avito_inbox_worker),
+    # so the response never waits for the Avito API or Telegram
     try:
-        from app.avito.schemas import AvitoWebhookEvent, AvitoBookingPayload
         from app.database import AsyncSessionLocal
-        from app.services.booking_service import BookingService
-        from app.telegram.notifier import notify_new_avito_event
-        from app.models import Booking, BookingSource
-        from sqlalchemy import select
-
-        # Parse full event for notification
-        event = AvitoWebhookEvent(**event_data)
-
-        # Parse booking payload
-        booking_payload = AvitoBookingPayload(**payload)
-        avito_id = str(booking_payload.avito_booking_id)
+        from app.services.avito_inbox_service import AvitoInboxService, avito_inbox_worker
 
         async with AsyncSessionLocal() as session:
-            # Check if this Avito booking already exists
-            stmt = select(Booking).where(
-                Booking.external_id == avito_id, Booking.source == BookingSource.AVITO
-            )
-            result = await session.execute(stmt)
-            existing = result.scalar_one_or_none()
-
-            # === IDEMPOTENCY LOGIC ===
-            # Only block duplicate "create" events. Allow "update" events to pass through.
-            is_create_event = event_type in ("booking", "booking_created", "create")
-
-            if existing and is_create_event:
-                logger.info(
-                    f"Duplicate CREATE event for Avito booking {avito_id} (DB ID: {existing.id}) - skipping"
-                )
-                return {"status": "already_processed", "booking_id": existing.id}
-
-            # Process booking (create or update)
-            booking = await BookingService.create_or_update_avito_booking(session, booking_payload)
-
-        # Notify about new event
-        await notify_new_avito_event(event, request, booking)
+            row, is_new = await AvitoInboxService.accept(session, body, event_data)
+    except Exception as e:
+        logger.error("Failed to store Avito webhook: %s", e, exc_info=True)
+        # Event was not stored - let Avito retry the delivery
+        return JSONResponse(status_code=503, content={"status": "error"})
 
-        return {"status": "ok", "booking_id": booking.id if booking else None}
+    if not is_new:
+        logger.info("Duplicate Avito webhook delivery (inbox #%s) - skipping", row.id)
+        return {"status": "duplicate", "inbox_id": row.id}
 
-    except Exception as e:
-        logger.error("Error processing Avito webhook: %s", e, exc_info=True)
-        # Return 200 to prevent infinite retries from Avito
-        # Don't expose internal error details to external caller
-        return {"status": "error"}
+    avito_inbox_worker.wake()
+    return {"status": "accepted", "inbox_id": row.id}
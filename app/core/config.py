@@ -1,3 +1,4 @@
+import json
 import os
 from dotenv import load_dotenv
 from pydantic import BaseModel
@@ -9,18 +10,52 @@ load_dotenv()
 class Settings(BaseModel):
     telegram_bot_token: str
     telegram_chat_id: int
+    # Исходящие сообщения (лимиты Telegram: ~30 msg/s всего, 1/s в чат, 20/min в группу)
+    telegram_global_rate_per_second: float = 25.0
+    telegram_chat_rate_per_second: float = 1.0
+    telegram_group_rate_per_minute: float = 20.0
+    telegram_send_concurrency: int = 8
+    telegram_send_max_attempts: int = 3
     database_url: str = "sqlite+aiosqlite:///./easycamp.db"
 
+    # DB engine profile
+    db_echo: bool = False  # Полный SQL-лог (только для отладки)
+    db_pool_size: int = 5
+    db_max_overflow: int = 10
+    db_statement_timeout_ms: int = 30000  # 0 = без ограничения
+    # SQLite pragmas: бот, вебхук и джобы пишут в один файл одновременно
+    db_sqlite_journal_mode: str = "WAL"
+    db_sqlite_synchronous: str = "NORMAL"
+    db_sqlite_busy_timeout_ms: int = 5000
+    db_sqlite_cache_size_kib: int = 20000
+    db_sqlite_mmap_size_mb: int = 128
+    db_sqlite_temp_store: str = "MEMORY"
+    # Лог медленных запросов (вместо echo)
+    db_slow_query_log: bool = False
+    db_slow_query_threshold_ms: int = 200
+
     # Google Sheets
     google_sheets_spreadsheet_id: str = ""
     google_sheets_credentials_file: str = "google-credentials.json"
 
+    # Бэкапы БД: drive | local (каталог backup_local_dir, без сети)
+    backup_backend: str = "drive"
+    backup_local_dir: str = "data/backups"
+    backup_drive_folder_id: str = ""  # Пусто — корень диска сервисного аккаунта
+    backup_compression: str = "gzip"  # gzip | zstd (нужен пакет zstandard) | none
+    backup_retention_count: int = 14  # Сколько последних снапшотов хранить (0 — все)
+    backup_upload_chunk_mb: int = 8
+    backup_restore_timeout_seconds: int = 120  # Восстановление при старте (0 — без лимита)
+
     # Avito API
     avito_client_id: str = ""
     avito_client_secret: str = ""
     avito_user_id: int = 75878034
     avito_item_ids: str = ""
     avito_redirect_uri: str = "http://localhost:8000/avito/callback"
+    avito_http_max_connections: int = 4  # Пул keep-alive соединений к api.avito.ru
+    avito_http_max_attempts: int = 4  # Попыток на запрос (ретраи на 429/5xx)
+    avito_sync_concurrency: int = 4  # Объявлений, синхронизируемых параллельно
 
     # Scheduler settings
     enable_auto_sync: bool = True
@@ -31,6 +66,32 @@ class Settings(BaseModel):
     sync_on_bot_start: bool = True
     sync_on_user_interaction: bool = True
     sync_cache_ttl_seconds: int = 30
+    # "incremental" = переписываем только изменённые строки, "full" = лист целиком
+    sheets_sync_mode: str = "incremental"
+    # Окно склейки уведомлений об изменениях в один синк Sheets
+    sheets_sync_debounce_seconds: float = 3.0
+
+    # Outbox побочных эффектов броней (Avito-календарь, уведомления)
+    outbox_poll_interval_seconds: float = 5.0
+    outbox_batch_size: int = 50
+    outbox_max_attempts: int = 8
+    outbox_retry_base_seconds: float = 10.0  # Бэкофф: base * 2^(attempt-1)
+    outbox_retry_max_seconds: float = 900.0
+
+    # Как часто сверять версию кеша ролей с БД (0 — не сверять)
+    users_cache_sync_seconds: int = 30
+
+    # Планировщик: политика запусков по умолчанию и переопределения по задачам
+    scheduler_max_instances: int = 1  # Не запускать задачу, пока идёт прошлый прогон
+    scheduler_coalesce: bool = True  # Пропущенные запуски схлопываются в один
+    scheduler_misfire_grace_seconds: int = 300
+    scheduler_cron_jitter_seconds: int = 30  # Разброс старта cron-задач (кластер 09:00)
+    # Cron-запуски, пропущенные за время простоя, выполняются при старте (0 — выкл)
+    scheduler_catchup_minutes: int = 180
+    scheduler_history_days: int = 14  # Сколько хранить историю запусков
+    # {"avito_sync": {"max_instances": 1, "coalesce": true, "misfire_grace_time": 60,
+    #  "jitter": 0, "catch_up": false}}
+    scheduler_job_policies: dict = {}
 
     # Avito calendar settings
     booking_window_days: int = 180
@@ -38,12 +99,24 @@ class Settings(BaseModel):
     # Cleaner settings
     cleaning_notification_time: str = "20:00"
     cleaning_confirm_window_min: int = 30
-    cleaning_sla_check_interval_minutes: int = 5
+    # Эскалация — по таймеру на дедлайн; это лишь страховочный проход
+    cleaning_sla_check_interval_minutes: int = 30
 
     # Webhook security settings
     # Mode: "off" = no verification, "warn" = log warning but allow, "enforce" = reject invalid
     avito_webhook_mode: str = "warn"  # Default: warn (safe rollout)
     avito_webhook_secret: str = ""  # If empty, behaves as "off" mode
+    # Входящая очередь webhook: принять за миллисекунды, обработать воркером
+    avito_inbox_workers: int = 4  # Параллельно обрабатываемых броней
+    avito_inbox_poll_interval_seconds: float = 2.0
+    avito_inbox_batch_size: int = 100
+    avito_inbox_max_attempts: int = 6  # Затем событие уходит в dead-letter
+
+    # Состояние диалогов бота (FSM, шаги мастеров): sqlite | memory
+    telegram_state_backend: str = "sqlite"
+    telegram_state_ttl_seconds: int = 7 * 24 * 3600
+    telegram_state_max_entries: int = 20000
+    telegram_state_flush_interval_seconds: float = 2.0
 
     # Rate limiting settings
     rate_limit_enabled: bool = True  # Killswitch for quick disable
@@ -52,6 +125,8 @@ class Settings(BaseModel):
     # Logging settings
     log_format: str = "console"  # Options: "console", "json"
     log_slow_request_threshold_ms: int = 500  # Log timing only if duration > threshold
+    # Bearer-токен для GET /metrics (пусто — без авторизации)
+    metrics_token: str = ""
 
     # ----------------------------------------------------
     # SaaS / Branding Settings (De-branding)
@@ -78,7 +153,8 @@ class Settings(BaseModel):
     enable_auto_discounts: bool = True  # Авто-скидки на горящие даты
     enable_avito_price_sync: bool = True  # Синхронизация цен → Авито
     auto_discount_tomorrow_percent: int = 20  # Скидка если свободно завтра
-    auto_discount_day_after_percent: int = 15  # Скидка если свободно послезавтра
+    auto_discount_day_after_percent: int = 15  # Скидка если свободно послезавтра (и далее)
+    auto_discount_days_ahead: int = 2  # На сколько дней вперёд искать горящие даты
 
     # Guest feature flags (SaaS toggles)
     guest_feature_faq: bool = True
@@ -129,17 +205,44 @@ else:
 settings = Settings(
     telegram_bot_token=os.environ["TELEGRAM_BOT_TOKEN"],
     telegram_chat_id=int(os.environ["TELEGRAM_CHAT_ID"]),
+    telegram_global_rate_per_second=float(os.environ.get("TELEGRAM_GLOBAL_RATE_PER_SECOND", "25")),
+    telegram_chat_rate_per_second=float(os.environ.get("TELEGRAM_CHAT_RATE_PER_SECOND", "1")),
+    telegram_group_rate_per_minute=float(os.environ.get("TELEGRAM_GROUP_RATE_PER_MINUTE", "20")),
+    telegram_send_concurrency=int(os.environ.get("TELEGRAM_SEND_CONCURRENCY", "8")),
+    telegram_send_max_attempts=int(os.environ.get("TELEGRAM_SEND_MAX_ATTEMPTS", "3")),
     database_url=final_db_url,
+    db_echo=os.environ.get("DB_ECHO", "false").lower() == "true",
+    db_pool_size=int(os.environ.get("DB_POOL_SIZE", "5")),
+    db_max_overflow=int(os.environ.get("DB_MAX_OVERFLOW", "10")),
+    db_statement_timeout_ms=int(os.environ.get("DB_STATEMENT_TIMEOUT_MS", "30000")),
+    db_sqlite_journal_mode=os.environ.get("DB_SQLITE_JOURNAL_MODE", "WAL"),
+    db_sqlite_synchronous=os.environ.get("DB_SQLITE_SYNCHRONOUS", "NORMAL"),
+    db_sqlite_busy_timeout_ms=int(os.environ.get("DB_SQLITE_BUSY_TIMEOUT_MS", "5000")),
+    db_sqlite_cache_size_kib=int(os.environ.get("DB_SQLITE_CACHE_SIZE_KIB", "20000")),
+    db_sqlite_mmap_size_mb=int(os.environ.get("DB_SQLITE_MMAP_SIZE_MB", "128")),
+    db_sqlite_temp_store=os.environ.get("DB_SQLITE_TEMP_STORE", "MEMORY"),
+    db_slow_query_log=os.environ.get("DB_SLOW_QUERY_LOG", "false").lower() == "true",
+    db_slow_query_threshold_ms=int(os.environ.get("DB_SLOW_QUERY_THRESHOLD_MS", "200")),
     google_sheets_spreadsheet_id=os.environ.get("GOOGLE_SHEETS_SPREADSHEET_ID", ""),
     google_sheets_credentials_file=os.environ.get(
         "GOOGLE_SHEETS_CREDENTIALS_FILE", "google-credentials.json"
     ),
+    backup_backend=os.environ.get("BACKUP_BACKEND", "drive"),
+    backup_local_dir=os.environ.get("BACKUP_LOCAL_DIR", "data/backups"),
+    backup_drive_folder_id=os.environ.get("BACKUP_DRIVE_FOLDER_ID", ""),
+    backup_compression=os.environ.get("BACKUP_COMPRESSION", "gzip"),
+    backup_retention_count=int(os.environ.get("BACKUP_RETENTION_COUNT", "14")),
+    backup_upload_chunk_mb=int(os.environ.get("BACKUP_UPLOAD_CHUNK_MB", "8")),
+    backup_restore_timeout_seconds=int(os.environ.get("BACKUP_RESTORE_TIMEOUT_SECONDS", "120")),
     avito_client_id=os.environ.get("AVITO_CLIENT_ID", ""),
     avito_client_secret=os.environ.get("AVITO_CLIENT_SECRET", ""),
     avito_item_ids=os.environ.get("AVITO_ITEM_IDS", ""),
     avito_redirect_uri=os.environ.get(
         "AVITO_REDIRECT_URI", "http://localhost:8000/avito/callback"
     ),
+    avito_http_max_connections=int(os.environ.get("AVITO_HTTP_MAX_CONNECTIONS", "4")),
+    avito_http_max_attempts=int(os.environ.get("AVITO_HTTP_MAX_ATTEMPTS", "4")),
+    avito_sync_concurrency=int(os.environ.get("AVITO_SYNC_CONCURRENCY", "4")),
     enable_auto_sync=os.environ.get("ENABLE_AUTO_SYNC", "true").lower() == "true",
     avito_sync_interval_minutes=int(os.environ.get("AVITO_SYNC_INTERVAL_MINUTES", "5")),
     sheets_sync_interval_minutes=int(
@@ -149,18 +252,44 @@ settings = Settings(
     sync_on_user_interaction=os.environ.get("SYNC_ON_USER_INTERACTION", "true").lower()
     == "true",
     sync_cache_ttl_seconds=int(os.environ.get("SYNC_CACHE_TTL_SECONDS", "30")),
+    sheets_sync_mode=os.environ.get("SHEETS_SYNC_MODE", "incremental"),
+    sheets_sync_debounce_seconds=float(os.environ.get("SHEETS_SYNC_DEBOUNCE_SECONDS", "3")),
+    outbox_poll_interval_seconds=float(os.environ.get("OUTBOX_POLL_INTERVAL_SECONDS", "5")),
+    outbox_batch_size=int(os.environ.get("OUTBOX_BATCH_SIZE", "50")),
+    outbox_max_attempts=int(os.environ.get("OUTBOX_MAX_ATTEMPTS", "8")),
+    outbox_retry_base_seconds=float(os.environ.get("OUTBOX_RETRY_BASE_SECONDS", "10")),
+    outbox_retry_max_seconds=float(os.environ.get("OUTBOX_RETRY_MAX_SECONDS", "900")),
+    users_cache_sync_seconds=int(os.environ.get("USERS_CACHE_SYNC_SECONDS", "30")),
+    scheduler_max_instances=int(os.environ.get("SCHEDULER_MAX_INSTANCES", "1")),
+    scheduler_coalesce=os.environ.get("SCHEDULER_COALESCE", "true").lower() == "true",
+    scheduler_misfire_grace_seconds=int(os.environ.get("SCHEDULER_MISFIRE_GRACE_SECONDS", "300")),
+    scheduler_cron_jitter_seconds=int(os.environ.get("SCHEDULER_CRON_JITTER_SECONDS", "30")),
+    scheduler_catchup_minutes=int(os.environ.get("SCHEDULER_CATCHUP_MINUTES", "180")),
+    scheduler_history_days=int(os.environ.get("SCHEDULER_HISTORY_DAYS", "14")),
+    scheduler_job_policies=json.loads(os.environ.get("SCHEDULER_JOB_POLICIES") or "{}"),
     booking_window_days=int(os.environ.get("BOOKING_WINDOW_DAYS", "180")),
     cleaning_notification_time=os.environ.get("CLEANING_NOTIFICATION_TIME", "20:00"),
     cleaning_confirm_window_min=int(os.environ.get("CLEANING_CONFIRM_WINDOW_MIN", "30")),
-    cleaning_sla_check_interval_minutes=int(os.environ.get("CLEANING_SLA_CHECK_INTERVAL_MINUTES", "5")),
+    cleaning_sla_check_interval_minutes=int(os.environ.get("CLEANING_SLA_CHECK_INTERVAL_MINUTES", "30")),
     avito_webhook_mode=os.environ.get("AVITO_WEBHOOK_MODE", "warn"),
     avito_webhook_secret=os.environ.get("AVITO_WEBHOOK_SECRET", ""),
+    avito_inbox_workers=int(os.environ.get("AVITO_INBOX_WORKERS", "4")),
+    avito_inbox_poll_interval_seconds=float(os.environ.get("AVITO_INBOX_POLL_INTERVAL_SECONDS", "2")),
+    avito_inbox_batch_size=int(os.environ.get("AVITO_INBOX_BATCH_SIZE", "100")),
+    avito_inbox_max_attempts=int(os.environ.get("AVITO_INBOX_MAX_ATTEMPTS", "6")),
+    telegram_state_backend=os.environ.get("TELEGRAM_STATE_BACKEND", "sqlite"),
+    telegram_state_ttl_seconds=int(os.environ.get("TELEGRAM_STATE_TTL_SECONDS", str(7 * 24 * 3600))),
+    telegram_state_max_entries=int(os.environ.get("TELEGRAM_STATE_MAX_ENTRIES", "20000")),
+    telegram_state_flush_interval_seconds=float(
+        os.environ.get("TELEGRAM_STATE_FLUSH_INTERVAL_SECONDS", "2")
+    ),
     rate_limit_enabled=os.environ.get("RATE_LIMIT_ENABLED", "true").lower() == "true",
     rate_limit_webhook=os.environ.get("RATE_LIMIT_WEBHOOK", "30/minute"),
     log_format=os.environ.get("LOG_FORMAT", "console"),
     log_slow_request_threshold_ms=int(
         os.environ.get("LOG_SLOW_REQUEST_THRESHOLD_MS", "500")
     ),
+    metrics_token=os.environ.get("METRICS_TOKEN", ""),
     # SaaS Settings
     project_name=os.environ.get("PROJECT_NAME", "EasyCamp-Teplo"),
     project_location=os.environ.get("PROJECT_LOCATION", "Архыз"),
@@ -179,6 +308,7 @@ settings = Settings(
     enable_avito_price_sync=os.environ.get("ENABLE_AVITO_PRICE_SYNC", "true").lower() == "true",
     auto_discount_tomorrow_percent=int(os.environ.get("AUTO_DISCOUNT_TOMORROW_PERCENT", "20")),
     auto_discount_day_after_percent=int(os.environ.get("AUTO_DISCOUNT_DAY_AFTER_PERCENT", "15")),
+    auto_discount_days_ahead=int(os.environ.get("AUTO_DISCOUNT_DAYS_AHEAD", "2")),
     guest_feature_faq=os.environ.get("GUEST_FEATURE_FAQ", "true").lower() == "true",
     guest_feature_partners=os.environ.get("GUEST_FEATURE_PARTNERS", "true").lower() == "true",
     guest_feature_showcase_houses=os.environ.get("GUEST_FEATURE_SHOWCASE_HOUSES", "true").lower() == "true",
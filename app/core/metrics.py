@@ -0,0 +1,330 @@
+"""
+Метрики процесса в формате Prometheus (без внешних зависимостей)
+
+Счётчики и гистограммы живут в памяти процесса, GET /metrics отдаёт их
+в text exposition format. Запись — поиск по dict и bisect по границам
+корзин (единицы микросекунд), поэтому инструментировать можно горячие
+пути: HTTP-запросы, хэндлеры бота, запросы к БД.
+
+Метки — только из ограниченных множеств (шаблон маршрута, id задачи,
+имя сервиса): сырые пути и id в метки не попадают.
+"""
+
+import asyncio
+import logging
+import time
+from abc import ABC, abstractmethod
+from bisect import bisect_left
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Dict, List, Optional, Sequence, Tuple
+
+logger = logging.getLogger(__name__)
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+JOB_BUCKETS = (0.1, 0.5, 1.0, 5.0, 15.0, 30.0, 60.0, 120.0, 300.0, 600.0)
+LAG_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0)
+COUNT_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100)
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(str(value))}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if not float(value).is_integer() else str(int(value))
+
+
+class _Metric(ABC):
+    kind = "untyped"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+
+    def _header(self) -> List[str]:
+        return [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+
+    @abstractmethod
+    def collect(self) -> List[str]:
+        """Строки экспозиции Prometheus (заголовок и серии)"""
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        super().__init__(name, documentation, labelnames)
+        self._values: Dict[Tuple[str, ...], float] = {}
+
+    def inc(self, *labels: str, amount: float = 1.0):
+        self._values[labels] = self._values.get(labels, 0.0) + amount
+
+    def value(self, *labels: str) -> float:
+        return self._values.get(labels, 0.0)
+
+    def collect(self) -> List[str]:
+        lines = self._header()
+        for labels, value in list(self._values.items()):
+            lines.append(f"{self.name}{_format_labels(self.labelnames, labels)} {_format_value(value)}")
+        return lines
+
+
+class Gauge(Counter):
+    kind = "gauge"
+
+    def set(self, *labels: str, value: float):
+        self._values[labels] = value
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: Sequence[str] = (),
+        buckets: Sequence[float] = LATENCY_BUCKETS,
+    ):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(buckets)
+        # labels -> [счётчики по корзинам (последняя — +Inf), сумма, количество]
+        self._series: Dict[Tuple[str, ...], list] = {}
+
+    def observe(self, value: float, *labels: str):
+        series = self._series.get(labels)
+        if series is None:
+            series = self._series[labels] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+        series[0][bisect_left(self.buckets, value)] += 1
+        series[1] += value
+        series[2] += 1
+
+    @contextmanager
+    def time(self, *labels: str):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, *labels)
+
+    def count(self, *labels: str) -> int:
+        series = self._series.get(labels)
+        return series[2] if series else 0
+
+    def collect(self) -> List[str]:
+        lines = self._header()
+        for labels, (counts, total, count) in list(self._series.items()):
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += bucket_count
+                le = f'le="{_format_value(bound)}"'
+                lines.append(
+                    f"{self.name}_bucket{_format_labels(self.labelnames, labels, le)} {cumulative}"
+                )
+            label_str = _format_labels(self.labelnames, labels)
+            lines.append(f"{self.name}_sum{label_str} {_format_value(total)}")
+            lines.append(f"{self.name}_count{label_str} {count}")
+        return lines
+
+
+class Registry:
+    def __init__(self):
+        self._metrics: Dict[str, _Metric] = {}
+
+    def register(self, metric: _Metric) -> _Metric:
+        self._metrics[metric.name] = metric
+        return metric
+
+    def render(self) -> str:
+        lines: List[str] = []
+        for metric in self._metrics.values():
+            lines.extend(metric.collect())
+        return "\n".join(lines) + "\n"
+
+
+# Глобальный экземпляр
+registry = Registry()
+
+PROCESS_START_TIME = registry.register(
+    Gauge("process_start_time_seconds", "Start time of the process since unix epoch")
+)
+PROCESS_START_TIME.set(value=time.time())
+
+HTTP_REQUEST_DURATION = registry.register(
+    Histogram(
+        "http_request_duration_seconds",
+        "HTTP request latency by route template",
+        ("method", "route", "status"),
+    )
+)
+HTTP_REQUEST_DB_QUERIES = registry.register(
+    Histogram(
+        "http_request_db_queries",
+        "Database queries issued while handling one HTTP request",
+        ("route",),
+        buckets=COUNT_BUCKETS,
+    )
+)
+DB_QUERIES = registry.register(Counter("db_queries_total", "Database queries executed"))
+
+SCHEDULER_JOB_DURATION = registry.register(
+    Histogram(
+        "scheduler_job_duration_seconds",
+        "Scheduler job run duration",
+        ("job",),
+        buckets=JOB_BUCKETS,
+    )
+)
+SCHEDULER_JOB_RUNS = registry.register(
+    Counter("scheduler_job_runs_total", "Scheduler job runs by outcome", ("job", "outcome"))
+)
+
+EXTERNAL_REQUEST_DURATION = registry.register(
+    Histogram(
+        "external_request_duration_seconds",
+        "Outgoing API call latency (Avito, Yandex Travel, Google Sheets/Drive)",
+        ("service", "method", "status"),
+    )
+)
+
+TELEGRAM_HANDLER_DURATION = registry.register(
+    Histogram(
+        "telegram_handler_duration_seconds",
+        "Telegram update handling latency by handler module",
+        ("router", "event"),
+    )
+)
+TELEGRAM_HANDLER_ERRORS = registry.register(
+    Counter("telegram_handler_errors_total", "Telegram handlers that raised", ("router", "event"))
+)
+
+BACKUP_SIZE_BYTES = registry.register(
+    Gauge("backup_last_size_bytes", "Size of the last database backup", ("kind",))
+)
+BACKUP_DURATION = registry.register(
+    Gauge("backup_last_duration_seconds", "Duration of the last database backup")
+)
+
+STARTUP_PHASE = registry.register(
+    Gauge("startup_phase_seconds", "Duration of application startup phases", ("phase",))
+)
+
+EVENT_LOOP_LAG = registry.register(
+    Histogram("event_loop_lag_seconds", "Delay of event loop wakeups", buckets=LAG_BUCKETS)
+)
+
+
+# ------------------------------------------------------------------
+# Внешние API
+# ------------------------------------------------------------------
+
+
+def observe_external(service: str, method: str, status, seconds: float):
+    EXTERNAL_REQUEST_DURATION.observe(seconds, service, method, str(status))
+
+
+def requests_hook(service: str):
+    """response-hook для requests: латентность и статус каждого ответа"""
+
+    def hook(response, *args, **kwargs):
+        observe_external(
+            service, response.request.method, response.status_code, response.elapsed.total_seconds()
+        )
+
+    return hook
+
+
+@contextmanager
+def track_external(service: str, method: str):
+    """Замер вызова без доступа к ответу (googleapiclient .execute())"""
+    start = time.perf_counter()
+    status = "ok"
+    try:
+        yield
+    except Exception as e:
+        resp = getattr(e, "resp", None)
+        status = getattr(resp, "status", None) or "error"
+        raise
+    finally:
+        observe_external(service, method, status, time.perf_counter() - start)
+
+
+# ------------------------------------------------------------------
+# Запросы к БД в рамках HTTP-запроса
+# ------------------------------------------------------------------
+
+_request_db_queries: ContextVar[Optional[List[int]]] = ContextVar("request_db_queries", default=None)
+
+
+def begin_db_query_count():
+    """Начинает счёт запросов к БД в текущем контексте; возвращает (token, счётчик)"""
+    counter = [0]
+    return _request_db_queries.set(counter), counter
+
+
+def end_db_query_count(token):
+    _request_db_queries.reset(token)
+
+
+def install_db_metrics(engine):
+    """Считает запросы к БД: всего и в рамках текущего HTTP-запроса"""
+    from sqlalchemy import event
+
+    @event.listens_for(engine.sync_engine, "before_cursor_execute")
+    def _count_query(conn, cursor, statement, parameters, context, executemany):
+        DB_QUERIES.inc()
+        counter = _request_db_queries.get()
+        if counter is not None:
+            counter[0] += 1
+
+
+# ------------------------------------------------------------------
+# Лаг event loop
+# ------------------------------------------------------------------
+
+
+class LoopLagMonitor:
+    """Периодически засыпает на interval и меряет, насколько позже проснулся"""
+
+    def __init__(self, interval: float = 0.5):
+        self.interval = interval
+        self.last_lag = 0.0
+        self._runner: Optional[asyncio.Task] = None
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            start = loop.time()
+            await asyncio.sleep(self.interval)
+            self.last_lag = max(0.0, loop.time() - start - self.interval)
+            EVENT_LOOP_LAG.observe(self.last_lag)
+
+    def start(self):
+        if self._runner is not None and not self._runner.done():
+            return
+        self._runner = asyncio.get_running_loop().create_task(self._run())
+
+    async def stop(self):
+        if self._runner is None:
+            return
+        self._runner.cancel()
+        try:
+            await self._runner
+        except asyncio.CancelledError:
+            pass
+        self._runner = None
+
+
+# Глобальный экземпляр
+loop_lag_monitor = LoopLagMonitor()
@@ -0,0 +1,73 @@
+"""
+Профиль старта приложения
+
+Отсчёт идёт с импорта app.main (этот модуль импортируется в нём первым):
+время импорта модулей, каждой фазы on_startup и до первого обработанного
+апдейта Telegram. Итог — одна строка в логе («Startup profile: ...») и
+метрика startup_phase_seconds{phase} на /metrics.
+"""
+
+import logging
+import time
+from contextlib import contextmanager
+from typing import Awaitable, Dict
+
+from app.core import metrics
+
+logger = logging.getLogger(__name__)
+
+
+class StartupProfile:
+    def __init__(self, clock=time.perf_counter):
+        self._clock = clock
+        self.started = clock()
+        self.phases: Dict[str, float] = {}
+        self._first_update_seen = False
+
+    def elapsed(self) -> float:
+        return self._clock() - self.started
+
+    def record(self, name: str, seconds: float):
+        self.phases[name] = seconds
+        metrics.STARTUP_PHASE.set(name, value=round(seconds, 4))
+
+    def mark(self, name: str):
+        """Отметка от начала старта (import, ready, first_update)"""
+        self.record(name, self.elapsed())
+
+    @contextmanager
+    def phase(self, name: str):
+        start = self._clock()
+        try:
+            yield
+        finally:
+            self.record(name, self._clock() - start)
+
+    async def run(self, name: str, aw: Awaitable, *, required: bool = True):
+        """Фаза-корутина; необязательная фаза при ошибке только логируется"""
+        with self.phase(name):
+            try:
+                return await aw
+            except Exception as e:
+                if required:
+                    raise
+                logger.error(f"Startup phase {name} failed: {e}", exc_info=True)
+                return None
+
+    def summary(self) -> str:
+        return ", ".join(f"{name}={seconds * 1000:.0f}ms" for name, seconds in self.phases.items())
+
+    async def first_update_middleware(self, handler, event, data):
+        """outer-middleware dp.update: время до первого обработанного апдейта"""
+        if self._first_update_seen:
+            return await handler(event, data)
+        self._first_update_seen = True
+        try:
+            return await handler(event, data)
+        finally:
+            self.mark("first_update")
+            logger.info(f"First Telegram update handled {self.phases['first_update']:.2f}s after start")
+
+
+# Глобальный экземпляр
+startup_profile = StartupProfile()
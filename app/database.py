@@ -1,12 +1,143 @@
-from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker, AsyncSession
+import logging
+import time
+
+from sqlalchemy import event
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import (
+    AsyncEngine,
+    create_async_engine,
+    async_sessionmaker,
+    AsyncSession,
+)
 from sqlalchemy.orm import DeclarativeBase
 
-from app.core.config import settings
+from app.core.config import Settings, settings
+from app.core.metrics import install_db_metrics
 
-engine = create_async_engine(
-    settings.database_url,
-    echo=True,  # Log SQL queries for debugging
-)
+logger = logging.getLogger(__name__)
+
+# Как часто (в инструкциях VM SQLite) проверять таймаут запроса
+_PROGRESS_HANDLER_STEPS = 1000
+
+
+def _is_sqlite(url: str) -> bool:
+    return make_url(url).get_backend_name() == "sqlite"
+
+
+def _is_memory_sqlite(url: str) -> bool:
+    database = make_url(url).database
+    return _is_sqlite(url) and (not database or database == ":memory:")
+
+
+def sqlite_pragmas(profile: Settings) -> list[str]:
+    """PRAGMA-выражения, применяемые к каждому новому соединению SQLite."""
+    return [
+        f"PRAGMA journal_mode={profile.db_sqlite_journal_mode}",
+        f"PRAGMA synchronous={profile.db_sqlite_synchronous}",
+        f"PRAGMA busy_timeout={int(profile.db_sqlite_busy_timeout_ms)}",
+        # Отрицательное значение = размер в KiB, а не в страницах
+        f"PRAGMA cache_size=-{int(profile.db_sqlite_cache_size_kib)}",
+        f"PRAGMA mmap_size={int(profile.db_sqlite_mmap_size_mb) * 1024 * 1024}",
+        f"PRAGMA temp_store={profile.db_sqlite_temp_store}",
+    ]
+
+
+def engine_kwargs(profile: Settings) -> dict:
+    """Аргументы create_async_engine по профилю из Settings."""
+    kwargs: dict = {"echo": profile.db_echo}
+
+    # In-memory SQLite работает на StaticPool — размер пула к нему неприменим
+    if not _is_memory_sqlite(profile.database_url):
+        kwargs["pool_size"] = profile.db_pool_size
+        kwargs["max_overflow"] = profile.db_max_overflow
+
+    backend = make_url(profile.database_url).get_backend_name()
+    if backend == "postgresql" and profile.db_statement_timeout_ms > 0:
+        kwargs["connect_args"] = {
+            "server_settings": {"statement_timeout": str(profile.db_statement_timeout_ms)}
+        }
+    return kwargs
+
+
+def install_sqlite_profile(engine: AsyncEngine, profile: Settings) -> None:
+    """
+    Pragmas на каждое соединение + таймаут запроса.
+
+    У SQLite нет statement_timeout: ставим progress handler, который
+    прерывает запрос (OperationalError: interrupted), если тот идёт
+    дольше db_statement_timeout_ms.
+    """
+    pragmas = sqlite_pragmas(profile)
+    timeout = profile.db_statement_timeout_ms / 1000
+
+    @event.listens_for(engine.sync_engine, "connect")
+    def _on_connect(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        try:
+            for pragma in pragmas:
+                cursor.execute(pragma)
+        finally:
+            cursor.close()
+
+        if timeout > 0:
+            deadline = connection_record.info.setdefault("statement_deadline", [None])
+
+            def _check_deadline():
+                # 1 = прервать текущий запрос
+                return 1 if deadline[0] is not None and time.monotonic() > deadline[0] else 0
+
+            dbapi_connection.await_(
+                dbapi_connection.driver_connection.set_progress_handler(
+                    _check_deadline, _PROGRESS_HANDLER_STEPS
+                )
+            )
+
+    if timeout > 0:
+
+        @event.listens_for(engine.sync_engine, "before_cursor_execute")
+        def _arm_deadline(conn, cursor, statement, parameters, context, executemany):
+            deadline = conn.info.get("statement_deadline")
+            if deadline is not None:
+                deadline[0] = time.monotonic() + timeout
+
+        @event.listens_for(engine.sync_engine, "after_cursor_execute")
+        def _disarm_deadline(conn, cursor, statement, parameters, context, executemany):
+            deadline = conn.info.get("statement_deadline")
+            if deadline is not None:
+                deadline[0] = None
+
+
+def install_slow_query_log(engine: AsyncEngine, threshold_ms: int) -> None:
+    """Логировать запросы дольше threshold_ms (opt-in замена echo=True)."""
+
+    @event.listens_for(engine.sync_engine, "before_cursor_execute")
+    def _start_timer(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault("query_started", []).append(time.perf_counter())
+
+    @event.listens_for(engine.sync_engine, "after_cursor_execute")
+    def _log_slow(conn, cursor, statement, parameters, context, executemany):
+        started = conn.info.get("query_started")
+        if not started:
+            return
+        duration_ms = (time.perf_counter() - started.pop()) * 1000
+        if duration_ms > threshold_ms:
+            logger.warning(
+                f"Slow query: {duration_ms:.1f}ms: {' '.join(statement.split())[:500]}",
+                extra={"duration_ms": round(duration_ms, 2)},
+            )
+
+
+def create_engine_from_settings(profile: Settings) -> AsyncEngine:
+    engine = create_async_engine(profile.database_url, **engine_kwargs(profile))
+    if _is_sqlite(profile.database_url):
+        install_sqlite_profile(engine, profile)
+    if profile.db_slow_query_log:
+        install_slow_query_log(engine, profile.db_slow_query_threshold_ms)
+    install_db_metrics(engine)
+    return engine
+
+
+engine = create_engine_from_settings(settings)
 
 
 AsyncSessionLocal = async_sessionmaker(
@@ -28,3 +159,9 @@ async def get_db():
 async def init_db():
     async with engine.begin() as conn:
         await conn.run_sync(Base.metadata.create_all)
+
+    # create_all на существующей базе создаёт house_day_occupancy пустой
+    from app.services.occupancy_service import OccupancyService
+
+    async with AsyncSessionLocal() as session:
+        await OccupancyService.ensure_populated(session)
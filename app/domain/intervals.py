@@ -0,0 +1,79 @@
+"""
+Алгебра диапазонов дат для календарей занятости.
+
+Диапазон — полуинтервал [start, end) из двух date, как у брони:
+check_in входит, check_out — нет (день выезда свободен для заезда).
+Все функции принимают любые итерируемые диапазоны и работают за
+O(n log n) на сортировку + O(n) на проход; по дням разворачивается
+только availability_mask, которой это и нужно для ответа.
+"""
+
+from datetime import date
+from typing import Iterable, Iterator, List, Tuple
+
+DateRange = Tuple[date, date]
+
+
+def merge(ranges: Iterable[DateRange]) -> List[DateRange]:
+    """Отсортировать и склеить пересекающиеся и смежные диапазоны, пустые отбросить."""
+    merged: List[DateRange] = []
+    for start, end in sorted(r for r in ranges if r[0] < r[1]):
+        if merged and start <= merged[-1][1]:
+            if end > merged[-1][1]:
+                merged[-1] = (merged[-1][0], end)
+        else:
+            merged.append((start, end))
+    return merged
+
+
+def clip(ranges: Iterable[DateRange], window_start: date, window_end: date) -> List[DateRange]:
+    """Обрезать диапазоны окном [window_start, window_end), пустые отбросить."""
+    clipped = []
+    for start, end in ranges:
+        start, end = max(start, window_start), min(end, window_end)
+        if start < end:
+            clipped.append((start, end))
+    return clipped
+
+
+def subtract(ranges: Iterable[DateRange], removed: Iterable[DateRange]) -> List[DateRange]:
+    """Дни из ranges, не покрытые removed (оба набора склеиваются заранее)."""
+    removed = merge(removed)
+    result: List[DateRange] = []
+    i = 0
+    for start, end in merge(ranges):
+        # Пропускаем вычитаемые диапазоны, закончившиеся до текущего
+        while i < len(removed) and removed[i][1] <= start:
+            i += 1
+        cursor = start
+        j = i
+        while j < len(removed) and removed[j][0] < end:
+            if removed[j][0] > cursor:
+                result.append((cursor, removed[j][0]))
+            cursor = max(cursor, removed[j][1])
+            j += 1
+        if cursor < end:
+            result.append((cursor, end))
+    return result
+
+
+def free_gaps(busy: Iterable[DateRange], window_start: date, window_end: date) -> Iterator[DateRange]:
+    """Свободные промежутки окна [window_start, window_end) между занятыми диапазонами."""
+    cursor = window_start
+    for start, end in merge(clip(busy, window_start, window_end)):
+        if start > cursor:
+            yield cursor, start
+        cursor = end
+    if cursor < window_end:
+        yield cursor, window_end
+
+
+def availability_mask(busy: Iterable[DateRange], window_start: date, window_end: date) -> List[bool]:
+    """Свободен ли каждый день окна: список длиной (window_end - window_start).days."""
+    days = (window_end - window_start).days
+    mask = [True] * max(days, 0)
+    for start, end in merge(clip(busy, window_start, window_end)):
+        lo, hi = (start - window_start).days, (end - window_start).days
+        mask[lo:hi] = [False] * (hi - lo)
+    return mask
+
@@ -2,12 +2,14 @@
 Периодическая задача синхронизации с Avito API
 """
 
+import asyncio
 import logging
-from aiogram import Bot
+import time
 
 from app.core.config import settings
-from app.services.avito_sync_service import sync_all_avito_items
+from app.services.avito_sync_service import format_item_timings, sync_all_avito_items
 from app.services.notification_service import send_safe
+from app.services.telegram_dispatcher import Priority
 
 logger = logging.getLogger(__name__)
 
@@ -35,8 +37,10 @@ async def sync_avito_job():
         logger.info(
             f"✅ Avito sync completed: "
             f"total={stats['total']}, new={len(stats['new_bookings'])}, "
-            f"updated={len(stats['updated_bookings'])}, errors={stats['errors']}"
+            f"updated={len(stats['updated_bookings'])}, errors={stats['errors']}, "
+            f"conflicts={stats['conflicts']}, duration={stats['duration_ms']:.0f}ms"
         )
+        logger.info(f"⏱ Avito sync per item (fetch+apply): {format_item_timings(stats['items'])}")
 
         # Проверка и синхронизация локальных броней в Avito
         logger.info("🔍 Verifying local bookings in Avito...")
@@ -53,23 +57,32 @@ async def sync_avito_job():
         # Если были изменения, запускаем синхронизацию с таблицей
         if stats["new_bookings"] or stats["updated_bookings"]:
             logger.info("Triggering Sheets sync due to Avito changes...")
-            from app.services.sheets_service import sheets_service
+            from app.services.sheets_sync_coordinator import sheets_sync_coordinator
 
-            await sheets_service.sync_if_needed(force=True)
+            sheets_sync_coordinator.request_sync("avito_sync")
 
     except Exception as e:
         logger.error(f"❌ Avito sync failed: {e}", exc_info=True)
 
 
-async def verify_local_bookings_in_avito(item_house_mapping: dict):
-    """Проверить и синхронизировать локальные брони в Avito"""
+async def verify_local_bookings_in_avito(item_house_mapping: dict, force: bool = False):
+    """Проверить и синхронизировать локальные брони в Avito.
+
+    Календарь объявления пушится через channel_push_queue: если интервалы
+    не изменились с последнего успешного пуша, запрос не отправляется
+    (force=True — отправить всё равно).
+    """
     try:
         from app.database import AsyncSessionLocal
         from app.models import Booking, BookingStatus
         from sqlalchemy import select
         from datetime import datetime, timedelta
         from app.services.avito_api_service import avito_api_service
-        import asyncio
+        from app.services.channel_push_queue import (
+            FAILED,
+            UNCHANGED,
+            channel_push_queue,
+        )
 
         async with AsyncSessionLocal() as session:
             # Получаем все активные брони из БД
@@ -116,32 +129,52 @@ async def verify_local_bookings_in_avito(item_house_mapping: dict):
                     bookings_by_house[booking.house_id] = []
                 bookings_by_house[booking.house_id].append(booking)
 
-            # Проверяем каждый дом
-            stats = {"updated": 0, "errors": 0}
-
-            for item_id, house_id in item_house_mapping.items():
-                house_bookings = bookings_by_house.get(house_id, [])
-
-                logger.info(
-                    f"Syncing calendar for house {house_id} (item {item_id}) using {len(house_bookings)} bookings"
-                )
-
-                # Вызываем обновление синхронно через asyncio.to_thread
-                success = await asyncio.to_thread(
-                    avito_api_service.update_calendar_from_local,
-                    item_id,
-                    house_bookings,
-                )
-
-                if success:
-                    stats["updated"] += 1
-                else:
-                    stats["errors"] += 1
+        # Пушим календари параллельно (не больше avito_sync_concurrency
+        # одновременно). Сессия БД здесь уже не нужна — только сеть.
+        semaphore = asyncio.Semaphore(max(1, settings.avito_sync_concurrency))
+        started = time.perf_counter()
+
+        async def _push(item_id: int, house_id: int) -> tuple[int, str, float]:
+            house_bookings = bookings_by_house.get(house_id, [])
+            intervals = avito_api_service.build_calendar_intervals(house_bookings)
+            async with semaphore:
+                item_started = time.perf_counter()
+                try:
+                    outcome = await channel_push_queue.push(
+                        "avito",
+                        item_id,
+                        "calendar",
+                        intervals,
+                        lambda payload: avito_api_service.push_calendar_intervals(
+                            item_id, payload
+                        ),
+                        force=force,
+                    )
+                except Exception as e:
+                    logger.error(f"Calendar push failed for item {item_id}: {e}")
+                    outcome = FAILED
+                return item_id, outcome, (time.perf_counter() - item_started) * 1000
+
+        results = await asyncio.gather(
+            *(_push(item_id, house_id) for item_id, house_id in item_house_mapping.items())
+        )
 
-            logger.info(
-                f"✅ Calendar sync complete: "
-                f"updated={stats['updated']}, errors={stats['errors']}"
-            )
+        stats = {
+            "updated": sum(1 for _, outcome, _ in results if outcome not in (FAILED, UNCHANGED)),
+            "unchanged": sum(1 for _, outcome, _ in results if outcome == UNCHANGED),
+            "errors": sum(1 for _, outcome, _ in results if outcome == FAILED),
+        }
+        timings = ", ".join(
+            f"{item_id}: {ms:.0f}ms" + {FAILED: " (err)", UNCHANGED: " (=)"}.get(outcome, "")
+            for item_id, outcome, ms in results
+        )
+        logger.info(
+            f"✅ Calendar sync complete: "
+            f"updated={stats['updated']}, unchanged={stats['unchanged']}, "
+            f"errors={stats['errors']}, "
+            f"duration={(time.perf_counter() - started) * 1000:.0f}ms [{timings}]"
+        )
+        return stats
 
     except Exception as e:
         logger.error(f"❌ Failed to verify local bookings: {e}", exc_info=True)
@@ -150,31 +183,36 @@ async def verify_local_bookings_in_avito(item_house_mapping: dict):
 async def notify_new_bookings(bookings: list):
     """Отправить уведомление о новых бронях"""
     from app.services.cleaner_notify import notify_cleaners_new_booking
-
-    bot = Bot(token=settings.telegram_bot_token)
-    try:
-        for booking in bookings:
-            house_name = booking.house.name if booking.house else f"House {booking.house_id}"
-            text = (
-                f"🆕 <b>Новая бронь (Avito)</b>\n\n"
-                f"🏠 <b>{house_name}</b>\n"
-                f"👤 {booking.guest_name}\n"
-                f"📞 {booking.guest_phone}\n"
-                f"📅 {booking.check_in.strftime('%d.%m')} - {booking.check_out.strftime('%d.%m')}\n"
-                f"💰 {booking.total_price}₽ (Предоплата: {booking.advance_amount}₽)"
+    from app.telegram.bot import bot
+
+    sends = []
+    for booking in bookings:
+        house_name = booking.house.name if booking.house else f"House {booking.house_id}"
+        text = (
+            f"🆕 <b>Новая бронь (Avito)</b>\n\n"
+            f"🏠 <b>{house_name}</b>\n"
+            f"👤 {booking.guest_name}\n"
+            f"📞 {booking.guest_phone}\n"
+            f"📅 {booking.check_in.strftime('%d.%m')} - {booking.check_out.strftime('%d.%m')}\n"
+            f"💰 {booking.total_price}₽ (Предоплата: {booking.advance_amount}₽)"
+        )
+        sends.append(
+            send_safe(
+                bot, settings.telegram_chat_id, text,
+                priority=Priority.HIGH, context=f"avito_new booking={booking.id}",
             )
-            await send_safe(bot, settings.telegram_chat_id, text, context=f"avito_new booking={booking.id}")
-            await notify_cleaners_new_booking(bot, booking)
+        )
+        sends.append(notify_cleaners_new_booking(bot, booking))
 
-        logger.info(f"Sent notifications about {len(bookings)} new bookings")
-    finally:
-        await bot.session.close()
+    await asyncio.gather(*sends)
+    logger.info(f"Sent notifications about {len(bookings)} new bookings")
 
 
 async def notify_updated_bookings(bookings: list):
     """Отправить уведомление об обновлении броней"""
     from app.models import BookingStatus
     from app.services.cleaner_notify import notify_cleaners_booking_cancelled
+    from app.telegram.bot import bot
 
     _status_map = {
         "confirmed": "✅ Подтверждено",
@@ -183,22 +221,26 @@ async def notify_updated_bookings(bookings: list):
         "paid": "💰 Оплачено",
     }
 
-    bot = Bot(token=settings.telegram_bot_token)
-    try:
-        for booking in bookings:
-            house_name = booking.house.name if booking.house else f"House {booking.house_id}"
-            status_text = _status_map.get(booking.status.value, booking.status.value)
-            text = (
-                f"🔄 <b>Бронь обновлена (Avito)</b>\n\n"
-                f"🏠 <b>{house_name}</b>\n"
-                f"👤 {booking.guest_name}\n"
-                f"📅 {booking.check_in.strftime('%d.%m')} - {booking.check_out.strftime('%d.%m')}\n"
-                f"Статус: {status_text}\n"
-                f"Предоплата: {booking.advance_amount}₽"
+    sends = []
+    for booking in bookings:
+        house_name = booking.house.name if booking.house else f"House {booking.house_id}"
+        status_text = _status_map.get(booking.status.value, booking.status.value)
+        text = (
+            f"🔄 <b>Бронь обновлена (Avito)</b>\n\n"
+            f"🏠 <b>{house_name}</b>\n"
+            f"👤 {booking.guest_name}\n"
+            f"📅 {booking.check_in.strftime('%d.%m')} - {booking.check_out.strftime('%d.%m')}\n"
+            f"Статус: {status_text}\n"
+            f"Предоплата: {booking.advance_amount}₽"
+        )
+        sends.append(
+            send_safe(
+                bot, settings.telegram_chat_id, text,
+                priority=Priority.HIGH, context=f"avito_updated booking={booking.id}",
             )
-            await send_safe(bot, settings.telegram_chat_id, text, context=f"avito_updated booking={booking.id}")
+        )
+
+        if booking.status == BookingStatus.CANCELLED:
+            sends.append(notify_cleaners_booking_cancelled(bot, booking))
 
-            if booking.status == BookingStatus.CANCELLED:
-                await notify_cleaners_booking_cancelled(bot, booking)
-    finally:
-        await bot.session.close()
+    await asyncio.gather(*sends)
@@ -9,6 +9,7 @@ Escalation chain for tomorrow's checkouts:
 Plus:
   09:00 — non-interactive morning briefing for today's checkouts (guest phone included)
 """
+import asyncio
 import logging
 from datetime import date, timedelta
 
@@ -18,7 +19,7 @@ from sqlalchemy.orm import joinedload
 from app.database import AsyncSessionLocal
 from app.models import Booking, BookingStatus, User, UserRole
 from app.services.checkout_ack import checkout_ack_keyboard, get_ack_status, set_ack_status
-from app.services.notification_service import send_safe
+from app.services.telegram_dispatcher import Priority, telegram_dispatcher
 
 logger = logging.getLogger(__name__)
 
@@ -46,8 +47,6 @@ async def _cleaners(session) -> list[User]:
 
 async def send_checkout_ack_reminders():
     """12:00: send day-before reminder with ack buttons for tomorrow's checkouts."""
-    from app.telegram.bot import bot
-
     tomorrow = date.today() + timedelta(days=1)
     async with AsyncSessionLocal() as session:
         bookings = await _bookings_on(session, tomorrow)
@@ -55,6 +54,7 @@ async def send_checkout_ack_reminders():
         if not bookings or not cleaners:
             return
 
+        sends = []
         for b in bookings:
             ack = await get_ack_status(session, b.id)
             if ack in ("acked", "declined"):
@@ -69,17 +69,21 @@ async def send_checkout_ack_reminders():
                 "Подтвердите, что примете уборку."
             )
             kb = checkout_ack_keyboard(b.id)
-            for c in cleaners:
-                await send_safe(bot, c.telegram_id, text, reply_markup=kb, context=f"ack_reminder booking={b.id}")
+            sends.append(
+                telegram_dispatcher.send_many(
+                    [c.telegram_id for c in cleaners], text, reply_markup=kb,
+                    context=f"ack_reminder booking={b.id}",
+                )
+            )
 
             await set_ack_status(session, b.id, "pending:0")
-            logger.info(f"Checkout ack reminder sent for booking {b.id} (checkout {tomorrow})")
+            logger.info(f"Checkout ack reminder queued for booking {b.id} (checkout {tomorrow})")
+
+        await asyncio.gather(*sends)
 
 
 async def retry_checkout_ack():
     """13:00: re-send reminder for bookings still at pending:0."""
-    from app.telegram.bot import bot
-
     tomorrow = date.today() + timedelta(days=1)
     async with AsyncSessionLocal() as session:
         bookings = await _bookings_on(session, tomorrow)
@@ -87,6 +91,7 @@ async def retry_checkout_ack():
         if not bookings or not cleaners:
             return
 
+        sends = []
         for b in bookings:
             if await get_ack_status(session, b.id) != "pending:0":
                 continue
@@ -100,16 +105,21 @@ async def retry_checkout_ack():
                 "Вы ещё не подтвердили уборку."
             )
             kb = checkout_ack_keyboard(b.id)
-            for c in cleaners:
-                await send_safe(bot, c.telegram_id, text, reply_markup=kb, context=f"ack_retry booking={b.id}")
+            sends.append(
+                telegram_dispatcher.send_many(
+                    [c.telegram_id for c in cleaners], text, reply_markup=kb,
+                    context=f"ack_retry booking={b.id}",
+                )
+            )
 
             await set_ack_status(session, b.id, "pending:1")
-            logger.info(f"Checkout ack retry sent for booking {b.id}")
+            logger.info(f"Checkout ack retry queued for booking {b.id}")
+
+        await asyncio.gather(*sends)
 
 
 async def alert_admin_no_ack():
     """14:00: alert admin if booking still at pending:1 (2 reminders sent, no response)."""
-    from app.telegram.bot import bot
     from app.core.config import settings
 
     tomorrow = date.today() + timedelta(days=1)
@@ -129,15 +139,16 @@ async def alert_admin_no_ack():
                 f"📅 Выезд: {b.check_out.strftime('%d.%m')}\n\n"
                 "Никто не подтвердил уборку. Требуется ручное управление."
             )
-            ok = await send_safe(bot, settings.telegram_chat_id, text, context=f"no_ack_admin booking={b.id}")
+            ok = await telegram_dispatcher.send(
+                settings.telegram_chat_id, text,
+                priority=Priority.HIGH, context=f"no_ack_admin booking={b.id}",
+            )
             if ok:
                 logger.warning(f"Admin alerted: no ack for booking {b.id}")
 
 
 async def send_morning_checkout_briefing():
     """09:00: non-interactive morning briefing for today's checkouts with guest phone."""
-    from app.telegram.bot import bot
-
     today = date.today()
     async with AsyncSessionLocal() as session:
         bookings = await _bookings_on(session, today)
@@ -145,6 +156,7 @@ async def send_morning_checkout_briefing():
         if not bookings or not cleaners:
             return
 
+        sends = []
         for b in bookings:
             house = b.house.name if b.house else f"Дом {b.house_id}"
             text = (
@@ -155,9 +167,14 @@ async def send_morning_checkout_briefing():
                 f"📞 {b.guest_phone}\n\n"
                 "Гость выезжает до 12:00 🧹"
             )
-            for c in cleaners:
-                await send_safe(bot, c.telegram_id, text, context=f"morning_briefing booking={b.id}")
+            sends.append(
+                telegram_dispatcher.send_many(
+                    [c.telegram_id for c in cleaners], text,
+                    priority=Priority.BULK, context=f"morning_briefing booking={b.id}",
+                )
+            )
 
+        await asyncio.gather(*sends)
         logger.info(f"Morning checkout briefing: {len(bookings)} booking(s) on {today}")
 
         # Cleanup stale ack keys for past checkouts
@@ -1,52 +1,85 @@
+import asyncio
 import logging
 from datetime import datetime, timezone
+from typing import Iterable, Optional
 
-from sqlalchemy import and_, select
+from sqlalchemy import select, update
 
 from app.core.config import settings
 from app.database import AsyncSessionLocal
 from app.models import CleaningTask, CleaningTaskStatus, User, UserRole
-from app.telegram.bot import bot
-from app.services.notification_service import send_safe
+from app.services.telegram_dispatcher import Priority, telegram_dispatcher
 
 logger = logging.getLogger(__name__)
 
 
-async def run_cleaning_sla_monitor():
+async def escalate_overdue_tasks(task_ids: Optional[Iterable[int]] = None) -> int:
+    """
+    Эскалировать PENDING-задачи с истёкшим дедлайном подтверждения.
+
+    Условный UPDATE ... RETURNING: задачу, которую уже приняли, отменили
+    или эскалировал другой процесс, повторно не трогаем.
+    task_ids — только эти задачи (таймер app.services.cleaning_sla_timers),
+    None — все просроченные (страховочный проход).
+    """
     now = datetime.now(timezone.utc)
 
+    stmt = update(CleaningTask).where(
+        CleaningTask.status == CleaningTaskStatus.PENDING,
+        CleaningTask.confirm_deadline_at.is_not(None),
+        CleaningTask.confirm_deadline_at <= now,
+    )
+    if task_ids is not None:
+        stmt = stmt.where(CleaningTask.id.in_(list(task_ids)))
+    stmt = (
+        stmt.values(status=CleaningTaskStatus.ESCALATED, escalated_at=now, updated_at=now)
+        .returning(CleaningTask.id, CleaningTask.house_id, CleaningTask.scheduled_date)
+        .execution_options(synchronize_session=False)
+    )
+
     async with AsyncSessionLocal() as session:
-        q = await session.execute(
-            select(CleaningTask).where(
-                and_(
-                    CleaningTask.status == CleaningTaskStatus.PENDING,
-                    CleaningTask.confirm_deadline_at.is_not(None),
-                    CleaningTask.confirm_deadline_at < now,
-                )
-            )
-        )
-        overdue = list(q.scalars().all())
+        overdue = (await session.execute(stmt)).all()
         if not overdue:
-            return
+            await session.rollback()
+            return 0
 
         admin_q = await session.execute(select(User).where(User.role.in_([UserRole.ADMIN, UserRole.OWNER])))
         admins = [u.telegram_id for u in admin_q.scalars().all() if u.telegram_id]
         if settings.telegram_chat_id not in admins:
             admins.append(settings.telegram_chat_id)
 
-        for task in overdue:
-            task.status = CleaningTaskStatus.ESCALATED
-            task.escalated_at = now
-            task.updated_at = now
+        await session.commit()
 
-            text = (
-                f"🚨 SLA Escalation: задача уборки #{task.id}\n"
-                f"Домик: {task.house_id}\n"
-                f"Дата: {task.scheduled_date.strftime('%d.%m.%Y')}\n"
-                f"Дедлайн подтверждения истёк"
+    alerts = []
+    for task_id, house_id, scheduled_date in overdue:
+        text = (
+            f"🚨 SLA Escalation: задача уборки #{task_id}\n"
+            f"Домик: {house_id}\n"
+            f"Дата: {scheduled_date.strftime('%d.%m.%Y')}\n"
+            f"Дедлайн подтверждения истёк"
+        )
+        alerts.append((task_id, text))
+
+    await asyncio.gather(
+        *(
+            telegram_dispatcher.send_many(
+                admins, text, priority=Priority.HIGH, context=f"sla_escalation task={task_id}"
             )
-            for aid in admins:
-                await send_safe(bot, aid, text, context=f"sla_escalation task={task.id}")
+            for task_id, text in alerts
+        )
+    )
+    logger.warning("Escalated overdue cleaning tasks: %s", len(overdue))
+    return len(overdue)
 
-        await session.commit()
-        logger.warning("Escalated overdue cleaning tasks: %s", len(overdue))
+
+async def run_cleaning_sla_monitor():
+    """
+    Страховочный проход по просроченным задачам.
+
+    Основной путь — таймеры на confirm_deadline_at (эскалация в течение
+    секунд); проход раз в cleaning_sla_check_interval_minutes подбирает
+    задачи, таймер которых не был поставлен или потерялся.
+    """
+    escalated = await escalate_overdue_tasks()
+    if escalated:
+        logger.info("SLA sweep escalated tasks missed by timers: %s", escalated)
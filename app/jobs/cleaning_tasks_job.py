@@ -1,3 +1,4 @@
+import asyncio
 import logging
 from datetime import date, datetime, timedelta, timezone
 
@@ -9,8 +10,7 @@ from app.core.config import settings
 from app.database import AsyncSessionLocal
 from app.models import Booking, BookingStatus, CleaningTask, User, UserRole
 from app.services.cleaning_task_service import CleaningTaskService
-from app.telegram.bot import bot
-from app.services.notification_service import send_safe
+from app.services.telegram_dispatcher import telegram_dispatcher
 
 logger = logging.getLogger(__name__)
 
@@ -56,7 +56,9 @@ async def generate_cleaning_tasks_for_tomorrow() -> int:
 
             if task.confirm_deadline_at is None:
                 base_dt = datetime.combine(target, datetime.min.time()).replace(tzinfo=timezone.utc)
-                task.confirm_deadline_at = base_dt + timedelta(minutes=settings.cleaning_confirm_window_min)
+                CleaningTaskService.set_confirm_deadline(
+                    task, base_dt + timedelta(minutes=settings.cleaning_confirm_window_min)
+                )
 
             if task.created_at and task.updated_at and task.created_at == task.updated_at:
                 created += 1
@@ -69,42 +71,49 @@ async def generate_cleaning_tasks_for_tomorrow() -> int:
 async def notify_cleaners_about_tasks() -> int:
     """Отправить уборщицам список задач на завтра с переходом в карточку."""
     target = date.today() + timedelta(days=1)
-    sent = 0
 
     async with AsyncSessionLocal() as session:
         cleaners_q = await session.execute(select(User).where(User.role == UserRole.CLEANER))
-        cleaners = list(cleaners_q.scalars().all())
+        cleaners = [c for c in cleaners_q.scalars().all() if c.telegram_id]
+        if not cleaners:
+            return 0
 
-        for cleaner in cleaners:
-            q = await session.execute(
-                select(CleaningTask)
-                .where(
-                    and_(
-                        CleaningTask.scheduled_date == target,
-                        CleaningTask.assigned_to_user_id == cleaner.id,
-                    )
+        q = await session.execute(
+            select(CleaningTask)
+            .where(
+                and_(
+                    CleaningTask.scheduled_date == target,
+                    CleaningTask.assigned_to_user_id.in_([c.id for c in cleaners]),
                 )
-                .order_by(CleaningTask.id)
             )
-            tasks = list(q.scalars().all())
-            if not tasks or not cleaner.telegram_id:
-                continue
-
-            lines = [f"🧹 Задачи на {target.strftime('%d.%m')}"]
-            kb_rows = []
-            for t in tasks[:10]:
-                lines.append(f"• #{t.id} домик={t.house_id} статус={t.status.value}")
-                kb_rows.append([InlineKeyboardButton(text=f"Открыть #{t.id}", callback_data=f"cleaner:task:view:{t.id}")])
-
-            ok = await send_safe(
-                bot, cleaner.telegram_id, "\n".join(lines),
+            .order_by(CleaningTask.id)
+        )
+        tasks_by_cleaner: dict[int, list[CleaningTask]] = {}
+        for t in q.scalars().all():
+            tasks_by_cleaner.setdefault(t.assigned_to_user_id, []).append(t)
+
+    sends = []
+    for cleaner in cleaners:
+        tasks = tasks_by_cleaner.get(cleaner.id)
+        if not tasks:
+            continue
+
+        lines = [f"🧹 Задачи на {target.strftime('%d.%m')}"]
+        kb_rows = []
+        for t in tasks[:10]:
+            lines.append(f"• #{t.id} домик={t.house_id} статус={t.status.value}")
+            kb_rows.append([InlineKeyboardButton(text=f"Открыть #{t.id}", callback_data=f"cleaner:task:view:{t.id}")])
+
+        sends.append(
+            telegram_dispatcher.send(
+                cleaner.telegram_id, "\n".join(lines),
                 reply_markup=InlineKeyboardMarkup(inline_keyboard=kb_rows),
                 context=f"cleaning_tasks cleaner={cleaner.id}",
             )
-            if ok:
-                sent += 1
+        )
 
-    return sent
+    results = await asyncio.gather(*sends)
+    return sum(1 for ok in results if ok)
 
 
 async def run_cleaning_tasks_cycle():
@@ -19,8 +19,8 @@ logger = logging.getLogger(__name__)
 
 async def auto_discount_job():
     """
-    Проверяет загруженность на ближайшие дни.
-    Если домик свободен завтра/послезавтра — создаёт горящую скидку.
+    Проверяет загруженность на ближайшие AUTO_DISCOUNT_DAYS_AHEAD дней.
+    Если домик свободен в какую-то из ночей — создаёт горящую скидку.
     Запускается 2 раза в день (утром и вечером).
     """
     if not settings.enable_auto_discounts:
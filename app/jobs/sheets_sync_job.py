@@ -18,10 +18,11 @@ async def sync_sheets_job():
 
     for attempt in range(max_retries):
         try:
-            # Use the smart sync method which handles caching
-            from app.services.sheets_service import sheets_service
+            # Через координатор: не пересекается с синками по изменениям,
+            # TTL-кэш sync_if_needed по-прежнему действует (force=False)
+            from app.services.sheets_sync_coordinator import sheets_sync_coordinator
 
-            success = await sheets_service.sync_if_needed(force=False)
+            success = await sheets_sync_coordinator.sync_now("scheduled", force=False)
 
             if success:
                 logger.info("✅ Scheduled sync completed successfully")
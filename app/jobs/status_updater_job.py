@@ -1,21 +1,110 @@
 """
 Периодическая задача для автоматического обновления статусов броней
+
+Правила переходов — несколько UPDATE ... WHERE ... RETURNING в одной
+транзакции: в Python не загружается ни одна бронь, а WHERE идёт по
+индексам (status, check_in) / (status, check_out), поэтому стоимость
+ночного прогона не растёт вместе с историей броней.
+
+Переходы не затрагивают CANCELLED, поэтому занятость (house_day_occupancy,
+которую обновляет after_flush и не видит bulk UPDATE) не меняется.
+
+Google Sheets получает изменённые брони по updated_at (инкрементальный
+синк), отдельного списка изменений ему не нужно.
 """
 
 import logging
-from datetime import datetime
+from dataclasses import dataclass
+from datetime import date, datetime
+from typing import List
 from zoneinfo import ZoneInfo
 
+from sqlalchemy import update
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.models import Booking, BookingStatus
+
 logger = logging.getLogger(__name__)
 
 # Moscow timezone for business logic (check-in/check-out transitions)
 MOSCOW_TZ = ZoneInfo("Europe/Moscow")
 
+_NOT_CHECKED_IN = (BookingStatus.NEW, BookingStatus.CONFIRMED, BookingStatus.PAID)
+
+
+@dataclass(frozen=True)
+class StatusChange:
+    """Изменение статуса брони (результат одного правила перехода)"""
+
+    booking_id: int
+    house_id: int
+    check_in: date
+    check_out: date
+    status: BookingStatus
+
+
+def _transition_rules(today: date) -> list:
+    """(исходные статусы, новый статус, условие) — условия не пересекаются"""
+    return [
+        # День заезда
+        (
+            _NOT_CHECKED_IN,
+            BookingStatus.CHECKING_IN,
+            (Booking.check_in == today) & (Booking.check_out > today),
+        ),
+        # Гость уже должен был заселиться (check_in < сегодня < check_out)
+        (
+            _NOT_CHECKED_IN + (BookingStatus.CHECKING_IN,),
+            BookingStatus.CHECKED_IN,
+            (Booking.check_in < today) & (Booking.check_out > today),
+        ),
+        # Гость должен был выселиться (check_out <= сегодня)
+        (
+            (BookingStatus.CHECKED_IN,),
+            BookingStatus.COMPLETED,
+            Booking.check_out <= today,
+        ),
+    ]
+
+
+async def apply_status_transitions(session: AsyncSession, today: date) -> List[StatusChange]:
+    """
+    Применить правила переходов статусов (без commit).
 
-async def update_booking_statuses_job():
+    Бронь за прогон меняет статус не более одного раза: условия правил
+    не пересекаются, как и в прежнем обходе броней по одной.
+    """
+    now = datetime.utcnow()
+    changes: List[StatusChange] = []
+
+    for sources, target, condition in _transition_rules(today):
+        stmt = (
+            update(Booking)
+            .where(Booking.status.in_(sources), condition)
+            # updated_at явно: по нему инкрементальный синк Sheets находит изменения
+            .values(status=target, updated_at=now)
+            .returning(Booking.id, Booking.house_id, Booking.check_in, Booking.check_out)
+            .execution_options(synchronize_session=False)
+        )
+        rows = (await session.execute(stmt)).all()
+        if rows:
+            logger.info(
+                f"📝 {'/'.join(s.value for s in sources)} -> {target.value}: "
+                f"{', '.join(f'#{row.id}' for row in rows)}"
+            )
+        changes.extend(
+            StatusChange(row.id, row.house_id, row.check_in, row.check_out, target)
+            for row in rows
+        )
+
+    return changes
+
+
+async def update_booking_statuses_job() -> None:
     """
     Автоматическое обновление статусов броней:
-    - CONFIRMED/PAID -> CHECKED_IN (если check_in <= сегодня < check_out)
+    - NEW/CONFIRMED/PAID -> CHECKING_IN (если check_in == сегодня < check_out)
+    - NEW/CONFIRMED/PAID/CHECKING_IN -> CHECKED_IN (если check_in < сегодня < check_out)
     - CHECKED_IN -> COMPLETED (если check_out <= сегодня)
 
     Note: Uses Moscow timezone for date comparisons regardless of server timezone.
@@ -24,80 +113,26 @@ async def update_booking_statuses_job():
 
     try:
         from app.database import AsyncSessionLocal
-        from app.models import Booking, BookingStatus
-        from sqlalchemy import select
 
         # Use Moscow timezone for correct date comparison
         today = datetime.now(MOSCOW_TZ).date()
         logger.info(f"📅 Today (Moscow): {today}")
 
-        updated_count = 0
-
         async with AsyncSessionLocal() as session:
-            # Получаем все активные брони
-            stmt = select(Booking).where(
-                Booking.status.in_(
-                    [
-                        BookingStatus.CONFIRMED,
-                        BookingStatus.PAID,
-                        BookingStatus.CHECKING_IN,
-                        BookingStatus.CHECKED_IN,
-                        BookingStatus.NEW,
-                    ]
-                )
-            )
-            result = await session.execute(stmt)
-            bookings = result.scalars().all()
-
-            for booking in bookings:
-                old_status = booking.status
-                new_status = None
-
-                # Логика обновления статусов
-                if booking.status in [
-                    BookingStatus.CONFIRMED,
-                    BookingStatus.PAID,
-                    BookingStatus.NEW,
-                ]:
-                    # Если сегодня день заезда (check_in == сегодня)
-                    if booking.check_in == today and booking.check_out > today:
-                        new_status = BookingStatus.CHECKING_IN
-                    # Если гость уже должен был заселиться (check_in < сегодня < check_out)
-                    elif booking.check_in < today < booking.check_out:
-                        new_status = BookingStatus.CHECKED_IN
-
-                elif booking.status == BookingStatus.CHECKING_IN:
-                    # Если прошла ночь после заезда (check_in < сегодня < check_out)
-                    if booking.check_in < today < booking.check_out:
-                        new_status = BookingStatus.CHECKED_IN
-
-                elif booking.status == BookingStatus.CHECKED_IN:
-                    # Если гость должен был выселиться (check_out <= сегодня)
-                    if booking.check_out <= today:
-                        new_status = BookingStatus.COMPLETED
-
-                # Применяем изменение
-                if new_status and new_status != old_status:
-                    booking.status = new_status
-                    updated_count += 1
-
-                    logger.info(
-                        f"📝 Booking #{booking.id} ({booking.guest_name}): "
-                        f"{old_status.value} -> {new_status.value}"
-                    )
-
-            # Сохраняем изменения
-            if updated_count > 0:
-                await session.commit()
-                logger.info(f"✅ Updated {updated_count} booking statuses")
-
-                # Триггерим синхронизацию с Google Sheets
-                logger.info("Triggering Sheets sync due to status changes...")
-                from app.services.sheets_service import sheets_service
-
-                await sheets_service.sync_if_needed(force=True)
-            else:
-                logger.info("No status updates needed")
+            async with session.begin():
+                changes = await apply_status_transitions(session, today)
+
+        if not changes:
+            logger.info("No status updates needed")
+            return
+
+        logger.info(f"✅ Updated {len(changes)} booking statuses")
+
+        # Триггерим синхронизацию с Google Sheets
+        logger.info("Triggering Sheets sync due to status changes...")
+        from app.services.sheets_sync_coordinator import sheets_sync_coordinator
+
+        sheets_sync_coordinator.request_sync("status_update")
 
     except Exception as e:
         logger.error(f"❌ Status update job failed: {e}", exc_info=True)
@@ -5,6 +5,7 @@
 Polling вместо webhooks — API Яндекс Путешествий не поддерживает push.
 """
 
+import asyncio
 import logging
 from datetime import datetime
 
@@ -48,8 +49,8 @@ async def sync_yandex_travel_job() -> None:
         # Если были изменения — обновляем Google Sheets
         if stats["new_bookings"] or stats["updated_bookings"]:
             try:
-                from app.services.sheets_service import sheets_service
-                await sheets_service.sync_if_needed(force=True)
+                from app.services.sheets_sync_coordinator import sheets_sync_coordinator
+                sheets_sync_coordinator.request_sync("yandex_travel_sync")
             except Exception as e:
                 logger.warning("YaTr: не удалось обновить Sheets: %s", e)
 
@@ -66,9 +67,10 @@ async def _notify_new_bookings(bookings) -> None:
     try:
         from app.core.config import settings as s
         from app.services.notification_service import send_safe
-        from aiogram import Bot
+        from app.services.telegram_dispatcher import Priority
+        from app.telegram.bot import bot
 
-        bot = Bot(token=s.telegram_bot_token)
+        sends = []
         for booking in bookings:
             nights = (booking.check_out - booking.check_in).days
             text = (
@@ -80,8 +82,13 @@ async def _notify_new_bookings(bookings) -> None:
                 f"💰 {booking.total_price:,.0f} ₽\n"
                 f"🆔 #{booking.id} | ext: {booking.external_id}"
             )
-            await send_safe(bot, s.telegram_chat_id, text, parse_mode="HTML")
-        await bot.session.close()
+            sends.append(
+                send_safe(
+                    bot, s.telegram_chat_id, text, parse_mode="HTML",
+                    priority=Priority.HIGH, context=f"yatr_new booking={booking.id}",
+                )
+            )
+        await asyncio.gather(*sends)
     except Exception as e:
         logger.error("YaTr: ошибка отправки уведомления: %s", e)
 
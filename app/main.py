@@ -1,6 +1,9 @@
 import asyncio
 import logging
 
+# Первым: от этого момента считается профиль старта (импорт модулей, фазы)
+from app.core.startup import startup_profile
+
 from fastapi import FastAPI, Request
 from fastapi.responses import RedirectResponse
 from slowapi.errors import RateLimitExceeded
@@ -8,7 +11,10 @@ from slowapi import _rate_limit_exceeded_handler
 from slowapi.middleware import SlowAPIMiddleware
 
 from aiogram import Dispatcher
+from app.telegram.middlewares.db_session import DbSessionMiddleware
+from app.telegram.middlewares.metrics import HandlerMetricsMiddleware
 from app.telegram.middlewares.panel_guard import PanelGuardMiddleware
+from app.telegram.state.store import StateStoreStorage, state_store
 
 from app.core.config import settings
 from app.core.logging import setup_logging
@@ -16,6 +22,7 @@ from app.core.rate_limiter import limiter
 from app.middleware.request_logger import RequestLoggerMiddleware
 
 from app.api.health import router as health_router
+from app.api.metrics import router as metrics_router
 from app.api.site_leads import router as site_leads_router
 from app.avito.webhook import router as avito_router
 from app.avito.oauth import router as avito_oauth_router
@@ -86,6 +93,7 @@ async def auth_redirect_handler(request: Request, exc: AuthRedirectException):
 from app.api.houses import router as houses_api_router  # noqa: E402
 
 app.include_router(health_router)
+app.include_router(metrics_router)
 app.include_router(site_leads_router)
 app.include_router(avito_router)
 app.include_router(avito_oauth_router)
@@ -116,7 +124,15 @@ app.include_router(booking_web.router)
 # -------------------------------------------------
 # (Imports are at the top of the file)
 
-dp = Dispatcher()
+# FSM-состояние в общем хранилище: TTL, лимит записей, переживает рестарт
+dp = Dispatcher(storage=StateStoreStorage(state_store))
+# Время до первого обработанного апдейта — в профиль старта
+dp.update.outer_middleware(startup_profile.first_update_middleware)
+# One DB session per update, injected into handlers as `session`
+dp.update.outer_middleware(DbSessionMiddleware())
+# Handler latency per router module, exposed on /metrics
+dp.message.middleware(HandlerMetricsMiddleware("message"))
+dp.callback_query.middleware(HandlerMetricsMiddleware("callback_query"))
 # Global callback guard: prevents cross-panel/role callback leaks
 # (e.g., old buttons from other menus)
 dp.callback_query.middleware(PanelGuardMiddleware())
@@ -145,6 +161,9 @@ dp.include_router(houses.router)
 for r in booking_routers:
     dp.include_router(r)
 
+# Импорт модулей и сборка FastAPI/aiogram
+startup_profile.mark("import")
+
 
 # -------------------------------------------------
 # Lifecycle
@@ -155,23 +174,52 @@ for r in booking_routers:
 async def on_startup():
     logger.info("FastAPI startup")
 
-    # 0. Smart Recovery (Restore from Drive if DB missing)
-    try:
-        from app.services.backup_service import restore_latest_backup
+    # 0. Smart Recovery (restore from backup if DB missing),
+    # не дольше BACKUP_RESTORE_TIMEOUT_SECONDS
+    from app.services.backup_service import restore_latest_backup
 
-        await restore_latest_backup()
-    except Exception as e:
-        logger.error(f"❌ Smart Recovery failed: {e}", exc_info=True)
+    await startup_profile.run("restore", restore_latest_backup(), required=False)
 
     # Init DB
     from app.database import init_db
 
-    await init_db()
+    with startup_profile.phase("init_db"):
+        await init_db()
+
+    # Независимые друг от друга чтения из БД — параллельно
+    from app.services.cleaning_sla_timers import sla_timers
+    from app.telegram.auth.admin import refresh_users_cache
+
+    await asyncio.gather(
+        # Состояние диалогов бота (FSM, шаги мастеров) из прошлого запуска
+        startup_profile.run("state_store", state_store.start()),
+        startup_profile.run("users_cache", refresh_users_cache()),
+        # Таймеры SLA задач уборки: восстановить дедлайны PENDING-задач
+        startup_profile.run("sla_timers", sla_timers.start(), required=False),
+    )
+    logger.info("👥 User cache refreshed")
+
+    with startup_profile.phase("workers"):
+        # Лаг event loop для /metrics
+        from app.core.metrics import loop_lag_monitor
+
+        loop_lag_monitor.start()
+
+        # Outbox worker: побочные эффекты броней (Avito-календарь, уведомления)
+        from app.services.outbox_service import outbox_worker
+
+        outbox_worker.start()
+
+        # Входящая очередь webhook Avito (события, принятые до рестарта, тоже)
+        from app.services.avito_inbox_service import avito_inbox_worker
+
+        avito_inbox_worker.start()
 
     # Start scheduler
     from app.services.scheduler_service import scheduler_service
 
-    scheduler_service.start()
+    with startup_profile.phase("scheduler"):
+        scheduler_service.start()
 
     # Register auto-sync middleware if enabled
     if settings.sync_on_user_interaction:
@@ -187,8 +235,8 @@ async def on_startup():
         async def background_initial_sync():
             """Фоновая синхронизация при старте"""
             try:
-                from app.services.sheets_service import sheets_service
-                await sheets_service.sync_if_needed(force=True)
+                from app.services.sheets_sync_coordinator import sheets_sync_coordinator
+                await sheets_sync_coordinator.sync_now("startup")
                 logger.info("✅ Initial sync completed")
             except Exception as e:
                 logger.error(f"❌ Initial sync failed: {e}", exc_info=True)
@@ -196,19 +244,19 @@ async def on_startup():
         # Запускаем в фоне, не блокируя старт сервера
         asyncio.create_task(background_initial_sync())
 
-    # Refresh user cache
-    from app.telegram.auth.admin import refresh_users_cache
+    logger.info("Starting Telegram polling")
 
-    await refresh_users_cache()
-    logger.info("👥 User cache refreshed")
+    asyncio.create_task(dp.start_polling(bot))
 
-    # Set bot menu commands
+    # Set bot menu commands: запрос к Telegram API, polling его не ждёт
     from app.telegram.commands import setup_commands
-    await setup_commands(bot)
 
-    logger.info("Starting Telegram polling")
+    asyncio.create_task(
+        startup_profile.run("bot_commands", setup_commands(bot), required=False)
+    )
 
-    asyncio.create_task(dp.start_polling(bot))
+    startup_profile.mark("ready")
+    logger.info(f"Startup profile: {startup_profile.summary()}")
 
 
 @app.on_event("shutdown")
@@ -219,4 +267,40 @@ async def on_shutdown():
     from app.services.scheduler_service import scheduler_service
 
     scheduler_service.shutdown()
+
+    # Дописать историю запусков, накопленную в памяти
+    from app.services.scheduler_history import scheduler_history
+
+    await scheduler_history.stop()
+
+    from app.services.avito_api_service import avito_api_service
+
+    from app.services.outbox_service import outbox_worker
+
+    await outbox_worker.stop()
+
+    from app.services.avito_inbox_service import avito_inbox_worker
+
+    await avito_inbox_worker.stop()
+
+    from app.services.cleaning_sla_timers import sla_timers
+
+    await sla_timers.stop()
+
+    await state_store.stop()
+
+    from app.core.metrics import loop_lag_monitor
+
+    await loop_lag_monitor.stop()
+
+    await avito_api_service.close()
+
+    from app.services.telegram_dispatcher import telegram_dispatcher
+
+    try:
+        # Дать досланным уведомлениям уйти, но не висеть на flood control
+        await asyncio.wait_for(telegram_dispatcher.drain(), timeout=10)
+    except asyncio.TimeoutError:
+        logger.warning(f"Telegram queue not drained on shutdown: {telegram_dispatcher.queue_depth} left")
+    await telegram_dispatcher.close()
     await bot.session.close()
@@ -4,16 +4,25 @@ import uuid
 from fastapi import Request, Response
 from starlette.middleware.base import BaseHTTPMiddleware, RequestResponseEndpoint
 
+from app.core import metrics
 from app.core.config import settings
 
 logger = logging.getLogger(__name__)
 
 
+def _route_label(request: Request) -> str:
+    # Шаблон маршрута (/api/houses/{house_id}), а не сырой путь — иначе
+    # метки метрик растут с каждым id
+    route = request.scope.get("route")
+    return getattr(route, "path", None) or "<unmatched>"
+
+
 class RequestLoggerMiddleware(BaseHTTPMiddleware):
     """
     Middleware to log slow requests timing and metadata.
     Logs: method, path, status_code, duration_ms, request_id
     Sampling: Only logs if duration > LOG_SLOW_REQUEST_THRESHOLD_MS
+    Metrics: latency per route and DB queries per request (app.core.metrics)
     """
 
     async def dispatch(
@@ -24,6 +33,7 @@ class RequestLoggerMiddleware(BaseHTTPMiddleware):
         
         # Store for internal usage (services, loggers)
         request.state.request_id = request_id
+        db_token, db_queries = metrics.begin_db_query_count()
 
         # Process request
         try:
@@ -35,7 +45,12 @@ class RequestLoggerMiddleware(BaseHTTPMiddleware):
             status_code = 500
             raise
         finally:
-            duration_ms = (time.perf_counter() - start_time) * 1000
+            elapsed = time.perf_counter() - start_time
+            duration_ms = elapsed * 1000
+            metrics.end_db_query_count(db_token)
+            route = _route_label(request)
+            metrics.HTTP_REQUEST_DURATION.observe(elapsed, request.method, route, str(status_code))
+            metrics.HTTP_REQUEST_DB_QUERIES.observe(db_queries[0], route)
 
             # Log only if threshold exceeded (default 500ms)
             if duration_ms > settings.log_slow_request_threshold_ms:
@@ -1,20 +1,25 @@
-from datetime import date, datetime
+from datetime import date, datetime, timedelta
 from enum import Enum
 from typing import Optional
 from decimal import Decimal
 
 from sqlalchemy import (
     String,
+    Text,
     Integer,
     Date,
     DateTime,
     ForeignKey,
     Numeric,
+    Index,
     Enum as SQLEnum,
+    event,
+    inspect,
 )
-from sqlalchemy.orm import Mapped, mapped_column, relationship
+from sqlalchemy.orm import Mapped, Session, mapped_column, relationship, validates
 
 from app.database import Base
+from app.utils.phone import phone_last10
 
 
 class BookingSource(str, Enum):
@@ -106,6 +111,15 @@ class HouseDiscount(Base):
 
 class Booking(Base):
     __tablename__ = "bookings"
+    __table_args__ = (
+        # Пересечение дат по дому: check_availability, overlap guard, /availability
+        Index("ix_bookings_house_dates", "house_id", "check_in", "check_out"),
+        # Правила уведомлений, авто-скидки, обновление статусов
+        Index("ix_bookings_status_check_in", "status", "check_in"),
+        Index("ix_bookings_status_check_out", "status", "check_out"),
+        # Одна бронь на внешний ID в рамках источника (NULL не ограничивается)
+        Index("uq_bookings_source_external_id", "source", "external_id", unique=True),
+    )
 
     id: Mapped[int] = mapped_column(primary_key=True)
 
@@ -116,6 +130,10 @@ class Booking(Base):
     # Данные гостя
     guest_name: Mapped[str] = mapped_column(String)
     guest_phone: Mapped[str] = mapped_column(String)
+    # Последние 10 цифр нормализованного телефона — для индексного поиска гостя
+    guest_phone_last10: Mapped[Optional[str]] = mapped_column(
+        String, index=True, nullable=True
+    )
 
     # Детали брони
     check_in: Mapped[date] = mapped_column(Date)
@@ -141,6 +159,88 @@ class Booking(Base):
         DateTime, default=datetime.utcnow, onupdate=datetime.utcnow
     )
 
+    @validates("guest_phone")
+    def _fill_guest_phone_last10(self, key, value):
+        self.guest_phone_last10 = phone_last10(value) or None
+        return value
+
+
+class HouseDayOccupancy(Base):
+    """Занятая ночь домика: строка на (домик, дата, бронь).
+
+    Материализованная занятость для проверок свободных дат и календарей.
+    Поддерживается на запись в той же транзакции, что и бронь
+    (_sync_house_day_occupancy ниже); пересчёт и сверка —
+    app.services.occupancy_service.
+    """
+    __tablename__ = "house_day_occupancy"
+
+    # PK (house_id, day, booking_id): диапазон дат домика — индексный скан,
+    # пересекающиеся брони (конфликты площадок) хранятся без потерь
+    house_id: Mapped[int] = mapped_column(Integer, primary_key=True)
+    day: Mapped[date] = mapped_column(Date, primary_key=True)
+    booking_id: Mapped[int] = mapped_column(Integer, primary_key=True, index=True)
+
+
+def booking_occupancy_rows(
+    booking_id: int,
+    house_id: Optional[int],
+    check_in: Optional[date],
+    check_out: Optional[date],
+    status: Optional["BookingStatus"],
+) -> list[dict]:
+    """Строки house_day_occupancy для брони: ночи [check_in, check_out) не отменённой брони."""
+    if status == BookingStatus.CANCELLED or not (house_id and check_in and check_out):
+        return []
+    return [
+        {"house_id": house_id, "day": check_in + timedelta(days=i), "booking_id": booking_id}
+        for i in range((check_out - check_in).days)
+    ]
+
+
+_OCCUPANCY_FIELDS = ("house_id", "check_in", "check_out", "status")
+
+
+@event.listens_for(Session, "after_flush")
+def _sync_house_day_occupancy(session, flush_context):
+    """Обновить занятость по броням, записанным в этом flush (та же транзакция).
+
+    Срабатывает для любых ORM-изменений Booking — BookingService,
+    синки Avito/Яндекс Путешествий, заявки с сайта.
+    """
+    stale: list[int] = []
+    fresh: list[dict] = []
+
+    for obj in session.deleted:
+        if isinstance(obj, Booking):
+            stale.append(obj.id)
+
+    for obj in session.new:
+        if isinstance(obj, Booking):
+            fresh.extend(
+                booking_occupancy_rows(obj.id, obj.house_id, obj.check_in, obj.check_out, obj.status)
+            )
+
+    for obj in session.dirty:
+        if not isinstance(obj, Booking) or obj in session.deleted:
+            continue
+        state = inspect(obj)
+        if any(state.attrs[name].history.has_changes() for name in _OCCUPANCY_FIELDS):
+            stale.append(obj.id)
+            fresh.extend(
+                booking_occupancy_rows(obj.id, obj.house_id, obj.check_in, obj.check_out, obj.status)
+            )
+
+    if not stale and not fresh:
+        return
+
+    table = HouseDayOccupancy.__table__
+    conn = session.connection()
+    if stale:
+        conn.execute(table.delete().where(table.c.booking_id.in_(stale)))
+    if fresh:
+        conn.execute(table.insert(), fresh)
+
 
 class UserRole(str, Enum):
     OWNER = "owner"
@@ -161,8 +261,16 @@ class User(Base):
     phone: Mapped[Optional[str]] = mapped_column(
         String, nullable=True
     )  # Телефон для связи с бронями
+    phone_last10: Mapped[Optional[str]] = mapped_column(
+        String, index=True, nullable=True
+    )  # Последние 10 цифр телефона (индексный матчинг с Booking.guest_phone_last10)
     created_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow)
 
+    @validates("phone")
+    def _fill_phone_last10(self, key, value):
+        self.phone_last10 = phone_last10(value) or None
+        return value
+
 
 class GlobalSetting(Base):
     __tablename__ = "global_settings"
@@ -330,3 +438,133 @@ class CleanerPaymentProfile(Base):
     updated_at: Mapped[datetime] = mapped_column(
         DateTime, default=datetime.utcnow, onupdate=datetime.utcnow
     )
+
+
+class OutboxStatus(str, Enum):
+    PENDING = "pending"
+    DONE = "done"
+    SUPERSEDED = "superseded"  # перекрыто более поздним событием той же цели
+    FAILED = "failed"  # исчерпаны попытки
+
+
+class OutboxEvent(Base):
+    """Побочный эффект изменения брони, записанный в той же транзакции.
+
+    Выполняется фоновым воркером (app.services.outbox_service) с ретраями.
+    """
+    __tablename__ = "outbox_events"
+    __table_args__ = (
+        # Выборка воркером: status='pending' AND next_attempt_at <= now
+        Index("ix_outbox_events_status_next_attempt", "status", "next_attempt_at"),
+    )
+
+    id: Mapped[int] = mapped_column(primary_key=True)
+    kind: Mapped[str] = mapped_column(String)
+    # События одной цели склеиваются: выполняется только последнее
+    target_key: Mapped[str] = mapped_column(String, index=True)
+    idempotency_key: Mapped[str] = mapped_column(String, unique=True)
+    payload_json: Mapped[str] = mapped_column(String, default="{}")
+    status: Mapped[OutboxStatus] = mapped_column(
+        SQLEnum(OutboxStatus), default=OutboxStatus.PENDING
+    )
+    attempts: Mapped[int] = mapped_column(Integer, default=0)
+    next_attempt_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow)
+    last_error: Mapped[Optional[str]] = mapped_column(String, nullable=True)
+    created_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow)
+    processed_at: Mapped[Optional[datetime]] = mapped_column(DateTime, nullable=True)
+
+
+class ChannelPushState(Base):
+    """Последнее успешно отправленное на площадку состояние (календарь/цены).
+
+    Хэш payload по (platform, item_id, kind): неизменившиеся данные не пушим.
+    """
+    __tablename__ = "channel_push_state"
+    __table_args__ = (
+        Index("uq_channel_push_state_target", "platform", "item_id", "kind", unique=True),
+    )
+
+    id: Mapped[int] = mapped_column(primary_key=True)
+    platform: Mapped[str] = mapped_column(String)  # avito / yandex_travel
+    item_id: Mapped[str] = mapped_column(String)  # ID объявления / hotel_id/room_id
+    kind: Mapped[str] = mapped_column(String)  # calendar / prices
+    payload_hash: Mapped[str] = mapped_column(String)
+    pushed_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow)
+
+
+class InboxStatus(str, Enum):
+    PENDING = "pending"
+    DONE = "done"
+    DEAD = "dead"  # dead-letter: исчерпаны попытки или событие не разобрать
+
+
+class AvitoWebhookInbox(Base):
+    """Принятое, но ещё не обработанное событие webhook Avito.
+
+    Endpoint только сохраняет сырое тело и отвечает 200; обработка —
+    app.services.avito_inbox_service (по порядку в пределах брони).
+    """
+    __tablename__ = "avito_webhook_inbox"
+    __table_args__ = (
+        # Выборка воркером: status='pending' по порядку поступления
+        Index("ix_avito_webhook_inbox_status_id", "status", "id"),
+    )
+
+    id: Mapped[int] = mapped_column(primary_key=True)
+    # Повторная доставка того же события Avito не создаёт вторую строку
+    dedupe_key: Mapped[str] = mapped_column(String, unique=True)
+    event_type: Mapped[str] = mapped_column(String, default="unknown")
+    # ID брони в Avito: события одной брони обрабатываются строго по очереди
+    booking_key: Mapped[Optional[str]] = mapped_column(String, nullable=True, index=True)
+    body: Mapped[str] = mapped_column(Text)
+    status: Mapped[InboxStatus] = mapped_column(
+        SQLEnum(InboxStatus), default=InboxStatus.PENDING
+    )
+    attempts: Mapped[int] = mapped_column(Integer, default=0)
+    next_attempt_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow)
+    last_error: Mapped[Optional[str]] = mapped_column(String, nullable=True)
+    received_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow)
+    processed_at: Mapped[Optional[datetime]] = mapped_column(DateTime, nullable=True)
+
+
+class TelegramState(Base):
+    """Состояние диалогов бота (FSM aiogram, шаги мастеров) между рестартами.
+
+    Пишется отложенно пачками из app.telegram.state.store; при старте
+    непросроченные записи поднимаются обратно в память.
+    """
+    __tablename__ = "telegram_state"
+
+    namespace: Mapped[str] = mapped_column(String, primary_key=True)
+    key: Mapped[str] = mapped_column(String, primary_key=True)
+    value: Mapped[str] = mapped_column(Text)  # JSON
+    expires_at: Mapped[datetime] = mapped_column(DateTime, index=True)
+
+
+class JobRunOutcome(str, Enum):
+    OK = "ok"
+    ERROR = "error"
+    SKIPPED = "skipped"  # предыдущий прогон ещё шёл (max_instances)
+    MISSED = "missed"  # не успели запустить в пределах misfire_grace_time
+
+
+class SchedulerJobRun(Base):
+    """Запуск задачи планировщика: время, длительность и исход.
+
+    Пишется пачками из app.services.scheduler_history; старые строки
+    удаляются через SCHEDULER_HISTORY_DAYS.
+    """
+    __tablename__ = "scheduler_job_runs"
+    __table_args__ = (
+        Index("ix_scheduler_job_runs_job_started", "job_id", "started_at"),
+    )
+
+    id: Mapped[int] = mapped_column(primary_key=True)
+    job_id: Mapped[str] = mapped_column(String)
+    outcome: Mapped[JobRunOutcome] = mapped_column(SQLEnum(JobRunOutcome))
+    # Плановое время запуска (по триггеру, без задержки исполнителя)
+    scheduled_at: Mapped[Optional[datetime]] = mapped_column(DateTime, nullable=True)
+    started_at: Mapped[datetime] = mapped_column(DateTime, index=True)
+    finished_at: Mapped[Optional[datetime]] = mapped_column(DateTime, nullable=True)
+    duration_ms: Mapped[Optional[int]] = mapped_column(Integer, nullable=True)
+    error: Mapped[Optional[str]] = mapped_column(String, nullable=True)
@@ -1,21 +1,50 @@
 """
 Сервис для работы с Avito API
+
+Асинхронный клиент на общем aiohttp-сессии (keep-alive пул соединений):
+- лимит одновременных соединений к api.avito.ru (AVITO_HTTP_MAX_CONNECTIONS);
+- ретраи с джиттером на 429/5xx и сетевые ошибки (учитывает Retry-After);
+- single-flight обновление токена: параллельные вызовы ждут один запрос /token.
 """
 
-import requests
-from typing import List, Dict, Optional
-from datetime import datetime, timedelta
+import asyncio
+import json
+import random
+import time
+from typing import List, Dict, Optional, Tuple
+from datetime import date, datetime, timedelta
 import logging
 
+import aiohttp
+
+from app.core import metrics
 from app.core.config import settings
+from app.domain import intervals
 
 logger = logging.getLogger(__name__)
 
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+
+class AvitoAPIError(Exception):
+    """Ошибка ответа Avito API (после всех ретраев)."""
+
+    def __init__(self, status: Optional[int], body: str = "", message: str = ""):
+        super().__init__(message or f"Avito API error (status={status}): {body[:200]}")
+        self.status = status
+        self.body = body
+
+    @property
+    def retryable(self) -> bool:
+        """Имеет ли смысл повторить позже: сетевая ошибка, 429 или 5xx."""
+        return self.status is None or self.status in RETRY_STATUSES
+
 
 class AvitoAPIService:
     """Сервис для работы с Avito API краткосрочной аренды"""
 
     BASE_URL = "https://api.avito.ru"
+    DEFAULT_TIMEOUT = 10
 
     def __init__(self):
         self.client_id = settings.avito_client_id
@@ -24,57 +53,189 @@ class AvitoAPIService:
         self.access_token: Optional[str] = None
         self.token_expires_at: Optional[datetime] = None
 
-    def get_access_token(self) -> str:
+        self.max_connections = settings.avito_http_max_connections
+        self.max_attempts = settings.avito_http_max_attempts
+        self.backoff_base_seconds = 0.5
+        self.backoff_max_seconds = 10.0
+
+        self._session: Optional[aiohttp.ClientSession] = None
+        self._token_lock = asyncio.Lock()
+
+    # ------------------------------------------------------------------
+    # HTTP
+    # ------------------------------------------------------------------
+
+    def _get_session(self) -> aiohttp.ClientSession:
+        """Общая сессия с keep-alive пулом; создаётся лениво внутри event loop."""
+        if self._session is None or self._session.closed:
+            connector = aiohttp.TCPConnector(
+                limit_per_host=self.max_connections,
+                keepalive_timeout=60,
+                ttl_dns_cache=300,
+            )
+            self._session = aiohttp.ClientSession(
+                connector=connector,
+                timeout=aiohttp.ClientTimeout(total=self.DEFAULT_TIMEOUT),
+            )
+        return self._session
+
+    async def close(self):
+        """Закрыть пул соединений (при остановке приложения)."""
+        if self._session is not None and not self._session.closed:
+            await self._session.close()
+        self._session = None
+
+    def _backoff(self, attempt: int, retry_after: Optional[str] = None) -> float:
+        """Экспоненциальная задержка с джиттером; Retry-After имеет приоритет."""
+        if retry_after:
+            try:
+                return min(float(retry_after), self.backoff_max_seconds)
+            except ValueError:
+                pass
+        delay = min(self.backoff_max_seconds, self.backoff_base_seconds * 2 ** (attempt - 1))
+        return random.uniform(delay / 2, delay)
+
+    async def _request(
+        self,
+        method: str,
+        path: str,
+        *,
+        auth: bool = True,
+        timeout: float = DEFAULT_TIMEOUT,
+        **kwargs,
+    ) -> Dict:
+        """
+        Запрос к Avito API с ретраями.
+
+        Returns:
+            Распарсенный JSON ответа ({} для пустого тела)
+
+        Raises:
+            AvitoAPIError: статус >= 400 после всех попыток или сетевая ошибка
+        """
+        url = f"{self.BASE_URL}{path}"
+        extra_headers = kwargs.pop("headers", {})
+        token_refreshed = False
+        attempt = 0
+
+        while True:
+            attempt += 1
+            headers = dict(extra_headers)
+            token = None
+            if auth:
+                token = await self.ensure_token()
+                headers["Authorization"] = f"Bearer {token}"
+
+            started = time.perf_counter()
+            try:
+                async with self._get_session().request(
+                    method,
+                    url,
+                    headers=headers,
+                    timeout=aiohttp.ClientTimeout(total=timeout),
+                    **kwargs,
+                ) as response:
+                    status = response.status
+                    body = await response.text()
+                    retry_after = response.headers.get("Retry-After")
+                metrics.observe_external("avito", method, status, time.perf_counter() - started)
+            except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+                metrics.observe_external("avito", method, "error", time.perf_counter() - started)
+                if attempt >= self.max_attempts:
+                    raise AvitoAPIError(None, message=f"{method} {path} failed: {e!r}") from e
+                delay = self._backoff(attempt)
+                logger.warning(
+                    f"Avito {method} {path}: {e!r}, retry {attempt}/{self.max_attempts} in {delay:.1f}s"
+                )
+                await asyncio.sleep(delay)
+                continue
+
+            if status == 401 and auth and not token_refreshed:
+                # Токен отозван раньше срока — обновляем один раз
+                token_refreshed = True
+                self._invalidate_token(token)
+                attempt -= 1
+                continue
+
+            if status in RETRY_STATUSES and attempt < self.max_attempts:
+                delay = self._backoff(attempt, retry_after)
+                logger.warning(
+                    f"Avito {method} {path}: HTTP {status}, retry {attempt}/{self.max_attempts} in {delay:.1f}s"
+                )
+                await asyncio.sleep(delay)
+                continue
+
+            if status >= 400:
+                raise AvitoAPIError(status, body)
+
+            return json.loads(body) if body else {}
+
+    # ------------------------------------------------------------------
+    # Token
+    # ------------------------------------------------------------------
+
+    def _token_is_valid(self) -> bool:
+        return bool(
+            self.access_token
+            and self.token_expires_at
+            and datetime.now() < self.token_expires_at
+        )
+
+    def _invalidate_token(self, token: Optional[str]):
+        # Сбрасываем только тот токен, с которым получили 401 — если другой
+        # вызов уже обновил его, повторный запрос /token не нужен.
+        if token is not None and self.access_token == token:
+            self.access_token = None
+            self.token_expires_at = None
+
+    async def get_access_token(self) -> str:
         """Получение access token через client_credentials"""
         logger.info("Requesting Avito access token...")
 
         try:
-            response = requests.post(
-                f"{self.BASE_URL}/token",
+            data = await self._request(
+                "POST",
+                "/token",
+                auth=False,
                 data={
                     "grant_type": "client_credentials",
                     "client_id": self.client_id,
                     "client_secret": self.client_secret,
                     "scope": "short_term_rent:read short_term_rent:write",
                 },
-                timeout=10,
             )
+        except AvitoAPIError as e:
+            logger.error(f"Failed to get access token: status={e.status or 'N/A'}")
+            raise
 
-            logger.info(f"Token response status: {response.status_code}")
-            response.raise_for_status()
-
-            data = response.json()
+        if "access_token" not in data:
+            # Log only keys, never values — response may contain the token
+            logger.error(f"No access_token in response (keys: {list(data.keys())})")
+            raise ValueError("Avito API returned unexpected response (no access_token)")
 
-            if "access_token" not in data:
-                # Log only keys, never values — response may contain the token
-                logger.error(f"No access_token in response (keys: {list(data.keys())})")
-                raise ValueError("Avito API returned unexpected response (no access_token)")
+        self.access_token = data["access_token"]
 
-            self.access_token = data["access_token"]
+        # Токен действует 24 часа, сохраняем время истечения
+        expires_in = data.get("expires_in", 86400)  # По умолчанию 24 часа
+        self.token_expires_at = datetime.now() + timedelta(seconds=expires_in)
 
-            # Токен действует 24 часа, сохраняем время истечения
-            expires_in = data.get("expires_in", 86400)  # По умолчанию 24 часа
-            self.token_expires_at = datetime.now() + timedelta(seconds=expires_in)
+        logger.info(f"Access token obtained, expires at {self.token_expires_at}")
+        return self.access_token
 
-            logger.info(f"Access token obtained, expires at {self.token_expires_at}")
+    async def ensure_token(self) -> str:
+        """Проверка и обновление токена при необходимости (single-flight)"""
+        if self._token_is_valid():
             return self.access_token
 
-        except requests.exceptions.HTTPError as e:
-            logger.error(f"HTTP error getting token: status={e.response.status_code if e.response else 'N/A'}")
-            raise
-        except requests.exceptions.RequestException as e:
-            logger.error(f"Failed to get access token: {e}")
-            raise
-
-    def ensure_token(self):
-        """Проверка и обновление токена при необходимости"""
-        if not self.access_token or not self.token_expires_at:
-            self.get_access_token()
-        elif datetime.now() >= self.token_expires_at:
-            logger.info("Token expired, refreshing...")
-            self.get_access_token()
+        async with self._token_lock:
+            # Пока ждали блокировку, токен мог обновить другой вызов
+            if self._token_is_valid():
+                return self.access_token
+            if self.access_token:
+                logger.info("Token expired, refreshing...")
+            return await self.get_access_token()
 
-    def get_bookings(self, item_id: int, date_start: str, date_end: str) -> Dict:
+    async def get_bookings(self, item_id: int, date_start: str, date_end: str) -> Dict:
         """
         Получение списка броней по объявлению
 
@@ -86,40 +247,28 @@ class AvitoAPIService:
         Returns:
             Dict с ключом 'bookings' содержащим список броней
         """
-        self.ensure_token()
-
         logger.info(
             f"Fetching bookings for item {item_id} from {date_start} to {date_end}"
         )
 
         try:
-            response = requests.get(
-                f"{self.BASE_URL}/realty/v1/accounts/{self.user_id}/items/{item_id}/bookings",
-                headers={"Authorization": f"Bearer {self.access_token}"},
+            data = await self._request(
+                "GET",
+                f"/realty/v1/accounts/{self.user_id}/items/{item_id}/bookings",
                 params={
                     "date_start": date_start,
                     "date_end": date_end,
                     "with_unpaid": "true",
                 },
-                timeout=10,
             )
-            response.raise_for_status()
-
-            data = response.json()
             logger.info(f"Received {len(data.get('bookings', []))} bookings")
             return data
 
-        except requests.exceptions.HTTPError as e:
-            logger.error(f"HTTP error: {e}")
-            logger.error(
-                f"Response body: {e.response.text if e.response else 'No response'}"
-            )
-            raise
-        except requests.exceptions.RequestException as e:
-            logger.error(f"Failed to fetch bookings: {e}")
+        except AvitoAPIError as e:
+            logger.error(f"Failed to fetch bookings (status {e.status}): {e}")
             raise
 
-    def get_bookings_for_period(
+    async def get_bookings_for_period(
         self, item_id: int, days_forward: int = 180
     ) -> List[Dict]:
         """
@@ -135,13 +284,13 @@ class AvitoAPIService:
         today = datetime.now().date()
         end_date = today + timedelta(days=days_forward)
 
-        data = self.get_bookings(
+        data = await self.get_bookings(
             item_id=item_id, date_start=today.isoformat(), date_end=end_date.isoformat()
         )
 
         return data.get("bookings", [])
 
-    def get_all_bookings(self, item_ids: List[int]) -> Dict[int, List[Dict]]:
+    async def get_all_bookings(self, item_ids: List[int]) -> Dict[int, List[Dict]]:
         """
         Получение броней для всех объявлений
 
@@ -151,20 +300,27 @@ class AvitoAPIService:
         Returns:
             Словарь {item_id: [bookings]}
         """
-        result = {}
-
-        for item_id in item_ids:
+        async def _fetch(item_id: int) -> List[Dict]:
             try:
-                bookings = self.get_bookings_for_period(item_id)
-                result[item_id] = bookings
+                return await self.get_bookings_for_period(item_id)
             except Exception as e:
                 logger.error(f"Failed to fetch bookings for item {item_id}: {e}")
-                result[item_id] = []
+                return []
+
+        # Параллельность ограничена пулом соединений (limit_per_host)
+        bookings = await asyncio.gather(*(_fetch(item_id) for item_id in item_ids))
+        result = dict(zip(item_ids, bookings))
 
         return result
 
-    def block_dates(
-        self, item_id: int, check_in: str, check_out: str, comment: str = None
+    async def block_dates(
+        self,
+        item_id: int,
+        check_in: str,
+        check_out: str,
+        comment: str = None,
+        *,
+        raise_permanent: bool = False,
     ) -> bool:
         """
         Блокировка дат в календаре Avito
@@ -174,6 +330,8 @@ class AvitoAPIService:
             check_in: Дата заезда (формат: YYYY-MM-DD)
             check_out: Дата выезда (формат: YYYY-MM-DD)
             comment: Комментарий к брони (опционально)
+            raise_permanent: пробросить AvitoAPIError, если повтор не поможет
+                (4xx, кроме 429) — вместо False
 
         Returns:
             True если блокировка успешна, False в случае ошибки
@@ -182,17 +340,12 @@ class AvitoAPIService:
             Последний день (check_out) доступен для пользователя (open end).
             Бронь на 1 день = промежуток в 2 дня.
         """
-        self.ensure_token()
-
         logger.info(f"Blocking dates for item {item_id}: {check_in} to {check_out}")
 
         try:
-            response = requests.post(
-                f"{self.BASE_URL}/core/v1/accounts/{self.user_id}/items/{item_id}/bookings",
-                headers={
-                    "Authorization": f"Bearer {self.access_token}",
-                    "Content-Type": "application/json",
-                },
+            await self._request(
+                "POST",
+                f"/core/v1/accounts/{self.user_id}/items/{item_id}/bookings",
                 json={
                     "bookings": [
                         {
@@ -204,15 +357,13 @@ class AvitoAPIService:
                     ],
                     "source": "EasyCamp",
                 },
-                timeout=10,
             )
-            response.raise_for_status()
 
             logger.info(f"✅ Dates blocked successfully for item {item_id}")
             return True
 
-        except requests.exceptions.HTTPError as e:
-            status_code = e.response.status_code if e.response else None
+        except AvitoAPIError as e:
+            status_code = e.status
 
             if status_code == 409:
                 logger.warning(
@@ -225,15 +376,14 @@ class AvitoAPIService:
             else:
                 logger.error(f"❌ HTTP error blocking dates: {e}")
 
-            logger.error(
-                f"Response: {e.response.text if e.response else 'No response'}"
-            )
-            return False
-        except requests.exceptions.RequestException as e:
-            logger.error(f"❌ Failed to block dates: {e}")
+            logger.error(f"Response: {e.body or 'No response'}")
+            if raise_permanent and not e.retryable:
+                raise
             return False
 
-    def unblock_dates(self, item_id: int, check_in: str, check_out: str) -> bool:
+    async def unblock_dates(
+        self, item_id: int, check_in: str, check_out: str, *, raise_permanent: bool = False
+    ) -> bool:
         """
         Разблокировка дат в календаре Avito через обновление интервалов доступности
 
@@ -241,6 +391,8 @@ class AvitoAPIService:
             item_id: ID объявления на Avito
             check_in: Дата заезда отмененной брони (формат: YYYY-MM-DD)
             check_out: Дата выезда отмененной брони (формат: YYYY-MM-DD)
+            raise_permanent: пробросить AvitoAPIError, если повтор не поможет
+                (4xx, кроме 429) — вместо False
 
         Returns:
             True если разблокировка успешна, False в случае ошибки
@@ -251,8 +403,6 @@ class AvitoAPIService:
             2. Вычисляет свободные интервалы между ними
             3. Отправляет свободные интервалы через /intervals API
         """
-        self.ensure_token()
-
         logger.info(f"Unblocking dates for item {item_id}: {check_in} to {check_out}")
 
         try:
@@ -267,7 +417,7 @@ class AvitoAPIService:
                 f"Fetching bookings for item {item_id} from {today} to {end_date}"
             )
 
-            bookings_data = self.get_bookings(
+            bookings_data = await self.get_bookings(
                 item_id=item_id,
                 date_start=today.isoformat(),
                 date_end=end_date.isoformat(),
@@ -276,93 +426,43 @@ class AvitoAPIService:
             bookings = bookings_data.get("bookings", [])
             logger.info(f"Found {len(bookings)} existing bookings")
 
-            # Шаг 2: Фильтруем брони, исключая отмененную
-            # Преобразуем даты в объекты date для сравнения
-            cancelled_start = datetime.fromisoformat(check_in).date()
-            cancelled_end = datetime.fromisoformat(check_out).date()
-
-            remaining_bookings = []
-            for booking in bookings:
-                booking_start = datetime.fromisoformat(booking["date_start"]).date()
-                booking_end = datetime.fromisoformat(booking["date_end"]).date()
-
-                # Пропускаем отмененную бронь
-                if booking_start == cancelled_start and booking_end == cancelled_end:
-                    logger.info(
-                        f"Skipping cancelled booking: {booking['date_start']} to {booking['date_end']}"
-                    )
-                    continue
-
-                remaining_bookings.append({"start": booking_start, "end": booking_end})
+            # Шаг 2: Исключаем отменённую бронь (саму запись, а не её даты —
+            # пересекающаяся с ней другая бронь свои дни сохраняет)
+            cancelled = (
+                datetime.fromisoformat(check_in).date(),
+                datetime.fromisoformat(check_out).date(),
+            )
+            remaining_bookings = [
+                dates for dates in self.avito_booking_dates(bookings) if dates != cancelled
+            ]
 
             logger.info(
                 f"Remaining bookings after cancellation: {len(remaining_bookings)}"
             )
 
-            # Шаг 3: Сортируем брони по дате начала
-            remaining_bookings.sort(key=lambda x: x["start"])
-
-            # Шаг 4: Вычисляем свободные интервалы
-            free_intervals = []
-            current_date = today
-
-            for booking in remaining_bookings:
-                # Если есть промежуток между current_date и началом брони
-                if current_date < booking["start"]:
-                    free_intervals.append(
-                        {
-                            "date_start": current_date.isoformat(),
-                            "date_end": booking["start"].isoformat(),
-                            "open": 1,
-                        }
-                    )
-                # Сдвигаем current_date на конец текущей брони
-                if booking["end"] > current_date:
-                    current_date = booking["end"]
-
-            # Добавляем последний интервал до конца окна бронирования
-            if current_date < end_date:
-                free_intervals.append(
-                    {
-                        "date_start": current_date.isoformat(),
-                        "date_end": end_date.isoformat(),
-                        "open": 1,
-                    }
-                )
-
-            logger.info(f"Calculated {len(free_intervals)} free intervals")
+            # Шаг 3: Свободные интервалы окна между оставшимися бронями
+            free_intervals = self.free_intervals_payload(remaining_bookings, today)
 
-            # Шаг 5: Отправляем обновленные интервалы через /intervals API
-            response = requests.post(
-                f"{self.BASE_URL}/realty/v1/items/intervals",
-                headers={
-                    "Authorization": f"Bearer {self.access_token}",
-                    "Content-Type": "application/json",
-                },
-                json={
-                    "intervals": free_intervals,
-                    "item_id": item_id,
-                    "source": "EasyCamp",
-                },
-                timeout=10,
+            # Шаг 4: Отправляем обновленные интервалы через /intervals API
+            success = await self.push_calendar_intervals(
+                item_id, free_intervals, raise_permanent=raise_permanent
             )
-            response.raise_for_status()
+            if success:
+                logger.info(f"✅ Dates unblocked successfully for item {item_id}")
+            return success
 
-            logger.info(f"✅ Dates unblocked successfully for item {item_id}")
-            return True
-
-        except requests.exceptions.HTTPError as e:
-            status_code = e.response.status_code if e.response else None
+        except AvitoAPIError as e:
+            status_code = e.status
             logger.error(f"❌ HTTP error unblocking dates (status {status_code}): {e}")
-            logger.error(
-                f"Response: {e.response.text if e.response else 'No response'}"
-            )
+            logger.error(f"Response: {e.body or 'No response'}")
+            if raise_permanent and not e.retryable:
+                raise
             return False
         except Exception as e:
             logger.error(f"❌ Failed to unblock dates: {e}", exc_info=True)
             return False
 
-    def update_calendar_intervals(self, item_id: int) -> bool:
+    async def update_calendar_intervals(self, item_id: int) -> bool:
         """
         Обновить интервалы доступности для дома
 
@@ -375,8 +475,6 @@ class AvitoAPIService:
         Returns:
             True если обновление успешно, False в случае ошибки
         """
-        self.ensure_token()
-
         logger.info(f"Updating calendar intervals for item {item_id}")
 
         try:
@@ -391,7 +489,7 @@ class AvitoAPIService:
                 f"Fetching bookings for item {item_id} from {today} to {end_date}"
             )
 
-            bookings_data = self.get_bookings(
+            bookings_data = await self.get_bookings(
                 item_id=item_id,
                 date_start=today.isoformat(),
                 date_end=end_date.isoformat(),
@@ -400,92 +498,24 @@ class AvitoAPIService:
             bookings = bookings_data.get("bookings", [])
             logger.info(f"Found {len(bookings)} existing bookings")
 
-            # DEBUG: Логируем первую бронь для проверки формата
-            if bookings:
-                logger.info(f"DEBUG: First booking structure: {bookings[0]}")
-
-            # Преобразуем брони в объекты date
-            remaining_bookings = []
-            for booking in bookings:
-                # Avito API возвращает поля check_in/check_out, а не date_start/date_end
-                check_in = booking.get("check_in") or booking.get("date_start")
-                check_out = booking.get("check_out") or booking.get("date_end")
-
-                if not check_in or not check_out:
-                    logger.warning(f"Skipping booking with missing dates: {booking}")
-                    continue
-
-                booking_start = datetime.fromisoformat(check_in).date()
-                booking_end = datetime.fromisoformat(check_out).date()
-
-                remaining_bookings.append({"start": booking_start, "end": booking_end})
-
-            # Сортируем брони по дате начала
-            remaining_bookings.sort(key=lambda x: x["start"])
-
             # Вычисляем свободные интервалы
-            free_intervals = []
-            current_date = today
-
-            for booking in remaining_bookings:
-                # Если есть промежуток между current_date и началом брони
-                if current_date < booking["start"]:
-                    free_intervals.append(
-                        {
-                            "date_start": current_date.isoformat(),
-                            "date_end": booking["start"].isoformat(),
-                            "open": 1,
-                        }
-                    )
-                # Сдвигаем current_date на конец текущей брони
-                if booking["end"] > current_date:
-                    current_date = booking["end"]
-
-            # Добавляем последний интервал до конца окна бронирования
-            if current_date < end_date:
-                free_intervals.append(
-                    {
-                        "date_start": current_date.isoformat(),
-                        "date_end": end_date.isoformat(),
-                        "open": 1,
-                    }
-                )
-
-            logger.info(f"Calculated {len(free_intervals)} free intervals")
-
-            # Отправляем обновленные интервалы через /intervals API
-            response = requests.post(
-                f"{self.BASE_URL}/realty/v1/items/intervals",
-                headers={
-                    "Authorization": f"Bearer {self.access_token}",
-                    "Content-Type": "application/json",
-                },
-                json={
-                    "intervals": free_intervals,
-                    "item_id": item_id,
-                    "source": "EasyCamp",
-                },
-                timeout=10,
+            free_intervals = self.free_intervals_payload(
+                self.avito_booking_dates(bookings), today
             )
-            response.raise_for_status()
 
-            logger.info(
-                f"✅ Calendar intervals updated successfully for item {item_id}"
-            )
-            return True
+            # Отправляем обновленные интервалы через /intervals API
+            return await self.push_calendar_intervals(item_id, free_intervals)
 
-        except requests.exceptions.HTTPError as e:
-            status_code = e.response.status_code if e.response else None
+        except AvitoAPIError as e:
+            status_code = e.status
             logger.error(f"❌ HTTP error updating calendar (status {status_code}): {e}")
-            logger.error(
-                f"Response: {e.response.text if e.response else 'No response'}"
-            )
+            logger.error(f"Response: {e.body or 'No response'}")
             return False
         except Exception as e:
             logger.error(f"❌ Failed to update calendar intervals: {e}", exc_info=True)
             return False
 
-    def update_calendar_from_local(self, item_id: int, local_bookings: list) -> bool:
+    async def update_calendar_from_local(self, item_id: int, local_bookings: list) -> bool:
         """
         Обновить интервалы доступности в Avito на основе локальных броней
 
@@ -496,118 +526,121 @@ class AvitoAPIService:
         Returns:
             True если обновление успешно, False в случае ошибки
         """
-        self.ensure_token()
-
         logger.info(
             f"Updating calendar for item {item_id} from {len(local_bookings)} local bookings"
         )
+        return await self.push_calendar_intervals(
+            item_id, self.build_calendar_intervals(local_bookings)
+        )
 
-        try:
-            from app.core.config import settings
-            from datetime import datetime, timedelta
+    @staticmethod
+    def build_calendar_intervals(local_bookings: list, today=None) -> List[Dict]:
+        """
+        Свободные интервалы окна бронирования (payload для /intervals).
 
-            # Подготовка интервалов
-            today = datetime.now().date()
-            end_date = today + timedelta(days=settings.booking_window_days)
+        Детерминированы для одного и того же набора броней и дня —
+        по ним очередь пушей определяет, изменился ли календарь.
+        """
+        from app.models import BookingStatus as _BS
 
-            # Преобразуем брони в список словарей с date объектами
-            booking_intervals = []
-            for booking in local_bookings:
-                # Пропускаем отменённые и завершённые
-                from app.models import BookingStatus as _BS
-                if hasattr(booking, "status") and booking.status in (
-                    _BS.CANCELLED, _BS.COMPLETED
-                ):
-                    continue
+        busy = []
+        for booking in local_bookings:
+            # Пропускаем отменённые и завершённые
+            if hasattr(booking, "status") and booking.status in (
+                _BS.CANCELLED, _BS.COMPLETED
+            ):
+                continue
 
-                check_in = booking.check_in
-                check_out = booking.check_out
+            check_in = booking.check_in
+            check_out = booking.check_out
 
-                # Если check_in/check_out уже date, используем как есть
-                # Если datetime, преобразуем
-                if isinstance(check_in, datetime):
-                    check_in = check_in.date()
-                if isinstance(check_out, datetime):
-                    check_out = check_out.date()
+            # Если check_in/check_out уже date, используем как есть
+            # Если datetime, преобразуем
+            if isinstance(check_in, datetime):
+                check_in = check_in.date()
+            if isinstance(check_out, datetime):
+                check_out = check_out.date()
 
-                booking_intervals.append({"start": check_in, "end": check_out})
+            busy.append((check_in, check_out))
 
-            # Сортируем брони по дате начала
-            booking_intervals.sort(key=lambda x: x["start"])
+        return AvitoAPIService.free_intervals_payload(busy, today)
 
-            # Вычисляем свободные интервалы
-            free_intervals = []
-            current_date = today
-
-            for booking in booking_intervals:
-                # Если бронь в прошлом/заканчивается до сегодня, пропускаем
-                if booking["end"] <= current_date:
-                    continue
-
-                # Если начало брони после current_date, добавляем интервал
-                if current_date < booking["start"]:
-                    # Обрезаем интервал концом окна, если нужно
-                    interval_end = min(booking["start"], end_date)
-
-                    if current_date < interval_end:
-                        free_intervals.append(
-                            {
-                                "date_start": current_date.isoformat(),
-                                "date_end": interval_end.isoformat(),
-                                "open": 1,
-                            }
-                        )
-
-                # Сдвигаем current_date на конец текущей брони (или оставляем, если она была в прошлом)
-                if booking["end"] > current_date:
-                    current_date = booking["end"]
-
-            # Добавляем последний интервал до конца окна бронирования
-            if current_date < end_date:
-                free_intervals.append(
-                    {
-                        "date_start": current_date.isoformat(),
-                        "date_end": end_date.isoformat(),
-                        "open": 1,
-                    }
-                )
+    @staticmethod
+    def free_intervals_payload(busy: list, today=None) -> List[Dict]:
+        """
+        Свободные промежутки окна [today, today + booking_window_days)
+        между занятыми диапазонами (date, date) — в формате /intervals.
+
+        Единая точка для всех путей, пушащих календарь в Avito.
+        """
+        today = today or datetime.now().date()
+        end_date = today + timedelta(days=settings.booking_window_days)
+        return [
+            {"date_start": start.isoformat(), "date_end": end.isoformat(), "open": 1}
+            for start, end in intervals.free_gaps(busy, today, end_date)
+        ]
+
+    @staticmethod
+    def avito_booking_dates(bookings: list) -> List[Tuple[date, date]]:
+        """
+        Диапазоны (заезд, выезд) броней из ответа Avito get_bookings.
+
+        Avito отдаёт даты в check_in/check_out, старый формат — в
+        date_start/date_end; брони без дат пропускаются.
+        """
+        result = []
+        for booking in bookings:
+            check_in = booking.get("check_in") or booking.get("date_start")
+            check_out = booking.get("check_out") or booking.get("date_end")
+            if not check_in or not check_out:
+                logger.warning(f"Skipping booking with missing dates: {booking}")
+                continue
+            result.append((
+                datetime.fromisoformat(check_in).date(),
+                datetime.fromisoformat(check_out).date(),
+            ))
+        return result
 
+    async def push_calendar_intervals(
+        self, item_id: int, free_intervals: List[Dict], *, raise_permanent: bool = False
+    ) -> bool:
+        """
+        Отправить свободные интервалы объявления в /intervals.
+
+        raise_permanent: пробросить AvitoAPIError, если повтор не поможет
+        (4xx, кроме 429) — вместо False
+        """
+        try:
             logger.info(
-                f"Calculated {len(free_intervals)} free intervals for item {item_id}"
+                f"Pushing {len(free_intervals)} free intervals for item {item_id}"
             )
 
             # Отправляем интвервалы
-            response = requests.post(
-                f"{self.BASE_URL}/realty/v1/items/intervals",
-                headers={
-                    "Authorization": f"Bearer {self.access_token}",
-                    "Content-Type": "application/json",
-                },
+            await self._request(
+                "POST",
+                "/realty/v1/items/intervals",
                 json={
                     "intervals": free_intervals,
                     "item_id": item_id,
                     "source": "EasyCamp",
                 },
-                timeout=10,
             )
-            response.raise_for_status()
 
             logger.info(f"✅ Calendar updated successfully for item {item_id}")
             return True
 
-        except requests.exceptions.HTTPError as e:
-            status_code = e.response.status_code if e.response else None
+        except AvitoAPIError as e:
+            status_code = e.status
             logger.error(f"❌ HTTP error updating calendar (status {status_code}): {e}")
-            logger.error(
-                f"Response: {e.response.text if e.response else 'No response'}"
-            )
+            logger.error(f"Response: {e.body or 'No response'}")
+            if raise_permanent and not e.retryable:
+                raise
             return False
         except Exception as e:
             logger.error(f"❌ Failed to update calendar: {e}", exc_info=True)
             return False
 
-
-    def update_prices(
+    async def update_prices(
         self, item_id: int, price_intervals: List[Dict]
     ) -> bool:
         """
@@ -623,42 +656,34 @@ class AvitoAPIService:
         Returns:
             True если обновление успешно
         """
-        self.ensure_token()
-
         logger.info(
             f"Updating prices for item {item_id}: {len(price_intervals)} intervals"
         )
 
         try:
             # Avito Price Calendar API: POST /realty/v1/accounts/{user_id}/items/{item_id}/price_calendar
-            response = requests.post(
-                f"{self.BASE_URL}/realty/v1/accounts/{self.user_id}/items/{item_id}/price_calendar",
-                headers={
-                    "Authorization": f"Bearer {self.access_token}",
-                    "Content-Type": "application/json",
-                },
+            await self._request(
+                "POST",
+                f"/realty/v1/accounts/{self.user_id}/items/{item_id}/price_calendar",
                 json={"prices": price_intervals},
                 timeout=15,
             )
-            response.raise_for_status()
 
             logger.info(f"✅ Prices updated successfully for item {item_id}")
             return True
 
-        except requests.exceptions.HTTPError as e:
-            status_code = e.response.status_code if e.response else None
+        except AvitoAPIError as e:
+            status_code = e.status
             logger.error(
                 f"❌ HTTP error updating prices (status {status_code}): {e}"
             )
-            logger.error(
-                f"Response: {e.response.text if e.response else 'No response'}"
-            )
+            logger.error(f"Response: {e.body or 'No response'}")
             return False
         except Exception as e:
             logger.error(f"❌ Failed to update prices: {e}", exc_info=True)
             return False
 
-    def get_price_calendar(self, item_id: int, date_from: str, date_to: str) -> Dict:
+    async def get_price_calendar(self, item_id: int, date_from: str, date_to: str) -> Dict:
         """
         Получить текущий прайс-календарь с Avito.
 
@@ -670,24 +695,18 @@ class AvitoAPIService:
         Returns:
             Dict с ценами по датам
         """
-        self.ensure_token()
-
         try:
-            response = requests.get(
-                f"{self.BASE_URL}/realty/v1/accounts/{self.user_id}/items/{item_id}/price_calendar",
-                headers={"Authorization": f"Bearer {self.access_token}"},
+            data = await self._request(
+                "GET",
+                f"/realty/v1/accounts/{self.user_id}/items/{item_id}/price_calendar",
                 params={"date_from": date_from, "date_to": date_to},
-                timeout=10,
             )
-            response.raise_for_status()
-
-            data = response.json()
             logger.info(
                 f"Fetched price calendar for item {item_id}: {len(data.get('prices', []))} entries"
             )
             return data
 
-        except requests.exceptions.HTTPError as e:
+        except AvitoAPIError as e:
             logger.error(f"HTTP error fetching price calendar: {e}")
             return {}
         except Exception as e:
@@ -0,0 +1,413 @@
+"""
+Входящая очередь webhook Avito (inbox).
+
+Endpoint проверяет подпись, сохраняет сырое событие в avito_webhook_inbox
+с ключом дедупликации и сразу отвечает 200 — Avito не ждёт ни API Avito,
+ни Telegram. Фоновый воркер:
+- берёт ожидающие события по порядку поступления;
+- события одной брони (booking_key) обрабатывает строго по очереди,
+  разные брони — параллельно (до AVITO_INBOX_WORKERS);
+- при ошибке повторяет с бэкоффом (как outbox), следующие события той же
+  брони ждут; после AVITO_INBOX_MAX_ATTEMPTS или если событие не
+  разбирается — переводит в DEAD (dead-letter), откуда его можно
+  вернуть в очередь из бота (/avito_inbox_retry).
+
+Повторная доставка того же события (ретрай Avito) не создаёт вторую строку.
+"""
+
+import asyncio
+import hashlib
+import json
+import logging
+import time
+from collections import deque
+from datetime import datetime, timedelta
+from typing import Awaitable, Callable, Dict, List, Optional
+
+from sqlalchemy import delete, func, or_, select, update
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.config import settings
+from app.models import AvitoWebhookInbox, Booking, BookingSource, InboxStatus
+
+logger = logging.getLogger(__name__)
+
+# Обработанные события храним неделю — для разбора и дедупликации ретраев
+PROCESSED_RETENTION = timedelta(days=7)
+
+# Поля payload, в которых Avito передаёт ID брони
+_BOOKING_ID_FIELDS = ("avito_booking_id", "booking_id", "id")
+
+Processor = Callable[[dict], Awaitable[None]]
+
+
+def dedupe_key(event_data: dict) -> str:
+    """Ключ дедупликации: хэш события без учёта порядка ключей и пробелов."""
+    raw = json.dumps(event_data, sort_keys=True, ensure_ascii=False, separators=(",", ":"))
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+def booking_key(event_data: dict) -> Optional[str]:
+    """ID брони Avito из payload события (если есть)."""
+    payload = event_data.get("payload")
+    if not isinstance(payload, dict):
+        return None
+    for field in _BOOKING_ID_FIELDS:
+        value = payload.get(field)
+        if value not in (None, ""):
+            return str(value)
+    return None
+
+
+async def process_avito_event(event_data: dict) -> None:
+    """
+    Применить событие webhook к броням и уведомить админа.
+
+    ValueError (в т.ч. ошибка валидации pydantic) — событие не разобрать,
+    повтор бессмыслен; прочие исключения — повторить позже.
+    """
+    from app.avito.schemas import AvitoBookingPayload, AvitoWebhookEvent
+    from app.database import AsyncSessionLocal
+    from app.services.booking_service import BookingService
+    from app.telegram.notifier import notify_new_avito_event
+
+    event = AvitoWebhookEvent(**event_data)
+    booking_payload = AvitoBookingPayload(**event.payload)
+    avito_id = booking_key(event_data)
+
+    async with AsyncSessionLocal() as session:
+        existing = await session.scalar(
+            select(Booking).where(
+                Booking.external_id == avito_id, Booking.source == BookingSource.AVITO
+            )
+        )
+
+        # Повторный CREATE для существующей брони пропускаем, UPDATE применяем
+        is_create_event = event.event_type in ("booking", "booking_created", "create")
+        if existing and is_create_event:
+            logger.info(
+                f"Duplicate CREATE event for Avito booking {avito_id} (DB ID: {existing.id}) - skipping"
+            )
+            return
+
+        booking = await BookingService.create_or_update_avito_booking(session, booking_payload)
+
+    await notify_new_avito_event(event, booking)
+
+
+class AvitoInboxService:
+    """Приём событий в inbox и запросы для админки."""
+
+    @staticmethod
+    async def accept(db: AsyncSession, body: bytes, event_data: dict) -> tuple[AvitoWebhookInbox, bool]:
+        """
+        Сохранить событие. Вернуть (строка inbox, True если новое / False если дубль).
+        """
+        key = dedupe_key(event_data)
+        now = datetime.utcnow()
+        row = AvitoWebhookInbox(
+            dedupe_key=key,
+            event_type=str(event_data.get("event_type", "unknown")),
+            booking_key=booking_key(event_data),
+            body=body.decode("utf-8", errors="replace"),
+            status=InboxStatus.PENDING,
+            attempts=0,
+            next_attempt_at=now,
+            received_at=now,
+        )
+        db.add(row)
+        try:
+            await db.commit()
+            return row, True
+        except IntegrityError:
+            await db.rollback()
+            existing = await db.scalar(
+                select(AvitoWebhookInbox).where(AvitoWebhookInbox.dedupe_key == key)
+            )
+            return existing, False
+
+    @staticmethod
+    async def backlog(db: AsyncSession) -> dict:
+        """Размер очереди, dead-letter и возраст самого старого ожидающего события."""
+        counts = dict(
+            (
+                await db.execute(
+                    select(AvitoWebhookInbox.status, func.count())
+                    .where(AvitoWebhookInbox.status.in_([InboxStatus.PENDING, InboxStatus.DEAD]))
+                    .group_by(AvitoWebhookInbox.status)
+                )
+            ).all()
+        )
+        oldest = await db.scalar(
+            select(func.min(AvitoWebhookInbox.received_at)).where(
+                AvitoWebhookInbox.status == InboxStatus.PENDING
+            )
+        )
+        return {
+            "pending": counts.get(InboxStatus.PENDING, 0),
+            "dead": counts.get(InboxStatus.DEAD, 0),
+            "oldest_pending_age_s": (
+                round((datetime.utcnow() - oldest).total_seconds(), 1) if oldest else None
+            ),
+        }
+
+    @staticmethod
+    async def dead_letters(db: AsyncSession, limit: int = 10) -> List[AvitoWebhookInbox]:
+        result = await db.execute(
+            select(AvitoWebhookInbox)
+            .where(AvitoWebhookInbox.status == InboxStatus.DEAD)
+            .order_by(AvitoWebhookInbox.id.desc())
+            .limit(limit)
+        )
+        return list(result.scalars().all())
+
+    @staticmethod
+    async def requeue_dead(db: AsyncSession) -> int:
+        """Вернуть все события из dead-letter в очередь с обнулёнными попытками."""
+        result = await db.execute(
+            update(AvitoWebhookInbox)
+            .where(AvitoWebhookInbox.status == InboxStatus.DEAD)
+            .values(
+                status=InboxStatus.PENDING,
+                attempts=0,
+                next_attempt_at=datetime.utcnow(),
+                processed_at=None,
+            )
+        )
+        await db.commit()
+        return result.rowcount or 0
+
+
+class AvitoInboxWorker:
+    """Фоновый обработчик inbox: по очереди в пределах брони, параллельно между бронями."""
+
+    def __init__(
+        self,
+        session_factory=None,
+        processor: Optional[Processor] = None,
+        workers: Optional[int] = None,
+        poll_interval: Optional[float] = None,
+    ):
+        self._session_factory = session_factory
+        self.processor = processor or process_avito_event
+        self.workers = workers or settings.avito_inbox_workers
+        self.poll_interval = (
+            settings.avito_inbox_poll_interval_seconds if poll_interval is None else poll_interval
+        )
+
+        self._runner: Optional[asyncio.Task] = None
+        self._wakeup: Optional[asyncio.Event] = None
+        self._lock = asyncio.Lock()
+        self._last_purge = 0.0
+
+        # Метрики
+        self.processed_total = 0
+        self.retried_total = 0
+        self.dead_total = 0
+        self._lags_s: deque = deque(maxlen=200)  # received_at -> обработано
+
+    @property
+    def session_factory(self):
+        if self._session_factory is None:
+            from app.database import AsyncSessionLocal
+
+            self._session_factory = AsyncSessionLocal
+        return self._session_factory
+
+    def _backoff(self, attempts: int) -> timedelta:
+        seconds = settings.outbox_retry_base_seconds * 2 ** max(attempts - 1, 0)
+        return timedelta(seconds=min(seconds, settings.outbox_retry_max_seconds))
+
+    async def run_once(self) -> int:
+        """Обработать одну пачку ожидающих событий. Вернуть число взятых в работу."""
+        async with self._lock:
+            return await self._run_once()
+
+    async def _run_once(self) -> int:
+        now = datetime.utcnow()
+        pending = AvitoWebhookInbox.status == InboxStatus.PENDING
+        # Голова очереди брони — её самое раннее ожидающее событие
+        lane_heads = (
+            select(func.min(AvitoWebhookInbox.id))
+            .where(pending, AvitoWebhookInbox.booking_key.is_not(None))
+            .group_by(AvitoWebhookInbox.booking_key)
+        )
+        async with self.session_factory() as session:
+            # Пачку набираем только из голов, которым пора: события на
+            # backoff и очереди за ними не занимают места в пачке
+            heads = (
+                await session.execute(
+                    select(AvitoWebhookInbox.id, AvitoWebhookInbox.booking_key)
+                    .where(
+                        pending,
+                        AvitoWebhookInbox.next_attempt_at <= now,
+                        or_(
+                            AvitoWebhookInbox.booking_key.is_(None),
+                            AvitoWebhookInbox.id.in_(lane_heads),
+                        ),
+                    )
+                    .order_by(AvitoWebhookInbox.id)
+                    .limit(settings.avito_inbox_batch_size)
+                )
+            ).all()
+            if not heads:
+                return 0
+
+            keys = [h.booking_key for h in heads if h.booking_key is not None]
+            keyless = [h.id for h in heads if h.booking_key is None]
+            rows = (
+                await session.execute(
+                    select(
+                        AvitoWebhookInbox.id,
+                        AvitoWebhookInbox.booking_key,
+                        AvitoWebhookInbox.body,
+                        AvitoWebhookInbox.next_attempt_at,
+                    )
+                    .where(
+                        pending,
+                        or_(
+                            AvitoWebhookInbox.booking_key.in_(keys),
+                            AvitoWebhookInbox.id.in_(keyless),
+                        ),
+                    )
+                    .order_by(AvitoWebhookInbox.id)
+                )
+            ).all()
+
+        lanes: Dict[str, list] = {}
+        for row in rows:
+            lanes.setdefault(row.booking_key or f"#{row.id}", []).append(row)
+
+        semaphore = asyncio.Semaphore(self.workers)
+
+        async def run_lane(lane: list) -> int:
+            taken = 0
+            async with semaphore:
+                for row in lane:
+                    # Событие ждёт повтора — следующие события брони ждут его
+                    if row.next_attempt_at > now:
+                        break
+                    taken += 1
+                    if not await self._process(row.id, row.body):
+                        break
+            return taken
+
+        return sum(await asyncio.gather(*(run_lane(lane) for lane in lanes.values())))
+
+    async def _process(self, inbox_id: int, body: str) -> bool:
+        """Обработать одно событие и записать исход. True — можно идти дальше по брони."""
+        dead_now = False
+        try:
+            await self.processor(json.loads(body))
+            error = None
+        except ValueError as e:
+            # Тело/payload не разбирается — повтор не поможет
+            dead_now = True
+            error = f"invalid event: {e}"[:500]
+        except Exception as e:
+            logger.error(f"Avito inbox event #{inbox_id} failed: {e}", exc_info=True)
+            error = str(e)[:500]
+
+        finished = datetime.utcnow()
+        async with self.session_factory() as session:
+            row = await session.get(AvitoWebhookInbox, inbox_id)
+            if row is None:
+                return True
+
+            if error is None:
+                row.status = InboxStatus.DONE
+                row.processed_at = finished
+                row.last_error = None
+                self.processed_total += 1
+                self._lags_s.append((finished - row.received_at).total_seconds())
+                await session.commit()
+                return True
+
+            row.attempts += 1
+            row.last_error = error
+            if dead_now or row.attempts >= settings.avito_inbox_max_attempts:
+                row.status = InboxStatus.DEAD
+                row.processed_at = finished
+                self.dead_total += 1
+                logger.error(
+                    f"❌ Avito inbox event #{inbox_id} moved to dead-letter after "
+                    f"{row.attempts} attempts: {error}"
+                )
+                await session.commit()
+                return True  # dead-letter не блокирует следующие события брони
+
+            row.next_attempt_at = finished + self._backoff(row.attempts)
+            self.retried_total += 1
+            await session.commit()
+            return False
+
+    async def purge_processed(self, older_than: timedelta = PROCESSED_RETENTION) -> int:
+        """Удалить давно обработанные события."""
+        cutoff = datetime.utcnow() - older_than
+        async with self.session_factory() as session:
+            result = await session.execute(
+                delete(AvitoWebhookInbox).where(
+                    AvitoWebhookInbox.status == InboxStatus.DONE,
+                    AvitoWebhookInbox.processed_at < cutoff,
+                )
+            )
+            await session.commit()
+            return result.rowcount or 0
+
+    async def _run(self):
+        while True:
+            try:
+                taken = await self.run_once()
+                if time.monotonic() - self._last_purge > 3600:
+                    self._last_purge = time.monotonic()
+                    await self.purge_processed()
+            except Exception as e:
+                taken = 0
+                logger.error(f"Avito inbox worker iteration failed: {e}", exc_info=True)
+
+            if taken >= settings.avito_inbox_batch_size:
+                continue  # очередь не пуста — берём следующую пачку сразу
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=self.poll_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+
+    def start(self):
+        if self._runner is not None and not self._runner.done():
+            return
+        self._wakeup = asyncio.Event()
+        self._runner = asyncio.get_running_loop().create_task(self._run())
+        logger.info("✅ Avito inbox worker started")
+
+    def wake(self):
+        """Разбудить воркер после приёма события (без воркера — no-op)."""
+        if self._wakeup is not None:
+            self._wakeup.set()
+
+    async def stop(self):
+        if self._runner is None:
+            return
+        self._runner.cancel()
+        try:
+            await self._runner
+        except asyncio.CancelledError:
+            pass
+        self._runner = None
+        self._wakeup = None
+
+    def stats(self) -> dict:
+        lags = list(self._lags_s)
+        return {
+            "running": self._runner is not None and not self._runner.done(),
+            "processed_total": self.processed_total,
+            "retried_total": self.retried_total,
+            "dead_total": self.dead_total,
+            "lag_avg_s": round(sum(lags) / len(lags), 2) if lags else None,
+            "lag_max_s": round(max(lags), 2) if lags else None,
+        }
+
+
+# Глобальный экземпляр
+avito_inbox_worker = AvitoInboxWorker()
@@ -11,6 +11,12 @@ from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.core.config import settings
 from app.services.avito_api_service import avito_api_service
+from app.services.channel_push_queue import (
+    FAILED,
+    UNCHANGED,
+    channel_push_queue,
+    collapse_price_ranges,
+)
 from app.services.pricing_service import PricingService
 from app.services.house_service import HouseService
 
@@ -46,14 +52,20 @@ async def sync_prices_to_avito(
     db: AsyncSession,
     house_id: Optional[int] = None,
     days_forward: int = 90,
+    force: bool = False,
 ) -> Dict:
     """
     Синхронизирует цены из базы на Авито.
 
+    Подневные цены сворачиваются в диапазоны date_from/date_to с одной
+    ценой; если диапазоны не изменились с последнего успешного пуша,
+    запрос не отправляется.
+
     Args:
         db: Сессия БД
         house_id: Конкретный домик (None = все)
         days_forward: На сколько дней вперёд
+        force: Отправить, даже если цены не изменились
 
     Returns:
         {"synced": [...], "errors": [...]}
@@ -77,25 +89,35 @@ async def sync_prices_to_avito(
             continue
 
         # Собираем цены по дням
-        price_entries = []
-        for i in range(days_forward):
-            target_date = today + timedelta(days=i)
-            info = await PricingService.get_price_for_date(db, house.id, target_date)
-            price_entries.append({
-                "date": target_date.isoformat(),
-                "price": info["final_price"],
-            })
+        prices = await PricingService.get_price_range(
+            db, house.id, today, today + timedelta(days=days_forward)
+        )
+        price_ranges = collapse_price_ranges(
+            {"date": info["date"], "price": info["final_price"]} for info in prices
+        )
 
         try:
-            success = avito_api_service.update_prices(avito_item_id, price_entries)
-            if success:
+            outcome = await channel_push_queue.push(
+                "avito",
+                avito_item_id,
+                "prices",
+                price_ranges,
+                lambda payload, item_id=avito_item_id: avito_api_service.update_prices(
+                    item_id, payload
+                ),
+                force=force,
+            )
+            if outcome != FAILED:
                 results["synced"].append({
                     "house": house.name,
                     "item_id": avito_item_id,
-                    "days": len(price_entries),
+                    "days": len(prices),
+                    "ranges": len(price_ranges),
+                    "unchanged": outcome == UNCHANGED,
                 })
                 logger.info(
-                    f"Synced {len(price_entries)} price days for {house.name} → Avito item {avito_item_id}"
+                    f"Price sync {house.name} → Avito item {avito_item_id}: {outcome} "
+                    f"({len(prices)} days in {len(price_ranges)} ranges)"
                 )
             else:
                 results["errors"].append(f"{house.name}: Avito API returned error")
@@ -2,13 +2,16 @@
 Сервис синхронизации броней из Avito API
 """
 
-from datetime import datetime
+import asyncio
+from datetime import datetime, timedelta
 from decimal import Decimal
 import logging
+import time
 
 from sqlalchemy import select
 from sqlalchemy.orm import Session
 
+from app.core.config import settings
 from app.models import Booking, BookingStatus, BookingSource, House
 from app.services.avito_api_service import avito_api_service
 from app.services.booking_service import should_replace_avito_guest_value
@@ -18,6 +21,9 @@ from app.utils.validators import format_phone
 
 logger = logging.getLogger(__name__)
 
+# Применение ответов Avito к БД — по одному объявлению за раз
+_db_apply_lock = asyncio.Lock()
+
 
 def extract_avito_contact_field(booking_data: dict, field: str) -> str | None:
     """Read Avito guest contact fields from nested contact or legacy top-level payload fields."""
@@ -58,6 +64,10 @@ async def sync_avito_bookings(item_id: int, house_id: int) -> dict:
     """
     Синхронизация броней из Avito для одного объявления
 
+    Сетевой запрос идёт без блокировок (объявления опрашиваются параллельно),
+    а применение к БД — одна транзакция на объявление под общим локом:
+    у SQLite один писатель, параллельные коммиты только ждали бы друг друга.
+
     Args:
         item_id: ID объявления на Avito
         house_id: ID домика в нашей системе
@@ -68,86 +78,112 @@ async def sync_avito_bookings(item_id: int, house_id: int) -> dict:
         - new_bookings (List[Booking])
         - updated_bookings (List[Booking])
         - errors (int)
+        - conflicts (int)
+        - fetch_ms / apply_ms (float) — тайминги этапов
     """
     logger.info(f"Starting sync for Avito item {item_id} -> house {house_id}")
 
-    stats = {"total": 0, "new_bookings": [], "updated_bookings": [], "errors": 0}
+    stats = {
+        "item_id": item_id,
+        "house_id": house_id,
+        "total": 0,
+        "new_bookings": [],
+        "updated_bookings": [],
+        "errors": 0,
+        "conflicts": 0,
+        "fetch_ms": 0.0,
+        "apply_ms": 0.0,
+    }
 
     try:
         # Получаем брони из Avito
-        bookings_data = avito_api_service.get_bookings_for_period(item_id)
+        started = time.perf_counter()
+        try:
+            bookings_data = await avito_api_service.get_bookings_for_period(item_id)
+        finally:
+            stats["fetch_ms"] = (time.perf_counter() - started) * 1000
         stats["total"] = len(bookings_data)
 
-        async with AsyncSessionLocal() as session:
-            # 1. Обработка полученных броней
-            seen_external_ids = set()
-            for booking_data in bookings_data:
-                try:
-                    await process_avito_booking(session, booking_data, house_id, stats)
-                    seen_external_ids.add(str(booking_data.get("avito_booking_id")))
-                except Exception as e:
-                    logger.error(
-                        f"Error processing booking {booking_data.get('avito_booking_id')}: {e}"
-                    )
-                    stats["errors"] += 1
-
-            # 2. Сверка (Reconciliation) - поиск пропавших броней
-            from datetime import timedelta
-            from app.core.config import settings
-
-            today = datetime.now().date()
-            end_date = today + timedelta(days=settings.booking_window_days)
-
-            # Ищем активные локальные брони Avito, которых нет в ответе API
-            stmt = select(Booking).where(
-                Booking.source == BookingSource.AVITO,
-                Booking.house_id == house_id,
-                Booking.check_in >= today,
-                Booking.check_in <= end_date,
-                Booking.status.in_(
-                    [
-                        BookingStatus.NEW,
-                        BookingStatus.CONFIRMED,
-                        BookingStatus.PAID,
-                        BookingStatus.CHECKING_IN,
-                    ]
-                ),
-                Booking.external_id.notin_(seen_external_ids),
-            )
-
-            result = await session.execute(stmt)
-            stale_bookings = result.scalars().all()
-
-            for stale in stale_bookings:
-                if stale.status == BookingStatus.NEW:
-                    # Удаляем "мусор" (неподтвержденные заявки, исчезнувшие с Avito)
-                    logger.info(
-                        f"🗑 Deleting stale NEW booking {stale.id} (ext: {stale.external_id})"
-                    )
-                    await session.delete(stale)
-                    # Можно добавить счетчик удаленных, если нужно
-                else:
-                    # Важные брони помечаем как отмененные
-                    logger.info(
-                        f"❌ Cancelling stale booking {stale.id} (ext: {stale.external_id}, status: {stale.status})"
-                    )
-                    stale.status = BookingStatus.CANCELLED
-                    stale.updated_at = datetime.now()
-                    stats["updated_bookings"].append(stale)  # Добавляем для уведомления
-
-            await session.commit()
+        async with _db_apply_lock:
+            started = time.perf_counter()
+            try:
+                async with AsyncSessionLocal() as session:
+                    await apply_avito_bookings(session, bookings_data, house_id, stats)
+                    await session.commit()
+            finally:
+                stats["apply_ms"] = (time.perf_counter() - started) * 1000
 
         logger.info(
-            f"Sync completed: total={stats['total']}, new={len(stats['new_bookings'])}, updated={len(stats['updated_bookings'])}"
+            f"Sync completed for item {item_id}: total={stats['total']}, "
+            f"new={len(stats['new_bookings'])}, updated={len(stats['updated_bookings'])}, "
+            f"fetch={stats['fetch_ms']:.0f}ms, apply={stats['apply_ms']:.0f}ms"
         )
         return stats
 
     except Exception as e:
-        logger.error(f"Failed to sync Avito bookings: {e}")
+        logger.error(f"Failed to sync Avito bookings for item {item_id}: {e}")
         stats["errors"] += 1
         return stats
 
 
+async def apply_avito_bookings(
+    session: Session, bookings_data: list, house_id: int, stats: dict
+):
+    """Применить ответ Avito по одному объявлению к БД (без коммита)."""
+    # 1. Обработка полученных броней
+    seen_external_ids = set()
+    for booking_data in bookings_data:
+        try:
+            await process_avito_booking(session, booking_data, house_id, stats)
+            seen_external_ids.add(str(booking_data.get("avito_booking_id")))
+        except Exception as e:
+            logger.error(
+                f"Error processing booking {booking_data.get('avito_booking_id')}: {e}"
+            )
+            stats["errors"] += 1
+
+    # 2. Сверка (Reconciliation) - поиск пропавших броней
+    today = datetime.now().date()
+    end_date = today + timedelta(days=settings.booking_window_days)
+
+    # Ищем активные локальные брони Avito, которых нет в ответе API
+    stmt = select(Booking).where(
+        Booking.source == BookingSource.AVITO,
+        Booking.house_id == house_id,
+        Booking.check_in >= today,
+        Booking.check_in <= end_date,
+        Booking.status.in_(
+            [
+                BookingStatus.NEW,
+                BookingStatus.CONFIRMED,
+                BookingStatus.PAID,
+                BookingStatus.CHECKING_IN,
+            ]
+        ),
+        Booking.external_id.notin_(seen_external_ids),
+    )
+
+    result = await session.execute(stmt)
+    stale_bookings = result.scalars().all()
+
+    for stale in stale_bookings:
+        if stale.status == BookingStatus.NEW:
+            # Удаляем "мусор" (неподтвержденные заявки, исчезнувшие с Avito)
+            logger.info(
+                f"🗑 Deleting stale NEW booking {stale.id} (ext: {stale.external_id})"
+            )
+            await session.delete(stale)
+            # Можно добавить счетчик удаленных, если нужно
+        else:
+            # Важные брони помечаем как отмененные
+            logger.info(
+                f"❌ Cancelling stale booking {stale.id} (ext: {stale.external_id}, status: {stale.status})"
+            )
+            stale.status = BookingStatus.CANCELLED
+            stale.updated_at = datetime.now()
+            stats["updated_bookings"].append(stale)  # Добавляем для уведомления
+
+
 async def process_avito_booking(
     session: Session, booking_data: dict, house_id: int, stats: dict
 ):
@@ -301,20 +337,65 @@ async def sync_all_avito_items(item_house_mapping: dict) -> dict:
     """
     Синхронизация всех объявлений Avito
 
+    Объявления опрашиваются параллельно (не больше
+    settings.avito_sync_concurrency одновременно), так что время синка
+    определяется самым медленным объявлением, а не их суммой.
+
     Args:
         item_house_mapping: Словарь {item_id: house_id}
 
     Returns:
-        Общая статистика
+        Общая статистика; в "items" — разбивка и тайминги по объявлениям
     """
-    total_stats = {"total": 0, "new_bookings": [], "updated_bookings": [], "errors": 0}
+    started = time.perf_counter()
+    semaphore = asyncio.Semaphore(max(1, settings.avito_sync_concurrency))
+
+    async def _sync_one(item_id: int, house_id: int) -> dict:
+        async with semaphore:
+            return await sync_avito_bookings(item_id, house_id)
 
-    for item_id, house_id in item_house_mapping.items():
-        stats = await sync_avito_bookings(item_id, house_id)
+    results = await asyncio.gather(
+        *(
+            _sync_one(item_id, house_id)
+            for item_id, house_id in item_house_mapping.items()
+        )
+    )
 
+    total_stats = {
+        "total": 0,
+        "new_bookings": [],
+        "updated_bookings": [],
+        "errors": 0,
+        "conflicts": 0,
+        "items": [],
+    }
+    for stats in results:
         total_stats["total"] += stats["total"]
         total_stats["new_bookings"].extend(stats["new_bookings"])
         total_stats["updated_bookings"].extend(stats["updated_bookings"])
         total_stats["errors"] += stats["errors"]
+        total_stats["conflicts"] += stats.get("conflicts", 0)
+        total_stats["items"].append(
+            {
+                "item_id": stats["item_id"],
+                "house_id": stats["house_id"],
+                "total": stats["total"],
+                "new": len(stats["new_bookings"]),
+                "updated": len(stats["updated_bookings"]),
+                "errors": stats["errors"],
+                "fetch_ms": round(stats["fetch_ms"], 1),
+                "apply_ms": round(stats["apply_ms"], 1),
+            }
+        )
 
+    total_stats["duration_ms"] = round((time.perf_counter() - started) * 1000, 1)
     return total_stats
+
+
+def format_item_timings(items: list) -> str:
+    """Строка с таймингами по объявлениям для логов/сообщений."""
+    return ", ".join(
+        f"{i['item_id']}: {i['fetch_ms']:.0f}+{i['apply_ms']:.0f}ms"
+        + (f" ({i['errors']} err)" if i["errors"] else "")
+        for i in items
+    )
@@ -1,86 +1,359 @@
-import os
+"""
+Database backups.
+
+A backup is a consistent snapshot taken through SQLite's online backup API
+(safe while the bot, webhooks and jobs keep writing), compressed with gzip
+(or zstd when the `zstandard` package is installed) and handed to a backend:
+Google Drive (resumable chunked upload) or a local directory. After each
+upload the backend keeps only the newest BACKUP_RETENTION_COUNT snapshots.
+
+All blocking work - snapshot, compression, Google API calls - runs in a
+worker thread, so the event loop keeps serving updates during a backup.
+"""
+
+import asyncio
+import gzip
+import io
 import logging
+import os
+import shutil
+import sqlite3
+import tempfile
+import threading
+import time
+from dataclasses import dataclass
 from datetime import datetime
-from google.oauth2 import service_account
-from googleapiclient.discovery import build
-from googleapiclient.http import MediaFileUpload
+from typing import List, Optional
 
+from app.core import metrics
 from app.core.config import settings
 
 logger = logging.getLogger(__name__)
 
+BACKUP_PREFIX = "easycamp_backup_"
 
-async def backup_database_to_drive():
-    """
-    Creates a backup of the SQLite database and uploads it to Google Drive.
-    """
-    logger.info("📦 Starting database backup...")
+_EXTENSIONS = {"gzip": ".db.gz", "zstd": ".db.zst", "none": ".db"}
+_MIME_TYPES = {".gz": "application/gzip", ".zst": "application/zstd", ".db": "application/x-sqlite3"}
+
+
+@dataclass
+class BackupResult:
+    name: str
+    snapshot_bytes: int
+    compressed_bytes: int
+    duration_seconds: float
+    pruned: int
 
-    # Define paths
-    # Assuming the database URL is like sqlite+aiosqlite:///path/to/db or just a file path
-    # We need to parse the actual file path from config
-    db_path = "easycamp.db"  # Default local
 
-    # Try to parse from DATABASE_URL if strictly defined
+def _backup_db_path() -> str:
+    """Path of the live SQLite database (DATABASE_URL, then Docker fallbacks)."""
+    db_path = "easycamp.db"  # Default local
     if "sqlite" in settings.database_url:
         parts = settings.database_url.split("///")
         if len(parts) > 1:
             db_path = parts[1]
 
-    # For Docker, db_path might be absolute /data/easycamp.db.
-    # But usually we just backup the file we know.
-    # Let's verify existence.
     if not os.path.exists(db_path):
         # Fallback for Docker path if running inside container
         if os.path.exists("/app/data/easycamp.db"):
             db_path = "/app/data/easycamp.db"
         elif os.path.exists("data/easycamp.db"):
             db_path = "data/easycamp.db"
+    return db_path
+
+
+def _compression() -> str:
+    method = settings.backup_compression.lower()
+    if method == "zstd":
+        try:
+            import zstandard  # noqa: F401
+        except ImportError:
+            logger.warning("zstandard is not installed, falling back to gzip")
+            return "gzip"
+    return method if method in _EXTENSIONS else "gzip"
 
-    if not os.path.exists(db_path):
-        logger.error(f"❌ Database file not found at {db_path}. Backup failed.")
-        return
 
-    backup_filename = f"easycamp_backup_{datetime.now().strftime('%Y%m%d_%H%M%S')}.db"
+# ------------------------------------------------------------------
+# Snapshot + compression (blocking, run in a worker thread)
+# ------------------------------------------------------------------
 
+
+def create_snapshot(db_path: str, dest_path: str) -> int:
+    """Consistent copy of a live database via the online backup API."""
+    source = sqlite3.connect(f"file:{db_path}?mode=ro", uri=True)
     try:
-        # 1. Authenticate
-        scope = ["https://www.googleapis.com/auth/drive.file"]
-        creds = service_account.Credentials.from_service_account_file(
-            settings.google_sheets_credentials_file, scopes=scope
-        )
-        service = build("drive", "v3", credentials=creds)
+        target = sqlite3.connect(dest_path)
+        try:
+            # One step = one read transaction: a consistent point-in-time copy.
+            # In WAL mode writers are not blocked while it runs.
+            source.backup(target)
+        finally:
+            target.close()
+    finally:
+        source.close()
+    return os.path.getsize(dest_path)
 
-        # 2. Upload
-        logger.info(f"Uploading {db_path} as {backup_filename}...")
 
-        file_metadata = {
-            "name": backup_filename,
-            "mimeType": "application/x-sqlite3",
-            # 'parents': ['FOLDER_ID'] # Optional: if user wants a specific folder
-        }
+def compress_file(src_path: str, dest_path: str, method: str) -> int:
+    with open(src_path, "rb") as src, open(dest_path, "wb") as dst:
+        if method == "gzip":
+            with gzip.GzipFile(fileobj=dst, mode="wb", compresslevel=6) as gz:
+                shutil.copyfileobj(src, gz, 1024 * 1024)
+        elif method == "zstd":
+            import zstandard
 
-        media = MediaFileUpload(
-            db_path, mimetype="application/x-sqlite3", resumable=True
-        )
+            zstandard.ZstdCompressor(level=10).copy_stream(src, dst)
+        else:
+            shutil.copyfileobj(src, dst, 1024 * 1024)
+    return os.path.getsize(dest_path)
 
-        file = (
-            service.files()
-            .create(body=file_metadata, media_body=media, fields="id")
-            .execute()
-        )
 
-        logger.info(f"✅ Backup successful! File ID: {file.get('id')}")
+def decompress_file(src_path: str, dest_path: str) -> None:
+    """Inverse of compress_file; the method is taken from the file name."""
+    with open(src_path, "rb") as src, open(dest_path, "wb") as dst:
+        if src_path.endswith(".gz"):
+            with gzip.GzipFile(fileobj=src, mode="rb") as gz:
+                shutil.copyfileobj(gz, dst, 1024 * 1024)
+        elif src_path.endswith(".zst"):
+            import zstandard
+
+            zstandard.ZstdDecompressor().copy_stream(src, dst)
+        else:
+            shutil.copyfileobj(src, dst, 1024 * 1024)
+
+
+# ------------------------------------------------------------------
+# Backends
+# ------------------------------------------------------------------
+
+
+class LocalBackupBackend:
+    """Stores snapshots in a directory (offline setups and tests)."""
+
+    name = "local"
+
+    def __init__(self, directory: str):
+        self.directory = directory
+
+    def upload(self, path: str, name: str) -> None:
+        os.makedirs(self.directory, exist_ok=True)
+        tmp_path = os.path.join(self.directory, f".{name}.part")
+        shutil.copyfile(path, tmp_path)
+        os.replace(tmp_path, os.path.join(self.directory, name))
+
+    def list(self) -> List[str]:
+        """Backup names, newest first (names embed the timestamp)."""
+        if not os.path.isdir(self.directory):
+            return []
+        names = [n for n in os.listdir(self.directory) if n.startswith(BACKUP_PREFIX)]
+        return sorted(names, reverse=True)
+
+    def download(self, name: str, dest_path: str) -> None:
+        shutil.copyfile(os.path.join(self.directory, name), dest_path)
+
+    def delete(self, name: str) -> None:
+        os.remove(os.path.join(self.directory, name))
+
+
+class DriveBackupBackend:
+    """Stores snapshots in Google Drive (service account)."""
+
+    name = "drive"
+
+    def __init__(self, credentials_file: str, folder_id: str = "", chunk_mb: int = 8):
+        self.credentials_file = credentials_file
+        self.folder_id = folder_id
+        self.chunk_size = max(1, chunk_mb) * 1024 * 1024
+        self._service = None
+        self._ids: dict = {}
+
+    @property
+    def service(self):
+        if self._service is None:
+            from google.oauth2 import service_account
+            from googleapiclient.discovery import build
+
+            creds = service_account.Credentials.from_service_account_file(
+                self.credentials_file, scopes=["https://www.googleapis.com/auth/drive.file"]
+            )
+            self._service = build("drive", "v3", credentials=creds, cache_discovery=False)
+        return self._service
+
+    def upload(self, path: str, name: str) -> None:
+        from googleapiclient.http import MediaFileUpload
+
+        mime_type = _MIME_TYPES.get(os.path.splitext(name)[1], "application/octet-stream")
+        file_metadata = {"name": name, "mimeType": mime_type}
+        if self.folder_id:
+            file_metadata["parents"] = [self.folder_id]
+
+        media = MediaFileUpload(path, mimetype=mime_type, resumable=True, chunksize=self.chunk_size)
+        request = self.service.files().create(body=file_metadata, media_body=media, fields="id")
+        with metrics.track_external("google_drive", "files.create"):
+            response = None
+            while response is None:
+                # Each chunk is retried by the client; a failed upload resumes
+                # from the last acknowledged byte instead of starting over
+                _, response = request.next_chunk(num_retries=3)
+        logger.info(f"Uploaded {name} to Drive (file ID: {response.get('id')})")
+
+    def _files(self) -> List[dict]:
+        query = f"name contains '{BACKUP_PREFIX}' and trashed = false"
+        if self.folder_id:
+            query += f" and '{self.folder_id}' in parents"
+        files, page_token = [], None
+        while True:
+            with metrics.track_external("google_drive", "files.list"):
+                result = (
+                    self.service.files()
+                    .list(q=query, fields="nextPageToken, files(id, name)", pageToken=page_token)
+                    .execute()
+                )
+            files.extend(result.get("files", []))
+            page_token = result.get("nextPageToken")
+            if not page_token:
+                return files
 
+    def list(self) -> List[str]:
+        # name -> id, so download/delete after list() need no extra lookups
+        self._ids = {f["name"]: f["id"] for f in self._files()}
+        return sorted(self._ids, reverse=True)
+
+    def _file_id(self, name: str) -> str:
+        if name not in self._ids:
+            self.list()
+        if name not in self._ids:
+            raise FileNotFoundError(name)
+        return self._ids[name]
+
+    def download(self, name: str, dest_path: str) -> None:
+        from googleapiclient.http import MediaIoBaseDownload
+
+        request = self.service.files().get_media(fileId=self._file_id(name))
+        with io.FileIO(dest_path, "wb") as fh, metrics.track_external("google_drive", "files.get_media"):
+            downloader = MediaIoBaseDownload(fh, request, chunksize=self.chunk_size)
+            done = False
+            while not done:
+                _, done = downloader.next_chunk(num_retries=3)
+
+    def delete(self, name: str) -> None:
+        file_id = self._file_id(name)
+        with metrics.track_external("google_drive", "files.delete"):
+            self.service.files().delete(fileId=file_id).execute()
+        self._ids.pop(name, None)
+
+
+def get_backup_backend():
+    if settings.backup_backend == "local":
+        return LocalBackupBackend(settings.backup_local_dir)
+    return DriveBackupBackend(
+        settings.google_sheets_credentials_file,
+        folder_id=settings.backup_drive_folder_id,
+        chunk_mb=settings.backup_upload_chunk_mb,
+    )
+
+
+def prune_backups(backend, keep: int) -> int:
+    """Delete all but the newest `keep` snapshots."""
+    if keep <= 0:
+        return 0
+    pruned = 0
+    for name in backend.list()[keep:]:
+        try:
+            backend.delete(name)
+            pruned += 1
+        except Exception as e:
+            logger.warning(f"Failed to delete old backup {name}: {e}")
+    return pruned
+
+
+def _run_backup(db_path: str, backend) -> BackupResult:
+    start = time.perf_counter()
+    method = _compression()
+    name = f"{BACKUP_PREFIX}{datetime.now().strftime('%Y%m%d_%H%M%S')}{_EXTENSIONS[method]}"
+
+    with tempfile.TemporaryDirectory(prefix="easycamp_backup_") as tmp:
+        snapshot_path = os.path.join(tmp, "snapshot.db")
+        snapshot_bytes = create_snapshot(db_path, snapshot_path)
+        archive_path = os.path.join(tmp, name)
+        compressed_bytes = compress_file(snapshot_path, archive_path, method)
+        backend.upload(archive_path, name)
+
+    pruned = prune_backups(backend, settings.backup_retention_count)
+    return BackupResult(
+        name=name,
+        snapshot_bytes=snapshot_bytes,
+        compressed_bytes=compressed_bytes,
+        duration_seconds=round(time.perf_counter() - start, 3),
+        pruned=pruned,
+    )
+
+
+async def backup_database(backend=None, db_path: Optional[str] = None) -> Optional[BackupResult]:
+    """
+    Takes a consistent, compressed snapshot of the SQLite database and stores
+    it in the configured backend (Drive or a local directory).
+    """
+    logger.info("📦 Starting database backup...")
+
+    db_path = db_path or _backup_db_path()
+    if not os.path.exists(db_path):
+        logger.error(f"❌ Database file not found at {db_path}. Backup failed.")
+        return None
+
+    try:
+        backend = backend or get_backup_backend()
+        result = await asyncio.to_thread(_run_backup, db_path, backend)
     except Exception as e:
         logger.error(f"❌ Backup failed: {e}", exc_info=True)
+        return None
+
+    metrics.BACKUP_SIZE_BYTES.set("snapshot", value=result.snapshot_bytes)
+    metrics.BACKUP_SIZE_BYTES.set("compressed", value=result.compressed_bytes)
+    metrics.BACKUP_DURATION.set(value=result.duration_seconds)
+    logger.info(
+        f"✅ Backup {result.name} stored ({backend.name}): "
+        f"{result.snapshot_bytes} -> {result.compressed_bytes} bytes "
+        f"in {result.duration_seconds}s, pruned {result.pruned} old"
+    )
+    return result
+
+
+def _restore_latest(
+    db_path: str, backend, abandoned: Optional[threading.Event] = None
+) -> Optional[str]:
+    names = backend.list()
+    if not names:
+        return None
+    latest = names[0]
+    logger.info(f"🔄 Restoring latest backup: {latest}...")
 
+    os.makedirs(os.path.dirname(db_path) or ".", exist_ok=True)
+    with tempfile.TemporaryDirectory(prefix="easycamp_restore_") as tmp:
+        archive_path = os.path.join(tmp, latest)
+        backend.download(latest, archive_path)
+        restored_path = os.path.join(tmp, "restored.db")
+        decompress_file(archive_path, restored_path)
+        if abandoned is not None and abandoned.is_set():
+            # Startup gave up waiting and may already be using a fresh database
+            logger.warning(f"Restore of {latest} finished after the timeout - discarded")
+            return None
+        # Move into place only once the file is complete
+        shutil.move(restored_path, db_path)
+    return latest
 
-async def restore_latest_backup():
+
+async def restore_latest_backup(backend=None, timeout: Optional[float] = None):
     """
-    Checks Google Drive for the latest backup and restores it
+    Checks the backup backend for the latest backup and restores it
     ONLY if the local database is missing or empty (size 0).
+
+    Gives up after `timeout` seconds (BACKUP_RESTORE_TIMEOUT_SECONDS by
+    default, 0 - no limit) so a hanging backend cannot block startup; a
+    download that completes later is discarded.
     """
+    if timeout is None:
+        timeout = settings.backup_restore_timeout_seconds
     db_path = "easycamp.db"
     if "sqlite" in settings.database_url:
         parts = settings.database_url.split("///")
@@ -101,56 +374,22 @@ async def restore_latest_backup():
         )
         return
 
-    logger.info("📦 Database missing or empty. Searching for backup on Drive...")
+    logger.info("📦 Database missing or empty. Searching for backup...")
 
+    abandoned = threading.Event()
     try:
-        # Authenticate
-        scope = ["https://www.googleapis.com/auth/drive.readonly"]
-        creds = service_account.Credentials.from_service_account_file(
-            settings.google_sheets_credentials_file, scopes=scope
+        backend = backend or get_backup_backend()
+        restored = await asyncio.wait_for(
+            asyncio.to_thread(_restore_latest, db_path, backend, abandoned),
+            timeout=timeout or None,
         )
-        service = build("drive", "v3", credentials=creds)
-
-        # Search
-        query = "name contains 'easycamp_backup_' and mimeType = 'application/x-sqlite3' and trashed = false"
-        results = (
-            service.files()
-            .list(
-                q=query,
-                orderBy="createdTime desc",
-                pageSize=1,
-                fields="files(id, name, createdTime)",
-            )
-            .execute()
-        )
-        files = results.get("files", [])
-
-        if not files:
-            logger.warning("⚠️ No backups found on Google Drive.")
+        if restored is None:
+            logger.warning(f"⚠️ No backups found ({backend.name}).")
             return
-
-        latest = files[0]
-        logger.info(
-            f"🔄 Restoring latest backup: {latest['name']} (ID: {latest['id']})..."
-        )
-
-        # Download
-        request = service.files().get_media(fileId=latest["id"])
-
-        # Ensure dir exists
-        os.makedirs(os.path.dirname(db_path), exist_ok=True)
-
-        import io
-        from googleapiclient.http import MediaIoBaseDownload
-
-        with io.FileIO(db_path, "wb") as fh:
-            downloader = MediaIoBaseDownload(fh, request)
-            done = False
-            while done is False:
-                status, done = downloader.next_chunk()
-                # logger.info(f"Download {int(status.progress() * 100)}%.")
-
         logger.info("✅ Database restored successfully!")
 
+    except asyncio.TimeoutError:
+        abandoned.set()
+        logger.error(f"❌ Restore timed out after {timeout}s - starting without it")
     except Exception as e:
         logger.error(f"❌ Restore failed: {e}", exc_info=True)
@@ -1,8 +1,7 @@
 import logging
-import asyncio
 from datetime import datetime, date, timezone
 from typing import List, Optional
-from sqlalchemy import select, and_
+from sqlalchemy import select
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.database import AsyncSessionLocal
@@ -19,7 +18,11 @@ from app.models import (
 )
 from app.schemas.booking import BookingCreate, BookingUpdate
 from app.avito.schemas import AvitoBookingPayload
-from app.services.sheets_service import sheets_service
+from app.services.channel_push_queue import channel_push_queue
+from app.services.cleaning_sla_timers import sla_timers
+from app.services.occupancy_service import OccupancyService
+from app.services.outbox_service import OutboxService, PermanentOutboxError, outbox_worker
+from app.services.sheets_sync_coordinator import sheets_sync_coordinator
 
 logger = logging.getLogger(__name__)
 
@@ -99,19 +102,10 @@ class BookingService:
         Возвращает True если даты свободны.
         """
         try:
-            query = select(Booking).where(
-                Booking.house_id == house_id,
-                Booking.status != BookingStatus.CANCELLED,
-                and_(Booking.check_in < check_out, Booking.check_out > check_in),
+            # Индексный скан занятых ночей домика (house_day_occupancy)
+            conflict = await OccupancyService.first_conflict(
+                db, house_id, check_in, check_out, exclude_booking_id
             )
-
-            if exclude_booking_id:
-                query = query.where(Booking.id != exclude_booking_id)
-
-            # Only fetch first conflict, no need to load all
-            result = await db.execute(query.limit(1))
-            conflict = result.scalars().first()
-
             return conflict is None
 
         except Exception as e:
@@ -127,10 +121,7 @@ class BookingService:
         """
         try:
             # Находим занятые дома
-            busy_houses_query = select(Booking.house_id).where(
-                Booking.status != BookingStatus.CANCELLED,
-                and_(Booking.check_in < check_out, Booking.check_out > check_in),
-            )
+            busy_houses_query = OccupancyService.busy_house_ids(check_in, check_out)
 
             # Выбираем дома, которых нет в списке занятых
             query = select(House).where(House.id.not_in(busy_houses_query))
@@ -188,14 +179,16 @@ class BookingService:
             )
 
             db.add(booking)
+            await db.flush()
+
+            # Блокировка дат в Avito — через outbox, в той же транзакции
+            await OutboxService.enqueue_avito_block(db, booking)
             await db.commit()
             await db.refresh(booking)
+            outbox_worker.wake()
 
-            # Блокировка дат в Avito
-            await cls._block_avito_dates(booking)
-
-            # Фоновая синхронизация с GS (safe wrapper)
-            asyncio.create_task(cls._safe_background_sheets_sync())
+            # Фоновая синхронизация с GS (через координатор)
+            await cls._safe_background_sheets_sync()
 
             return booking
 
@@ -204,8 +197,14 @@ class BookingService:
             return None
 
     @staticmethod
-    async def _block_avito_dates(booking: Booking):
-        """Блокировка дат в Avito для брони"""
+    async def _block_avito_dates(booking: Booking) -> bool:
+        """Блокировка дат в Avito для брони.
+
+        Вызывается воркером outbox. False — временная ошибка, нужен повтор;
+        PermanentOutboxError — Avito отклонил запрос (4xx), повтор не поможет.
+        """
+        from app.services.avito_api_service import AvitoAPIError
+
         try:
             # Получаем маппинг house_id -> avito_item_id
             from app.core.config import settings
@@ -223,18 +222,23 @@ class BookingService:
                 logger.info(
                     f"No Avito item ID for house {booking.house_id}, skipping calendar block"
                 )
-                return
+                return True
 
             # Блокируем даты в Avito
             from app.services.avito_api_service import avito_api_service
 
-            success = await asyncio.to_thread(
-                avito_api_service.block_dates,
-                avito_item_id,
-                booking.check_in.isoformat(),
-                booking.check_out.isoformat(),
-                f"Бронь #{booking.id}: {booking.guest_name}",
-            )
+            try:
+                success = await avito_api_service.block_dates(
+                    avito_item_id,
+                    booking.check_in.isoformat(),
+                    booking.check_out.isoformat(),
+                    f"Бронь #{booking.id}: {booking.guest_name}",
+                    raise_permanent=True,
+                )
+            finally:
+                # Календарь изменён в обход очереди пушей — следующий пуш
+                # интервалов уйдёт без сверки хэша
+                await channel_push_queue.invalidate("avito", avito_item_id, "calendar")
 
             if success:
                 logger.info(f"✅ Avito dates blocked for booking #{booking.id}")
@@ -242,18 +246,25 @@ class BookingService:
                 logger.warning(
                     f"⚠️ Failed to block Avito dates for booking #{booking.id}"
                 )
+            return success
 
+        except AvitoAPIError as e:
+            raise PermanentOutboxError(f"Avito rejected block (status {e.status})") from e
         except Exception as e:
             logger.error(f"Error blocking Avito dates: {e}", exc_info=True)
-            # Не прерываем создание брони при ошибке Avito
+            return False
 
     @staticmethod
-    async def _unblock_avito_dates(booking: Booking):
+    async def _unblock_avito_dates(booking: Booking) -> bool:
         """Разблокировка дат в Avito при отмене/удалении брони.
         
         Для Авито-броней ничего не делаем — Авито сам управляет своими датами.
         Для ручных броней — обновляем интервалы доступности.
+        Вызывается воркером outbox. False — временная ошибка, нужен повтор;
+        PermanentOutboxError — Avito отклонил запрос (4xx), повтор не поможет.
         """
+        from app.services.avito_api_service import AvitoAPIError
+
         try:
             from app.models import BookingSource
             
@@ -263,7 +274,7 @@ class BookingService:
                     f"Booking #{booking.id} is from Avito — skipping unblock "
                     f"(Avito manages its own dates)"
                 )
-                return
+                return True
 
             # Получаем маппинг house_id -> avito_item_id
             from app.core.config import settings
@@ -281,16 +292,19 @@ class BookingService:
                     f"No Avito item ID for house {booking.house_id}, "
                     f"skipping calendar unblock"
                 )
-                return
+                return True
 
             from app.services.avito_api_service import avito_api_service
 
-            success = await asyncio.to_thread(
-                avito_api_service.unblock_dates,
-                avito_item_id,
-                booking.check_in.isoformat(),
-                booking.check_out.isoformat(),
-            )
+            try:
+                success = await avito_api_service.unblock_dates(
+                    avito_item_id,
+                    booking.check_in.isoformat(),
+                    booking.check_out.isoformat(),
+                    raise_permanent=True,
+                )
+            finally:
+                await channel_push_queue.invalidate("avito", avito_item_id, "calendar")
 
             if success:
                 logger.info(f"✅ Avito dates unblocked for booking #{booking.id}")
@@ -298,40 +312,23 @@ class BookingService:
                 logger.warning(
                     f"⚠️ Failed to unblock Avito dates for booking #{booking.id}"
                 )
+            return success
 
+        except AvitoAPIError as e:
+            raise PermanentOutboxError(f"Avito rejected unblock (status {e.status})") from e
         except Exception as e:
             logger.error(f"Error unblocking Avito dates: {e}", exc_info=True)
-            # Не прерываем отмену/удаление брони при ошибке Avito
-
-    @classmethod
-    async def sync_all_to_sheets(cls):
-        """
-        Синхронизация всех броней с Google Sheets.
-        Raises exception on failure (caller should handle).
-        """
-        async with AsyncSessionLocal() as session:
-            from sqlalchemy.orm import joinedload
-
-            stmt = (
-                select(Booking)
-                .options(joinedload(Booking.house))
-                .order_by(Booking.check_in)
-            )
-            result = await session.execute(stmt)
-            bookings = result.scalars().all()
-
-            # Выполняем синхронный gspread запрос в отдельном потоке
-            await asyncio.to_thread(sheets_service.sync_bookings_to_sheet, bookings)
-            logger.info("Google Sheets sync completed successfully.")
+            return False
 
     @classmethod
     async def _safe_background_sheets_sync(cls):
         """
         Safe wrapper for background sheets sync.
-        Catches and logs all errors to prevent task crashes.
+        Only notifies the sync coordinator (debounced, non-blocking);
+        errors are logged and never break the booking operation.
         """
         try:
-            await cls.sync_all_to_sheets()
+            sheets_sync_coordinator.request_sync("booking_change")
         except Exception as e:
             logger.error(f"Background sheets sync failed: {e}", exc_info=True)
 
@@ -372,19 +369,19 @@ class BookingService:
             # отмена брони и каскад были атомарны.
             cleaner_tg_id = await cls._cascade_cancel_cleaning(db, booking_id)
 
-            await db.commit()
-
-            # Разблокировка дат в Avito (вне транзакции, side-effect)
-            await cls._unblock_avito_dates(booking)
-
-            # Уведомление уборщицы (best-effort)
+            # Разблокировка дат в Avito и уведомление уборщицы — через outbox,
+            # атомарно с отменой; выполнит фоновый воркер с ретраями
+            await OutboxService.enqueue_avito_unblock(db, booking)
             if cleaner_tg_id:
-                asyncio.create_task(
-                    cls._notify_cleaner_about_cancel(cleaner_tg_id, booking_id)
+                await OutboxService.enqueue_cleaner_cancel_notice(
+                    db, cleaner_tg_id, booking_id
                 )
 
-            # Фоновая синхронизация (safe wrapper)
-            asyncio.create_task(cls._safe_background_sheets_sync())
+            await db.commit()
+            outbox_worker.wake()
+
+            # Фоновая синхронизация (через координатор)
+            await cls._safe_background_sheets_sync()
 
             return True
         except Exception as e:
@@ -417,6 +414,7 @@ class BookingService:
             if task.status not in terminal:
                 task.status = CleaningTaskStatus.CANCELLED
                 task.updated_at = now
+                sla_timers.cancel(task.id)
 
             # Откатываем начисления уборки (если были)
             ledger_q = await db.execute(
@@ -452,12 +450,12 @@ class BookingService:
             return None
 
     @staticmethod
-    async def _notify_cleaner_about_cancel(cleaner_tg_id: int, booking_id: int):
-        """Best-effort уведомление уборщицы об отмене связанной задачи."""
+    async def _notify_cleaner_about_cancel(cleaner_tg_id: int, booking_id: int) -> bool:
+        """Уведомление уборщицы об отмене связанной задачи (из outbox)."""
         from app.telegram.bot import bot
         from app.services.notification_service import send_safe
 
-        await send_safe(
+        return await send_safe(
             bot, cleaner_tg_id,
             f"ℹ️ Бронь #{booking_id} отменена — связанная уборка снята.",
             context=f"booking_cancel cleaner={cleaner_tg_id}",
@@ -480,17 +478,18 @@ class BookingService:
                 f"({booking.check_in} - {booking.check_out})"
             )
 
-            # Разблокируем даты в Avito перед удалением
-            await cls._unblock_avito_dates(booking)
+            # Разблокировка дат в Avito — через outbox (снимок брони в payload)
+            await OutboxService.enqueue_avito_unblock(db, booking)
 
             # Удаляем из базы
             await db.delete(booking)
             await db.commit()
+            outbox_worker.wake()
 
             logger.info(f"✅ Booking #{booking_id} deleted successfully")
 
-            # Фоновая синхронизация с Google Sheets (safe wrapper)
-            asyncio.create_task(cls._safe_background_sheets_sync())
+            # Фоновая синхронизация с Google Sheets (через координатор)
+            await cls._safe_background_sheets_sync()
 
             return True
         except Exception as e:
@@ -559,7 +558,7 @@ class BookingService:
             logger.info(f"✅ Booking #{booking_id} updated successfully")
 
             # Фоновая синхронизация
-            asyncio.create_task(cls._safe_background_sheets_sync())
+            await cls._safe_background_sheets_sync()
 
             return True
 
@@ -579,7 +578,6 @@ class BookingService:
             from app.services.avito_sync_service import map_avito_status
             from app.utils.validators import format_phone
             from decimal import Decimal
-            import asyncio
 
             avito_id = str(booking_payload.avito_booking_id)
 
@@ -631,7 +629,7 @@ class BookingService:
                 await db.refresh(existing)
 
                 # Sync to sheets
-                asyncio.create_task(BookingService._safe_background_sheets_sync())
+                await BookingService._safe_background_sheets_sync()
 
                 return existing
 
@@ -695,7 +693,7 @@ class BookingService:
                 await db.refresh(new_booking)
                 
                 # Sync to sheets
-                asyncio.create_task(BookingService._safe_background_sheets_sync())
+                await BookingService._safe_background_sheets_sync()
 
                 return new_booking
 
@@ -0,0 +1,236 @@
+"""
+Очередь пушей календарей и цен на площадки (channel manager).
+
+Каждый пуш адресован цели (platform, item_id, kind). Очередь:
+- хранит хэш последнего успешно отправленного payload по цели
+  (таблица channel_push_state) и пропускает пуш, если хэш не изменился;
+- склеивает изменения одной цели: пока пуш в полёте, новые запросы
+  перезаписывают ожидающий payload, и после завершения уходит только
+  последний — все ждавшие получают его результат;
+- разные цели пушатся независимо.
+
+После внешних изменений календаря в обход очереди (блокировка дат
+отдельной бронью) сохранённое состояние сбрасывается через invalidate().
+"""
+
+import asyncio
+import hashlib
+import json
+import logging
+from dataclasses import dataclass, field
+from datetime import date, datetime, timedelta
+from typing import Any, Awaitable, Callable, Dict, Iterable, List, Optional, Tuple
+
+from sqlalchemy import delete, select
+
+from app.models import ChannelPushState
+
+logger = logging.getLogger(__name__)
+
+PUSHED = "pushed"
+UNCHANGED = "unchanged"
+FAILED = "failed"
+
+Sender = Callable[[Any], Awaitable[bool]]
+_Key = Tuple[str, str, str]
+
+
+def payload_hash(payload: Any) -> str:
+    """Стабильный хэш payload (порядок ключей не важен)."""
+    raw = json.dumps(payload, sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+def collapse_price_ranges(prices: Iterable[dict]) -> List[dict]:
+    """
+    Свернуть подневные цены в диапазоны одинаковой цены.
+
+    [{"date": date, "price": 5000}, ...] ->
+    [{"date_from": "2026-03-10", "date_to": "2026-03-15", "price": 5000}, ...]
+    Диапазон прерывается на смене цены и на пропуске дня.
+    """
+    ranges: List[dict] = []
+    last_day: Optional[date] = None
+    for entry in sorted(prices, key=lambda e: e["date"]):
+        day = entry["date"]
+        if isinstance(day, str):
+            day = date.fromisoformat(day)
+        price = entry["price"]
+        if (
+            ranges
+            and ranges[-1]["price"] == price
+            and last_day is not None
+            and day == last_day + timedelta(days=1)
+        ):
+            ranges[-1]["date_to"] = day.isoformat()
+        else:
+            ranges.append({"date_from": day.isoformat(), "date_to": day.isoformat(), "price": price})
+        last_day = day
+    return ranges
+
+
+@dataclass
+class _Slot:
+    """Ожидающий пуш одной цели."""
+    payload: Any = None
+    sender: Optional[Sender] = None
+    force: bool = False
+    has_pending: bool = False
+    waiters: List[asyncio.Future] = field(default_factory=list)
+    runner: Optional[asyncio.Task] = None
+
+
+class ChannelPushQueue:
+    """Пуши на площадки с пропуском неизменившихся данных и склейкой."""
+
+    def __init__(self, session_factory=None):
+        self._session_factory = session_factory
+        self._slots: Dict[_Key, _Slot] = {}
+        self._hashes: Dict[_Key, str] = {}  # кэш channel_push_state
+
+        # Метрики
+        self.requests_total = 0
+        self.pushed_total = 0
+        self.unchanged_total = 0
+        self.failed_total = 0
+        self.coalesced_total = 0
+
+    @property
+    def session_factory(self):
+        if self._session_factory is None:
+            from app.database import AsyncSessionLocal
+
+            self._session_factory = AsyncSessionLocal
+        return self._session_factory
+
+    async def push(
+        self,
+        platform: str,
+        item_id: Any,
+        kind: str,
+        payload: Any,
+        sender: Sender,
+        *,
+        force: bool = False,
+    ) -> str:
+        """
+        Запросить пуш payload для цели. Вернуть PUSHED / UNCHANGED / FAILED
+        для прогона, который покрыл этот запрос.
+
+        Args:
+            sender: async callable(payload) -> bool, выполняющий сам запрос к API
+            force: отправить, даже если хэш не изменился
+        """
+        key = (platform, str(item_id), kind)
+        slot = self._slots.setdefault(key, _Slot())
+        self.requests_total += 1
+        if slot.has_pending:
+            # Ещё не отправленный payload перекрыт более свежим
+            self.coalesced_total += 1
+
+        future = asyncio.get_running_loop().create_future()
+        slot.payload = payload
+        slot.sender = sender
+        slot.force = slot.force or force
+        slot.has_pending = True
+        slot.waiters.append(future)
+
+        if slot.runner is None or slot.runner.done():
+            slot.runner = asyncio.get_running_loop().create_task(self._drain(key, slot))
+        return await future
+
+    async def _drain(self, key: _Key, slot: _Slot):
+        while slot.has_pending:
+            payload, sender, force, waiters = slot.payload, slot.sender, slot.force, slot.waiters
+            slot.payload, slot.sender, slot.force = None, None, False
+            slot.has_pending = False
+            slot.waiters = []
+
+            try:
+                result = await self._push_one(key, payload, sender, force)
+            except Exception as e:
+                logger.error(f"Channel push {key} failed: {e}", exc_info=True)
+                result = FAILED
+
+            for future in waiters:
+                if not future.done():
+                    future.set_result(result)
+
+    async def _push_one(self, key: _Key, payload: Any, sender: Sender, force: bool) -> str:
+        digest = payload_hash(payload)
+        if not force and digest == await self._stored_hash(key):
+            self.unchanged_total += 1
+            logger.debug(f"Channel push {key}: unchanged, skipped")
+            return UNCHANGED
+
+        if not await sender(payload):
+            self.failed_total += 1
+            return FAILED
+
+        await self._store_hash(key, digest)
+        self.pushed_total += 1
+        return PUSHED
+
+    async def _stored_hash(self, key: _Key) -> Optional[str]:
+        if key not in self._hashes:
+            platform, item_id, kind = key
+            async with self.session_factory() as session:
+                stored = await session.scalar(
+                    select(ChannelPushState.payload_hash).where(
+                        ChannelPushState.platform == platform,
+                        ChannelPushState.item_id == item_id,
+                        ChannelPushState.kind == kind,
+                    )
+                )
+            if stored is None:
+                return None
+            self._hashes[key] = stored
+        return self._hashes[key]
+
+    async def _store_hash(self, key: _Key, digest: str) -> None:
+        platform, item_id, kind = key
+        async with self.session_factory() as session:
+            state = await session.scalar(
+                select(ChannelPushState).where(
+                    ChannelPushState.platform == platform,
+                    ChannelPushState.item_id == item_id,
+                    ChannelPushState.kind == kind,
+                )
+            )
+            if state is None:
+                state = ChannelPushState(platform=platform, item_id=item_id, kind=kind)
+                session.add(state)
+            state.payload_hash = digest
+            state.pushed_at = datetime.utcnow()
+            await session.commit()
+        self._hashes[key] = digest
+
+    async def invalidate(self, platform: str, item_id: Any, kind: Optional[str] = None) -> None:
+        """Забыть отправленное состояние цели — следующий пуш уйдёт обязательно."""
+        item_id = str(item_id)
+        for key in [k for k in self._hashes if k[0] == platform and k[1] == item_id]:
+            if kind is None or key[2] == kind:
+                del self._hashes[key]
+
+        stmt = delete(ChannelPushState).where(
+            ChannelPushState.platform == platform,
+            ChannelPushState.item_id == item_id,
+        )
+        if kind is not None:
+            stmt = stmt.where(ChannelPushState.kind == kind)
+        async with self.session_factory() as session:
+            await session.execute(stmt)
+            await session.commit()
+
+    def stats(self) -> dict:
+        return {
+            "requests_total": self.requests_total,
+            "pushed_total": self.pushed_total,
+            "unchanged_total": self.unchanged_total,
+            "failed_total": self.failed_total,
+            "coalesced_total": self.coalesced_total,
+        }
+
+
+# Глобальный экземпляр
+channel_push_queue = ChannelPushQueue()
@@ -1,4 +1,5 @@
 """Event-based cleaner notifications."""
+import asyncio
 import logging
 from datetime import date, timedelta
 
@@ -45,8 +46,9 @@ async def notify_cleaners_new_booking(bot, booking) -> None:
         f"📌 Заезд {when}"
     )
 
-    for cleaner in cleaners:
-        await send_safe(bot, cleaner.telegram_id, text, context="notify_new_booking")
+    await asyncio.gather(
+        *(send_safe(bot, c.telegram_id, text, context="notify_new_booking") for c in cleaners)
+    )
 
 
 async def notify_cleaners_booking_cancelled(bot, booking) -> None:
@@ -67,5 +69,6 @@ async def notify_cleaners_booking_cancelled(bot, booking) -> None:
         f"👥 {booking.guests_count} чел."
     )
 
-    for cleaner in cleaners:
-        await send_safe(bot, cleaner.telegram_id, text, context="notify_cancelled")
+    await asyncio.gather(
+        *(send_safe(bot, c.telegram_id, text, context="notify_cancelled") for c in cleaners)
+    )
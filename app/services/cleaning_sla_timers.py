@@ -0,0 +1,136 @@
+"""
+Таймеры дедлайнов подтверждения задач уборки (SLA).
+
+CleaningTaskService ставит одноразовый таймер на confirm_deadline_at,
+когда задаче назначается дедлайн, и снимает его при любом переходе из
+PENDING. Сработавший таймер эскалирует задачу условным UPDATE (только если
+она всё ещё PENDING и дедлайн истёк), поэтому лишний или не снятый таймер
+безопасен, а между процессами эскалация не дублируется.
+
+Таймеры живут в памяти процесса: при старте они восстанавливаются из
+cleaning_tasks, а редкий проход run_cleaning_sla_monitor подбирает то,
+что таймеры пропустили (откат транзакции, запись из другого процесса).
+"""
+
+import asyncio
+import logging
+from datetime import datetime, timezone
+from typing import Awaitable, Callable, Dict, Iterable, Optional, Set
+
+from sqlalchemy import select
+
+from app.models import CleaningTask, CleaningTaskStatus
+
+logger = logging.getLogger(__name__)
+
+Escalate = Callable[[Iterable[int]], Awaitable[int]]
+
+
+def _as_utc(value: datetime) -> datetime:
+    # confirm_deadline_at хранится без таймзоны, в UTC
+    return value.replace(tzinfo=timezone.utc) if value.tzinfo is None else value
+
+
+class SlaDeadlineTimers:
+    """Одноразовые таймеры на confirm_deadline_at задач уборки"""
+
+    def __init__(
+        self,
+        escalate: Optional[Escalate] = None,
+        session_factory=None,
+        grace_seconds: float = 1.0,
+    ):
+        self._escalate = escalate
+        self._session_factory = session_factory
+        # Запас после дедлайна: UPDATE сравнивает с now(), а транзакция,
+        # назначившая дедлайн, успевает закоммититься
+        self.grace_seconds = grace_seconds
+        self._timers: Dict[int, asyncio.TimerHandle] = {}
+        self._running: Set[asyncio.Task] = set()
+
+        # Метрики
+        self.fired_total = 0
+        self.escalated_total = 0
+
+    @property
+    def session_factory(self):
+        if self._session_factory is None:
+            from app.database import AsyncSessionLocal
+
+            self._session_factory = AsyncSessionLocal
+        return self._session_factory
+
+    @property
+    def escalate(self) -> Escalate:
+        if self._escalate is None:
+            from app.jobs.cleaning_sla_monitor import escalate_overdue_tasks
+
+            self._escalate = escalate_overdue_tasks
+        return self._escalate
+
+    def schedule(self, task_id: Optional[int], deadline: Optional[datetime]) -> None:
+        """Поставить (или переставить) таймер задачи"""
+        if task_id is None or deadline is None:
+            return
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            return  # Вне event loop — подберёт проход run_cleaning_sla_monitor
+        self.cancel(task_id)
+        delay = (_as_utc(deadline) - datetime.now(timezone.utc)).total_seconds()
+        self._timers[task_id] = loop.call_later(
+            max(0.0, delay) + self.grace_seconds, self._fire, task_id
+        )
+
+    def cancel(self, task_id: Optional[int]) -> None:
+        handle = self._timers.pop(task_id, None)
+        if handle is not None:
+            handle.cancel()
+
+    def _fire(self, task_id: int):
+        self._timers.pop(task_id, None)
+        self.fired_total += 1
+        runner = asyncio.get_running_loop().create_task(self._run_escalation(task_id))
+        self._running.add(runner)
+        runner.add_done_callback(self._running.discard)
+
+    async def _run_escalation(self, task_id: int):
+        try:
+            self.escalated_total += await self.escalate([task_id])
+        except Exception as e:
+            logger.error(f"SLA escalation for task {task_id} failed: {e}", exc_info=True)
+
+    async def start(self) -> int:
+        """Восстановить таймеры PENDING-задач; просроченные сработают сразу"""
+        async with self.session_factory() as session:
+            rows = (
+                await session.execute(
+                    select(CleaningTask.id, CleaningTask.confirm_deadline_at).where(
+                        CleaningTask.status == CleaningTaskStatus.PENDING,
+                        CleaningTask.confirm_deadline_at.is_not(None),
+                    )
+                )
+            ).all()
+        for task_id, deadline in rows:
+            self.schedule(task_id, deadline)
+        if rows:
+            logger.info(f"Restored {len(rows)} cleaning SLA timers")
+        return len(rows)
+
+    async def stop(self):
+        for handle in self._timers.values():
+            handle.cancel()
+        self._timers.clear()
+        if self._running:
+            await asyncio.gather(*self._running, return_exceptions=True)
+
+    def stats(self) -> dict:
+        return {
+            "scheduled": len(self._timers),
+            "fired_total": self.fired_total,
+            "escalated_total": self.escalated_total,
+        }
+
+
+# Глобальный экземпляр
+sla_timers = SlaDeadlineTimers()
@@ -19,6 +19,7 @@ from app.models import (
     SupplyAlert,
     SupplyAlertStatus,
 )
+from app.services.cleaning_sla_timers import sla_timers
 
 logger = logging.getLogger(__name__)
 
@@ -83,6 +84,8 @@ class CleaningTaskService:
         )
         task = existing.scalar_one_or_none()
         if task:
+            if task.status == CleaningTaskStatus.PENDING:
+                sla_timers.schedule(task.id, task.confirm_deadline_at)
             return task
 
         task = CleaningTask(
@@ -98,6 +101,13 @@ class CleaningTaskService:
         await CleaningTaskService.ensure_default_checklist(db, task)
         return task
 
+    @staticmethod
+    def set_confirm_deadline(task: CleaningTask, deadline: datetime) -> None:
+        """Назначить дедлайн подтверждения и поставить таймер эскалации."""
+        task.confirm_deadline_at = deadline
+        if task.status == CleaningTaskStatus.PENDING:
+            sla_timers.schedule(task.id, deadline)
+
     @classmethod
     def can_transition(cls, current: CleaningTaskStatus, target: CleaningTaskStatus) -> bool:
         if current == target:
@@ -123,6 +133,8 @@ class CleaningTaskService:
         now = datetime.now(timezone.utc)
         task.status = target
         task.updated_at = now
+        if target != CleaningTaskStatus.PENDING:
+            sla_timers.cancel(task.id)
 
         if target == CleaningTaskStatus.ACCEPTED:
             task.accepted_at = now
@@ -1,3 +1,4 @@
+import asyncio
 import logging
 from dataclasses import dataclass
 from datetime import date, timedelta
@@ -9,7 +10,9 @@ from aiogram.types import InlineKeyboardMarkup
 
 from app.database import AsyncSessionLocal
 from app.models import Booking, BookingStatus, User, UserRole
-from app.telegram.bot import bot
+from app.telegram.bot import bot as shared_bot
+from app.services.telegram_dispatcher import Priority, telegram_dispatcher
+from app.utils.phone import phone_last10
 
 logger = logging.getLogger(__name__)
 
@@ -22,12 +25,25 @@ async def send_safe(
     reply_markup=None,
     *,
     context: str = "",
+    priority: Priority = Priority.NORMAL,
 ) -> bool:
     """Send a Telegram message with error handling and logging.
 
     Returns True on success, False on failure (never raises).
     Use this instead of bare bot.send_message so all failures are logged uniformly.
+    Messages for the shared bot go through telegram_dispatcher (rate limits,
+    RetryAfter, priorities); any other bot instance is called directly.
     """
+    if bot is None or bot is shared_bot:
+        return await telegram_dispatcher.send(
+            chat_id,
+            text,
+            parse_mode=parse_mode,
+            reply_markup=reply_markup,
+            priority=priority,
+            context=context,
+        )
+
     try:
         await bot.send_message(
             chat_id=chat_id,
@@ -128,7 +144,7 @@ class NotificationService:
             return
 
         # Для уборщиц обычно формируется ОДНА сводка по всем домам
-        count = 0
+        sends = []
         for cleaner in cleaners:
             try:
                 text = rule.message_func(bookings, cleaner)
@@ -137,89 +153,75 @@ class NotificationService:
                     if rule.keyboard_func
                     else None
                 )
-
-                await bot.send_message(
-                    chat_id=cleaner.telegram_id, text=text, reply_markup=keyboard
-                )
-                count += 1
             except Exception as e:
-                logger.error(f"Failed to notify cleaner {cleaner.telegram_id}: {e}")
+                logger.error(f"Failed to build message for cleaner {cleaner.telegram_id}: {e}")
+                continue
+            sends.append(
+                telegram_dispatcher.submit(
+                    cleaner.telegram_id,
+                    text,
+                    reply_markup=keyboard,
+                    priority=Priority.BULK,
+                    context=f"rule={rule.name} cleaner={cleaner.telegram_id}",
+                )
+            )
 
+        count = sum(1 for ok in await asyncio.gather(*sends) if ok)
         logger.info(f"Rule {rule.name}: Sent to {count} cleaners.")
 
     async def _notify_guests(
         self, session, bookings: List[Booking], rule: NotificationRule
     ):
         """Уведомление гостей (персонально каждому)"""
-        import re
+        # Ключ матчинга — последние 10 цифр телефона (как в phones_match).
+        # Гостей выбираем одним индексным запросом только по телефонам из броней.
+        booking_keys = {
+            booking.id: booking.guest_phone_last10 or phone_last10(booking.guest_phone)
+            for booking in bookings
+        }
+        keys = {k for k in booking_keys.values() if k}
+        if not keys:
+            logger.info(f"Rule {rule.name}: no guest phones to match.")
+            return
 
-        # Получаем всех гостей (чтобы найти telegram_id по телефону)
-        # Оптимизация: можно выбирать только тех, у кого есть телефон
-        users_query = select(User).where(User.role == UserRole.GUEST)
+        users_query = select(User).where(
+            User.role == UserRole.GUEST,
+            User.phone_last10.in_(keys),
+            User.telegram_id.is_not(None),
+        )
         result = await session.execute(users_query)
-        guest_users = result.scalars().all()
-
-        # Создаем мапу {clean_phone: user}
-        phone_user_map = {}
-        for u in guest_users:
-            if u.phone:
-                # Нормализуем телефон из User
-                p = re.sub(r"[\+\(\)\-\s]", "", u.phone)
-                if p.startswith("8"):
-                    p = "7" + p[1:]
-                phone_user_map[p] = u
-
-        count = 0
-        for booking in bookings:
-            # Нормализуем телефон из Booking
-            b_phone = re.sub(r"[\+\(\)\-\s]", "", booking.guest_phone)
-            if b_phone.startswith("8"):
-                b_phone = "7" + b_phone[1:]
-
-            # Попытка найти точное совпадение
-            # Или частичное? Guest phone from Avito might be virtual.
-            # Если это виртуальный номер, мы не сможем найти реального юзера, если он зашел под своим.
-            # Но если он логинился, он шарил контакт. Мы сохранили ЕГО контакт.
-            # Если в брони указан ТОТ ЖЕ номер, то найдем.
-
-            target_user = None
-            # 1. Пробуем точное
-            if b_phone in phone_user_map:
-                target_user = phone_user_map[b_phone]
-            else:
-                # 2. Пробуем найти "похожий" (вхождение)
-                for p, u in phone_user_map.items():
-                    if p in b_phone or b_phone in p:
-                        target_user = u
-                        break
-
-            if target_user:
-                try:
-                    text = rule.message_func([booking], target_user)
-                    keyboard = (
-                        rule.keyboard_func([booking], target_user)
-                        if rule.keyboard_func
-                        else None
-                    )
+        phone_user_map = {u.phone_last10: u for u in result.scalars().all()}
 
-                    await bot.send_message(
-                        chat_id=target_user.telegram_id,
-                        text=text,
-                        reply_markup=keyboard,
-                    )
-                    count += 1
-                    logger.info(
-                        f"Notified guest {target_user.name} ({target_user.telegram_id}) for booking {booking.id}"
-                    )
-                except Exception as e:
-                    logger.error(
-                        f"Failed to notify guest {target_user.telegram_id}: {e}"
-                    )
-            else:
+        sends = []
+        for booking in bookings:
+            target_user = phone_user_map.get(booking_keys[booking.id])
+            if not target_user:
                 logger.debug(
                     f"Guest user not found for booking {booking.id} (phone {booking.guest_phone})"
                 )
+                continue
 
+            try:
+                text = rule.message_func([booking], target_user)
+                keyboard = (
+                    rule.keyboard_func([booking], target_user)
+                    if rule.keyboard_func
+                    else None
+                )
+            except Exception as e:
+                logger.error(f"Failed to build message for guest {target_user.telegram_id}: {e}")
+                continue
+            sends.append(
+                telegram_dispatcher.submit(
+                    target_user.telegram_id,
+                    text,
+                    reply_markup=keyboard,
+                    priority=Priority.BULK,
+                    context=f"rule={rule.name} guest={target_user.telegram_id} booking={booking.id}",
+                )
+            )
+
+        count = sum(1 for ok in await asyncio.gather(*sends) if ok)
         logger.info(f"Rule {rule.name}: Sent to {count} guests.")
 
     async def _notify_admins(
@@ -238,22 +240,20 @@ class NotificationService:
         # Если нужно по каждой, нужно менять message_func.
         # Предполагаем сводку.
 
-        count = 0
-        for admin_id in admin_ids:
-            try:
-                text = rule.message_func(
-                    bookings, None
-                )  # None = нет персонализации получателя
-                keyboard = (
-                    rule.keyboard_func(bookings, None) if rule.keyboard_func else None
-                )
+        try:
+            text = rule.message_func(bookings, None)  # None = нет персонализации получателя
+            keyboard = rule.keyboard_func(bookings, None) if rule.keyboard_func else None
+        except Exception as e:
+            logger.error(f"Failed to build admin message for rule {rule.name}: {e}")
+            return
 
-                await bot.send_message(
-                    chat_id=admin_id, text=text, reply_markup=keyboard
-                )
-                count += 1
-            except Exception as e:
-                logger.error(f"Failed to notify admin {admin_id}: {e}")
+        count = await telegram_dispatcher.send_many(
+            admin_ids,
+            text,
+            reply_markup=keyboard,
+            priority=Priority.BULK,
+            context=f"rule={rule.name} admins",
+        )
         logger.info(f"Rule {rule.name}: Sent to {count} admins.")
 
 
@@ -0,0 +1,153 @@
+"""
+Занятость домиков по дням (таблица house_day_occupancy).
+
+Строки пишутся в транзакции брони ORM-хуком в app.models, поэтому
+проверки свободных дат и календари — индексный скан по
+(house_id, day) без пересечения диапазонов броней.
+
+rebuild() пересчитывает таблицу из bookings, check() сверяет её с
+ними (scripts/occupancy.py rebuild|check).
+"""
+
+import logging
+from datetime import date
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+from sqlalchemy import delete, insert, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.models import Booking, BookingStatus, HouseDayOccupancy, booking_occupancy_rows
+
+logger = logging.getLogger(__name__)
+
+
+class OccupancyService:
+    """Запросы к материализованной занятости и её обслуживание."""
+
+    @staticmethod
+    async def first_conflict(
+        db: AsyncSession,
+        house_id: int,
+        check_in: date,
+        check_out: date,
+        exclude_booking_id: Optional[int] = None,
+    ) -> Optional[int]:
+        """ID брони, занимающей хотя бы одну ночь [check_in, check_out), или None."""
+        stmt = select(HouseDayOccupancy.booking_id).where(
+            HouseDayOccupancy.house_id == house_id,
+            HouseDayOccupancy.day >= check_in,
+            HouseDayOccupancy.day < check_out,
+        )
+        if exclude_booking_id:
+            stmt = stmt.where(HouseDayOccupancy.booking_id != exclude_booking_id)
+        return await db.scalar(stmt.limit(1))
+
+    @staticmethod
+    def busy_house_ids(check_in: date, check_out: date):
+        """Подзапрос ID домиков, занятых хотя бы одну ночь периода."""
+        return (
+            select(HouseDayOccupancy.house_id)
+            .where(HouseDayOccupancy.day >= check_in, HouseDayOccupancy.day < check_out)
+            .distinct()
+        )
+
+    @staticmethod
+    async def busy_days(
+        db: AsyncSession,
+        house_ids: Iterable[int],
+        date_from: date,
+        date_to: date,
+    ) -> Set[Tuple[int, date]]:
+        """Занятые пары (домик, дата) в окне [date_from, date_to)."""
+        result = await db.execute(
+            select(HouseDayOccupancy.house_id, HouseDayOccupancy.day)
+            .where(
+                HouseDayOccupancy.house_id.in_(list(house_ids)),
+                HouseDayOccupancy.day >= date_from,
+                HouseDayOccupancy.day < date_to,
+            )
+            .distinct()
+        )
+        return {(house_id, day) for house_id, day in result.all()}
+
+    @staticmethod
+    async def availability(
+        db: AsyncSession,
+        house_ids: Iterable[int],
+        date_from: date,
+        date_to: date,
+    ) -> Dict[int, List[bool]]:
+        """Маска свободных дней окна [date_from, date_to) по каждому домику."""
+        house_ids = list(house_ids)
+        days = max((date_to - date_from).days, 0)
+        masks = {house_id: [True] * days for house_id in house_ids}
+        if not house_ids or not days:
+            return masks
+        for house_id, day in await OccupancyService.busy_days(db, house_ids, date_from, date_to):
+            masks[house_id][(day - date_from).days] = False
+        return masks
+
+    @staticmethod
+    async def _expected_rows(db: AsyncSession, house_id: Optional[int] = None) -> List[dict]:
+        stmt = select(
+            Booking.id, Booking.house_id, Booking.check_in, Booking.check_out, Booking.status
+        ).where(Booking.status != BookingStatus.CANCELLED)
+        if house_id is not None:
+            stmt = stmt.where(Booking.house_id == house_id)
+        rows: List[dict] = []
+        for booking_id, b_house_id, check_in, check_out, status in (await db.execute(stmt)).all():
+            rows.extend(booking_occupancy_rows(booking_id, b_house_id, check_in, check_out, status))
+        return rows
+
+    @staticmethod
+    async def rebuild(db: AsyncSession, house_id: Optional[int] = None) -> int:
+        """Пересчитать занятость из bookings (всю или одного домика). Вернуть число строк."""
+        rows = await OccupancyService._expected_rows(db, house_id)
+        stmt = delete(HouseDayOccupancy)
+        if house_id is not None:
+            stmt = stmt.where(HouseDayOccupancy.house_id == house_id)
+        await db.execute(stmt)
+        if rows:
+            await db.execute(insert(HouseDayOccupancy), rows)
+        await db.commit()
+        logger.info(f"Occupancy rebuilt: {len(rows)} rows (house_id={house_id})")
+        return len(rows)
+
+    @staticmethod
+    async def ensure_populated(db: AsyncSession) -> int:
+        """
+        Заполнить пустую таблицу из bookings, если есть живые брони.
+
+        init_db() (create_all) на существующей базе создаёт таблицу пустой —
+        без этого все старые брони выглядели бы свободными датами.
+        Возвращает число записанных строк (0, если заполнять не нужно).
+        """
+        if await db.scalar(select(HouseDayOccupancy.house_id).limit(1)) is not None:
+            return 0
+        live = await db.scalar(
+            select(Booking.id).where(Booking.status != BookingStatus.CANCELLED).limit(1)
+        )
+        if live is None:
+            return 0
+        logger.warning("house_day_occupancy is empty while live bookings exist, rebuilding")
+        return await OccupancyService.rebuild(db)
+
+    @staticmethod
+    async def check(db: AsyncSession) -> dict:
+        """
+        Сверить house_day_occupancy с bookings.
+
+        Returns:
+            {"ok": bool, "missing": [...], "extra": [...]} — строки
+            (house_id, day, booking_id), которых не хватает / которые лишние.
+        """
+        expected = {
+            (r["house_id"], r["day"], r["booking_id"]) for r in await OccupancyService._expected_rows(db)
+        }
+        result = await db.execute(
+            select(HouseDayOccupancy.house_id, HouseDayOccupancy.day, HouseDayOccupancy.booking_id)
+        )
+        actual = {tuple(row) for row in result.all()}
+        missing = sorted(expected - actual)
+        extra = sorted(actual - expected)
+        return {"ok": not missing and not extra, "missing": missing, "extra": extra}
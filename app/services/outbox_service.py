@@ -0,0 +1,379 @@
+"""
+Transactional outbox для побочных эффектов броней.
+
+BookingService не ходит во внешние API внутри запроса: блокировка/разблокировка
+дат в Avito и уведомление уборщицы записываются строкой в outbox_events
+в той же транзакции, что и изменение брони. Фоновый воркер:
+- выбирает готовые события (status=pending, next_attempt_at <= now);
+- склеивает события одной цели (target_key) — выполняется только последнее,
+  предыдущие помечаются SUPERSEDED (бронь создали и сразу отменили —
+  в Avito уйдёт только разблокировка);
+- при ошибке повторяет с экспоненциальным бэкоффом, после
+  OUTBOX_MAX_ATTEMPTS помечает FAILED; PermanentOutboxError (4xx Avito
+  и т.п.) — сразу FAILED, без повторов;
+- idempotency_key не даёт поставить одно и то же событие дважды
+  (повторная отмена, удаление уже отменённой брони).
+
+Переживает рестарт: всё, что не выполнено, остаётся в таблице.
+"""
+
+import asyncio
+import json
+import logging
+import time
+from datetime import date, datetime, timedelta
+from types import SimpleNamespace
+from typing import Awaitable, Callable, Dict, Optional
+
+from sqlalchemy import delete, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.config import settings
+from app.models import Booking, BookingSource, OutboxEvent, OutboxStatus
+
+logger = logging.getLogger(__name__)
+
+KIND_AVITO_BLOCK = "avito_block"
+KIND_AVITO_UNBLOCK = "avito_unblock"
+KIND_CLEANER_CANCEL_NOTICE = "cleaner_cancel_notice"
+
+# Выполненные события храним неделю — для разбора и дедупликации
+PROCESSED_RETENTION = timedelta(days=7)
+
+
+class PermanentOutboxError(Exception):
+    """Повтор не поможет (например, 4xx от Avito) — событие сразу FAILED."""
+
+
+def _booking_snapshot(booking: Booking) -> dict:
+    """Данные брони, нужные обработчику (бронь к тому моменту может быть удалена)."""
+    return {
+        "booking_id": booking.id,
+        "house_id": booking.house_id,
+        "guest_name": booking.guest_name,
+        "source": booking.source.value if booking.source else BookingSource.DIRECT.value,
+        "check_in": booking.check_in.isoformat(),
+        "check_out": booking.check_out.isoformat(),
+    }
+
+
+def _booking_from_payload(payload: dict) -> SimpleNamespace:
+    return SimpleNamespace(
+        id=payload["booking_id"],
+        house_id=payload["house_id"],
+        guest_name=payload["guest_name"],
+        source=BookingSource(payload["source"]),
+        check_in=date.fromisoformat(payload["check_in"]),
+        check_out=date.fromisoformat(payload["check_out"]),
+    )
+
+
+async def _handle_avito_block(payload: dict) -> bool:
+    from app.services.booking_service import BookingService
+
+    return await BookingService._block_avito_dates(_booking_from_payload(payload))
+
+
+async def _handle_avito_unblock(payload: dict) -> bool:
+    from app.services.booking_service import BookingService
+
+    return await BookingService._unblock_avito_dates(_booking_from_payload(payload))
+
+
+async def _handle_cleaner_cancel_notice(payload: dict) -> bool:
+    from app.services.booking_service import BookingService
+
+    return await BookingService._notify_cleaner_about_cancel(
+        payload["cleaner_tg_id"], payload["booking_id"]
+    )
+
+
+# kind -> обработчик(payload) -> True (готово) / False (повторить);
+# PermanentOutboxError — не повторять
+HANDLERS: Dict[str, Callable[[dict], Awaitable[bool]]] = {
+    KIND_AVITO_BLOCK: _handle_avito_block,
+    KIND_AVITO_UNBLOCK: _handle_avito_unblock,
+    KIND_CLEANER_CANCEL_NOTICE: _handle_cleaner_cancel_notice,
+}
+
+
+class OutboxService:
+    """Постановка событий в outbox (внутри транзакции вызывающего)."""
+
+    @staticmethod
+    async def enqueue(
+        db: AsyncSession,
+        kind: str,
+        payload: dict,
+        *,
+        target_key: str,
+        idempotency_key: str,
+    ) -> OutboxEvent:
+        """
+        Добавить событие в текущую сессию (без commit).
+        Если событие с таким idempotency_key уже есть — вернуть его.
+        """
+        existing = await db.scalar(
+            select(OutboxEvent).where(OutboxEvent.idempotency_key == idempotency_key)
+        )
+        if existing is not None:
+            return existing
+
+        now = datetime.utcnow()
+        event = OutboxEvent(
+            kind=kind,
+            target_key=target_key,
+            idempotency_key=idempotency_key,
+            payload_json=json.dumps(payload, ensure_ascii=False),
+            status=OutboxStatus.PENDING,
+            attempts=0,
+            next_attempt_at=now,
+            created_at=now,
+        )
+        db.add(event)
+        return event
+
+    @classmethod
+    async def enqueue_avito_block(cls, db: AsyncSession, booking: Booking) -> OutboxEvent:
+        key = f"{booking.id}:{booking.check_in}:{booking.check_out}"
+        return await cls.enqueue(
+            db,
+            KIND_AVITO_BLOCK,
+            _booking_snapshot(booking),
+            target_key=f"avito_calendar:booking:{booking.id}",
+            idempotency_key=f"{KIND_AVITO_BLOCK}:{key}",
+        )
+
+    @classmethod
+    async def enqueue_avito_unblock(cls, db: AsyncSession, booking: Booking) -> OutboxEvent:
+        key = f"{booking.id}:{booking.check_in}:{booking.check_out}"
+        return await cls.enqueue(
+            db,
+            KIND_AVITO_UNBLOCK,
+            _booking_snapshot(booking),
+            target_key=f"avito_calendar:booking:{booking.id}",
+            idempotency_key=f"{KIND_AVITO_UNBLOCK}:{key}",
+        )
+
+    @classmethod
+    async def enqueue_cleaner_cancel_notice(
+        cls, db: AsyncSession, cleaner_tg_id: int, booking_id: int
+    ) -> OutboxEvent:
+        key = f"{KIND_CLEANER_CANCEL_NOTICE}:{booking_id}:{cleaner_tg_id}"
+        return await cls.enqueue(
+            db,
+            KIND_CLEANER_CANCEL_NOTICE,
+            {"cleaner_tg_id": cleaner_tg_id, "booking_id": booking_id},
+            target_key=key,
+            idempotency_key=key,
+        )
+
+
+class OutboxWorker:
+    """Фоновый воркер, выполняющий события outbox."""
+
+    def __init__(
+        self,
+        session_factory=None,
+        handlers: Optional[Dict[str, Callable[[dict], Awaitable[bool]]]] = None,
+        poll_interval: Optional[float] = None,
+    ):
+        self._session_factory = session_factory
+        self.handlers = HANDLERS if handlers is None else handlers
+        self.poll_interval = (
+            settings.outbox_poll_interval_seconds if poll_interval is None else poll_interval
+        )
+
+        self._runner: Optional[asyncio.Task] = None
+        self._wakeup: Optional[asyncio.Event] = None
+        self._lock = asyncio.Lock()
+        self._last_purge = 0.0
+
+        # Метрики
+        self.processed_total = 0
+        self.retried_total = 0
+        self.failed_total = 0
+        self.superseded_total = 0
+        self.last_batch_size = 0
+
+    @property
+    def session_factory(self):
+        if self._session_factory is None:
+            from app.database import AsyncSessionLocal
+
+            self._session_factory = AsyncSessionLocal
+        return self._session_factory
+
+    def _backoff(self, attempts: int) -> timedelta:
+        seconds = settings.outbox_retry_base_seconds * 2 ** max(attempts - 1, 0)
+        return timedelta(seconds=min(seconds, settings.outbox_retry_max_seconds))
+
+    async def _run_event(self, event_id: int, kind: str, payload_json: str):
+        """Выполнить событие. Вернуть (ok, error, permanent)."""
+        handler = self.handlers.get(kind)
+        if handler is None:
+            return False, f"no handler for kind {kind!r}", True
+        try:
+            ok = await handler(json.loads(payload_json))
+            return bool(ok), None if ok else "handler returned False", False
+        except PermanentOutboxError as e:
+            logger.error(f"Outbox event #{event_id} ({kind}) failed permanently: {e}")
+            return False, str(e)[:500], True
+        except Exception as e:
+            logger.error(f"Outbox event #{event_id} ({kind}) failed: {e}", exc_info=True)
+            return False, str(e)[:500], False
+
+    async def run_once(self) -> int:
+        """Обработать одну пачку готовых событий. Вернуть число взятых в работу."""
+        async with self._lock:
+            return await self._run_once()
+
+    async def _run_once(self) -> int:
+        now = datetime.utcnow()
+        async with self.session_factory() as session:
+            due = (
+                await session.execute(
+                    select(OutboxEvent.target_key)
+                    .where(
+                        OutboxEvent.status == OutboxStatus.PENDING,
+                        OutboxEvent.next_attempt_at <= now,
+                    )
+                    .order_by(OutboxEvent.id)
+                    .limit(settings.outbox_batch_size)
+                )
+            ).scalars().all()
+            if not due:
+                return 0
+
+            # Все ожидающие события этих целей (в т.ч. ещё не созревшие),
+            # чтобы склейка видела самое свежее состояние цели
+            pending = (
+                await session.execute(
+                    select(OutboxEvent)
+                    .where(
+                        OutboxEvent.status == OutboxStatus.PENDING,
+                        OutboxEvent.target_key.in_(set(due)),
+                    )
+                    .order_by(OutboxEvent.id)
+                )
+            ).scalars().all()
+
+            latest: Dict[str, OutboxEvent] = {}
+            for event in pending:
+                previous = latest.get(event.target_key)
+                if previous is not None:
+                    previous.status = OutboxStatus.SUPERSEDED
+                    previous.processed_at = now
+                    previous.last_error = f"superseded by #{event.id}"
+                    self.superseded_total += 1
+                latest[event.target_key] = event
+
+            batch = [
+                (event.id, event.kind, event.payload_json)
+                for event in latest.values()
+                if event.next_attempt_at <= now
+            ]
+            await session.commit()
+
+        # Внешние вызовы — вне сессии БД, цели независимы друг от друга
+        results = await asyncio.gather(*(self._run_event(*item) for item in batch))
+
+        finished = datetime.utcnow()
+        async with self.session_factory() as session:
+            for (event_id, kind, _payload), (ok, error, permanent) in zip(batch, results):
+                event = await session.get(OutboxEvent, event_id)
+                if event is None:
+                    continue
+                if ok:
+                    event.status = OutboxStatus.DONE
+                    event.processed_at = finished
+                    event.last_error = None
+                    self.processed_total += 1
+                    continue
+
+                event.attempts += 1
+                event.last_error = error
+                if permanent or event.attempts >= settings.outbox_max_attempts:
+                    event.status = OutboxStatus.FAILED
+                    event.processed_at = finished
+                    self.failed_total += 1
+                    logger.error(
+                        f"❌ Outbox event #{event_id} ({kind}) gave up after "
+                        f"{event.attempts} attempts: {error}"
+                    )
+                else:
+                    event.next_attempt_at = finished + self._backoff(event.attempts)
+                    self.retried_total += 1
+            await session.commit()
+
+        self.last_batch_size = len(batch)
+        return len(batch)
+
+    async def purge_processed(self, older_than: timedelta = PROCESSED_RETENTION) -> int:
+        """Удалить давно выполненные/склеенные события."""
+        cutoff = datetime.utcnow() - older_than
+        async with self.session_factory() as session:
+            result = await session.execute(
+                delete(OutboxEvent).where(
+                    OutboxEvent.status.in_([OutboxStatus.DONE, OutboxStatus.SUPERSEDED]),
+                    OutboxEvent.processed_at < cutoff,
+                )
+            )
+            await session.commit()
+            return result.rowcount or 0
+
+    async def _run(self):
+        while True:
+            try:
+                taken = await self.run_once()
+                if time.monotonic() - self._last_purge > 3600:
+                    self._last_purge = time.monotonic()
+                    await self.purge_processed()
+            except Exception as e:
+                taken = 0
+                logger.error(f"Outbox worker iteration failed: {e}", exc_info=True)
+
+            if taken >= settings.outbox_batch_size:
+                continue  # очередь не пуста — берём следующую пачку сразу
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=self.poll_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+
+    def start(self):
+        if self._runner is not None and not self._runner.done():
+            return
+        self._wakeup = asyncio.Event()
+        self._runner = asyncio.get_running_loop().create_task(self._run())
+        logger.info("✅ Outbox worker started")
+
+    def wake(self):
+        """Разбудить воркер после commit (без воркера — no-op)."""
+        if self._wakeup is not None:
+            self._wakeup.set()
+
+    async def stop(self):
+        if self._runner is None:
+            return
+        self._runner.cancel()
+        try:
+            await self._runner
+        except asyncio.CancelledError:
+            pass
+        self._runner = None
+        self._wakeup = None
+
+    def stats(self) -> dict:
+        return {
+            "running": self._runner is not None and not self._runner.done(),
+            "processed_total": self.processed_total,
+            "retried_total": self.retried_total,
+            "failed_total": self.failed_total,
+            "superseded_total": self.superseded_total,
+            "last_batch_size": self.last_batch_size,
+        }
+
+
+# Глобальный экземпляр
+outbox_worker = OutboxWorker()
@@ -7,10 +7,12 @@
 - Ostrovok     → зарегистрировать в PLATFORMS
 
 Как добавить новую площадку:
-    1. Создать async def sync_<platform>(db, house_id, days_forward) -> SyncResult
+    1. Создать async def sync_<platform>(db, house_id, days_forward, force) -> SyncResult
+       (пуш через channel_push_queue — неизменившиеся цены не отправляются)
     2. Добавить в PLATFORMS словарь ниже
     3. Задать env-флаг ENABLE_<PLATFORM>_PRICE_SYNC в config.py
 """
+import asyncio
 import logging
 from dataclasses import dataclass, field
 from datetime import datetime, timezone
@@ -29,7 +31,7 @@ _LAST_SYNC_KEY = "price_sync_last_at"
 @dataclass
 class SyncResult:
     platform: str
-    synced: list = field(default_factory=list)   # [{house, item_id, days}]
+    synced: list = field(default_factory=list)   # [{house, item_id, days, unchanged}]
     errors: list = field(default_factory=list)    # [str]
     skipped: bool = False                          # площадка не сконфигурирована
 
@@ -38,13 +40,17 @@ class SyncResult:
         return bool(self.synced) and not self.errors
 
 
-async def _sync_avito(db: AsyncSession, house_id: Optional[int], days_forward: int) -> SyncResult:
+async def _sync_avito(
+    db: AsyncSession, house_id: Optional[int], days_forward: int, force: bool = False
+) -> SyncResult:
     """Делегирует в avito_price_service."""
     if not settings.enable_avito_price_sync:
         return SyncResult(platform="avito", skipped=True)
 
     from app.services.avito_price_service import sync_prices_to_avito
-    raw = await sync_prices_to_avito(db, house_id=house_id, days_forward=days_forward)
+    raw = await sync_prices_to_avito(
+        db, house_id=house_id, days_forward=days_forward, force=force
+    )
     return SyncResult(
         platform="avito",
         synced=raw.get("synced", []),
@@ -52,7 +58,9 @@ async def _sync_avito(db: AsyncSession, house_id: Optional[int], days_forward: i
     )
 
 
-async def _sync_yandex_travel(db: AsyncSession, house_id: Optional[int], days_forward: int) -> SyncResult:
+async def _sync_yandex_travel(
+    db: AsyncSession, house_id: Optional[int], days_forward: int, force: bool = False
+) -> SyncResult:
     """Синхронизация цен на Яндекс Путешествия."""
     if not settings.enable_yandex_travel_price_sync:
         return SyncResult(platform="yandex_travel", skipped=True)
@@ -60,6 +68,7 @@ async def _sync_yandex_travel(db: AsyncSession, house_id: Optional[int], days_fo
         return SyncResult(platform="yandex_travel", skipped=True)
 
     from app.services.yandex_travel_api_service import yandex_travel_api_service
+    from app.services.channel_push_queue import FAILED, UNCHANGED, channel_push_queue
     from app.services.pricing_service import PricingService
     from app.models import House
     from sqlalchemy import select
@@ -92,17 +101,30 @@ async def _sync_yandex_travel(db: AsyncSession, house_id: Optional[int], days_fo
         if house.id not in hotel_room_mapping:
             continue
         hotel_id, room_id = hotel_room_mapping[house.id]
-        price_entries = []
-        for i in range(days_forward):
-            target_date = today + timedelta(days=i)
-            info = await PricingService.get_price_for_date(db, house.id, target_date)
-            price_entries.append({
-                "date": target_date.isoformat(),
-                "price": info["final_price"],
+        prices = await PricingService.get_price_range(
+            db, house.id, today, today + timedelta(days=days_forward)
+        )
+        price_entries = [
+            {"date": info["date"].isoformat(), "price": info["final_price"]}
+            for info in prices
+        ]
+        # Формат диапазонов у YaTr не подтверждён — шлём подневно,
+        # но неизменившийся прайс не отправляем
+        outcome = await channel_push_queue.push(
+            "yandex_travel",
+            f"{hotel_id}/{room_id}",
+            "prices",
+            price_entries,
+            lambda payload, h=hotel_id, r=room_id: asyncio.to_thread(
+                yandex_travel_api_service.update_prices, h, r, payload
+            ),
+            force=force,
+        )
+        if outcome != FAILED:
+            synced.append({
+                "house": house.name, "hotel_id": hotel_id, "room_id": room_id,
+                "days": days_forward, "unchanged": outcome == UNCHANGED,
             })
-        ok = yandex_travel_api_service.update_prices(hotel_id, room_id, price_entries)
-        if ok:
-            synced.append({"house": house.name, "hotel_id": hotel_id, "room_id": room_id, "days": days_forward})
         else:
             errors.append(f"{house.name}: price update failed")
 
@@ -122,15 +144,17 @@ async def sync_all_platforms(
     db: AsyncSession,
     house_id: Optional[int] = None,
     days_forward: int = 90,
+    force: bool = False,
 ) -> list[SyncResult]:
     """
     Синхронизирует цены на все зарегистрированные площадки.
+    force=True — отправить и неизменившиеся цены (ручной синк по кнопке).
     Возвращает список SyncResult — по одному на платформу.
     """
     results: list[SyncResult] = []
     for name, fn in _PLATFORMS.items():
         try:
-            result = await fn(db, house_id, days_forward)
+            result = await fn(db, house_id, days_forward, force)
             results.append(result)
             if result.skipped:
                 logger.debug("Platform %s: skipped (not configured)", name)
@@ -175,7 +199,9 @@ def format_sync_results(results: list[SyncResult]) -> str:
         elif r.ok:
             total_days = sum(s.get("days", 0) for s in r.synced)
             houses = ", ".join(s["house"] for s in r.synced)
-            lines.append(f"✅ {r.platform.capitalize()}: {houses} ({total_days} дн.)")
+            unchanged = sum(1 for s in r.synced if s.get("unchanged"))
+            suffix = f", без изменений: {unchanged}" if unchanged else ""
+            lines.append(f"✅ {r.platform.capitalize()}: {houses} ({total_days} дн.{suffix})")
         else:
             lines.append(f"❌ {r.platform.capitalize()}: {'; '.join(r.errors)}")
     return "\n".join(lines) if lines else "Нет настроенных площадок"
@@ -4,7 +4,8 @@ from decimal import Decimal
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import select, and_, delete
 
-from app.models import House, HousePrice, HouseDiscount, Booking, BookingStatus
+from app.models import House, HousePrice, HouseDiscount
+from app.services.occupancy_service import OccupancyService
 
 
 class PricingService:
@@ -19,64 +20,191 @@ class PricingService:
         Приоритет: сезонная цена > base_price.
         Поверх — скидка (если есть).
         """
+        days = await PricingService.get_price_range(
+            db, house_id, target_date, target_date + timedelta(days=1)
+        )
+        if not days:
+            return {"price": 0, "discount": 0, "final_price": 0, "label": None}
+        return days[0]
+
+    @staticmethod
+    async def get_price_range(
+        db: AsyncSession, house_id: int, date_from: date, date_to: date
+    ) -> list[dict]:
+        """
+        Цены по дням на полуинтервал [date_from, date_to).
+
+        Сезонные цены и активные скидки грузятся одним запросом каждая,
+        дальше все ночи считаются в памяти — количество запросов не зависит
+        от длины периода. Формат элементов тот же, что у get_price_for_date,
+        плюс ключ "date".
+        """
+        if date_to <= date_from:
+            return []
+
         house = await db.get(House, house_id)
         if not house:
-            return {"price": 0, "discount": 0, "final_price": 0, "label": None}
+            return []
 
-        # 1. Ищем сезонную цену
-        stmt = select(HousePrice).where(
-            and_(
-                HousePrice.house_id == house_id,
-                HousePrice.date_from <= target_date,
-                HousePrice.date_to >= target_date,
+        last_day = date_to - timedelta(days=1)
+        seasonal = await PricingService._load_seasonal_prices(
+            db, date_from, last_day, house_id=house_id
+        )
+        discounts = await PricingService._load_active_discounts(
+            db, date_from, last_day, house_id=house_id
+        )
+        return PricingService.resolve_price_range(
+            house.base_price, seasonal, discounts, date_from, date_to
+        )
+
+    @staticmethod
+    async def get_price_matrix(
+        db: AsyncSession, houses: list[House], date_from: date, date_to: date
+    ) -> dict[int, list[dict]]:
+        """
+        Цены по дням сразу для нескольких домиков: {house_id: [день, ...]}.
+
+        Два запроса на всё (сезонные цены и скидки), независимо от числа
+        домиков и длины периода.
+        """
+        if date_to <= date_from or not houses:
+            return {house.id: [] for house in houses}
+
+        last_day = date_to - timedelta(days=1)
+        seasonal = await PricingService._load_seasonal_prices(db, date_from, last_day)
+        discounts = await PricingService._load_active_discounts(db, date_from, last_day)
+
+        seasonal_by_house: dict[int, list[HousePrice]] = {}
+        for sp in seasonal:
+            seasonal_by_house.setdefault(sp.house_id, []).append(sp)
+        global_discounts = [d for d in discounts if d.house_id is None]
+        discounts_by_house: dict[int, list[HouseDiscount]] = {}
+        for d in discounts:
+            if d.house_id is not None:
+                discounts_by_house.setdefault(d.house_id, []).append(d)
+
+        return {
+            house.id: PricingService.resolve_price_range(
+                house.base_price,
+                seasonal_by_house.get(house.id, []),
+                discounts_by_house.get(house.id, []) + global_discounts,
+                date_from,
+                date_to,
             )
+            for house in houses
+        }
+
+    @staticmethod
+    async def _load_seasonal_prices(
+        db: AsyncSession,
+        date_from: date,
+        last_day: date,
+        house_id: Optional[int] = None,
+    ) -> list[HousePrice]:
+        """Сезонные цены, пересекающиеся с [date_from, last_day]."""
+        conditions = [
+            HousePrice.date_from <= last_day,
+            HousePrice.date_to >= date_from,
+        ]
+        if house_id is not None:
+            conditions.append(HousePrice.house_id == house_id)
+        stmt = (
+            select(HousePrice)
+            .where(and_(*conditions))
+            .order_by(HousePrice.date_from, HousePrice.id)
         )
         result = await db.execute(stmt)
-        seasonal = result.scalar_one_or_none()
-
-        base = seasonal.price_per_night if seasonal else house.base_price
-        label = seasonal.label if seasonal else None
-
-        # 2. Ищем скидку (для этого домика или глобальную)
-        stmt = select(HouseDiscount).where(
-            and_(
-                HouseDiscount.is_active == True,
-                HouseDiscount.date_from <= target_date,
-                HouseDiscount.date_to >= target_date,
-                (HouseDiscount.house_id == house_id) | (HouseDiscount.house_id.is_(None)),
+        return list(result.scalars().all())
+
+    @staticmethod
+    async def _load_active_discounts(
+        db: AsyncSession,
+        date_from: date,
+        last_day: date,
+        house_id: Optional[int] = None,
+    ) -> list[HouseDiscount]:
+        """Активные скидки (домика и глобальные), пересекающиеся с [date_from, last_day]."""
+        conditions = [
+            HouseDiscount.is_active == True,
+            HouseDiscount.date_from <= last_day,
+            HouseDiscount.date_to >= date_from,
+        ]
+        if house_id is not None:
+            conditions.append(
+                (HouseDiscount.house_id == house_id) | (HouseDiscount.house_id.is_(None))
             )
-        ).order_by(HouseDiscount.discount_percent.desc())
+        stmt = (
+            select(HouseDiscount)
+            .where(and_(*conditions))
+            .order_by(HouseDiscount.discount_percent.desc(), HouseDiscount.id)
+        )
         result = await db.execute(stmt)
-        discount = result.scalars().first()
+        return list(result.scalars().all())
 
-        discount_percent = discount.discount_percent if discount else 0
-        discount_label = discount.label if discount else None
-        final_price = int(base * (100 - discount_percent) / 100)
+    @staticmethod
+    def resolve_price_range(
+        base_price: int,
+        seasonal: list[HousePrice],
+        discounts: list[HouseDiscount],
+        date_from: date,
+        date_to: date,
+    ) -> list[dict]:
+        """
+        Чистый расчёт цен по дням без обращений к БД.
 
-        return {
-            "price": base,
-            "discount_percent": discount_percent,
-            "discount_label": discount_label,
-            "final_price": final_price,
-            "season_label": label,
-        }
+        seasonal — сезонные цены одного домика (первая подходящая выигрывает),
+        discounts — скидки домика и глобальные (на день берётся максимальная).
+        """
+        nights = (date_to - date_from).days
+        if nights <= 0:
+            return []
+        last_day = date_to - timedelta(days=1)
+
+        season_by_day: list[Optional[HousePrice]] = [None] * nights
+        for sp in seasonal:
+            start = (max(sp.date_from, date_from) - date_from).days
+            end = (min(sp.date_to, last_day) - date_from).days
+            for i in range(start, end + 1):
+                if season_by_day[i] is None:
+                    season_by_day[i] = sp
+
+        discount_by_day: list[Optional[HouseDiscount]] = [None] * nights
+        for d in discounts:
+            start = (max(d.date_from, date_from) - date_from).days
+            end = (min(d.date_to, last_day) - date_from).days
+            for i in range(start, end + 1):
+                current = discount_by_day[i]
+                if current is None or d.discount_percent > current.discount_percent:
+                    discount_by_day[i] = d
+
+        days = []
+        for i in range(nights):
+            seasonal_price = season_by_day[i]
+            discount = discount_by_day[i]
+            base = seasonal_price.price_per_night if seasonal_price else base_price
+            discount_percent = discount.discount_percent if discount else 0
+            days.append({
+                "date": date_from + timedelta(days=i),
+                "price": base,
+                "discount_percent": discount_percent,
+                "discount_label": discount.label if discount else None,
+                "final_price": int(base * (100 - discount_percent) / 100),
+                "season_label": seasonal_price.label if seasonal_price else None,
+            })
+        return days
 
     @staticmethod
     async def calculate_stay_total(
         db: AsyncSession, house_id: int, check_in: date, check_out: date
     ) -> dict:
         """Расчёт стоимости за весь период проживания."""
-        total = 0
-        total_without_discount = 0
         nights = (check_out - check_in).days
         if nights <= 0:
             return {"total": 0, "nights": 0, "avg_per_night": 0}
 
-        for i in range(nights):
-            day = check_in + timedelta(days=i)
-            info = await PricingService.get_price_for_date(db, house_id, day)
-            total += info["final_price"]
-            total_without_discount += info["price"]
+        days = await PricingService.get_price_range(db, house_id, check_in, check_out)
+        total = sum(info["final_price"] for info in days)
+        total_without_discount = sum(info["price"] for info in days)
 
         return {
             "total": total,
@@ -179,83 +307,129 @@ class PricingService:
     # --- Auto-discount logic ---
 
     @staticmethod
-    async def check_and_apply_auto_discounts(db: AsyncSession) -> list[dict]:
-        """
-        Проверяет загруженность на ближайшие дни.
-        Если домик свободен завтра/послезавтра — создаёт горящую скидку.
-        Возвращает список применённых скидок для уведомлений.
-        """
-        from app.services.house_service import HouseService
+    def auto_discount_percent(days_ahead: int) -> int:
+        """Процент горящей скидки для даты через days_ahead дней."""
+        from app.core.config import settings
 
-        today = date.today()
-        tomorrow = today + timedelta(days=1)
-        day_after = today + timedelta(days=2)
-        hot_dates = [tomorrow, day_after]
+        if days_ahead <= 1:
+            return settings.auto_discount_tomorrow_percent
+        return settings.auto_discount_day_after_percent
 
-        houses = await HouseService.get_all_houses(db)
-        applied = []
+    @staticmethod
+    def resolve_auto_discounts(
+        houses: list[House],
+        busy: set[tuple[int, date]],
+        existing: list[HouseDiscount],
+        hot_dates: list[date],
+        today: date,
+    ) -> list[tuple[House, date, int]]:
+        """
+        Чистый расчёт: какие (домик, дата, %) нуждаются в новой авто-скидке.
 
+        Дата «горящая», если домик свободен в эту ночь (её нет в busy —
+        занятых парах (домик, дата)) и на неё ещё нет активной авто-скидки
+        этого домика.
+        """
+        if not hot_dates:
+            return []
+        first_day, last_day = hot_dates[0], hot_dates[-1]
+
+        covered: set[tuple[int, date]] = set()
+        for d in existing:
+            day = max(d.date_from, first_day)
+            while day <= min(d.date_to, last_day):
+                covered.add((d.house_id, day))
+                day += timedelta(days=1)
+
+        missing = []
         for house in houses:
             if house.base_price == 0:
                 continue
-
             for target_date in hot_dates:
-                # Проверяем, занят ли домик на эту дату
-                stmt = select(Booking).where(
-                    and_(
-                        Booking.house_id == house.id,
-                        Booking.check_in <= target_date,
-                        Booking.check_out > target_date,
-                        Booking.status.not_in([
-                            BookingStatus.CANCELLED,
-                        ]),
-                    )
-                )
-                result = await db.execute(stmt)
-                booking = result.scalar_one_or_none()
-
-                if booking:
-                    continue  # Занят — скидка не нужна
-
-                # Проверяем, нет ли уже авто-скидки на эту дату
-                stmt = select(HouseDiscount).where(
-                    and_(
-                        HouseDiscount.house_id == house.id,
-                        HouseDiscount.is_auto == True,
-                        HouseDiscount.is_active == True,
-                        HouseDiscount.date_from <= target_date,
-                        HouseDiscount.date_to >= target_date,
-                    )
-                )
-                result = await db.execute(stmt)
-                existing = result.scalar_one_or_none()
-
-                if existing:
-                    continue  # Уже есть авто-скидка
-
-                # Скидка: % из настроек
-                from app.core.config import settings
-                days_ahead = (target_date - today).days
-                percent = (
-                    settings.auto_discount_tomorrow_percent
-                    if days_ahead == 1
-                    else settings.auto_discount_day_after_percent
-                )
+                key = (house.id, target_date)
+                if key in busy or key in covered:
+                    continue
+                percent = PricingService.auto_discount_percent((target_date - today).days)
+                missing.append((house, target_date, percent))
+        return missing
+
+    @staticmethod
+    async def check_and_apply_auto_discounts(
+        db: AsyncSession, days_ahead: Optional[int] = None
+    ) -> list[dict]:
+        """
+        Проверяет загруженность на ближайшие days_ahead дней
+        (по умолчанию settings.auto_discount_days_ahead).
+        Если домик свободен в какую-то из ночей — создаёт горящую скидку.
+        Возвращает список применённых скидок для уведомлений.
+
+        Занятые ночи (house_day_occupancy) и существующие авто-скидки по всем
+        домикам и всему окну грузятся двумя запросами, новые скидки
+        вставляются одной транзакцией.
+        """
+        from app.core.config import settings
+        from app.services.house_service import HouseService
+
+        if days_ahead is None:
+            days_ahead = settings.auto_discount_days_ahead
 
-                discount = await PricingService.create_discount(
-                    db=db,
-                    label=f"Горящее: {target_date.strftime('%d.%m')}",
-                    discount_percent=percent,
-                    date_from=target_date,
-                    date_to=target_date,
-                    house_id=house.id,
-                    is_auto=True,
+        today = date.today()
+        hot_dates = [today + timedelta(days=i) for i in range(1, days_ahead + 1)]
+        if not hot_dates:
+            return []
+        first_day, last_day = hot_dates[0], hot_dates[-1]
+
+        houses = [h for h in await HouseService.get_all_houses(db) if h.base_price]
+        if not houses:
+            return []
+        house_ids = [h.id for h in houses]
+
+        busy = await OccupancyService.busy_days(
+            db, house_ids, first_day, last_day + timedelta(days=1)
+        )
+        discounts_result = await db.execute(
+            select(HouseDiscount).where(
+                and_(
+                    HouseDiscount.house_id.in_(house_ids),
+                    HouseDiscount.is_auto == True,
+                    HouseDiscount.is_active == True,
+                    HouseDiscount.date_from <= last_day,
+                    HouseDiscount.date_to >= first_day,
                 )
-                applied.append({
-                    "house": house.name,
-                    "date": target_date,
-                    "percent": percent,
-                    "discount_id": discount.id,
-                })
-
-        return applied
+            )
+        )
+
+        missing = PricingService.resolve_auto_discounts(
+            houses,
+            busy,
+            list(discounts_result.scalars().all()),
+            hot_dates,
+            today,
+        )
+        if not missing:
+            return []
+
+        created = [
+            HouseDiscount(
+                house_id=house.id,
+                label=f"Горящее: {target_date.strftime('%d.%m')}",
+                discount_percent=percent,
+                date_from=target_date,
+                date_to=target_date,
+                is_auto=True,
+                is_active=True,
+            )
+            for house, target_date, percent in missing
+        ]
+        db.add_all(created)
+        await db.commit()
+
+        return [
+            {
+                "house": house.name,
+                "date": target_date,
+                "percent": percent,
+                "discount_id": discount.id,
+            }
+            for (house, target_date, percent), discount in zip(missing, created)
+        ]
@@ -0,0 +1,191 @@
+"""
+История запусков задач планировщика (scheduler_job_runs).
+
+Слушатель событий APScheduler (SchedulerService._on_job_event) синхронный,
+поэтому в БД он не пишет: записи копятся в памяти и сбрасываются одной
+транзакцией фоновой задачей в event loop. Заодно раз в час удаляются
+строки старше SCHEDULER_HISTORY_DAYS.
+"""
+
+import asyncio
+import logging
+import time
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional
+
+from sqlalchemy import case, delete, func, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.config import settings
+from app.models import JobRunOutcome, SchedulerJobRun
+
+logger = logging.getLogger(__name__)
+
+# Не даём буферу расти бесконечно, если БД недоступна
+MAX_PENDING = 5000
+PURGE_INTERVAL_SECONDS = 3600
+
+
+class SchedulerHistoryService:
+    """Чтение истории запусков (для админки и догоняющих запусков)"""
+
+    @staticmethod
+    async def summary(db: AsyncSession, since: datetime) -> List[dict]:
+        """Сводка по задачам за период: число запусков по исходам и длительность"""
+        rows = await db.execute(
+            select(
+                SchedulerJobRun.job_id,
+                func.count(),
+                func.sum(case((SchedulerJobRun.outcome == JobRunOutcome.ERROR, 1), else_=0)),
+                func.sum(case((SchedulerJobRun.outcome == JobRunOutcome.SKIPPED, 1), else_=0)),
+                func.sum(case((SchedulerJobRun.outcome == JobRunOutcome.MISSED, 1), else_=0)),
+                func.avg(SchedulerJobRun.duration_ms),
+                func.max(SchedulerJobRun.duration_ms),
+            )
+            .where(SchedulerJobRun.started_at >= since)
+            .group_by(SchedulerJobRun.job_id)
+            .order_by(SchedulerJobRun.job_id)
+        )
+        result = []
+        for job_id, runs, errors, skipped, missed, avg_ms, max_ms in rows:
+            result.append(
+                {
+                    "job_id": job_id,
+                    "runs": runs,
+                    "errors": int(errors or 0),
+                    "skipped": int(skipped or 0),
+                    "missed": int(missed or 0),
+                    "avg_ms": int(avg_ms) if avg_ms is not None else None,
+                    "max_ms": max_ms,
+                }
+            )
+        return result
+
+    @staticmethod
+    async def last_runs(db: AsyncSession) -> Dict[str, SchedulerJobRun]:
+        """Последний выполненный (ok/error) запуск каждой задачи"""
+        latest = (
+            select(func.max(SchedulerJobRun.id))
+            .where(SchedulerJobRun.outcome.in_([JobRunOutcome.OK, JobRunOutcome.ERROR]))
+            .group_by(SchedulerJobRun.job_id)
+        )
+        rows = await db.scalars(select(SchedulerJobRun).where(SchedulerJobRun.id.in_(latest)))
+        return {row.job_id: row for row in rows}
+
+    @staticmethod
+    async def recent_errors(db: AsyncSession, limit: int = 5) -> List[SchedulerJobRun]:
+        rows = await db.scalars(
+            select(SchedulerJobRun)
+            .where(SchedulerJobRun.outcome == JobRunOutcome.ERROR)
+            .order_by(SchedulerJobRun.id.desc())
+            .limit(limit)
+        )
+        return list(rows)
+
+
+class SchedulerHistoryRecorder:
+    """Буфер записей истории с отложенным сбросом в БД"""
+
+    def __init__(self, session_factory=None):
+        self._session_factory = session_factory
+        self._pending: List[dict] = []
+        self._flush_task: Optional[asyncio.Task] = None
+        self._last_purge = 0.0
+        self.recorded_total = 0
+        self.dropped_total = 0
+
+    @property
+    def session_factory(self):
+        if self._session_factory is None:
+            from app.database import AsyncSessionLocal
+
+            self._session_factory = AsyncSessionLocal
+        return self._session_factory
+
+    def record(
+        self,
+        job_id: str,
+        outcome: JobRunOutcome,
+        started_at: datetime,
+        *,
+        scheduled_at: Optional[datetime] = None,
+        finished_at: Optional[datetime] = None,
+        duration_ms: Optional[int] = None,
+        error: Optional[str] = None,
+    ):
+        if len(self._pending) >= MAX_PENDING:
+            self._pending.pop(0)
+            self.dropped_total += 1
+        self._pending.append(
+            {
+                "job_id": job_id,
+                "outcome": outcome,
+                "scheduled_at": scheduled_at,
+                "started_at": started_at,
+                "finished_at": finished_at,
+                "duration_ms": duration_ms,
+                "error": error[:500] if error else None,
+            }
+        )
+        self.recorded_total += 1
+        self._schedule_flush()
+
+    def _schedule_flush(self):
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            return  # Сбросится при следующей записи или явном flush()
+        if self._flush_task is None or self._flush_task.done():
+            self._flush_task = loop.create_task(self.flush())
+
+    async def flush(self) -> int:
+        """Записать накопленное одной транзакцией; вернуть число строк"""
+        written = 0
+        while self._pending:
+            batch, self._pending = self._pending, []
+            try:
+                async with self.session_factory() as session:
+                    session.add_all(SchedulerJobRun(**row) for row in batch)
+                    await session.commit()
+            except Exception as e:
+                logger.error(f"Failed to write scheduler history: {e}")
+                # Вернём в буфер: запишется при следующем сбросе
+                self._pending[:0] = batch[-MAX_PENDING:]
+                return written
+            written += len(batch)
+
+        if time.monotonic() - self._last_purge > PURGE_INTERVAL_SECONDS:
+            self._last_purge = time.monotonic()
+            await self.purge()
+        return written
+
+    async def purge(self, older_than: Optional[timedelta] = None) -> int:
+        older_than = older_than or timedelta(days=settings.scheduler_history_days)
+        cutoff = datetime.utcnow() - older_than
+        try:
+            async with self.session_factory() as session:
+                result = await session.execute(
+                    delete(SchedulerJobRun).where(SchedulerJobRun.started_at < cutoff)
+                )
+                await session.commit()
+                return result.rowcount or 0
+        except Exception as e:
+            logger.error(f"Failed to purge scheduler history: {e}")
+            return 0
+
+    async def stop(self):
+        """Дописать буфер при остановке"""
+        if self._flush_task is not None and not self._flush_task.done():
+            await self._flush_task
+        await self.flush()
+
+    def stats(self) -> dict:
+        return {
+            "pending": len(self._pending),
+            "recorded_total": self.recorded_total,
+            "dropped_total": self.dropped_total,
+        }
+
+
+# Глобальный экземпляр
+scheduler_history = SchedulerHistoryRecorder()
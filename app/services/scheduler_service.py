@@ -1,22 +1,192 @@
 """
 Сервис планировщика для автоматической синхронизации
+
+Каждая задача регистрируется через _add_job с политикой запуска:
+max_instances / coalesce / misfire_grace_time из настроек (по умолчанию —
+без наложения прогонов, пропуски схлопываются), jitter для cron-задач
+(кластер 09:00 не стартует в одну секунду) и переопределения по id задачи
+из SCHEDULER_JOB_POLICIES. Каждый запуск (а также пропуск из-за ещё идущего
+прогона и просроченный запуск) пишется в историю scheduler_job_runs.
 """
 
+import asyncio
+import copy
 import logging
+import time
+from collections import deque
+from datetime import datetime, timedelta, timezone
+from typing import Deque, Dict, List, Optional, Tuple
+
+from apscheduler.events import (
+    EVENT_JOB_ERROR,
+    EVENT_JOB_EXECUTED,
+    EVENT_JOB_MAX_INSTANCES,
+    EVENT_JOB_MISSED,
+    EVENT_JOB_SUBMITTED,
+)
 from apscheduler.schedulers.asyncio import AsyncIOScheduler
+from apscheduler.triggers.cron import CronTrigger
 from apscheduler.triggers.interval import IntervalTrigger
 
+from app.core import metrics
 from app.core.config import settings
+from app.models import JobRunOutcome
+from app.services.scheduler_history import SchedulerHistoryService, scheduler_history
 
 logger = logging.getLogger(__name__)
 
+_POLICY_KEYS = ("max_instances", "coalesce", "misfire_grace_time", "jitter", "catch_up")
+
+
+def _utc_naive(value: Optional[datetime]) -> Optional[datetime]:
+    if value is None or value.tzinfo is None:
+        return value
+    return value.astimezone(timezone.utc).replace(tzinfo=None)
+
 
 class SchedulerService:
     """Сервис для управления периодическими задачами"""
 
-    def __init__(self):
+    def __init__(self, history=None):
         self.scheduler = AsyncIOScheduler()
+        self.history = history or scheduler_history
         self._jobs_registered = False
+        # job_id -> очередь (perf_counter, время старта) идущих прогонов
+        self._job_started: Dict[str, Deque[Tuple[float, datetime]]] = {}
+        self._catch_up: Dict[str, bool] = {}
+        self._catch_up_task: Optional[asyncio.Task] = None
+        self.scheduler.add_listener(
+            self._on_job_event,
+            EVENT_JOB_SUBMITTED
+            | EVENT_JOB_EXECUTED
+            | EVENT_JOB_ERROR
+            | EVENT_JOB_MISSED
+            | EVENT_JOB_MAX_INSTANCES,
+        )
+
+    def _on_job_event(self, event):
+        """Длительность и исход каждого запуска → app.core.metrics и история"""
+        now = datetime.utcnow()
+        job_id = event.job_id
+        if event.code == EVENT_JOB_SUBMITTED:
+            self._job_started.setdefault(job_id, deque()).append((time.perf_counter(), now))
+            return
+        if event.code == EVENT_JOB_MAX_INSTANCES:
+            # Прошлый прогон ещё идёт — этот запуск пропущен
+            metrics.SCHEDULER_JOB_RUNS.inc(job_id, "skipped")
+            run_times = getattr(event, "scheduled_run_times", None) or [None]
+            logger.warning(f"Job {job_id} skipped: previous run is still in progress")
+            self.history.record(
+                job_id, JobRunOutcome.SKIPPED, now, scheduled_at=_utc_naive(run_times[0])
+            )
+            return
+        scheduled_at = _utc_naive(getattr(event, "scheduled_run_time", None))
+        if event.code == EVENT_JOB_MISSED:
+            metrics.SCHEDULER_JOB_RUNS.inc(job_id, "missed")
+            self.history.record(job_id, JobRunOutcome.MISSED, now, scheduled_at=scheduled_at)
+            return
+
+        running = self._job_started.get(job_id)
+        started_at, duration_ms = now, None
+        if running:
+            started, started_at = running.popleft()
+            elapsed = time.perf_counter() - started
+            metrics.SCHEDULER_JOB_DURATION.observe(elapsed, job_id)
+            duration_ms = int(elapsed * 1000)
+        failed = event.code == EVENT_JOB_ERROR
+        metrics.SCHEDULER_JOB_RUNS.inc(job_id, "error" if failed else "ok")
+        exception = getattr(event, "exception", None)
+        self.history.record(
+            job_id,
+            JobRunOutcome.ERROR if failed else JobRunOutcome.OK,
+            started_at,
+            scheduled_at=scheduled_at,
+            finished_at=now,
+            duration_ms=duration_ms,
+            error=repr(exception) if failed and exception is not None else None,
+        )
+
+    def _job_policy(self, job_id: str, trigger) -> dict:
+        """Политика запуска задачи: значения по умолчанию + SCHEDULER_JOB_POLICIES"""
+        is_cron = isinstance(trigger, CronTrigger)
+        policy = {
+            "max_instances": settings.scheduler_max_instances,
+            "coalesce": settings.scheduler_coalesce,
+            "misfire_grace_time": settings.scheduler_misfire_grace_seconds,
+            "jitter": settings.scheduler_cron_jitter_seconds if is_cron else 0,
+            "catch_up": is_cron,
+        }
+        override = settings.scheduler_job_policies.get(job_id) or {}
+        unknown = set(override) - set(_POLICY_KEYS)
+        if unknown:
+            logger.warning(f"Unknown scheduler policy keys for {job_id}: {sorted(unknown)}")
+        policy.update({key: override[key] for key in _POLICY_KEYS if key in override})
+        return policy
+
+    def _add_job(self, func, trigger, id: str, name: str):
+        """Регистрация задачи с политикой запуска из настроек"""
+        policy = self._job_policy(id, trigger)
+        trigger.jitter = policy["jitter"] or None
+        self._catch_up[id] = bool(policy["catch_up"])
+        self.scheduler.add_job(
+            func,
+            trigger,
+            id=id,
+            name=name,
+            replace_existing=True,
+            max_instances=max(1, int(policy["max_instances"])),
+            coalesce=bool(policy["coalesce"]),
+            misfire_grace_time=policy["misfire_grace_time"],
+        )
+
+    @staticmethod
+    def _last_fire_time(trigger, since: datetime, now: datetime) -> Optional[datetime]:
+        """Последнее плановое срабатывание триггера в [since, now] (без jitter)"""
+        trigger = copy.copy(trigger)
+        trigger.jitter = None
+        last = None
+        fire = trigger.get_next_fire_time(None, since)
+        while fire is not None and fire <= now:
+            last = fire
+            fire = trigger.get_next_fire_time(fire, fire + timedelta(seconds=1))
+        return last
+
+    async def catch_up_missed(self) -> List[str]:
+        """
+        Запустить cron-задачи, плановый запуск которых пришёлся на простой
+        (рестарт, деплой) в пределах SCHEDULER_CATCHUP_MINUTES.
+
+        Задачи без истории не трогаем: по ним не понять, был ли пропуск.
+        """
+        if settings.scheduler_catchup_minutes <= 0:
+            return []
+        jobs = [job for job in self.scheduler.get_jobs() if self._catch_up.get(job.id)]
+        if not jobs:
+            return []
+
+        try:
+            async with self.history.session_factory() as session:
+                last_runs = await SchedulerHistoryService.last_runs(session)
+        except Exception as e:
+            logger.error(f"Failed to load scheduler history for catch-up: {e}")
+            return []
+
+        now = datetime.now(self.scheduler.timezone)
+        since = now - timedelta(minutes=settings.scheduler_catchup_minutes)
+        caught = []
+        for job in jobs:
+            last_run = last_runs.get(job.id)
+            if last_run is None:
+                continue
+            missed = self._last_fire_time(job.trigger, since, now)
+            if missed is None or _utc_naive(missed) <= (last_run.scheduled_at or last_run.started_at):
+                continue
+            job.modify(next_run_time=now)
+            caught.append(job.id)
+
+        if caught:
+            logger.info(f"Catching up missed scheduler runs: {', '.join(caught)}")
+        return caught
 
     def register_jobs(self):
         """Регистрация всех периодических задач"""
@@ -24,6 +194,17 @@ class SchedulerService:
             logger.warning("Jobs already registered")
             return
 
+        # Сверка версии кеша ролей: подхватывает изменения users из других процессов
+        if settings.users_cache_sync_seconds > 0:
+            from app.telegram.auth.admin import sync_users_cache
+
+            self._add_job(
+                sync_users_cache,
+                IntervalTrigger(seconds=settings.users_cache_sync_seconds),
+                id="users_cache_sync",
+                name="Sync users role cache",
+            )
+
         if not settings.enable_auto_sync:
             logger.info("Auto-sync is disabled in settings")
             return
@@ -38,12 +219,11 @@ class SchedulerService:
             and settings.avito_item_ids
             and settings.avito_sync_interval_minutes > 0
         ):
-            self.scheduler.add_job(
+            self._add_job(
                 sync_avito_job,
                 IntervalTrigger(minutes=settings.avito_sync_interval_minutes),
                 id="avito_sync",
                 name="Sync Avito bookings",
-                replace_existing=True,
             )
             logger.info(
                 f"Registered Avito sync job (every {settings.avito_sync_interval_minutes} minutes)"
@@ -61,12 +241,11 @@ class SchedulerService:
             settings.google_sheets_spreadsheet_id
             and settings.sheets_sync_interval_minutes > 0
         ):
-            self.scheduler.add_job(
+            self._add_job(
                 sync_sheets_job,
                 IntervalTrigger(minutes=settings.sheets_sync_interval_minutes),
                 id="sheets_sync",
                 name="Sync Google Sheets",
-                replace_existing=True,
             )
             logger.info(
                 f"Registered Sheets sync job (every {settings.sheets_sync_interval_minutes} minutes)"
@@ -90,7 +269,6 @@ class SchedulerService:
             retry_checkout_ack,
             alert_admin_no_ack,
         )
-        from apscheduler.triggers.cron import CronTrigger
 
         try:
             time_str = settings.cleaning_notification_time  # "HH:MM"
@@ -99,70 +277,62 @@ class SchedulerService:
                 hour = int(parts[0])
                 minute = int(parts[1])
 
-                self.scheduler.add_job(
+                self._add_job(
                     check_and_notify_cleaners,
                     CronTrigger(hour=hour, minute=minute),
                     id="cleaner_notify",
                     name="Notify cleaners",
-                    replace_existing=True,
                 )
                 logger.info(f"Registered cleaner notification job (at {time_str})")
 
-                self.scheduler.add_job(
+                self._add_job(
                     send_advance_checkout_notifications,
                     CronTrigger(hour=9, minute=0),
                     id="cleaner_advance_notify",
                     name="Advance checkout reminders for cleaners",
-                    replace_existing=True,
                 )
                 logger.info("Registered advance checkout reminder job (at 09:00)")
 
                 # Checkout acknowledgment chain
-                self.scheduler.add_job(
+                self._add_job(
                     send_morning_checkout_briefing,
                     CronTrigger(hour=9, minute=5),
                     id="checkout_morning_briefing",
                     name="Morning checkout briefing (today's checkouts)",
-                    replace_existing=True,
                 )
-                self.scheduler.add_job(
+                self._add_job(
                     send_checkout_ack_reminders,
                     CronTrigger(hour=12, minute=0),
                     id="checkout_ack_remind",
                     name="Day-before checkout ack reminder",
-                    replace_existing=True,
                 )
-                self.scheduler.add_job(
+                self._add_job(
                     retry_checkout_ack,
                     CronTrigger(hour=13, minute=0),
                     id="checkout_ack_retry",
                     name="Checkout ack retry reminder",
-                    replace_existing=True,
                 )
-                self.scheduler.add_job(
+                self._add_job(
                     alert_admin_no_ack,
                     CronTrigger(hour=14, minute=0),
                     id="checkout_ack_admin_alert",
                     name="Admin alert: no checkout ack",
-                    replace_existing=True,
                 )
                 logger.info("Registered checkout ack chain jobs (09:05 / 12:00 / 13:00 / 14:00)")
 
-                self.scheduler.add_job(
+                self._add_job(
                     run_cleaning_tasks_cycle,
                     CronTrigger(hour=hour, minute=minute),
                     id="cleaner_tasks_cycle",
                     name="Generate and notify cleaner tasks",
-                    replace_existing=True,
                 )
                 logger.info(f"Registered cleaner task generation job (at {time_str})")
 
-                self.scheduler.add_job(
+                self._add_job(
                     run_cleaning_sla_monitor,
                     IntervalTrigger(minutes=max(1, settings.cleaning_sla_check_interval_minutes)),
                     id="cleaner_sla_monitor",
                     name="Monitor cleaner SLA",
-                    replace_existing=True,
                 )
                 logger.info(
                     f"Registered cleaner SLA monitor job (every {settings.cleaning_sla_check_interval_minutes} minutes)"
@@ -173,36 +343,33 @@ class SchedulerService:
             # Guest notifications (Fixed time for now: 10:00)
             from app.jobs.guest_notifier import check_and_notify_guests
 
-            self.scheduler.add_job(
+            self._add_job(
                 check_and_notify_guests,
                 CronTrigger(hour=10, minute=0),
                 id="guest_notify",
                 name="Notify guests",
-                replace_existing=True,
             )
             logger.info("Registered guest notification job (at 10:00)")
 
             # Status updater - daily at 00:01
             from app.jobs.status_updater_job import update_booking_statuses_job
 
-            self.scheduler.add_job(
+            self._add_job(
                 update_booking_statuses_job,
                 CronTrigger(hour=0, minute=1),
                 id="status_updater",
                 name="Update booking statuses",
-                replace_existing=True,
             )
             logger.info("Registered status updater job (at 00:01)")
 
             # Database Backup - daily at 03:00
-            from app.services.backup_service import backup_database_to_drive
+            from app.services.backup_service import backup_database
 
-            self.scheduler.add_job(
-                backup_database_to_drive,
+            self._add_job(
+                backup_database,
                 CronTrigger(hour=3, minute=0),
                 id="db_backup",
-                name="Backup database to Drive",
-                replace_existing=True,
+                name=f"Backup database ({settings.backup_backend})",
             )
             logger.info("Registered database backup job (at 03:00)")
 
@@ -214,12 +381,11 @@ class SchedulerService:
             from app.jobs.pricing_job import pricing_cycle_job
 
             for hour in [9, 18]:
-                self.scheduler.add_job(
+                self._add_job(
                     pricing_cycle_job,
                     CronTrigger(hour=hour, minute=0),
                     id=f"pricing_cycle_{hour}",
                     name=f"Pricing cycle at {hour}:00",
-                    replace_existing=True,
                 )
             logger.info("Registered pricing cycle jobs (at 09:00 and 18:00)")
         except Exception as e:
@@ -233,12 +399,11 @@ class SchedulerService:
         ):
             from app.jobs.yandex_travel_sync_job import sync_yandex_travel_job
 
-            self.scheduler.add_job(
+            self._add_job(
                 sync_yandex_travel_job,
                 IntervalTrigger(minutes=settings.yandex_travel_sync_interval_minutes),
                 id="yandex_travel_sync",
                 name="Sync Yandex Travel bookings",
-                replace_existing=True,
             )
             logger.info(
                 f"Registered Yandex Travel sync job (every {settings.yandex_travel_sync_interval_minutes} min)"
@@ -254,6 +419,11 @@ class SchedulerService:
             self.register_jobs()
             self.scheduler.start()
             logger.info("Scheduler started")
+            try:
+                loop = asyncio.get_running_loop()
+            except RuntimeError:
+                return
+            self._catch_up_task = loop.create_task(self.catch_up_missed())
         else:
             logger.warning("Scheduler already running")
 
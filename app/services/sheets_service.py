@@ -2,13 +2,102 @@
 Сервис для работы с Google Sheets
 """
 
-import gspread
-from google.oauth2.service_account import Credentials
-from typing import List
-
+import heapq
+import logging
+from datetime import datetime, timedelta
+from typing import Dict, Iterable, List, Optional, Set
+
+# gspread и google-auth импортируются в методах: на старте приложения они
+# не нужны, а импорт занимает заметную долю холодного старта
+from app.core import metrics
 from app.core.config import settings
 from app.models import Booking
 
+logger = logging.getLogger(__name__)
+
+BOOKINGS_SHEET_TITLE = "Все брони"
+
+BOOKINGS_HEADERS = [
+    "ID",
+    "Дата заезда",
+    "Дата выезда",
+    "Гость",
+    "Телефон",
+    "Домик",
+    "Гостей",
+    "Цена",
+    "Предоплата (моя)",
+    "Остаток",
+    "Комиссия",
+    "Статус",
+    "Источник",
+    "Создано",
+]
+
+# Mappings for localization
+STATUS_MAP = {
+    "new": "Ожидает оплаты",
+    "confirmed": "Ждёт заселения",
+    "paid": "Оплата внесена",
+    "checking_in": "Заезд сегодня",
+    "checked_in": "Проживает",
+    "cancelled": "Отменена",
+    "completed": "Завершена",
+}
+
+SOURCE_MAP = {
+    "avito": "Авито",
+    "telegram": "Телеграм",
+    "direct": "Прямая",
+    "other": "Другое",
+}
+
+# Запас при выборке изменённых броней по updated_at: транзакция могла
+# выставить updated_at раньше, а закоммититься позже прошлого синка.
+# Повторно прочитанные строки не отправляются, если их значения не изменились.
+HIGH_WATER_OVERLAP = timedelta(minutes=2)
+_EPOCH = datetime(1970, 1, 1)
+
+
+def booking_to_row(booking: Booking, row_number: int) -> list:
+    """Строка листа «Все брони» для брони, размещённой в строке row_number."""
+    total_price = float(booking.total_price)
+    # Use direct fields from DB
+    advance_total = float(booking.advance_amount or 0)
+    commission = float(booking.commission or 0)
+
+    # Use direct owner amount if available (Avito), or fallback to total (Direct bookings)
+    if booking.prepayment_owner and float(booking.prepayment_owner) > 0:
+        advance_user_share = float(booking.prepayment_owner)
+    elif booking.source == "avito" and commission > 0:
+        # Fallback if field wasn't populated yet but we have commission
+        advance_user_share = advance_total - commission
+    else:
+        # For direct/other bookings, advance is fully user's
+        advance_user_share = advance_total
+
+    # Localize values
+    status_rus = STATUS_MAP.get(booking.status.value, booking.status.value)
+    source_rus = SOURCE_MAP.get(booking.source.value, booking.source.value)
+
+    i = row_number
+    return [
+        booking.id,
+        booking.check_in.strftime("%d.%m.%Y"),
+        booking.check_out.strftime("%d.%m.%Y"),
+        booking.guest_name,
+        f"'{booking.guest_phone}" if booking.guest_phone else "",  # Force text format
+        booking.house.name,
+        booking.guests_count,
+        total_price,
+        advance_user_share,
+        f"=H{i}-I{i}-K{i} ",  # Remain formula: Total - OwnerAdvance - Commission
+        commission,
+        status_rus,
+        source_rus,
+        booking.created_at.strftime("%d.%m.%Y %H:%M"),
+    ]
+
 
 class GoogleSheetsService:
     """Сервис для синхронизации данных с Google Sheets"""
@@ -24,8 +113,20 @@ class GoogleSheetsService:
         self._sync_cache_ttl_seconds = getattr(settings, "sync_cache_ttl_seconds", 30)
         self._is_syncing = False  # Prevent concurrent syncs
 
+        # Incremental sync state: где на листе лежит каждая бронь и что в ней записано.
+        # Пустой индекс = следующий синк делает полную перезапись листа.
+        self._bookings_worksheet = None
+        self._row_index: Dict[int, int] = {}  # booking_id -> row number (1-based)
+        self._row_values: Dict[int, list] = {}  # booking_id -> last written row
+        self._free_rows: List[int] = []  # heap освободившихся строк
+        self._next_row = 2  # первая строка после данных
+        self._high_water: Optional[datetime] = None  # max(Booking.updated_at) на листе
+
     def connect(self):
         """Подключение к Google Sheets"""
+        import gspread
+        from google.oauth2.service_account import Credentials
+
         scopes = [
             "https://www.googleapis.com/auth/spreadsheets",
             "https://www.googleapis.com/auth/drive",
@@ -36,6 +137,11 @@ class GoogleSheetsService:
         )
 
         self.client = gspread.authorize(creds)
+        # Латентность и статус каждого вызова Sheets API
+        self.client.http_client.session.hooks["response"].append(
+            metrics.requests_hook("google_sheets")
+        )
+        self._bookings_worksheet = None
         try:
             self.spreadsheet = self.client.open_by_key(self.spreadsheet_id)
         except Exception:
@@ -98,134 +204,166 @@ class GoogleSheetsService:
             self.spreadsheet.batch_update({"requests": requests})
         except Exception as e:
             # This can fail if 'Typed Columns' are enabled in the sheet
-            import logging
-            logger = logging.getLogger(__name__)
             logger.warning(f"⚠️ Could not apply data validation to sheets (might be due to Typed Columns): {e}")
 
-    def sync_bookings_to_sheet(self, bookings: List[Booking]):
-        """Синхронизация броней в Google Sheets"""
-        if not self.client or not self.spreadsheet:
-            self.connect()
-
-        # Mappings for localization
-        status_map = {
-            "new": "Ожидает оплаты",
-            "confirmed": "Ждёт заселения",
-            "paid": "Оплата внесена",
-            "checking_in": "Заезд сегодня",
-            "checked_in": "Проживает",
-            "cancelled": "Отменена",
-            "completed": "Завершена",
-        }
+    def _get_bookings_worksheet(self):
+        """Лист «Все брони»; при создании сразу форматируется."""
+        import gspread
 
-        source_map = {
-            "avito": "Авито",
-            "telegram": "Телеграм",
-            "direct": "Прямая",
-            "other": "Другое",
-        }
+        if self._bookings_worksheet is not None:
+            return self._bookings_worksheet
 
-        # Получаем или создаем лист "Все брони"
         try:
-            worksheet = self.spreadsheet.worksheet("Все брони")
+            worksheet = self.spreadsheet.worksheet(BOOKINGS_SHEET_TITLE)
         except gspread.WorksheetNotFound:
             worksheet = self.spreadsheet.add_worksheet(
-                title="Все брони", rows=1000, cols=14
+                title=BOOKINGS_SHEET_TITLE, rows=1000, cols=14
             )
+            # Форматирование — только при создании листа
+            try:
+                self._format_bookings_sheet(worksheet)
+            except Exception as e:
+                logger.warning(f"⚠️ Could not format sheets: {e}")
+
+        self._bookings_worksheet = worksheet
+        return worksheet
+
+    @staticmethod
+    def _ensure_rows(worksheet, last_row: int):
+        """Расширяет сетку листа, если данных больше, чем строк."""
+        if last_row > worksheet.row_count:
+            worksheet.add_rows(last_row - worksheet.row_count)
+
+    def reset_incremental_state(self):
+        """Сбрасывает индекс строк — следующий синк перезапишет лист целиком."""
+        self._row_index = {}
+        self._row_values = {}
+        self._free_rows = []
+        self._next_row = 2
+        self._high_water = None
+
+    @property
+    def has_row_index(self) -> bool:
+        return self._high_water is not None
+
+    def sync_bookings_to_sheet(self, bookings: List[Booking]):
+        """Полная синхронизация броней в Google Sheets (перезапись листа)."""
+        if not self.client or not self.spreadsheet:
+            self.connect()
+
+        worksheet = self._get_bookings_worksheet()
+
+        # Строки пишем уже отсортированными по дате заезда (колонка B),
+        # чтобы номера строк в индексе совпадали с листом.
+        ordered = sorted(bookings, key=lambda b: b.check_in)
+        data = [BOOKINGS_HEADERS]
+        row_index: Dict[int, int] = {}
+        row_values: Dict[int, list] = {}
+        for i, booking in enumerate(ordered, start=2):
+            row = booking_to_row(booking, i)
+            data.append(row)
+            row_index[booking.id] = i
+            row_values[booking.id] = row
+
+        self.reset_incremental_state()
 
         # Очищаем лист
         worksheet.clear()
+        self._ensure_rows(worksheet, len(data))
 
-        # Заголовки
-        headers = [
-            "ID",
-            "Дата заезда",
-            "Дата выезда",
-            "Гость",
-            "Телефон",
-            "Домик",
-            "Гостей",
-            "Цена",
-            "Предоплата (моя)",
-            "Остаток",
-            "Комиссия",
-            "Статус",
-            "Источник",
-            "Создано",
-        ]
+        # Записываем данные одним запросом
+        worksheet.batch_update(
+            [{"range": f"A1:N{len(data)}", "values": data}],
+            value_input_option="USER_ENTERED",
+        )
 
-        # Формируем данные
-        data = [headers]
-
-        for i, booking in enumerate(bookings, start=2):
-            # Calculate values
-            total_price = float(booking.total_price)
-            # Use direct fields from DB
-            advance_total = float(booking.advance_amount or 0)
-            commission = float(booking.commission or 0)
-
-            # Use direct owner amount if available (Avito), or fallback to total (Direct bookings)
-            if booking.prepayment_owner and float(booking.prepayment_owner) > 0:
-                advance_user_share = float(booking.prepayment_owner)
-            elif booking.source == "avito" and commission > 0:
-                # Fallback if field wasn't populated yet but we have commission
-                advance_user_share = advance_total - commission
-            else:
-                # For direct/other bookings, advance is fully user's
-                advance_user_share = advance_total
-
-            # Localize values
-            status_rus = status_map.get(booking.status.value, booking.status.value)
-            source_rus = source_map.get(booking.source.value, booking.source.value)
-
-            row = [
-                booking.id,
-                booking.check_in.strftime("%d.%m.%Y"),
-                booking.check_out.strftime("%d.%m.%Y"),
-                booking.guest_name,
-                f"'{booking.guest_phone}"
-                if booking.guest_phone
-                else "",  # Force text format
-                booking.house.name,
-                booking.guests_count,
-                total_price,
-                advance_user_share,
-                f"=H{i}-I{i}-K{i} ",  # Remain formula: Total - OwnerAdvance - Commission
-                commission,
-                status_rus,
-                source_rus,
-                booking.created_at.strftime("%d.%m.%Y %H:%M"),
-            ]
-            data.append(row)
+        self._row_index = row_index
+        self._row_values = row_values
+        self._next_row = len(data) + 1
+        self._high_water = max(
+            (b.updated_at for b in ordered if b.updated_at), default=_EPOCH
+        )
 
-        # Записываем данные
-        if len(data) > 0:
-            # Используем batch_update для записи всех данных сразу
-            # Используем update для записи данных
-            worksheet.batch_update(
-                [{"range": f"A1:N{len(data)}", "values": data}],
-                value_input_option="USER_ENTERED",
-            )
+    def sync_bookings_incremental(
+        self, changed: Iterable[Booking], current_ids: Set[int]
+    ) -> int:
+        """
+        Инкрементальная синхронизация по индексу строк.
 
-        # Форматирование
-        try:
-            self._format_bookings_sheet(worksheet)
-        except Exception as e:
-            import logging
-            logging.getLogger(__name__).warning(f"⚠️ Could not format sheets: {e}")
+        changed — брони, изменённые с прошлого синка (могут содержать и
+        неизменённые: такие строки не отправляются), current_ids — id всех
+        броней в БД (для поиска удалённых). Изменённые строки переписываются
+        на месте, новые занимают освободившиеся строки или дописываются в
+        конец, строки удалённых броней очищаются. Всё уходит одним batch_update.
 
-        # Сортировка по дате заезда (колонка B)
-        try:
-            if len(data) > 1:  # Если есть данные кроме заголовка
-                worksheet.sort(
-                    (2, "asc"), range=f"A2:N{len(data)}"
-                )  # Колонка 2 = B (Дата заезда)
-        except Exception as e:
-            import logging
-            logging.getLogger(__name__).warning(f"⚠️ Could not sort sheets: {e}")
+        Returns:
+            Количество отправленных строк.
+        """
+        if not self.has_row_index:
+            raise RuntimeError("Row index is empty, full sync required")
+        if not self.client or not self.spreadsheet:
+            self.connect()
+
+        row_index = dict(self._row_index)
+        row_values = dict(self._row_values)
+        free_rows = list(self._free_rows)
+        next_row = self._next_row
+        high_water = self._high_water
+        pending: Dict[int, list] = {}  # row number -> values
+
+        for booking_id in [bid for bid in row_index if bid not in current_ids]:
+            row_number = row_index.pop(booking_id)
+            row_values.pop(booking_id, None)
+            heapq.heappush(free_rows, row_number)
+            pending[row_number] = [""] * len(BOOKINGS_HEADERS)
+
+        for booking in changed:
+            if booking.id not in current_ids:
+                continue
+            row_number = row_index.get(booking.id)
+            if row_number is None:
+                if free_rows:
+                    row_number = heapq.heappop(free_rows)
+                else:
+                    row_number = next_row
+                    next_row += 1
+                row_index[booking.id] = row_number
+            if booking.updated_at and booking.updated_at > high_water:
+                high_water = booking.updated_at
+
+            row = booking_to_row(booking, row_number)
+            if row_values.get(booking.id) == row:
+                continue
+            row_values[booking.id] = row
+            pending[row_number] = row
+
+        if pending:
+            worksheet = self._get_bookings_worksheet()
+            self._ensure_rows(worksheet, next_row - 1)
+            try:
+                worksheet.batch_update(
+                    [
+                        {"range": f"A{n}:N{n}", "values": [values]}
+                        for n, values in sorted(pending.items())
+                    ],
+                    value_input_option="USER_ENTERED",
+                )
+            except Exception:
+                # Состояние листа неизвестно — следующий синк будет полным
+                self.reset_incremental_state()
+                raise
+
+        self._row_index = row_index
+        self._row_values = row_values
+        self._free_rows = free_rows
+        self._next_row = next_row
+        self._high_water = high_water
+        return len(pending)
 
     def create_dashboard(self, bookings: List[Booking]):
         """Создание Dashboard с общей статистикой"""
+        import gspread
+
         if not self.client or not self.spreadsheet:
             self.connect()
 
@@ -250,8 +388,6 @@ class GoogleSheetsService:
         )
 
         # Дата обновления
-        from datetime import datetime
-
         now = datetime.now().strftime("%d.%m.%Y %H:%M")
         worksheet.update_acell("A2", f"Обновлено: {now}")
 
@@ -280,13 +416,36 @@ class GoogleSheetsService:
         try:
             worksheet.batch_update([{"range": "A5:B7", "values": stats_data}])
         except Exception as e:
-            import logging
-            logging.getLogger(__name__).warning(f"⚠️ Could not update dashboard stats: {e}")
+            logger.warning(f"⚠️ Could not update dashboard stats: {e}")
+
+    def update_dashboard_stats(self, total_bookings: int, active_bookings: int, total_revenue):
+        """Обновляет только дату и цифры Dashboard (без очистки и форматирования)."""
+        import gspread
+
+        if not self.client or not self.spreadsheet:
+            self.connect()
+
+        try:
+            worksheet = self.spreadsheet.worksheet("Dashboard")
+        except gspread.WorksheetNotFound:
+            return
+
+        now = datetime.now().strftime("%d.%m.%Y %H:%M")
+        worksheet.batch_update([
+            {"range": "A2", "values": [[f"Обновлено: {now}"]]},
+            {
+                "range": "A5:B7",
+                "values": [
+                    ["Всего броней:", total_bookings],
+                    ["Активных:", active_bookings],
+                    ["Общий доход:", f"{total_revenue:,.0f} ₽"],
+                ],
+            },
+        ])
 
     async def sync_bookings_async(self, bookings: List[Booking]):
         """Async wrapper для синхронизации броней"""
         import asyncio
-        from datetime import datetime
 
         # Prevent concurrent syncs
         if self._is_syncing:
@@ -305,23 +464,23 @@ class GoogleSheetsService:
         finally:
             self._is_syncing = False
 
-    async def sync_if_needed(self, force: bool = False) -> bool:
+    async def sync_if_needed(self, force: bool = False, full: bool = False) -> bool:
         """
         Умная синхронизация - только если прошло достаточно времени
 
+        Вызывается только из SheetsSyncCoordinator (не больше одного синка
+        одновременно — полный и инкрементальный делят _row_index).
+
         Args:
             force: Принудительная синхронизация игнорируя кэш
+            full: Полная перезапись листа и Dashboard даже в incremental-режиме
 
         Returns:
             True если синхронизация выполнена, False если пропущена
         """
-        import logging
-        from datetime import datetime
         from sqlalchemy import select
         from sqlalchemy.orm import joinedload
 
-        logger = logging.getLogger(__name__)
-
         # Check if sync is needed
         if not force and self._last_sync_time:
             time_since_last_sync = (
@@ -338,6 +497,13 @@ class GoogleSheetsService:
             logger.debug("Sync already in progress, skipping")
             return False
 
+        if not full and settings.sheets_sync_mode == "incremental" and self.has_row_index:
+            try:
+                return await self._sync_changes()
+            except Exception as e:
+                logger.error(f"❌ Incremental sync failed: {e}", exc_info=True)
+                return False
+
         try:
             # Get bookings from database
             from app.database import AsyncSessionLocal
@@ -368,6 +534,55 @@ class GoogleSheetsService:
             logger.error(f"❌ Sync failed: {e}", exc_info=True)
             return False
 
+    async def _sync_changes(self) -> bool:
+        """Инкрементальный синк: только брони, изменённые после high-water mark."""
+        import asyncio
+        from sqlalchemy import func, select
+        from sqlalchemy.orm import joinedload
+
+        from app.database import AsyncSessionLocal
+        from app.models import BookingStatus
+
+        if self._is_syncing:
+            return False
+
+        try:
+            self._is_syncing = True
+            since = self._high_water - HIGH_WATER_OVERLAP
+
+            async with AsyncSessionLocal() as session:
+                current_ids = set((await session.execute(select(Booking.id))).scalars().all())
+                stmt = (
+                    select(Booking)
+                    .options(joinedload(Booking.house))
+                    .where(Booking.updated_at >= since)
+                )
+                changed = (await session.execute(stmt)).scalars().all()
+
+                active = Booking.status.in_(
+                    [BookingStatus.NEW, BookingStatus.CONFIRMED, BookingStatus.PAID]
+                )
+                active_count, revenue = (
+                    await session.execute(
+                        select(func.count(Booking.id), func.sum(Booking.total_price)).where(active)
+                    )
+                ).one()
+
+            sent = await asyncio.to_thread(
+                self.sync_bookings_incremental, changed, current_ids
+            )
+            if sent:
+                await asyncio.to_thread(
+                    self.update_dashboard_stats, len(current_ids), active_count, revenue or 0
+                )
+                logger.info(f"✅ Incremental sheets sync: {sent} row(s) updated")
+
+            self._last_sync_time = datetime.now()
+            return True
+
+        finally:
+            self._is_syncing = False
+
 
 # Глобальный экземпляр сервиса
 sheets_service = GoogleSheetsService()
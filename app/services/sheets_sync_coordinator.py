@@ -0,0 +1,153 @@
+"""
+Координатор синхронизации с Google Sheets.
+
+Все источники изменений (BookingService, джобы Avito/YaTr/статусов,
+AutoSyncMiddleware, стартовый синк) не запускают синк сами, а вызывают
+request_sync(). Координатор:
+- склеивает пачку уведомлений в один прогон в пределах debounce-окна;
+- гарантирует не больше одного синка одновременно (один runner-task);
+- если изменения пришли во время синка — делает ещё один (хвостовой) прогон;
+- ручной синк (/sync, меню броней) просит полную перезапись (full=True)
+  через ту же очередь, а не пишет в таблицу сам;
+- считает глубину очереди и коэффициент склейки.
+"""
+
+import asyncio
+import logging
+import time
+from typing import Awaitable, Callable, List, Optional
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+
+class SheetsSyncCoordinator:
+    """Debounce + coalescing для синков Google Sheets."""
+
+    def __init__(
+        self,
+        sync_func: Optional[Callable[[bool, bool], Awaitable[bool]]] = None,
+        debounce_seconds: Optional[float] = None,
+    ):
+        self._sync_func = sync_func
+        self.debounce_seconds = (
+            settings.sheets_sync_debounce_seconds
+            if debounce_seconds is None
+            else debounce_seconds
+        )
+
+        self._runner: Optional[asyncio.Task] = None
+        self._dirty = False  # есть уведомления, не покрытые начатым прогоном
+        self._force = False  # хотя бы одно уведомление требует синк мимо TTL
+        self._full = False  # хотя бы одно уведомление требует полную перезапись
+        self._pending = 0  # уведомлений в очереди (ещё не взяты прогоном)
+        self._waiters: List[asyncio.Future] = []
+        self._in_flight = False
+
+        # Метрики
+        self.requests_total = 0
+        self.runs_total = 0
+        self.failures_total = 0
+        self.last_run_duration_ms: Optional[float] = None
+        self.last_batch_size = 0
+
+    async def _sync(self, force: bool, full: bool) -> bool:
+        if self._sync_func is not None:
+            return await self._sync_func(force, full)
+
+        from app.services.sheets_service import sheets_service
+
+        return await sheets_service.sync_if_needed(force=force, full=full)
+
+    def request_sync(self, reason: str = "", force: bool = True, full: bool = False) -> None:
+        """
+        Сообщить об изменении. Не блокирует: синк выполнится после
+        debounce-окна в фоне.
+
+        Args:
+            reason: Источник изменения (для логов)
+            force: False = синк только если истёк TTL (как у AutoSyncMiddleware)
+            full: полная перезапись листа и Dashboard вместо инкрементального
+        """
+        self.requests_total += 1
+        self._pending += 1
+        self._dirty = True
+        self._force = self._force or force
+        self._full = self._full or full
+        if reason:
+            logger.debug(f"Sheets sync requested: {reason} (queue={self._pending})")
+
+        if self._runner is None or self._runner.done():
+            self._runner = asyncio.get_running_loop().create_task(self._run())
+
+    async def sync_now(self, reason: str = "", force: bool = True, full: bool = False) -> bool:
+        """Поставить синк в очередь и дождаться прогона, который его покрыл."""
+        future = asyncio.get_running_loop().create_future()
+        self._waiters.append(future)
+        self.request_sync(reason, force=force, full=full)
+        return await future
+
+    async def _run(self):
+        while self._dirty:
+            # Копим уведомления в пределах окна
+            await asyncio.sleep(self.debounce_seconds)
+
+            force = self._force
+            full = self._full
+            waiters = self._waiters
+            self._dirty = False
+            self._force = False
+            self._full = False
+            self._waiters = []
+            self.last_batch_size = self._pending
+            self._pending = 0
+            self.runs_total += 1
+
+            started = time.perf_counter()
+            ok = False
+            self._in_flight = True
+            try:
+                ok = await self._sync(force, full)
+            except Exception as e:
+                self.failures_total += 1
+                logger.error(f"❌ Coordinated sheets sync failed: {e}", exc_info=True)
+            finally:
+                self._in_flight = False
+                self.last_run_duration_ms = (time.perf_counter() - started) * 1000
+
+            for future in waiters:
+                if not future.done():
+                    future.set_result(bool(ok))
+
+    async def drain(self):
+        """Дождаться завершения текущего и хвостового прогонов."""
+        if self._runner is not None and not self._runner.done():
+            await asyncio.shield(self._runner)
+
+    @property
+    def queue_depth(self) -> int:
+        return self._pending
+
+    @property
+    def coalescing_ratio(self) -> float:
+        """Сколько уведомлений в среднем приходится на один прогон."""
+        if not self.runs_total:
+            return 0.0
+        return (self.requests_total - self._pending) / self.runs_total
+
+    def stats(self) -> dict:
+        return {
+            "queue_depth": self.queue_depth,
+            "in_flight": self._in_flight,
+            "requests_total": self.requests_total,
+            "runs_total": self.runs_total,
+            "failures_total": self.failures_total,
+            "coalescing_ratio": round(self.coalescing_ratio, 2),
+            "last_batch_size": self.last_batch_size,
+            "last_run_duration_ms": self.last_run_duration_ms,
+        }
+
+
+# Глобальный экземпляр
+sheets_sync_coordinator = SheetsSyncCoordinator()
@@ -0,0 +1,327 @@
+"""
+Диспетчер исходящих сообщений Telegram.
+
+Все рассылки (джобы, уведомления, алерты админам) идут через общую
+очередь поверх глобального `app.telegram.bot.bot`:
+- глобальный бюджет сообщений в секунду и бюджет на чат
+  (для групп — лимит в минуту, как у Telegram);
+- TelegramRetryAfter: ждём указанное время (вся отправка на паузе)
+  и повторяем;
+- у каждого чата своя очередь (порядок сохраняется); чат, упёршийся
+  в свой лимит, ждёт на таймере и не занимает воркер; опустевшая
+  очередь удаляется, когда лимит чата восстановился;
+- ограниченное число одновременных отправок (воркеры);
+- приоритеты: алерты админам обгоняют массовые рассылки;
+- метрики: глубина очереди, латентность (постановка → отправка).
+"""
+
+import asyncio
+import heapq
+import itertools
+import logging
+import time
+from collections import deque
+from enum import IntEnum
+from typing import Any, Iterable, Optional
+
+from aiogram.exceptions import TelegramRetryAfter
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+
+class Priority(IntEnum):
+    HIGH = 0  # алерты админам, ответы на действия пользователя
+    NORMAL = 1
+    BULK = 2  # утренние сводки, напоминания по правилам
+
+
+class _RateBudget:
+    """Равномерный бюджет: не чаще одного события раз в interval секунд."""
+
+    def __init__(self, interval: float):
+        self.interval = interval
+        self._next_at = 0.0
+
+    def delay(self) -> float:
+        """Сколько ждать до ближайшего свободного слота (без резервирования)."""
+        return max(0.0, self._next_at - time.monotonic())
+
+    def reserve(self) -> float:
+        """Зарезервировать слот, вернуть сколько ждать до него."""
+        now = time.monotonic()
+        slot = max(now, self._next_at)
+        self._next_at = slot + self.interval
+        return slot - now
+
+    def pause(self, seconds: float) -> None:
+        self._next_at = max(self._next_at, time.monotonic() + seconds)
+
+
+class _ChatLane:
+    """Очередь одного чата: свой бюджет, сообщения строго по одному."""
+
+    def __init__(self, chat_id: int, budget: _RateBudget):
+        self.chat_id = chat_id
+        self.budget = budget
+        self.pending: list = []  # heap (priority, seq, message)
+        self.busy = False  # сообщение чата сейчас отправляется
+        self.ready_seq: Optional[int] = None  # актуальная запись в очереди готовых
+        self.timer: Optional[asyncio.TimerHandle] = None  # ждёт бюджет чата
+
+
+class TelegramDispatcher:
+    """Очередь исходящих сообщений с лимитами и приоритетами.
+
+    Каждый чат — своя очередь со своим бюджетом; воркерам отдаются только
+    чаты, которые можно отправлять прямо сейчас. Чат, упёршийся в лимит
+    (группа админов — раз в 3 с), ждёт на таймере, а не на воркере,
+    поэтому не задерживает HIGH-сообщения и другие чаты.
+    """
+
+    def __init__(
+        self,
+        bot=None,
+        global_rate: Optional[float] = None,
+        chat_rate: Optional[float] = None,
+        group_rate_per_minute: Optional[float] = None,
+        concurrency: Optional[int] = None,
+        max_attempts: Optional[int] = None,
+    ):
+        self._bot = bot
+        self.global_rate = global_rate or settings.telegram_global_rate_per_second
+        self.chat_rate = chat_rate or settings.telegram_chat_rate_per_second
+        self.group_rate_per_minute = (
+            group_rate_per_minute or settings.telegram_group_rate_per_minute
+        )
+        self.concurrency = concurrency or settings.telegram_send_concurrency
+        self.max_attempts = max_attempts or settings.telegram_send_max_attempts
+
+        # Готовые к отправке чаты: (приоритет головы, seq головы, chat_id)
+        self._ready: Optional[asyncio.PriorityQueue] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._workers: list[asyncio.Task] = []
+        self._seq = itertools.count()
+        self._global = _RateBudget(1 / self.global_rate)
+        self._lanes: dict[int, _ChatLane] = {}
+        self._unfinished = 0
+        self._idle: Optional[asyncio.Event] = None
+        self._in_flight = 0
+
+        # Метрики
+        self.sent_total = 0
+        self.failed_total = 0
+        self.retry_after_total = 0
+        self._latencies_ms: deque = deque(maxlen=500)
+
+    @property
+    def bot(self):
+        if self._bot is None:
+            from app.telegram.bot import bot
+
+            self._bot = bot
+        return self._bot
+
+    def _ensure_workers(self):
+        loop = asyncio.get_running_loop()
+        if self._ready is None or self._loop is not loop:
+            # Первый вызов или новый event loop (тесты, перезапуск)
+            self._loop = loop
+            self._ready = asyncio.PriorityQueue()
+            self._workers = []
+            self._lanes = {}
+            self._unfinished = 0
+            self._idle = asyncio.Event()
+            self._idle.set()
+        self._workers = [w for w in self._workers if not w.done()]
+        while len(self._workers) < self.concurrency:
+            self._workers.append(loop.create_task(self._worker()))
+
+    def submit(
+        self,
+        chat_id: int,
+        text: str,
+        *,
+        parse_mode: Optional[str] = "HTML",
+        reply_markup: Any = None,
+        priority: Priority = Priority.NORMAL,
+        context: str = "",
+    ) -> asyncio.Future:
+        """Поставить сообщение в очередь; future вернёт True/False (не бросает)."""
+        self._ensure_workers()
+        future = asyncio.get_running_loop().create_future()
+        message = {
+            "chat_id": chat_id,
+            "text": text,
+            "parse_mode": parse_mode,
+            "reply_markup": reply_markup,
+            "context": context,
+            "attempt": 0,
+            "enqueued_at": time.perf_counter(),
+            "future": future,
+        }
+        lane = self._lane(chat_id)
+        heapq.heappush(lane.pending, (int(priority), next(self._seq), message))
+        self._unfinished += 1
+        self._idle.clear()
+        self._schedule(lane)
+        return future
+
+    async def send(self, chat_id: int, text: str, **kwargs) -> bool:
+        """Отправить через очередь и дождаться результата."""
+        return await self.submit(chat_id, text, **kwargs)
+
+    async def send_many(self, chat_ids: Iterable[int], text: str, **kwargs) -> int:
+        """Одно сообщение нескольким получателям параллельно; вернуть число успешных."""
+        futures = [self.submit(chat_id, text, **kwargs) for chat_id in chat_ids if chat_id]
+        results = await asyncio.gather(*futures)
+        return sum(1 for ok in results if ok)
+
+    def _lane(self, chat_id: int) -> _ChatLane:
+        lane = self._lanes.get(chat_id)
+        if lane is None:
+            # Отрицательный chat_id — группа/канал: у Telegram лимит в минуту
+            interval = 60 / self.group_rate_per_minute if chat_id < 0 else 1 / self.chat_rate
+            lane = self._lanes[chat_id] = _ChatLane(chat_id, _RateBudget(interval))
+        return lane
+
+    def _schedule(self, lane: _ChatLane) -> None:
+        """Отдать чат воркерам, когда его голова готова к отправке."""
+        if lane.busy or lane.timer is not None:
+            return
+        if not lane.pending:
+            self._release(lane)
+            return
+        priority, seq, _message = lane.pending[0]
+        if lane.ready_seq == seq:
+            return  # голова уже стоит в очереди готовых
+        delay = lane.budget.delay()
+        if delay > 0:
+            lane.timer = self._loop.call_later(delay, self._wake_lane, lane)
+            return
+        # Новая голова с более высоким приоритетом вытесняет прежнюю запись
+        lane.ready_seq = seq
+        self._ready.put_nowait((priority, seq, lane.chat_id))
+
+    def _release(self, lane: _ChatLane) -> None:
+        """Убрать опустевший чат, как только его бюджет восстановится.
+
+        Новое сообщение чату до этого момента попадёт в ту же очередь
+        и не обойдёт лимит; после — словарь чатов не растёт с числом
+        получателей.
+        """
+        delay = lane.budget.delay()
+        if delay > 0:
+            lane.timer = self._loop.call_later(delay, self._wake_lane, lane)
+        elif self._lanes.get(lane.chat_id) is lane:
+            del self._lanes[lane.chat_id]
+
+    def _wake_lane(self, lane: _ChatLane) -> None:
+        lane.timer = None
+        self._schedule(lane)
+
+    async def _worker(self):
+        while True:
+            _priority, seq, chat_id = await self._ready.get()
+            lane = self._lanes.get(chat_id)
+            if lane is None or lane.ready_seq != seq or lane.busy:
+                continue  # устаревшая запись
+            lane.ready_seq = None
+            _p, _s, message = heapq.heappop(lane.pending)
+            lane.busy = True
+            self._in_flight += 1
+            try:
+                ok = await self._deliver(lane, message)
+            except Exception as e:  # не даём воркеру умереть
+                logger.error(f"Telegram dispatcher worker error: {e}", exc_info=True)
+                ok = False
+            finally:
+                self._in_flight -= 1
+                lane.busy = False
+
+            if ok is None:
+                # Flood control — сообщение остаётся головой чата и ждёт паузу
+                heapq.heappush(lane.pending, (_p, _s, message))
+            else:
+                self._finish(message, ok)
+            self._schedule(lane)
+
+    def _finish(self, message: dict, ok: bool) -> None:
+        self._latencies_ms.append((time.perf_counter() - message["enqueued_at"]) * 1000)
+        if ok:
+            self.sent_total += 1
+        else:
+            self.failed_total += 1
+        if not message["future"].done():
+            message["future"].set_result(ok)
+        self._unfinished -= 1
+        if self._unfinished == 0:
+            self._idle.set()
+
+    async def _deliver(self, lane: _ChatLane, message: dict) -> Optional[bool]:
+        """Одна попытка отправки. None — повторить после паузы flood control."""
+        chat_id = message["chat_id"]
+        label = f"[{message['context']}] " if message["context"] else ""
+        message["attempt"] += 1
+
+        lane.budget.reserve()
+        await asyncio.sleep(self._global.reserve())
+        try:
+            await self.bot.send_message(
+                chat_id=chat_id,
+                text=message["text"],
+                parse_mode=message["parse_mode"],
+                reply_markup=message["reply_markup"],
+            )
+            return True
+        except TelegramRetryAfter as e:
+            self.retry_after_total += 1
+            # Flood control — притормаживаем всю отправку, не только этот чат
+            self._global.pause(e.retry_after)
+            lane.budget.pause(e.retry_after)
+            logger.warning(
+                f"{label}Telegram flood control for {chat_id}: retry after "
+                f"{e.retry_after}s (attempt {message['attempt']}/{self.max_attempts})"
+            )
+            return None if message["attempt"] < self.max_attempts else False
+        except Exception as e:
+            logger.warning(f"{label}Failed to send message to {chat_id}: {e}")
+            return False
+
+    async def drain(self):
+        """Дождаться отправки всего, что уже в очереди."""
+        if self._idle is not None:
+            await self._idle.wait()
+
+    async def close(self):
+        for worker in self._workers:
+            worker.cancel()
+        await asyncio.gather(*self._workers, return_exceptions=True)
+        for lane in self._lanes.values():
+            if lane.timer is not None:
+                lane.timer.cancel()
+        self._workers = []
+        self._lanes = {}
+        self._ready = None
+
+    @property
+    def queue_depth(self) -> int:
+        return sum(len(lane.pending) for lane in self._lanes.values())
+
+    def stats(self) -> dict:
+        latencies = sorted(self._latencies_ms)
+        p95 = latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))] if latencies else None
+        return {
+            "queue_depth": self.queue_depth,
+            "in_flight": self._in_flight,
+            "sent_total": self.sent_total,
+            "failed_total": self.failed_total,
+            "retry_after_total": self.retry_after_total,
+            "latency_avg_ms": round(sum(latencies) / len(latencies), 1) if latencies else None,
+            "latency_p95_ms": round(p95, 1) if p95 is not None else None,
+        }
+
+
+# Глобальный экземпляр
+telegram_dispatcher = TelegramDispatcher()
@@ -10,15 +10,19 @@
 """
 
 import logging
+import time
 from datetime import date, datetime, timedelta
 from typing import Any, Dict, List, Optional
 
 import requests
 
+from app.core import metrics
 from app.core.config import settings
 
 logger = logging.getLogger(__name__)
 
+_METRICS_HOOKS = {"response": metrics.requests_hook("yandex_travel")}
+
 BASE_URL = "https://whitelabel.travel.yandex-net.ru"
 # Пока White Label доступ не подтверждён — все запросы вернут 401.
 # После подтверждения (24 ч) здесь нужно уточнить точные пути к
@@ -44,8 +48,11 @@ class YandexTravelAPIService:
 
     def _get(self, path: str, params: Optional[Dict] = None, timeout: int = 10) -> Any:
         url = f"{BASE_URL}{path}"
+        started = time.perf_counter()
         try:
-            resp = requests.get(url, headers=self._headers(), params=params, timeout=timeout)
+            resp = requests.get(
+                url, headers=self._headers(), params=params, timeout=timeout, hooks=_METRICS_HOOKS
+            )
             if resp.status_code == 401:
                 logger.error("YaTr 401: проверьте YANDEX_TRAVEL_OAUTH_TOKEN и White Label статус")
                 return None
@@ -55,13 +62,17 @@ class YandexTravelAPIService:
             logger.error("YaTr GET %s → HTTP %s: %s", path, e.response.status_code if e.response else "?", e)
             return None
         except requests.exceptions.RequestException as e:
+            metrics.observe_external("yandex_travel", "GET", "error", time.perf_counter() - started)
             logger.error("YaTr GET %s → %s", path, e)
             return None
 
     def _post(self, path: str, body: Dict, timeout: int = 15) -> Any:
         url = f"{BASE_URL}{path}"
+        started = time.perf_counter()
         try:
-            resp = requests.post(url, headers=self._headers(), json=body, timeout=timeout)
+            resp = requests.post(
+                url, headers=self._headers(), json=body, timeout=timeout, hooks=_METRICS_HOOKS
+            )
             if resp.status_code == 401:
                 logger.error("YaTr 401: проверьте YANDEX_TRAVEL_OAUTH_TOKEN и White Label статус")
                 return None
@@ -71,6 +82,7 @@ class YandexTravelAPIService:
             logger.error("YaTr POST %s → HTTP %s: %s", path, e.response.status_code if e.response else "?", e)
             return None
         except requests.exceptions.RequestException as e:
+            metrics.observe_external("yandex_travel", "POST", "error", time.perf_counter() - started)
             logger.error("YaTr POST %s → %s", path, e)
             return None
 
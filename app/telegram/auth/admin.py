@@ -1,36 +1,168 @@
+import logging
 import os
-from sqlalchemy import select
+
+from sqlalchemy import Integer, String, cast, event, select
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.orm import Session
+
 from app.core.config import settings
 from app.database import AsyncSessionLocal
-from app.models import User, UserRole
+from app.models import GlobalSetting, User, UserRole
+
+logger = logging.getLogger(__name__)
 
+# Версия кеша ролей в global_settings: растёт при каждой записи в users
+# через этот модуль. Другой процесс (отдельный воркер бота) сравнивает её
+# со своей и перечитывает users только при расхождении.
+USERS_CACHE_VERSION_KEY = "users_cache_version"
 
 # Глобальный кеш пользователей
+_env_admins: frozenset[int] | None = None
+_user_roles: dict[int, UserRole] = {}
 _db_admins: set[int] = set()
 _db_cleaners: set[int] = set()
 _db_guests: set[int] = set()
+_cache_version: int = 0
 
+_ROLE_SETS = {
+    UserRole.ADMIN: _db_admins,
+    UserRole.CLEANER: _db_cleaners,
+    UserRole.GUEST: _db_guests,
+}
 
-def get_env_admins() -> set[int]:
-    """Получает админов из переменных окружения"""
+
+def _parse_env_admins() -> frozenset[int]:
     raw = os.getenv("ADMIN_TELEGRAM_IDS", "")
     ids = {int(x.strip()) for x in raw.split(",") if x.strip()}
     if settings.telegram_chat_id:
         ids.add(int(settings.telegram_chat_id))
-    return ids
+    return frozenset(ids)
+
+
+def get_env_admins() -> frozenset[int]:
+    """Получает админов из переменных окружения (разбирается один раз)"""
+    global _env_admins
+    if _env_admins is None:
+        _env_admins = _parse_env_admins()
+    return _env_admins
+
+
+def reload_env_admins() -> frozenset[int]:
+    """Перечитывает ADMIN_TELEGRAM_IDS (после смены окружения)"""
+    global _env_admins
+    _env_admins = _parse_env_admins()
+    return _env_admins
+
+
+def _cache_put(telegram_id: int | None, role: UserRole | None):
+    """Точечно обновляет кеш одного пользователя (role=None — удалить)"""
+    if telegram_id is None:
+        return
+    old = _user_roles.pop(telegram_id, None)
+    if old in _ROLE_SETS:
+        _ROLE_SETS[old].discard(telegram_id)
+    if role is not None:
+        _user_roles[telegram_id] = role
+        if role in _ROLE_SETS:
+            _ROLE_SETS[role].add(telegram_id)
+
+
+# Ключ session.info: изменения кеша, ждущие коммита транзакции
+_PENDING_CACHE_KEY = "users_cache_pending"
+
+
+def _on_commit(session, telegram_id: int | None, role: UserRole | None, version: int):
+    """Применить запись к кешу после коммита транзакции сессии.
+
+    Сессию апдейта коммитит DbSessionMiddleware уже после хэндлера;
+    при откате кеш не меняется.
+    """
+    session.sync_session.info.setdefault(_PENDING_CACHE_KEY, []).append(
+        (telegram_id, role, version)
+    )
+
+
+@event.listens_for(Session, "after_commit")
+def _apply_pending_cache(session):
+    for telegram_id, role, version in session.info.pop(_PENDING_CACHE_KEY, []):
+        _cache_put(telegram_id, role)
+        _mark_written(version)
+
+
+@event.listens_for(Session, "after_rollback")
+def _drop_pending_cache(session):
+    session.info.pop(_PENDING_CACHE_KEY, None)
+
+
+async def _bump_cache_version(session) -> int:
+    """Атомарно увеличивает версию кеша в текущей транзакции"""
+    stmt = (
+        sqlite_insert(GlobalSetting)
+        .values(key=USERS_CACHE_VERSION_KEY, value="1", description="Версия кеша ролей")
+        .on_conflict_do_update(
+            index_elements=[GlobalSetting.key],
+            set_={"value": cast(cast(GlobalSetting.value, Integer) + 1, String)},
+        )
+        .returning(GlobalSetting.value)
+    )
+    result = await session.execute(stmt)
+    return int(result.scalar_one())
+
+
+async def _read_cache_version(session) -> int:
+    result = await session.execute(
+        select(GlobalSetting.value).where(GlobalSetting.key == USERS_CACHE_VERSION_KEY)
+    )
+    value = result.scalar_one_or_none()
+    try:
+        return int(value) if value else 0
+    except ValueError:
+        return 0
+
+
+def get_cache_version() -> int:
+    """Версия, с которой сейчас согласован локальный кеш"""
+    return _cache_version
 
 
 async def refresh_users_cache():
-    """Обновляет кеш пользователей из БД"""
-    global _db_admins, _db_cleaners, _db_guests
+    """Полностью перечитывает кеш пользователей из БД"""
+    global _cache_version
 
     async with AsyncSessionLocal() as session:
-        result = await session.execute(select(User))
-        users = result.scalars().all()
+        version = await _read_cache_version(session)
+        result = await session.execute(select(User.telegram_id, User.role))
+        rows = result.all()
+
+    _user_roles.clear()
+    for role_set in _ROLE_SETS.values():
+        role_set.clear()
+    for telegram_id, role in rows:
+        _cache_put(telegram_id, role)
+    _cache_version = version
 
-        _db_admins = {u.telegram_id for u in users if u.role == UserRole.ADMIN}
-        _db_cleaners = {u.telegram_id for u in users if u.role == UserRole.CLEANER}
-        _db_guests = {u.telegram_id for u in users if u.role == UserRole.GUEST}
+
+async def sync_users_cache() -> bool:
+    """Перечитывает кеш, только если версия в БД ушла вперёд.
+
+    Стоит одного чтения по первичному ключу; возвращает True, если кеш
+    был перечитан.
+    """
+    async with AsyncSessionLocal() as session:
+        version = await _read_cache_version(session)
+    if version == _cache_version:
+        return False
+    logger.info(f"Users cache is stale ({_cache_version} -> {version}), reloading")
+    await refresh_users_cache()
+    return True
+
+
+def _mark_written(version: int):
+    """Версия после собственной записи. Если между нашими записями кто-то
+    писал из другого процесса — оставляем старую, чтобы sync её подхватил."""
+    global _cache_version
+    if version == _cache_version + 1:
+        _cache_version = version
 
 
 def is_admin(user_id: int) -> bool:
@@ -49,77 +181,87 @@ def is_guest(user_id: int) -> bool:
 
 
 async def add_user(
-    telegram_id: int, role: UserRole, name: str, phone: str = None
+    telegram_id: int, role: UserRole, name: str, phone: str = None, *, session=None
 ) -> bool:
-    """Добавляет пользователя в БД и обновляет кеш"""
-    async with AsyncSessionLocal() as session:
-        # Проверяем, существует ли уже
-        existing = await session.execute(
-            select(User).where(User.telegram_id == telegram_id)
-        )
-        if existing.scalar_one_or_none():
-            return False
+    """Добавляет пользователя в БД и обновляет кеш
 
-        user = User(telegram_id=telegram_id, role=role, name=name, phone=phone)
-        session.add(user)
-        await session.commit()
+    session — сессия апдейта (из DbSessionMiddleware): запись только
+    flush-ится, коммит и обновление кеша — по коммиту этой сессии.
+    Без неё открывается и коммитится своя.
+    """
+    if session is None:
+        async with AsyncSessionLocal() as s:
+            added = await add_user(telegram_id, role, name, phone, session=s)
+            await s.commit()
+            return added
 
-    await refresh_users_cache()
+    # Проверяем, существует ли уже
+    existing = await session.execute(
+        select(User).where(User.telegram_id == telegram_id)
+    )
+    if existing.scalar_one_or_none():
+        return False
+
+    user = User(telegram_id=telegram_id, role=role, name=name, phone=phone)
+    session.add(user)
+    version = await _bump_cache_version(session)
+    await session.flush()
+    _on_commit(session, telegram_id, role, version)
     return True
 
 
-async def remove_user(telegram_id: int) -> bool:
-    """Удаляет пользователя из БД и обновляет кеш"""
-    async with AsyncSessionLocal() as session:
-        result = await session.execute(
-            select(User).where(User.telegram_id == telegram_id)
-        )
-        user = result.scalar_one_or_none()
+async def _delete_user(*conditions, session=None) -> bool:
+    if session is None:
+        async with AsyncSessionLocal() as s:
+            removed = await _delete_user(*conditions, session=s)
+            await s.commit()
+            return removed
 
-        if not user:
-            return False
+    result = await session.execute(select(User).where(*conditions))
+    user = result.scalar_one_or_none()
 
-        await session.delete(user)
-        await session.commit()
+    if not user:
+        return False
 
-    await refresh_users_cache()
+    telegram_id = user.telegram_id
+    await session.delete(user)
+    version = await _bump_cache_version(session)
+    await session.flush()
+    _on_commit(session, telegram_id, None, version)
     return True
 
 
-async def remove_guest_user(telegram_id: int) -> bool:
-    """Удаляет ТОЛЬКО гостя (без риска снести админа/уборщицу)."""
-    async with AsyncSessionLocal() as session:
-        result = await session.execute(
-            select(User).where(
-                User.telegram_id == telegram_id,
-                User.role == UserRole.GUEST,
-            )
-        )
-        user = result.scalar_one_or_none()
-
-        if not user:
-            return False
+async def remove_user(telegram_id: int) -> bool:
+    """Удаляет пользователя из БД и обновляет кеш"""
+    return await _delete_user(User.telegram_id == telegram_id)
 
-        await session.delete(user)
-        await session.commit()
 
-    await refresh_users_cache()
-    return True
+async def remove_guest_user(telegram_id: int, *, session=None) -> bool:
+    """Удаляет ТОЛЬКО гостя (без риска снести админа/уборщицу)."""
+    return await _delete_user(
+        User.telegram_id == telegram_id,
+        User.role == UserRole.GUEST,
+        session=session,
+    )
 
 
-async def get_all_users() -> list[User]:
-    """Возвращает всех пользователей из БД"""
-    async with AsyncSessionLocal() as session:
-        result = await session.execute(select(User).order_by(User.id))
-        return list(result.scalars().all())
+async def get_all_users(session=None) -> list[User]:
+    """Возвращает всех пользователей из БД (в сессии апдейта, если передана)"""
+    if session is None:
+        async with AsyncSessionLocal() as s:
+            return await get_all_users(s)
+    result = await session.execute(select(User).order_by(User.id))
+    return list(result.scalars().all())
 
 
-async def get_user_name(user_id: int) -> str | None:
-    """Возвращает имя пользователя из БД"""
-    async with AsyncSessionLocal() as session:
-        result = await session.execute(select(User).where(User.telegram_id == user_id))
-        user = result.scalar_one_or_none()
-        return user.name if user else None
+async def get_user_name(user_id: int, session=None) -> str | None:
+    """Возвращает имя пользователя из БД (в сессии апдейта, если передана)"""
+    if session is None:
+        async with AsyncSessionLocal() as s:
+            return await get_user_name(user_id, s)
+    result = await session.execute(select(User).where(User.telegram_id == user_id))
+    user = result.scalar_one_or_none()
+    return user.name if user else None
 
 
 async def resolve_user_db_id(session, telegram_id: int) -> int | None:
@@ -130,6 +272,8 @@ async def resolve_user_db_id(session, telegram_id: int) -> int | None:
 
     Возвращает None, если пользователь ещё не зарегистрирован в БД.
     Принимает либо открытую AsyncSession, либо None — тогда открывает свою.
+    В хэндлерах передавайте сессию апдейта (`session` из DbSessionMiddleware),
+    чтобы не открывать лишнее соединение.
     """
     if session is None:
         async with AsyncSessionLocal() as s:
@@ -142,10 +142,9 @@ async def select_checkin_date(callback: CallbackQuery):
     selected_date = datetime.date.fromisoformat(date_str)
 
     # Сохраняем дату заезда
-    if user_id not in availability_states:
-        availability_states[user_id] = AvailabilityState()
-
-    availability_states[user_id].check_in = selected_date
+    state = availability_states.get(user_id) or AvailabilityState()
+    state.check_in = selected_date
+    availability_states[user_id] = state
 
     # Показываем календарь для выбора даты выезда
     await callback.message.edit_text(
@@ -218,6 +217,7 @@ async def select_checkout_date(callback: CallbackQuery):
         return
 
     state.check_out = selected_date
+    availability_states[user_id] = state
 
     # Вычисляем количество ночей
     nights = (selected_date - state.check_in).days
@@ -6,7 +6,6 @@ from aiogram import Router
 from aiogram.filters import Command
 from aiogram.types import Message
 
-from app.services.avito_sync_service import sync_all_avito_items
 from app.core.config import settings
 
 router = Router()
@@ -52,7 +51,9 @@ async def fetch_from_avito(message: Message):
                 # Если нет маппинга, используем item_id как есть и house_id=1
                 item_house_mapping[int(pair)] = 1
 
-        # Синхронизация
+        # Синхронизация (клиент Avito импортируется только при вызове команды)
+        from app.services.avito_sync_service import format_item_timings, sync_all_avito_items
+
         stats = await sync_all_avito_items(item_house_mapping)
 
         await message.answer(
@@ -61,8 +62,9 @@ async def fetch_from_avito(message: Message):
             f"• Всего броней: {stats['total']}\n"
             f"• Новых: {len(stats['new_bookings'])}\n"
             f"• Обновлено: {len(stats['updated_bookings'])}\n"
-            f"• Ошибок: {stats['errors']}\n\n"
-            f"• Ошибок: {stats['errors']}\n\n"
+            f"• Ошибок: {stats['errors']}\n"
+            f"• Время: {stats['duration_ms'] / 1000:.1f} с\n"
+            f"<code>{format_item_timings(stats['items'])}</code>\n\n"
             f"🔄 Обновляю Google таблицу..."
         )
 
@@ -76,9 +78,9 @@ async def fetch_from_avito(message: Message):
             await notify_updated_bookings(stats["updated_bookings"])
 
         # 2. Синхронизация с таблицей
-        from app.services.sheets_service import sheets_service
+        from app.services.sheets_sync_coordinator import sheets_sync_coordinator
 
-        await sheets_service.sync_if_needed(force=True)
+        await sheets_sync_coordinator.sync_now("manual_avito_fetch")
 
         await message.answer("✅ Google таблица обновлена!")
 
@@ -103,7 +105,7 @@ async def test_avito_connection(message: Message):
         from app.services.avito_api_service import avito_api_service
 
         # Пытаемся получить токен (проверка авторизации)
-        avito_api_service.get_access_token()
+        await avito_api_service.get_access_token()
 
         await message.answer(
             f"✅ <b>Подключение успешно!</b>\n\n"
@@ -13,7 +13,6 @@ from sqlalchemy.orm import joinedload
 from app.database import AsyncSessionLocal
 from app.models import Booking, BookingSource, BookingStatus
 from app.core.config import settings
-from app.jobs.avito_sync_job import sync_avito_job
 from app.telegram.ui.booking_format import BOOKING_SOURCE_EMOJI, BOOKING_STATUS_EMOJI
 
 router = Router()
@@ -384,6 +383,8 @@ async def sync_and_open_table(callback: CallbackQuery):
     )
 
     # 1. Синхронизация с Avito (получение новых броней)
+    from app.jobs.avito_sync_job import sync_avito_job
+
     await sync_avito_job()
 
     # 1.5 Проверка и блокировка локальных броней в Avito
@@ -401,51 +402,26 @@ async def sync_and_open_table(callback: CallbackQuery):
             item_house_mapping[int(item_id)] = int(house_id)
 
     if item_house_mapping:
-        await verify_local_bookings_in_avito(item_house_mapping)
+        # Ручной синк — пушим календари без сверки с последним отправленным
+        await verify_local_bookings_in_avito(item_house_mapping, force=True)
 
     # 2. Обновление статуса
     await callback.message.edit_text(
         "⏳ <b>Обновляем Google Sheets...</b>", parse_mode="HTML"
     )
 
-    # 3. Принудительная синхронизация таблицы
-    # Используем to_thread т.к. sync_bookings_to_sheet синхронная, но вызываем через сервис для правильности
-    from app.services.sheets_service import sheets_service
-    import asyncio
-
-    # Получаем актуальные брони для таблицы
-    async with AsyncSessionLocal() as session:
-        stmt = (
-            select(Booking)
-            .options(joinedload(Booking.house))
-            .order_by(Booking.check_in)
-        )
-        result = await session.execute(stmt)
-        bookings = result.scalars().all()
+    # 3. Принудительная синхронизация таблицы — через координатор,
+    # чтобы не пересечься с фоновым синком
+    from app.services.sheets_sync_coordinator import sheets_sync_coordinator
 
-    # Отправляем в GS
-    try:
-        await asyncio.to_thread(sheets_service.sync_bookings_to_sheet, bookings)
+    if await sheets_sync_coordinator.sync_now("manual", force=True, full=True):
         status_text = "✅ <b>Синхронизация завершена!</b>\n\nДанные актуализированы."
-    except Exception as e:
-        import traceback
-
-        error_details = traceback.format_exc()
-        # Логируем ошибку, но не отправляем юзеру страшный текст, если это не invalid_grant
-        if "invalid_grant" in str(e):
-            status_text = (
-                "⚠️ <b>Ошибка доступа к Google Таблице!</b>\n\n"
-                "Система не может обновить таблицу. Возможно, устарели ключи доступа или удален сервисный аккаунт.\n"
-                "Синхронизация с Avito прошла успешно, но таблица не обновлена."
-            )
-        else:
-            status_text = (
-                f"⚠️ <b>Ошибка при обновлении таблицы!</b>\n\n"
-                f"Синхронизация с Avito прошла, но таблицу обновить не удалось.\n"
-                f"Детали ошибки: {str(e)}"
-            )
-        # Логируем в консоль для админа
-        print(f"Sheets Sync Error: {error_details}")
+    else:
+        status_text = (
+            "⚠️ <b>Ошибка при обновлении таблицы!</b>\n\n"
+            "Синхронизация с Avito прошла, но таблицу обновить не удалось.\n"
+            "Проверьте доступ к Google Таблице (подробности в логах)."
+        )
 
     # 4. Финиш - даем ссылку
     sheet_link = f"https://docs.google.com/spreadsheets/d/{settings.google_sheets_spreadsheet_id}"
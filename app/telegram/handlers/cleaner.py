@@ -8,6 +8,7 @@ from aiogram.types import (
     InlineKeyboardButton,
 )
 from sqlalchemy import select, and_
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import joinedload
 
 from app.database import AsyncSessionLocal
@@ -30,47 +31,52 @@ ACTIVE_BOOKING_STATUSES = [
 router = Router()
 
 
-async def get_cleaning_schedule(start_date: date, end_date: date) -> list[Booking]:
+async def get_cleaning_schedule(session: AsyncSession, start_date: date, end_date: date) -> list[Booking]:
     """Получает список броней, у которых выезд в заданном диапазоне"""
-    async with AsyncSessionLocal() as session:
-        query = (
-            select(Booking)
-            .options(joinedload(Booking.house))
-            .where(
-                and_(
-                    Booking.status.in_(ACTIVE_BOOKING_STATUSES),
-                    Booking.check_out >= start_date,
-                    Booking.check_out <= end_date,
-                )
+    query = (
+        select(Booking)
+        .options(joinedload(Booking.house))
+        .where(
+            and_(
+                Booking.status.in_(ACTIVE_BOOKING_STATUSES),
+                Booking.check_out >= start_date,
+                Booking.check_out <= end_date,
             )
-            .order_by(Booking.check_out)
         )
+        .order_by(Booking.check_out)
+    )
+
+    result = await session.execute(query)
+    bookings = result.scalars().all()
+    return list(bookings)
 
-        result = await session.execute(query)
-        bookings = result.scalars().all()
-        return list(bookings)
 
+async def get_nearest_checkouts(session: AsyncSession | None = None) -> str:
+    """Формирует строку с ближайшими выездами по домам.
+
+    session — сессия апдейта; без неё (вызов из других модулей) открывается своя.
+    """
+    if session is None:
+        async with AsyncSessionLocal() as s:
+            return await get_nearest_checkouts(s)
 
-async def get_nearest_checkouts() -> str:
-    """Формирует строку с ближайшими выездами по домам"""
     today = date.today()
     prospect_date = today + timedelta(days=7)
 
-    async with AsyncSessionLocal() as session:
-        query = (
-            select(Booking)
-            .options(joinedload(Booking.house))
-            .where(
-                and_(
-                    Booking.status.in_(ACTIVE_BOOKING_STATUSES),
-                    Booking.check_out >= today,
-                    Booking.check_out <= prospect_date,
-                )
+    query = (
+        select(Booking)
+        .options(joinedload(Booking.house))
+        .where(
+            and_(
+                Booking.status.in_(ACTIVE_BOOKING_STATUSES),
+                Booking.check_out >= today,
+                Booking.check_out <= prospect_date,
             )
-            .order_by(Booking.check_out)
         )
-        result = await session.execute(query)
-        bookings = list(result.scalars().all())
+        .order_by(Booking.check_out)
+    )
+    result = await session.execute(query)
+    bookings = list(result.scalars().all())
 
     if not bookings:
         return "  Нет выездов на ближайшую неделю."
@@ -87,25 +93,27 @@ async def get_nearest_checkouts() -> str:
 
 
 @router.callback_query(F.data == "cleaner:menu")
-async def cleaner_menu_callback(callback: CallbackQuery):
+async def cleaner_menu_callback(callback: CallbackQuery, session: AsyncSession):
     from app.telegram.handlers.cleaner_payments import _cleaner_photo_msgs
     for msg_id in _cleaner_photo_msgs.pop(callback.from_user.id, []):
         try:
             await callback.bot.delete_message(callback.message.chat.id, msg_id)
         except Exception:
             pass
-    await show_cleaner_menu(callback, callback.from_user.id)
+    await show_cleaner_menu(callback, callback.from_user.id, session)
     # await callback.answer() # answer is handled in show_cleaner_menu if it's a callback
 
 
-async def show_cleaner_menu(event: Message | CallbackQuery, user_id: int):
+async def show_cleaner_menu(
+    event: Message | CallbackQuery, user_id: int, session: AsyncSession | None = None
+):
     """Главное меню уборщицы"""
-    name = await get_user_name(user_id) or "друг"
+    name = await get_user_name(user_id, session) or "друг"
     if isinstance(event, Message) and event.from_user:
         if event.from_user.first_name:
-            name = await get_user_name(user_id) or event.from_user.first_name
+            name = await get_user_name(user_id, session) or event.from_user.first_name
 
-    nearest_summary = await get_nearest_checkouts()
+    nearest_summary = await get_nearest_checkouts(session)
 
     text = (
         f"👋 <b>Добрый день, {name}!</b>\n\n"
@@ -135,28 +143,27 @@ async def show_cleaner_menu(event: Message | CallbackQuery, user_id: int):
             pass
 
 
-async def get_all_upcoming_bookings() -> list[Booking]:
+async def get_all_upcoming_bookings(session: AsyncSession) -> list[Booking]:
     """Получает ВСЕ предстоящие подтвержденные брони"""
     today = date.today()
-    async with AsyncSessionLocal() as session:
-        query = (
-            select(Booking)
-            .options(joinedload(Booking.house))
-            .where(
-                and_(
-                    Booking.status.in_(ACTIVE_BOOKING_STATUSES),
-                    Booking.check_out >= today,
-                )
+    query = (
+        select(Booking)
+        .options(joinedload(Booking.house))
+        .where(
+            and_(
+                Booking.status.in_(ACTIVE_BOOKING_STATUSES),
+                Booking.check_out >= today,
             )
-            .order_by(Booking.check_in)
-        )  # Сортируем по заезду
+        )
+        .order_by(Booking.check_in)
+    )  # Сортируем по заезду
 
-        result = await session.execute(query)
-        return list(result.scalars().all())
+    result = await session.execute(query)
+    return list(result.scalars().all())
 
 
 @router.callback_query(F.data.startswith("cleaner:schedule:"))
-async def show_schedule(callback: CallbackQuery):
+async def show_schedule(callback: CallbackQuery, session: AsyncSession):
     """Показать график уборок"""
     mode = callback.data.split(":")[2]
     today = date.today()
@@ -166,27 +173,27 @@ async def show_schedule(callback: CallbackQuery):
     is_list_view = False
 
     if mode == "today":
-        bookings = await get_cleaning_schedule(today, today)
+        bookings = await get_cleaning_schedule(session, today, today)
         title = "на СЕГОДНЯ"
     elif mode == "tomorrow":
         bookings = await get_cleaning_schedule(
-            today + timedelta(days=1), today + timedelta(days=1)
+            session, today + timedelta(days=1), today + timedelta(days=1)
         )
         title = "на ЗАВТРА"
     elif mode == "week":
-        bookings = await get_cleaning_schedule(today, today + timedelta(days=7))
+        bookings = await get_cleaning_schedule(session, today, today + timedelta(days=7))
         title = "на НЕДЕЛЮ"
     elif mode == "week_full":
-        bookings = await get_cleaning_schedule(today, today + timedelta(days=7))
+        bookings = await get_cleaning_schedule(session, today, today + timedelta(days=7))
         title = "на НЕДЕЛЮ"
         is_list_view = True
     elif mode == "month":
-        days = await _get_cleaner_schedule_days(callback.from_user.id)
-        bookings = await get_cleaning_schedule(today, today + timedelta(days=days))
+        days = await _get_cleaner_schedule_days(session, callback.from_user.id)
+        bookings = await get_cleaning_schedule(session, today, today + timedelta(days=days))
         title = f"на {days} дней"
         is_list_view = True
     elif mode == "all":
-        bookings = await get_all_upcoming_bookings()
+        bookings = await get_all_upcoming_bookings(session)
         title = "ВСЕ БРОНИ"
         is_list_view = True
 
@@ -243,7 +250,7 @@ async def show_schedule(callback: CallbackQuery):
             )
 
     reply_markup = (
-        await _week_full_keyboard(bookings) if mode == "week_full" else get_cleaner_keyboard()
+        await _week_full_keyboard(session, bookings) if mode == "week_full" else get_cleaner_keyboard()
     )
 
     try:
@@ -255,32 +262,30 @@ async def show_schedule(callback: CallbackQuery):
     await callback.answer()
 
 
-async def _week_full_keyboard(bookings: list) -> InlineKeyboardMarkup:
+async def _week_full_keyboard(session: AsyncSession, bookings: list) -> InlineKeyboardMarkup:
     """Build week_full keyboard: accept buttons for unacked bookings + main menu."""
     rows = []
-    async with AsyncSessionLocal() as session:
-        for b in bookings:
-            ack = await get_ack_status(session, b.id)
-            if ack not in ("acked", "declined"):
-                house_name = b.house.name if b.house else f"Дом {b.house_id}"
-                rows.append([InlineKeyboardButton(
-                    text=f"✅ Принять: {house_name} {b.check_out.strftime('%d.%m')}",
-                    callback_data=f"cleaner:preaccept:{b.id}",
-                )])
+    for b in bookings:
+        ack = await get_ack_status(session, b.id)
+        if ack not in ("acked", "declined"):
+            house_name = b.house.name if b.house else f"Дом {b.house_id}"
+            rows.append([InlineKeyboardButton(
+                text=f"✅ Принять: {house_name} {b.check_out.strftime('%d.%m')}",
+                callback_data=f"cleaner:preaccept:{b.id}",
+            )])
     rows.append([InlineKeyboardButton(text="🏠 Меню", callback_data="cleaner:menu")])
     return InlineKeyboardMarkup(inline_keyboard=rows)
 
 
 @router.callback_query(F.data.startswith("cleaner:preaccept:"))
-async def preaccept_booking_callback(callback: CallbackQuery):
+async def preaccept_booking_callback(callback: CallbackQuery, session: AsyncSession):
     """Pre-accept checkout from week view — skips day-before reminder chain."""
     booking_id = int(callback.data.split(":")[-1])
-    async with AsyncSessionLocal() as session:
-        await set_ack_status(session, booking_id, "acked")
+    await set_ack_status(session, booking_id, "acked")
 
     today = date.today()
-    bookings = await get_cleaning_schedule(today, today + timedelta(days=7))
-    new_kb = await _week_full_keyboard(bookings)
+    bookings = await get_cleaning_schedule(session, today, today + timedelta(days=7))
+    new_kb = await _week_full_keyboard(session, bookings)
     try:
         await callback.message.edit_reply_markup(reply_markup=new_kb)
     except Exception:
@@ -289,11 +294,10 @@ async def preaccept_booking_callback(callback: CallbackQuery):
 
 
 @router.callback_query(F.data.startswith("cleaner:ack_checkout:"))
-async def ack_checkout_callback(callback: CallbackQuery):
+async def ack_checkout_callback(callback: CallbackQuery, session: AsyncSession):
     """Cleaner confirmed checkout ack from job notification message."""
     booking_id = int(callback.data.split(":")[-1])
-    async with AsyncSessionLocal() as session:
-        await set_ack_status(session, booking_id, "acked")
+    await set_ack_status(session, booking_id, "acked")
 
     try:
         await callback.message.edit_reply_markup(reply_markup=None)
@@ -306,18 +310,17 @@ async def ack_checkout_callback(callback: CallbackQuery):
 
 
 @router.callback_query(F.data.startswith("cleaner:decline_checkout:"))
-async def decline_checkout_callback(callback: CallbackQuery):
+async def decline_checkout_callback(callback: CallbackQuery, session: AsyncSession):
     """Cleaner declined checkout ack from job notification message."""
     booking_id = int(callback.data.split(":")[-1])
 
-    async with AsyncSessionLocal() as session:
-        await set_ack_status(session, booking_id, "declined")
-        from sqlalchemy import select as sa_select
-        q = await session.execute(
-            sa_select(Booking).options(joinedload(Booking.house)).where(Booking.id == booking_id)
-        )
-        booking = q.scalar_one_or_none()
-        house_name = booking.house.name if booking and booking.house else f"Бронь #{booking_id}"
+    await set_ack_status(session, booking_id, "declined")
+    from sqlalchemy import select as sa_select
+    q = await session.execute(
+        sa_select(Booking).options(joinedload(Booking.house)).where(Booking.id == booking_id)
+    )
+    booking = q.scalar_one_or_none()
+    house_name = booking.house.name if booking and booking.house else f"Бронь #{booking_id}"
 
     try:
         await callback.message.edit_reply_markup(reply_markup=None)
@@ -394,39 +397,37 @@ async def decline_cleaning(callback: CallbackQuery):
     await callback.answer("Администратор оповещен", show_alert=True)
 
 
-async def _get_cleaner_schedule_days(telegram_id: int) -> int:
-    db_id = await resolve_user_db_id(None, telegram_id)
+async def _get_cleaner_schedule_days(session: AsyncSession, telegram_id: int) -> int:
+    db_id = await resolve_user_db_id(session, telegram_id)
     if not db_id:
         return 30
-    async with AsyncSessionLocal() as s:
-        setting = await s.get(GlobalSetting, f"cleaner_schedule_days_{db_id}")
-        if setting and setting.value:
-            try:
-                return int(setting.value)
-            except ValueError:
-                pass
+    setting = await session.get(GlobalSetting, f"cleaner_schedule_days_{db_id}")
+    if setting and setting.value:
+        try:
+            return int(setting.value)
+        except ValueError:
+            pass
     return 30
 
 
-async def _get_cleaner_notify_days(db_id: int) -> int:
+async def _get_cleaner_notify_days(session: AsyncSession, db_id: int) -> int:
     """0 = выкл, иначе кол-во дней до выезда для заблаговременного уведомления."""
-    async with AsyncSessionLocal() as s:
-        setting = await s.get(GlobalSetting, f"cleaner_notify_days_{db_id}")
-        if setting and setting.value:
-            try:
-                return int(setting.value)
-            except ValueError:
-                pass
+    setting = await session.get(GlobalSetting, f"cleaner_notify_days_{db_id}")
+    if setting and setting.value:
+        try:
+            return int(setting.value)
+        except ValueError:
+            pass
     return 7  # по умолчанию за 7 дней
 
 
 @router.callback_query(F.data == "cleaner:settings")
-async def cleaner_settings_menu(callback: CallbackQuery):
+async def cleaner_settings_menu(callback: CallbackQuery, session: AsyncSession):
     if not callback.from_user:
         return
-    db_id = await resolve_user_db_id(None, callback.from_user.id)
-    days = await _get_cleaner_schedule_days(callback.from_user.id)
-    notify_days = await _get_cleaner_notify_days(db_id) if db_id else 7
+    db_id = await resolve_user_db_id(session, callback.from_user.id)
+    days = await _get_cleaner_schedule_days(session, callback.from_user.id)
+    notify_days = await _get_cleaner_notify_days(session, db_id) if db_id else 7
 
     notify_label = "выкл" if notify_days == 0 else f"за {notify_days} дн."
     text = (
@@ -457,30 +458,29 @@ async def cleaner_noop(callback: CallbackQuery):
 
 
 @router.callback_query(F.data.startswith("cleaner:settings:days:"))
-async def cleaner_settings_days_save(callback: CallbackQuery):
+async def cleaner_settings_days_save(callback: CallbackQuery, session: AsyncSession):
     if not callback.from_user:
         return
     days = int(callback.data.split(":")[-1])
-    db_id = await resolve_user_db_id(None, callback.from_user.id)
+    db_id = await resolve_user_db_id(session, callback.from_user.id)
     if db_id:
-        async with AsyncSessionLocal() as s:
-            key = f"cleaner_schedule_days_{db_id}"
-            setting = await s.get(GlobalSetting, key)
-            if setting:
-                setting.value = str(days)
-            else:
-                s.add(GlobalSetting(key=key, value=str(days), description=f"Schedule days for cleaner {db_id}"))
-            await s.commit()
+        key = f"cleaner_schedule_days_{db_id}"
+        setting = await session.get(GlobalSetting, key)
+        if setting:
+            setting.value = str(days)
+        else:
+            session.add(GlobalSetting(key=key, value=str(days), description=f"Schedule days for cleaner {db_id}"))
+        await session.commit()
     await callback.answer(f"Сохранено: {days} дней")
-    await cleaner_settings_menu(callback)
+    await cleaner_settings_menu(callback, session)
 
 
 @router.callback_query(F.data == "cleaner:settings:notify")
-async def cleaner_settings_notify_menu(callback: CallbackQuery):
+async def cleaner_settings_notify_menu(callback: CallbackQuery, session: AsyncSession):
     if not callback.from_user:
         return
-    db_id = await resolve_user_db_id(None, callback.from_user.id)
-    notify_days = await _get_cleaner_notify_days(db_id) if db_id else 7
+    db_id = await resolve_user_db_id(session, callback.from_user.id)
+    notify_days = await _get_cleaner_notify_days(session, db_id) if db_id else 7
     notify_label = "выкл" if notify_days == 0 else f"за {notify_days} дн."
     text = (
         f"🔔 <b>Уведомления о предстоящих выездах</b>\n\n"
@@ -503,23 +503,22 @@ async def cleaner_settings_notify_menu(callback: CallbackQuery):
 
 
 @router.callback_query(F.data.startswith("cleaner:settings:notify:"))
-async def cleaner_settings_notify_save(callback: CallbackQuery):
+async def cleaner_settings_notify_save(callback: CallbackQuery, session: AsyncSession):
     if not callback.from_user:
         return
     val = int(callback.data.split(":")[-1])
-    db_id = await resolve_user_db_id(None, callback.from_user.id)
+    db_id = await resolve_user_db_id(session, callback.from_user.id)
     if db_id:
-        async with AsyncSessionLocal() as s:
-            key = f"cleaner_notify_days_{db_id}"
-            setting = await s.get(GlobalSetting, key)
-            if setting:
-                setting.value = str(val)
-            else:
-                s.add(GlobalSetting(key=key, value=str(val), description=f"Notify days for cleaner {db_id}"))
-            await s.commit()
+        key = f"cleaner_notify_days_{db_id}"
+        setting = await session.get(GlobalSetting, key)
+        if setting:
+            setting.value = str(val)
+        else:
+            session.add(GlobalSetting(key=key, value=str(val), description=f"Notify days for cleaner {db_id}"))
+        await session.commit()
     label = "выключены" if val == 0 else f"за {val} дн."
     await callback.answer(f"Уведомления: {label}")
-    await cleaner_settings_menu(callback)
+    await cleaner_settings_menu(callback, session)
 
 
 HELP_TEXT = """❓ <b>Как работает ваш личный кабинет</b>
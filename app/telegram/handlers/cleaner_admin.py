@@ -30,6 +30,7 @@ MONTHS_RU = {
     5: "Май", 6: "Июнь", 7: "Июль", 8: "Август",
     9: "Сентябрь", 10: "Октябрь", 11: "Ноябрь", 12: "Декабрь",
 }
+from app.services.cleaning_sla_timers import sla_timers
 from app.telegram.auth.admin import is_admin
 
 # admin telegram_id → list of photo message_ids to clean up on back
@@ -152,6 +153,7 @@ async def cleaner_task_close(message: Message):
         task.completed_at = datetime.now(timezone.utc)
         task.updated_at = datetime.now(timezone.utc)
         await session.commit()
+    sla_timers.cancel(task_id)
 
     await message.answer(f"✅ Задача #{task_id} закрыта вручную")
 
@@ -5,8 +5,8 @@ from decimal import Decimal
 from aiogram import F, Router
 from aiogram.types import CallbackQuery, InlineKeyboardButton, InlineKeyboardMarkup, Message
 from sqlalchemy import func, select
+from sqlalchemy.ext.asyncio import AsyncSession
 
-from app.database import AsyncSessionLocal
 from app.models import (
     CleanerPaymentProfile,
     CleaningPaymentLedger,
@@ -45,51 +45,49 @@ _awaiting_adj_dispute: dict[int, tuple[int, int]] = {}
 # Helpers
 # ---------------------------------------------------------------------------
 
-async def _get_profile(db_user_id: int):
-    async with AsyncSessionLocal() as s:
-        q = await s.execute(
-            select(CleanerPaymentProfile).where(CleanerPaymentProfile.user_id == db_user_id)
-        )
-        return q.scalar_one_or_none()
+async def _get_profile(session: AsyncSession, db_user_id: int):
+    q = await session.execute(
+        select(CleanerPaymentProfile).where(CleanerPaymentProfile.user_id == db_user_id)
+    )
+    return q.scalar_one_or_none()
 
 
-async def _get_balance(db_user_id: int) -> tuple[Decimal, int, Decimal, Decimal]:
+async def _get_balance(session: AsyncSession, db_user_id: int) -> tuple[Decimal, int, Decimal, Decimal]:
     """Возвращает (начислено_к_выплате, кол-во_уборок, возмещения, выплачено_в_этом_месяце)."""
     current_month = date.today().strftime("%Y-%m")
-    async with AsyncSessionLocal() as s:
-        # Начисления CLEANING_FEE ещё не выплаченные
-        accrued = await s.scalar(
-            select(func.sum(CleaningPaymentLedger.amount)).where(
-                CleaningPaymentLedger.cleaner_user_id == db_user_id,
-                CleaningPaymentLedger.entry_type == CleaningPaymentEntryType.CLEANING_FEE,
-                CleaningPaymentLedger.status.in_([PaymentStatus.ACCRUED, PaymentStatus.APPROVED]),
-            )
-        ) or Decimal(0)
-
-        task_count = await s.scalar(
-            select(func.count()).where(
-                CleaningPaymentLedger.cleaner_user_id == db_user_id,
-                CleaningPaymentLedger.entry_type == CleaningPaymentEntryType.CLEANING_FEE,
-                CleaningPaymentLedger.status.in_([PaymentStatus.ACCRUED, PaymentStatus.APPROVED]),
-            )
-        ) or 0
+    # Начисления CLEANING_FEE ещё не выплаченные
+    accrued = await session.scalar(
+        select(func.sum(CleaningPaymentLedger.amount)).where(
+            CleaningPaymentLedger.cleaner_user_id == db_user_id,
+            CleaningPaymentLedger.entry_type == CleaningPaymentEntryType.CLEANING_FEE,
+            CleaningPaymentLedger.status.in_([PaymentStatus.ACCRUED, PaymentStatus.APPROVED]),
+        )
+    ) or Decimal(0)
 
-        # Одобренные возмещения расходников (ещё не выплачены)
-        reimbursements = await s.scalar(
-            select(func.sum(SupplyExpenseClaim.amount_total)).where(
-                SupplyExpenseClaim.cleaner_user_id == db_user_id,
-                SupplyExpenseClaim.status == SupplyClaimStatus.APPROVED,
-            )
-        ) or Decimal(0)
+    task_count = await session.scalar(
+        select(func.count()).where(
+            CleaningPaymentLedger.cleaner_user_id == db_user_id,
+            CleaningPaymentLedger.entry_type == CleaningPaymentEntryType.CLEANING_FEE,
+            CleaningPaymentLedger.status.in_([PaymentStatus.ACCRUED, PaymentStatus.APPROVED]),
+        )
+    ) or 0
 
-        # Выплачено в текущем календарном месяце
-        paid_this_month = await s.scalar(
-            select(func.sum(CleaningPaymentLedger.amount)).where(
-                CleaningPaymentLedger.cleaner_user_id == db_user_id,
-                CleaningPaymentLedger.status == PaymentStatus.PAID,
-                CleaningPaymentLedger.period_key == current_month,
-            )
-        ) or Decimal(0)
+    # Одобренные возмещения расходников (ещё не выплачены)
+    reimbursements = await session.scalar(
+        select(func.sum(SupplyExpenseClaim.amount_total)).where(
+            SupplyExpenseClaim.cleaner_user_id == db_user_id,
+            SupplyExpenseClaim.status == SupplyClaimStatus.APPROVED,
+        )
+    ) or Decimal(0)
+
+    # Выплачено в текущем календарном месяце
+    paid_this_month = await session.scalar(
+        select(func.sum(CleaningPaymentLedger.amount)).where(
+            CleaningPaymentLedger.cleaner_user_id == db_user_id,
+            CleaningPaymentLedger.status == PaymentStatus.PAID,
+            CleaningPaymentLedger.period_key == current_month,
+        )
+    ) or Decimal(0)
 
     return Decimal(accrued), int(task_count), Decimal(reimbursements), Decimal(paid_this_month)
 
@@ -106,19 +104,19 @@ def _payments_back_kb() -> InlineKeyboardMarkup:
 # ---------------------------------------------------------------------------
 
 @router.callback_query(F.data == "cleaner:pay")
-async def cleaner_pay_screen(callback: CallbackQuery):
+async def cleaner_pay_screen(callback: CallbackQuery, session: AsyncSession):
     if not callback.from_user or not is_cleaner(callback.from_user.id):
         await callback.answer("Нет доступа", show_alert=True)
         return
 
-    db_user_id = await resolve_user_db_id(None, callback.from_user.id)
+    db_user_id = await resolve_user_db_id(session, callback.from_user.id)
     if not db_user_id:
         await callback.answer("Пользователь не найден", show_alert=True)
         return
 
-    accrued, task_count, reimbursements, paid_this_month = await _get_balance(db_user_id)
+    accrued, task_count, reimbursements, paid_this_month = await _get_balance(session, db_user_id)
     total = accrued + reimbursements
-    profile = await _get_profile(db_user_id)
+    profile = await _get_profile(session, db_user_id)
 
     reimbursement_line = f"\n🧾 Возмещения расходников: {reimbursements:.0f} ₽" if reimbursements else ""
     paid_line = f"\n\n💳 Выплачено в этом месяце: {paid_this_month:.0f} ₽" if paid_this_month else ""
@@ -166,7 +164,7 @@ MONTHS_RU = {
 
 
 @router.callback_query(F.data == "cleaner:pay:history")
-async def cleaner_pay_history(callback: CallbackQuery):
+async def cleaner_pay_history(callback: CallbackQuery, session: AsyncSession):
     if not callback.from_user or not is_cleaner(callback.from_user.id):
         await callback.answer("Нет доступа", show_alert=True)
         return
@@ -178,28 +176,27 @@ async def cleaner_pay_history(callback: CallbackQuery):
         except Exception:
             pass
 
-    db_user_id = await resolve_user_db_id(None, callback.from_user.id)
+    db_user_id = await resolve_user_db_id(session, callback.from_user.id)
     if not db_user_id:
         await callback.answer("Пользователь не найден", show_alert=True)
         return
 
-    async with AsyncSessionLocal() as s:
-        tasks_q = await s.execute(
-            select(CleaningTask).where(
-                CleaningTask.assigned_to_user_id == db_user_id,
-                CleaningTask.status == CleaningTaskStatus.DONE,
-            ).order_by(CleaningTask.scheduled_date.desc()).limit(60)
-        )
-        tasks = list(tasks_q.scalars().all())
-
-        amounts: dict[int, Decimal] = {}
-        for t in tasks:
-            amt = await s.scalar(
-                select(func.sum(CleaningPaymentLedger.amount)).where(
-                    CleaningPaymentLedger.task_id == t.id,
-                )
+    tasks_q = await session.execute(
+        select(CleaningTask).where(
+            CleaningTask.assigned_to_user_id == db_user_id,
+            CleaningTask.status == CleaningTaskStatus.DONE,
+        ).order_by(CleaningTask.scheduled_date.desc()).limit(60)
+    )
+    tasks = list(tasks_q.scalars().all())
+
+    amounts: dict[int, Decimal] = {}
+    for t in tasks:
+        amt = await session.scalar(
+            select(func.sum(CleaningPaymentLedger.amount)).where(
+                CleaningPaymentLedger.task_id == t.id,
             )
-            amounts[t.id] = Decimal(amt or 0)
+        )
+        amounts[t.id] = Decimal(amt or 0)
 
     if not tasks:
         await callback.message.edit_text(
@@ -276,7 +273,7 @@ async def cleaner_detail_close(callback: CallbackQuery):
 
 
 @router.message(lambda m: m.from_user and m.from_user.id in _awaiting_task_detail and m.text)
-async def cleaner_pay_history_detail_input(message: Message):
+async def cleaner_pay_history_detail_input(message: Message, session: AsyncSession):
     from app.telegram.bot import bot
     tg_id = message.from_user.id
     prompt_msg_id = _awaiting_task_detail.pop(tg_id, None)
@@ -303,28 +300,27 @@ async def cleaner_pay_history_detail_input(message: Message):
         return
 
     task_id = int(raw)
-    db_user_id = await resolve_user_db_id(None, tg_id)
+    db_user_id = await resolve_user_db_id(session, tg_id)
 
-    async with AsyncSessionLocal() as s:
-        task = await s.get(CleaningTask, task_id)
-        if not task or (db_user_id and task.assigned_to_user_id != db_user_id):
-            await _reply(f"❌ Уборка #{task_id} не найдена.", back_kb)
-            return
+    task = await session.get(CleaningTask, task_id)
+    if not task or (db_user_id and task.assigned_to_user_id != db_user_id):
+        await _reply(f"❌ Уборка #{task_id} не найдена.", back_kb)
+        return
 
-        checks_q = await s.execute(
-            select(CleaningTaskCheck).where(CleaningTaskCheck.task_id == task_id).order_by(CleaningTaskCheck.id)
-        )
-        checks = list(checks_q.scalars().all())
+    checks_q = await session.execute(
+        select(CleaningTaskCheck).where(CleaningTaskCheck.task_id == task_id).order_by(CleaningTaskCheck.id)
+    )
+    checks = list(checks_q.scalars().all())
 
-        media_q = await s.execute(
-            select(CleaningTaskMedia).where(CleaningTaskMedia.task_id == task_id)
-        )
-        media = list(media_q.scalars().all())
+    media_q = await session.execute(
+        select(CleaningTaskMedia).where(CleaningTaskMedia.task_id == task_id)
+    )
+    media = list(media_q.scalars().all())
 
-        ledger_q = await s.execute(
-            select(CleaningPaymentLedger).where(CleaningPaymentLedger.task_id == task_id)
-        )
-        ledger = list(ledger_q.scalars().all())
+    ledger_q = await session.execute(
+        select(CleaningPaymentLedger).where(CleaningPaymentLedger.task_id == task_id)
+    )
+    ledger = list(ledger_q.scalars().all())
 
     duration = ""
     if task.started_at and task.completed_at:
@@ -390,19 +386,18 @@ async def cleaner_pay_history_detail_input(message: Message):
 # Paid history (actual transfers)
 # ---------------------------------------------------------------------------
 
-async def _load_paid_groups(db_user_id: int) -> list[tuple[str, Decimal, list]]:
+async def _load_paid_groups(session: AsyncSession, db_user_id: int) -> list[tuple[str, Decimal, list]]:
     """Returns list of (day_key YYYY-MM-DD, total, entries) sorted newest-first."""
     from collections import defaultdict
     from datetime import datetime
-    async with AsyncSessionLocal() as s:
-        q = await s.execute(
-            select(CleaningPaymentLedger).where(
-                CleaningPaymentLedger.cleaner_user_id == db_user_id,
-                CleaningPaymentLedger.status == PaymentStatus.PAID,
-                CleaningPaymentLedger.paid_at.isnot(None),
-            ).order_by(CleaningPaymentLedger.paid_at.desc()).limit(200)
-        )
-        entries = list(q.scalars().all())
+    q = await session.execute(
+        select(CleaningPaymentLedger).where(
+            CleaningPaymentLedger.cleaner_user_id == db_user_id,
+            CleaningPaymentLedger.status == PaymentStatus.PAID,
+            CleaningPaymentLedger.paid_at.isnot(None),
+        ).order_by(CleaningPaymentLedger.paid_at.desc()).limit(200)
+    )
+    entries = list(q.scalars().all())
 
     by_date: dict[str, list] = defaultdict(list)
     for e in entries:
@@ -417,17 +412,17 @@ async def _load_paid_groups(db_user_id: int) -> list[tuple[str, Decimal, list]]:
 
 
 @router.callback_query(F.data == "cleaner:pay:paid_history")
-async def cleaner_pay_paid_history(callback: CallbackQuery):
+async def cleaner_pay_paid_history(callback: CallbackQuery, session: AsyncSession):
     if not callback.from_user or not is_cleaner(callback.from_user.id):
         await callback.answer("Нет доступа", show_alert=True)
         return
 
-    db_user_id = await resolve_user_db_id(None, callback.from_user.id)
+    db_user_id = await resolve_user_db_id(session, callback.from_user.id)
     if not db_user_id:
         await callback.answer("Пользователь не найден", show_alert=True)
         return
 
-    groups = await _load_paid_groups(db_user_id)
+    groups = await _load_paid_groups(session, db_user_id)
 
     if not groups:
         await callback.message.edit_text(
@@ -462,18 +457,18 @@ async def cleaner_pay_paid_history(callback: CallbackQuery):
 
 
 @router.callback_query(F.data.startswith("cleaner:pay:paid_detail:"))
-async def cleaner_pay_paid_detail(callback: CallbackQuery):
+async def cleaner_pay_paid_detail(callback: CallbackQuery, session: AsyncSession):
     if not callback.from_user or not is_cleaner(callback.from_user.id):
         await callback.answer("Нет доступа", show_alert=True)
         return
 
     day_key = callback.data[len("cleaner:pay:paid_detail:"):]
-    db_user_id = await resolve_user_db_id(None, callback.from_user.id)
+    db_user_id = await resolve_user_db_id(session, callback.from_user.id)
     if not db_user_id:
         await callback.answer("Пользователь не найден", show_alert=True)
         return
 
-    groups = await _load_paid_groups(db_user_id)
+    groups = await _load_paid_groups(session, db_user_id)
     group = next(((d, t, e) for d, t, e in groups if d == day_key), None)
     if not group:
         await callback.answer("Платёж не найден", show_alert=True)
@@ -510,17 +505,17 @@ async def cleaner_pay_paid_detail(callback: CallbackQuery):
 # ---------------------------------------------------------------------------
 
 @router.callback_query(F.data == "cleaner:pay:request")
-async def cleaner_pay_request_confirm(callback: CallbackQuery):
+async def cleaner_pay_request_confirm(callback: CallbackQuery, session: AsyncSession):
     if not callback.from_user or not is_cleaner(callback.from_user.id):
         await callback.answer("Нет доступа", show_alert=True)
         return
 
-    db_user_id = await resolve_user_db_id(None, callback.from_user.id)
+    db_user_id = await resolve_user_db_id(session, callback.from_user.id)
     if not db_user_id:
         await callback.answer("Пользователь не найден", show_alert=True)
         return
 
-    profile = await _get_profile(db_user_id)
+    profile = await _get_profile(session, db_user_id)
     if not profile or not profile.sbp_phone:
         await callback.message.edit_text(
             "⚠️ <b>Реквизиты не заданы</b>\n\nСначала укажите банк и номер телефона для СБП.",
@@ -533,7 +528,7 @@ async def cleaner_pay_request_confirm(callback: CallbackQuery):
         await callback.answer()
         return
 
-    accrued, task_count, reimbursements, _ = await _get_balance(db_user_id)
+    accrued, task_count, reimbursements, _ = await _get_balance(session, db_user_id)
     total = accrued + reimbursements
 
     text = (
@@ -558,23 +553,22 @@ async def cleaner_pay_request_confirm(callback: CallbackQuery):
 
 
 @router.callback_query(F.data == "cleaner:pay:request:send")
-async def cleaner_pay_request_send(callback: CallbackQuery):
+async def cleaner_pay_request_send(callback: CallbackQuery, session: AsyncSession):
     if not callback.from_user or not is_cleaner(callback.from_user.id):
         await callback.answer("Нет доступа", show_alert=True)
         return
 
-    db_user_id = await resolve_user_db_id(None, callback.from_user.id)
+    db_user_id = await resolve_user_db_id(session, callback.from_user.id)
     if not db_user_id:
         await callback.answer("Пользователь не найден", show_alert=True)
         return
 
-    accrued, task_count, reimbursements, _ = await _get_balance(db_user_id)
+    accrued, task_count, reimbursements, _ = await _get_balance(session, db_user_id)
     total = accrued + reimbursements
-    profile = await _get_profile(db_user_id)
+    profile = await _get_profile(session, db_user_id)
 
-    async with AsyncSessionLocal() as s:
-        user = await s.get(User, db_user_id)
-        cleaner_name = user.name if user else "—"
+    user = await session.get(User, db_user_id)
+    cleaner_name = user.name if user else "—"
 
     if total <= 0:
         await callback.answer("Нечего запрашивать — баланс 0 ₽", show_alert=True)
@@ -629,7 +623,7 @@ async def cleaner_pay_request_send(callback: CallbackQuery):
 # ---------------------------------------------------------------------------
 
 @router.callback_query(F.data.startswith("admin:pay:approve:"))
-async def admin_pay_approve(callback: CallbackQuery):
+async def admin_pay_approve(callback: CallbackQuery, session: AsyncSession):
     from app.telegram.auth.admin import is_admin
     if not callback.from_user or not is_admin(callback.from_user.id):
         await callback.answer("Нет доступа", show_alert=True)
@@ -638,40 +632,39 @@ async def admin_pay_approve(callback: CallbackQuery):
     _, _, _, cleaner_user_id_str, period = callback.data.split(":", 4)
     cleaner_user_id = int(cleaner_user_id_str)
 
-    async with AsyncSessionLocal() as s:
-        q = await s.execute(
-            select(CleaningPaymentLedger).where(
-                CleaningPaymentLedger.cleaner_user_id == cleaner_user_id,
-                CleaningPaymentLedger.status.in_([PaymentStatus.ACCRUED, PaymentStatus.APPROVED]),
-            )
+    q = await session.execute(
+        select(CleaningPaymentLedger).where(
+            CleaningPaymentLedger.cleaner_user_id == cleaner_user_id,
+            CleaningPaymentLedger.status.in_([PaymentStatus.ACCRUED, PaymentStatus.APPROVED]),
         )
-        entries = list(q.scalars().all())
+    )
+    entries = list(q.scalars().all())
 
-        claims_q = await s.execute(
-            select(SupplyExpenseClaim).where(
-                SupplyExpenseClaim.cleaner_user_id == cleaner_user_id,
-                SupplyExpenseClaim.status == SupplyClaimStatus.APPROVED,
-            )
+    claims_q = await session.execute(
+        select(SupplyExpenseClaim).where(
+            SupplyExpenseClaim.cleaner_user_id == cleaner_user_id,
+            SupplyExpenseClaim.status == SupplyClaimStatus.APPROVED,
         )
-        claims = list(claims_q.scalars().all())
+    )
+    claims = list(claims_q.scalars().all())
 
-        from datetime import datetime, timezone
-        now = datetime.now(timezone.utc)
-        total = Decimal(0)
+    from datetime import datetime, timezone
+    now = datetime.now(timezone.utc)
+    total = Decimal(0)
 
-        for e in entries:
-            e.status = PaymentStatus.PAID
-            e.paid_at = now
-            total += Decimal(e.amount)
+    for e in entries:
+        e.status = PaymentStatus.PAID
+        e.paid_at = now
+        total += Decimal(e.amount)
 
-        for c in claims:
-            c.status = SupplyClaimStatus.PAID
-            c.paid_at = now
-            total += Decimal(c.amount_total)
+    for c in claims:
+        c.status = SupplyClaimStatus.PAID
+        c.paid_at = now
+        total += Decimal(c.amount_total)
 
-        cleaner = await s.get(User, cleaner_user_id)
-        cleaner_tg_id = cleaner.telegram_id if cleaner else None
-        await s.commit()
+    cleaner = await session.get(User, cleaner_user_id)
+    cleaner_tg_id = cleaner.telegram_id if cleaner else None
+    await session.commit()
 
     await callback.message.edit_text(
         callback.message.text + f"\n\n✅ <b>Оплачено {total:.0f} ₽</b> — {callback.from_user.first_name}",
@@ -690,7 +683,7 @@ async def admin_pay_approve(callback: CallbackQuery):
 
 
 @router.callback_query(F.data.startswith("admin:pay:reject:"))
-async def admin_pay_reject(callback: CallbackQuery):
+async def admin_pay_reject(callback: CallbackQuery, session: AsyncSession):
     from app.telegram.auth.admin import is_admin
     if not callback.from_user or not is_admin(callback.from_user.id):
         await callback.answer("Нет доступа", show_alert=True)
@@ -699,9 +692,8 @@ async def admin_pay_reject(callback: CallbackQuery):
     _, _, _, cleaner_user_id_str, period = callback.data.split(":", 4)
     cleaner_user_id = int(cleaner_user_id_str)
 
-    async with AsyncSessionLocal() as s:
-        cleaner = await s.get(User, cleaner_user_id)
-        cleaner_tg_id = cleaner.telegram_id if cleaner else None
+    cleaner = await session.get(User, cleaner_user_id)
+    cleaner_tg_id = cleaner.telegram_id if cleaner else None
 
     await callback.message.edit_text(
         callback.message.text + f"\n\n❌ <b>Отклонено</b> — {callback.from_user.first_name}",
@@ -723,13 +715,13 @@ async def admin_pay_reject(callback: CallbackQuery):
 # ---------------------------------------------------------------------------
 
 @router.callback_query(F.data == "cleaner:pay:profile")
-async def cleaner_pay_profile(callback: CallbackQuery):
+async def cleaner_pay_profile(callback: CallbackQuery, session: AsyncSession):
     if not callback.from_user or not is_cleaner(callback.from_user.id):
         await callback.answer("Нет доступа", show_alert=True)
         return
 
-    db_user_id = await resolve_user_db_id(None, callback.from_user.id)
-    profile = await _get_profile(db_user_id) if db_user_id else None
+    db_user_id = await resolve_user_db_id(session, callback.from_user.id)
+    profile = await _get_profile(session, db_user_id) if db_user_id else None
 
     bank = profile.sbp_bank if profile else "не задан"
     phone = profile.sbp_phone if profile else "не задан"
@@ -765,23 +757,22 @@ async def cleaner_pay_profile_bank_choose(callback: CallbackQuery):
 
 
 @router.callback_query(F.data.startswith("cleaner:pay:profile:bank:"))
-async def cleaner_pay_profile_bank_save(callback: CallbackQuery):
+async def cleaner_pay_profile_bank_save(callback: CallbackQuery, session: AsyncSession):
     bank = callback.data[len("cleaner:pay:profile:bank:"):]
-    db_user_id = await resolve_user_db_id(None, callback.from_user.id)
+    db_user_id = await resolve_user_db_id(session, callback.from_user.id)
     if not db_user_id:
         await callback.answer("Ошибка", show_alert=True)
         return
 
-    async with AsyncSessionLocal() as s:
-        q = await s.execute(
-            select(CleanerPaymentProfile).where(CleanerPaymentProfile.user_id == db_user_id)
-        )
-        profile = q.scalar_one_or_none()
-        if profile:
-            profile.sbp_bank = bank
-        else:
-            s.add(CleanerPaymentProfile(user_id=db_user_id, sbp_bank=bank))
-        await s.commit()
+    q = await session.execute(
+        select(CleanerPaymentProfile).where(CleanerPaymentProfile.user_id == db_user_id)
+    )
+    profile = q.scalar_one_or_none()
+    if profile:
+        profile.sbp_bank = bank
+    else:
+        session.add(CleanerPaymentProfile(user_id=db_user_id, sbp_bank=bank))
+    await session.commit()
 
     await callback.answer(f"Банк сохранён: {bank}")
     # Вернуть в профиль через edit
@@ -809,27 +800,26 @@ async def cleaner_pay_profile_phone_ask(callback: CallbackQuery):
 
 
 @router.message(lambda m: m.from_user and m.from_user.id in _awaiting_phone and m.text)
-async def cleaner_pay_profile_phone_save(message: Message):
+async def cleaner_pay_profile_phone_save(message: Message, session: AsyncSession):
     phone = (message.text or "").strip()
     if not phone.startswith("+7") or len(phone) < 11:
         await message.answer("❌ Неверный формат. Отправьте номер в виде <code>+7XXXXXXXXXX</code>", parse_mode="HTML")
         return
 
     _awaiting_phone.discard(message.from_user.id)
-    db_user_id = await resolve_user_db_id(None, message.from_user.id)
+    db_user_id = await resolve_user_db_id(session, message.from_user.id)
     if not db_user_id:
         return
 
-    async with AsyncSessionLocal() as s:
-        q = await s.execute(
-            select(CleanerPaymentProfile).where(CleanerPaymentProfile.user_id == db_user_id)
-        )
-        profile = q.scalar_one_or_none()
-        if profile:
-            profile.sbp_phone = phone
-        else:
-            s.add(CleanerPaymentProfile(user_id=db_user_id, sbp_phone=phone))
-        await s.commit()
+    q = await session.execute(
+        select(CleanerPaymentProfile).where(CleanerPaymentProfile.user_id == db_user_id)
+    )
+    profile = q.scalar_one_or_none()
+    if profile:
+        profile.sbp_phone = phone
+    else:
+        session.add(CleanerPaymentProfile(user_id=db_user_id, sbp_phone=phone))
+    await session.commit()
 
     await message.answer(
         f"✅ Телефон сохранён: <b>{phone}</b>",
@@ -845,7 +835,7 @@ async def cleaner_pay_profile_phone_save(message: Message):
 # ---------------------------------------------------------------------------
 
 @router.callback_query(F.data.startswith("admin:pay:adj_approve:"))
-async def admin_pay_adj_approve(callback: CallbackQuery):
+async def admin_pay_adj_approve(callback: CallbackQuery, session: AsyncSession):
     from datetime import datetime, timezone
     from app.telegram.auth.admin import is_admin
     if not callback.from_user or not is_admin(callback.from_user.id):
@@ -858,20 +848,19 @@ async def admin_pay_adj_approve(callback: CallbackQuery):
     amount = Decimal(parts[5])
 
     period_key = date.today().strftime("%Y-%m")
-    async with AsyncSessionLocal() as s:
-        s.add(CleaningPaymentLedger(
-            task_id=task_id,
-            cleaner_user_id=cleaner_db_id,
-            entry_type=CleaningPaymentEntryType.ADJUSTMENT,
-            amount=amount,
-            period_key=period_key,
-            status=PaymentStatus.ACCRUED,
-            comment=f"Доп. работа по задаче #{task_id} — одобрено {callback.from_user.first_name}",
-            created_at=datetime.now(timezone.utc),
-        ))
-        cleaner = await s.get(User, cleaner_db_id)
-        cleaner_tg_id = cleaner.telegram_id if cleaner else None
-        await s.commit()
+    session.add(CleaningPaymentLedger(
+        task_id=task_id,
+        cleaner_user_id=cleaner_db_id,
+        entry_type=CleaningPaymentEntryType.ADJUSTMENT,
+        amount=amount,
+        period_key=period_key,
+        status=PaymentStatus.ACCRUED,
+        comment=f"Доп. работа по задаче #{task_id} — одобрено {callback.from_user.first_name}",
+        created_at=datetime.now(timezone.utc),
+    ))
+    cleaner = await session.get(User, cleaner_db_id)
+    cleaner_tg_id = cleaner.telegram_id if cleaner else None
+    await session.commit()
 
     await callback.message.edit_text(
         callback.message.text + f"\n\n✅ <b>Одобрено {amount:.0f} ₽</b> — {callback.from_user.first_name}",
@@ -913,7 +902,7 @@ async def admin_pay_adj_reject(callback: CallbackQuery):
 
 
 @router.callback_query(F.data.startswith("admin:pay:adj_reject_confirm:"))
-async def admin_pay_adj_reject_confirm(callback: CallbackQuery):
+async def admin_pay_adj_reject_confirm(callback: CallbackQuery, session: AsyncSession):
     from app.telegram.auth.admin import is_admin
     if not callback.from_user or not is_admin(callback.from_user.id):
         await callback.answer("Нет доступа", show_alert=True)
@@ -924,9 +913,8 @@ async def admin_pay_adj_reject_confirm(callback: CallbackQuery):
     cleaner_db_id = int(parts[4])
     _awaiting_adj_dispute.pop(callback.from_user.id, None)
 
-    async with AsyncSessionLocal() as s:
-        cleaner = await s.get(User, cleaner_db_id)
-        cleaner_tg_id = cleaner.telegram_id if cleaner else None
+    cleaner = await session.get(User, cleaner_db_id)
+    cleaner_tg_id = cleaner.telegram_id if cleaner else None
 
     await callback.message.edit_text(
         callback.message.text.split("\n\n❌")[0] + f"\n\n❌ <b>Отклонено</b> — {callback.from_user.first_name}",
@@ -945,7 +933,7 @@ async def admin_pay_adj_reject_confirm(callback: CallbackQuery):
 
 
 @router.message(lambda m: m.from_user and m.from_user.id in _awaiting_adj_dispute and m.text)
-async def admin_pay_adj_dispute_comment(message: Message):
+async def admin_pay_adj_dispute_comment(message: Message, session: AsyncSession):
     from datetime import datetime, timezone
     from app.telegram.auth.admin import is_admin
     if not message.from_user or not is_admin(message.from_user.id):
@@ -966,22 +954,21 @@ async def admin_pay_adj_dispute_comment(message: Message):
     except Exception:
         is_counter = False
 
-    async with AsyncSessionLocal() as s:
-        if is_counter:
-            period_key = date.today().strftime("%Y-%m")
-            s.add(CleaningPaymentLedger(
-                task_id=task_id,
-                cleaner_user_id=cleaner_db_id,
-                entry_type=CleaningPaymentEntryType.ADJUSTMENT,
-                amount=counter_amount,
-                period_key=period_key,
-                status=PaymentStatus.ACCRUED,
-                comment=f"Доп. работа #{task_id} — встречное предложение {message.from_user.first_name}",
-                created_at=datetime.now(timezone.utc),
-            ))
-        cleaner = await s.get(User, cleaner_db_id)
-        cleaner_tg_id = cleaner.telegram_id if cleaner else None
-        await s.commit()
+    if is_counter:
+        period_key = date.today().strftime("%Y-%m")
+        session.add(CleaningPaymentLedger(
+            task_id=task_id,
+            cleaner_user_id=cleaner_db_id,
+            entry_type=CleaningPaymentEntryType.ADJUSTMENT,
+            amount=counter_amount,
+            period_key=period_key,
+            status=PaymentStatus.ACCRUED,
+            comment=f"Доп. работа #{task_id} — встречное предложение {message.from_user.first_name}",
+            created_at=datetime.now(timezone.utc),
+        ))
+    cleaner = await session.get(User, cleaner_db_id)
+    cleaner_tg_id = cleaner.telegram_id if cleaner else None
+    await session.commit()
 
     if is_counter:
         await message.answer(f"✅ Начислено встречное предложение: {counter_amount:.0f} ₽ по задаче #{task_id}", parse_mode="HTML")
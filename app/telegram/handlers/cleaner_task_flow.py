@@ -4,8 +4,8 @@ from datetime import date, timedelta
 from aiogram import Router, F
 from aiogram.types import CallbackQuery, InlineKeyboardButton, InlineKeyboardMarkup, Message
 from sqlalchemy import and_, func, or_, select
+from sqlalchemy.ext.asyncio import AsyncSession
 
-from app.database import AsyncSessionLocal
 from app.models import CleaningTask, CleaningTaskCheck, CleaningTaskMedia, CleaningTaskStatus
 from app.services.cleaning_task_service import CleaningTaskService
 from app.services.notification_service import send_safe
@@ -52,73 +52,71 @@ def _task_actions_keyboard(task: CleaningTask) -> InlineKeyboardMarkup:
     return InlineKeyboardMarkup(inline_keyboard=rows)
 
 
-async def _get_tasks(user_id: int, days: int = 0) -> list[CleaningTask]:
+async def _get_tasks(session: AsyncSession, user_id: int, days: int = 0) -> list[CleaningTask]:
     start = date.today()
     end = start + timedelta(days=days)
 
     # user_id here is telegram_id; resolve to DB PK for FK comparison
-    db_user_id = await resolve_user_db_id(None, user_id)
+    db_user_id = await resolve_user_db_id(session, user_id)
     if db_user_id is None:
         return []
 
-    async with AsyncSessionLocal() as session:
-        date_filter = (
-            and_(CleaningTask.scheduled_date >= start, CleaningTask.scheduled_date <= end)
-            if days
-            else (CleaningTask.scheduled_date == start)
-        )
-        stmt = select(CleaningTask).where(
-            and_(
-                or_(
-                    CleaningTask.assigned_to_user_id == db_user_id,
-                    and_(
-                        CleaningTask.assigned_to_user_id.is_(None),
-                        CleaningTask.status == CleaningTaskStatus.PENDING,
-                    ),
-                ),
-                date_filter,
-                CleaningTask.status.in_(
-                    [
-                        CleaningTaskStatus.PENDING,
-                        CleaningTaskStatus.ACCEPTED,
-                        CleaningTaskStatus.IN_PROGRESS,
-                        CleaningTaskStatus.ESCALATED,
-                        CleaningTaskStatus.DONE,
-                    ]
+    date_filter = (
+        and_(CleaningTask.scheduled_date >= start, CleaningTask.scheduled_date <= end)
+        if days
+        else (CleaningTask.scheduled_date == start)
+    )
+    stmt = select(CleaningTask).where(
+        and_(
+            or_(
+                CleaningTask.assigned_to_user_id == db_user_id,
+                and_(
+                    CleaningTask.assigned_to_user_id.is_(None),
+                    CleaningTask.status == CleaningTaskStatus.PENDING,
                 ),
-            )
-        ).order_by(CleaningTask.scheduled_date)
-        result = await session.execute(stmt)
-        return list(result.scalars().all())
+            ),
+            date_filter,
+            CleaningTask.status.in_(
+                [
+                    CleaningTaskStatus.PENDING,
+                    CleaningTaskStatus.ACCEPTED,
+                    CleaningTaskStatus.IN_PROGRESS,
+                    CleaningTaskStatus.ESCALATED,
+                    CleaningTaskStatus.DONE,
+                ]
+            ),
+        )
+    ).order_by(CleaningTask.scheduled_date)
+    result = await session.execute(stmt)
+    return list(result.scalars().all())
 
 
-async def _get_unconfirmed_tasks(lookback_days: int = 7) -> list[CleaningTask]:
+async def _get_unconfirmed_tasks(session: AsyncSession, lookback_days: int = 7) -> list[CleaningTask]:
     """Список незавершённых уборок (PENDING/ESCALATED), дата прошла или сегодня.
     Видимы всем уборщицам — любая может взять."""
     today = date.today()
     earliest = today - timedelta(days=lookback_days)
-    async with AsyncSessionLocal() as session:
-        stmt = (
-            select(CleaningTask)
-            .where(
-                and_(
-                    CleaningTask.scheduled_date >= earliest,
-                    CleaningTask.scheduled_date <= today,
-                    CleaningTask.status.in_(
-                        [CleaningTaskStatus.PENDING, CleaningTaskStatus.ESCALATED]
-                    ),
-                )
+    stmt = (
+        select(CleaningTask)
+        .where(
+            and_(
+                CleaningTask.scheduled_date >= earliest,
+                CleaningTask.scheduled_date <= today,
+                CleaningTask.status.in_(
+                    [CleaningTaskStatus.PENDING, CleaningTaskStatus.ESCALATED]
+                ),
             )
-            .order_by(CleaningTask.scheduled_date)
         )
-        result = await session.execute(stmt)
-        return list(result.scalars().all())
+        .order_by(CleaningTask.scheduled_date)
+    )
+    result = await session.execute(stmt)
+    return list(result.scalars().all())
 
 
 @router.callback_query(F.data == "cleaner:tasks:unconfirmed")
-async def cleaner_unconfirmed_tasks(callback: CallbackQuery):
+async def cleaner_unconfirmed_tasks(callback: CallbackQuery, session: AsyncSession):
     """Список неподтверждённых/просроченных уборок — любая уборщица видит и может взять."""
-    tasks = await _get_unconfirmed_tasks()
+    tasks = await _get_unconfirmed_tasks(session)
 
     if not tasks:
         await callback.message.edit_text(
@@ -134,9 +132,8 @@ async def cleaner_unconfirmed_tasks(callback: CallbackQuery):
 
     # Тексты домиков — загружаем все House разом.
     from app.models import House as _House
-    async with AsyncSessionLocal() as session:
-        houses_q = await session.execute(select(_House))
-        houses = {h.id: h.name for h in houses_q.scalars().all()}
+    houses_q = await session.execute(select(_House))
+    houses = {h.id: h.name for h in houses_q.scalars().all()}
 
     today = date.today()
     lines = ["⚠️ <b>Невыполненные уборки</b>", "<i>(можешь взять любую — Возьми и убери)</i>", ""]
@@ -169,47 +166,48 @@ async def cleaner_unconfirmed_tasks(callback: CallbackQuery):
 
 
 @router.callback_query(F.data.startswith("cleaner:task:claim:"))
-async def cleaner_task_claim(callback: CallbackQuery):
+async def cleaner_task_claim(callback: CallbackQuery, session: AsyncSession):
     """Уборщица берёт неподтверждённую задачу: ESCALATED/PENDING → ACCEPTED, assigned_to_user_id перезаписывается."""
     task_id = int(callback.data.split(":")[3])
 
-    async with AsyncSessionLocal() as session:
-        task = await session.get(CleaningTask, task_id)
-        if not task:
-            await callback.answer("Задача не найдена", show_alert=True)
-            return
+    task = await session.get(CleaningTask, task_id)
+    if not task:
+        await callback.answer("Задача не найдена", show_alert=True)
+        return
 
-        if task.status not in (CleaningTaskStatus.PENDING, CleaningTaskStatus.ESCALATED):
-            await callback.answer(
-                f"Эту уборку уже взяли (статус: {task.status.value})", show_alert=True
-            )
-            return
-
-        cleaner_db_id = await resolve_user_db_id(session, callback.from_user.id)
-        if not cleaner_db_id:
-            await callback.answer("Вы не зарегистрированы как уборщица", show_alert=True)
-            return
-
-        ok = await CleaningTaskService.transition_status(
-            session,
-            task,
-            CleaningTaskStatus.ACCEPTED,
-            cleaner_user_id=cleaner_db_id,
+    if task.status not in (CleaningTaskStatus.PENDING, CleaningTaskStatus.ESCALATED):
+        await callback.answer(
+            f"Эту уборку уже взяли (статус: {task.status.value})", show_alert=True
         )
-        if not ok:
-            await callback.answer("Не удалось взять задачу — обновите список", show_alert=True)
-            return
-        await session.commit()
+        return
+
+    cleaner_db_id = await resolve_user_db_id(session, callback.from_user.id)
+    if not cleaner_db_id:
+        await callback.answer("Вы не зарегистрированы как уборщица", show_alert=True)
+        return
+
+    ok = await CleaningTaskService.transition_status(
+        session,
+        task,
+        CleaningTaskStatus.ACCEPTED,
+        cleaner_user_id=cleaner_db_id,
+    )
+    if not ok:
+        # Откатить частичные изменения — иначе их закоммитит DbSessionMiddleware
+        await session.rollback()
+        await callback.answer("Не удалось взять задачу — обновите список", show_alert=True)
+        return
+    await session.commit()
 
     await callback.answer("✅ Взято! Открой задачу и начни уборку.", show_alert=True)
-    await _render_task_view(callback, task_id)
+    await _render_task_view(session, callback, task_id)
 
 
 @router.callback_query(F.data.startswith("cleaner:tasks:"))
-async def cleaner_tasks_list(callback: CallbackQuery):
+async def cleaner_tasks_list(callback: CallbackQuery, session: AsyncSession):
     mode = callback.data.split(":")[2]
     days = 7 if mode == "week" else 0
-    tasks = await _get_tasks(callback.from_user.id, days=days)
+    tasks = await _get_tasks(session, callback.from_user.id, days=days)
 
     active = [t for t in tasks if t.status != CleaningTaskStatus.DONE]
     done = [t for t in tasks if t.status == CleaningTaskStatus.DONE]
@@ -256,17 +254,16 @@ async def cleaner_tasks_list(callback: CallbackQuery):
     await callback.answer()
 
 
-async def _render_task_view(callback: CallbackQuery, task_id: int):
+async def _render_task_view(session: AsyncSession, callback: CallbackQuery, task_id: int):
     """Отрисовывает карточку задачи в текущем сообщении. Принимает task_id явно
     чтобы не мутировать замороженный объект CallbackQuery."""
-    async with AsyncSessionLocal() as session:
-        task = await session.get(CleaningTask, task_id)
-        if not task:
-            await callback.answer("Задача не найдена", show_alert=True)
-            return
-        photo_count = await session.scalar(
-            select(func.count()).where(CleaningTaskMedia.task_id == task_id)
-        )
+    task = await session.get(CleaningTask, task_id)
+    if not task:
+        await callback.answer("Задача не найдена", show_alert=True)
+        return
+    photo_count = await session.scalar(
+        select(func.count()).where(CleaningTaskMedia.task_id == task_id)
+    )
 
     photo_line = f"\n📸 Фото: {photo_count}" if photo_count else ""
     text = (
@@ -280,25 +277,24 @@ async def _render_task_view(callback: CallbackQuery, task_id: int):
 
 
 @router.callback_query(F.data.startswith("cleaner:task:view:"))
-async def cleaner_task_view(callback: CallbackQuery):
+async def cleaner_task_view(callback: CallbackQuery, session: AsyncSession):
     task_id = int(callback.data.split(":")[3])
-    await _render_task_view(callback, task_id)
+    await _render_task_view(session, callback, task_id)
     await callback.answer()
 
 
-async def _render_task_checks(callback: CallbackQuery, task_id: int):
+async def _render_task_checks(session: AsyncSession, callback: CallbackQuery, task_id: int):
     """Отрисовывает чеклист задачи. Принимает task_id явно."""
-    async with AsyncSessionLocal() as session:
-        task = await session.get(CleaningTask, task_id)
-        if not task:
-            await callback.answer("Задача не найдена", show_alert=True)
-            return
-        await CleaningTaskService.ensure_default_checklist(session, task)
-        q = await session.execute(
-            select(CleaningTaskCheck).where(CleaningTaskCheck.task_id == task_id).order_by(CleaningTaskCheck.id)
-        )
-        checks = list(q.scalars().all())
-        await session.commit()
+    task = await session.get(CleaningTask, task_id)
+    if not task:
+        await callback.answer("Задача не найдена", show_alert=True)
+        return
+    await CleaningTaskService.ensure_default_checklist(session, task)
+    q = await session.execute(
+        select(CleaningTaskCheck).where(CleaningTaskCheck.task_id == task_id).order_by(CleaningTaskCheck.id)
+    )
+    checks = list(q.scalars().all())
+    await session.commit()
 
     lines = [f"☑️ <b>Чеклист задачи #{task_id}</b>"]
     rows = []
@@ -314,14 +310,14 @@ async def _render_task_checks(callback: CallbackQuery, task_id: int):
 
 
 @router.callback_query(F.data.startswith("cleaner:task:checks:"))
-async def cleaner_task_checks(callback: CallbackQuery):
+async def cleaner_task_checks(callback: CallbackQuery, session: AsyncSession):
     task_id = int(callback.data.split(":")[3])
-    await _render_task_checks(callback, task_id)
+    await _render_task_checks(session, callback, task_id)
     await callback.answer()
 
 
 @router.callback_query(F.data.startswith("cleaner:task:check:"))
-async def cleaner_toggle_check(callback: CallbackQuery):
+async def cleaner_toggle_check(callback: CallbackQuery, session: AsyncSession):
     _, _, _, task_id_str, code = callback.data.split(":", 4)
     task_id = int(task_id_str)
 
@@ -330,48 +326,47 @@ async def cleaner_toggle_check(callback: CallbackQuery):
     supply_alert_resolved = False
     house_id_for_alert = None
 
-    async with AsyncSessionLocal() as session:
-        q = await session.execute(
-            select(CleaningTaskCheck).where(
-                CleaningTaskCheck.task_id == task_id,
-                CleaningTaskCheck.code == code,
-            )
+    q = await session.execute(
+        select(CleaningTaskCheck).where(
+            CleaningTaskCheck.task_id == task_id,
+            CleaningTaskCheck.code == code,
         )
-        check = q.scalar_one_or_none()
-        if not check:
-            await callback.answer("Пункт не найден", show_alert=True)
-            return
-
-        new_value = not check.is_checked
-        await CleaningTaskService.toggle_check(session, task_id, code, new_value)
-
-        # Хук C10.1: код `need_purchase` → SupplyAlert (idempotent).
-        if code == "need_purchase":
-            task = await session.get(CleaningTask, task_id)
-            if task:
-                house_id_for_alert = task.house_id
-                cleaner_db_id = await resolve_user_db_id(
-                    session, callback.from_user.id
+    )
+    check = q.scalar_one_or_none()
+    if not check:
+        await callback.answer("Пункт не найден", show_alert=True)
+        return
+
+    new_value = not check.is_checked
+    await CleaningTaskService.toggle_check(session, task_id, code, new_value)
+
+    # Хук C10.1: код `need_purchase` → SupplyAlert (idempotent).
+    if code == "need_purchase":
+        task = await session.get(CleaningTask, task_id)
+        if task:
+            house_id_for_alert = task.house_id
+            cleaner_db_id = await resolve_user_db_id(
+                session, callback.from_user.id
+            )
+            if new_value:
+                alert = await CleaningTaskService.open_supply_alert(
+                    session,
+                    task,
+                    items_json=None,
+                    reporter_user_id=cleaner_db_id,
+                )
+                supply_alert_opened = bool(alert)
+            else:
+                affected = await CleaningTaskService.resolve_supply_alerts(
+                    session, task
                 )
-                if new_value:
-                    alert = await CleaningTaskService.open_supply_alert(
-                        session,
-                        task,
-                        items_json=None,
-                        reporter_user_id=cleaner_db_id,
-                    )
-                    supply_alert_opened = bool(alert)
-                else:
-                    affected = await CleaningTaskService.resolve_supply_alerts(
-                        session, task
-                    )
-                    supply_alert_resolved = affected > 0
-
-        await session.commit()
+                supply_alert_resolved = affected > 0
+
+    await session.commit()
 
     if supply_alert_opened:
         await _notify_admins_supply_alert(
-            callback.bot, task_id=task_id, house_id=house_id_for_alert
+            session, callback.bot, task_id=task_id, house_id=house_id_for_alert
         )
         await callback.message.answer(
             "🧴 <b>Алерт отправлен администратору.</b>\n\n"
@@ -386,16 +381,16 @@ async def cleaner_toggle_check(callback: CallbackQuery):
         except Exception:
             pass
 
-    await _render_task_checks(callback, task_id)
+    await _render_task_checks(session, callback, task_id)
 
 
-async def _notify_admins_supply_alert(bot, *, task_id: int, house_id: int | None):
+async def _notify_admins_supply_alert(session: AsyncSession, bot, *, task_id: int, house_id: int | None):
     """Шлёт всем админам уведомление о новом SupplyAlert."""
     from app.core.config import settings
     from app.models import UserRole
     from app.telegram.auth.admin import get_all_users
 
-    users = await get_all_users()
+    users = await get_all_users(session)
     admin_ids = {
         u.telegram_id
         for u in users
@@ -449,23 +444,22 @@ def _is_cleaner_photo(message: Message) -> bool:
     return True
 
 
-async def _get_active_task_id(telegram_id: int) -> int | None:
+async def _get_active_task_id(session: AsyncSession, telegram_id: int) -> int | None:
     """Возвращает id задачи IN_PROGRESS, назначенной на уборщицу, если есть."""
-    db_user_id = await resolve_user_db_id(None, telegram_id)
+    db_user_id = await resolve_user_db_id(session, telegram_id)
     if db_user_id is None:
         return None
-    async with AsyncSessionLocal() as session:
-        result = await session.execute(
-            select(CleaningTask.id).where(
-                CleaningTask.assigned_to_user_id == db_user_id,
-                CleaningTask.status == CleaningTaskStatus.IN_PROGRESS,
-            ).order_by(CleaningTask.scheduled_date.desc()).limit(1)
-        )
-        return result.scalar_one_or_none()
+    result = await session.execute(
+        select(CleaningTask.id).where(
+            CleaningTask.assigned_to_user_id == db_user_id,
+            CleaningTask.status == CleaningTaskStatus.IN_PROGRESS,
+        ).order_by(CleaningTask.scheduled_date.desc()).limit(1)
+    )
+    return result.scalar_one_or_none()
 
 
 @router.message(F.photo, _is_task_photo)
-async def cleaner_receive_photo(message: Message):
+async def cleaner_receive_photo(message: Message, session: AsyncSession):
     caption = message.caption or ""
     m = PHOTO_HINT_RE.search(caption)
     if not m:
@@ -474,29 +468,28 @@ async def cleaner_receive_photo(message: Message):
     task_id = int(m.group(1))
     file_id = message.photo[-1].file_id
 
-    async with AsyncSessionLocal() as session:
-        task = await session.get(CleaningTask, task_id)
-        if not task:
-            await message.answer("Задача не найдена")
-            return
-        cleaner_db_id = (
-            await resolve_user_db_id(session, message.from_user.id)
-            if message.from_user
-            else None
-        )
-        await CleaningTaskService.add_photo(session, task_id, file_id, user_id=cleaner_db_id)
-        await session.commit()
+    task = await session.get(CleaningTask, task_id)
+    if not task:
+        await message.answer("Задача не найдена")
+        return
+    cleaner_db_id = (
+        await resolve_user_db_id(session, message.from_user.id)
+        if message.from_user
+        else None
+    )
+    await CleaningTaskService.add_photo(session, task_id, file_id, user_id=cleaner_db_id)
+    await session.commit()
 
     await message.answer(f"✅ Фото прикреплено к задаче #{task_id}")
 
 
 @router.message(F.photo, _is_cleaner_photo)
-async def cleaner_receive_photo_auto(message: Message):
+async def cleaner_receive_photo_auto(message: Message, session: AsyncSession):
     """Любое фото от уборщицы без тега → к активной задаче IN_PROGRESS."""
     if not message.from_user:
         return
 
-    task_id = await _get_active_task_id(message.from_user.id)
+    task_id = await _get_active_task_id(session, message.from_user.id)
     if task_id is None:
         await message.answer(
             "📌 Нет активной уборки.\n\n"
@@ -510,10 +503,9 @@ async def cleaner_receive_photo_auto(message: Message):
         return
 
     file_id = message.photo[-1].file_id
-    async with AsyncSessionLocal() as session:
-        cleaner_db_id = await resolve_user_db_id(session, message.from_user.id)
-        await CleaningTaskService.add_photo(session, task_id, file_id, user_id=cleaner_db_id)
-        await session.commit()
+    cleaner_db_id = await resolve_user_db_id(session, message.from_user.id)
+    await CleaningTaskService.add_photo(session, task_id, file_id, user_id=cleaner_db_id)
+    await session.commit()
 
     await message.answer(
         f"✅ Фото сохранено (задача #{task_id})\n\nМожно ещё добавить фото или завершить уборку:",
@@ -525,72 +517,74 @@ async def cleaner_receive_photo_auto(message: Message):
     )
 
 
-async def _do_transition(callback: CallbackQuery, task_id: int, target: CleaningTaskStatus, decline_reason: str | None = None):
-    async with AsyncSessionLocal() as session:
-        task = await session.get(CleaningTask, task_id)
-        if not task:
-            await callback.answer("Задача не найдена", show_alert=True)
-            return
-
-        # ВАЖНО: assigned_to_user_id — FK на users.id, передаём не telegram_id
-        # а резолвленный PK. Если пользователь ещё не в БД — None,
-        # тогда service оставит assigned_to_user_id как было (job
-        # обычно уже назначил при генерации).
-        cleaner_db_id = await resolve_user_db_id(session, callback.from_user.id)
-
-        ok = await CleaningTaskService.transition_status(
-            session,
-            task,
-            target,
-            cleaner_user_id=cleaner_db_id,
-            decline_reason=decline_reason,
+async def _do_transition(session: AsyncSession, callback: CallbackQuery, task_id: int, target: CleaningTaskStatus, decline_reason: str | None = None):
+    task = await session.get(CleaningTask, task_id)
+    if not task:
+        await callback.answer("Задача не найдена", show_alert=True)
+        return
+
+    # ВАЖНО: assigned_to_user_id — FK на users.id, передаём не telegram_id
+    # а резолвленный PK. Если пользователь ещё не в БД — None,
+    # тогда service оставит assigned_to_user_id как было (job
+    # обычно уже назначил при генерации).
+    cleaner_db_id = await resolve_user_db_id(session, callback.from_user.id)
+
+    ok = await CleaningTaskService.transition_status(
+        session,
+        task,
+        target,
+        cleaner_user_id=cleaner_db_id,
+        decline_reason=decline_reason,
+    )
+    if not ok:
+        # transition_status мог успеть поменять task (DONE без фото) —
+        # откатываем, иначе изменения закоммитит DbSessionMiddleware
+        await session.rollback()
+        await session.refresh(task)
+        # Показываем текущий статус задачи и предлагаем обновить
+        current_status = task.status.value
+        await callback.answer(
+            f"Кнопка устарела — статус уже: {current_status}\nОбновите карточку задачи.",
+            show_alert=True,
         )
-        if not ok:
-            # Показываем текущий статус задачи и предлагаем обновить
-            current_status = task.status.value
-            await callback.answer(
-                f"Кнопка устарела — статус уже: {current_status}\nОбновите карточку задачи.",
-                show_alert=True,
-            )
-            # Перерисовываем карточку с актуальным состоянием
-            await _render_task_view(callback, task_id)
-            return
-        await session.commit()
+        # Перерисовываем карточку с актуальным состоянием
+        await _render_task_view(session, callback, task_id)
+        return
+    await session.commit()
 
     await callback.answer("Готово")
-    await _render_task_view(callback, task_id)
+    await _render_task_view(session, callback, task_id)
 
 
 @router.callback_query(F.data.startswith("cleaner:task:accept:"))
-async def cleaner_task_accept(callback: CallbackQuery):
-    await _do_transition(callback, int(callback.data.split(":")[3]), CleaningTaskStatus.ACCEPTED)
+async def cleaner_task_accept(callback: CallbackQuery, session: AsyncSession):
+    await _do_transition(session, callback, int(callback.data.split(":")[3]), CleaningTaskStatus.ACCEPTED)
 
 
 @router.callback_query(F.data.startswith("cleaner:task:decline:"))
-async def cleaner_task_decline(callback: CallbackQuery):
-    await _do_transition(callback, int(callback.data.split(":")[3]), CleaningTaskStatus.DECLINED, decline_reason="declined_in_ui")
+async def cleaner_task_decline(callback: CallbackQuery, session: AsyncSession):
+    await _do_transition(session, callback, int(callback.data.split(":")[3]), CleaningTaskStatus.DECLINED, decline_reason="declined_in_ui")
 
 
 @router.callback_query(F.data.startswith("cleaner:task:start:"))
-async def cleaner_task_start(callback: CallbackQuery):
-    await _do_transition(callback, int(callback.data.split(":")[3]), CleaningTaskStatus.IN_PROGRESS)
+async def cleaner_task_start(callback: CallbackQuery, session: AsyncSession):
+    await _do_transition(session, callback, int(callback.data.split(":")[3]), CleaningTaskStatus.IN_PROGRESS)
 
 
 @router.callback_query(F.data.startswith("cleaner:task:done:"))
-async def cleaner_task_done(callback: CallbackQuery):
-    await _do_transition(callback, int(callback.data.split(":")[3]), CleaningTaskStatus.DONE)
+async def cleaner_task_done(callback: CallbackQuery, session: AsyncSession):
+    await _do_transition(session, callback, int(callback.data.split(":")[3]), CleaningTaskStatus.DONE)
 
 
 @router.callback_query(F.data.startswith("cleaner:task:extra:"))
-async def cleaner_task_extra_ask(callback: CallbackQuery):
+async def cleaner_task_extra_ask(callback: CallbackQuery, session: AsyncSession):
     task_id = int(callback.data.split(":")[3])
 
     # Загружаем стандартные доп. услуги из настроек
     from app.models import GlobalSetting
     from app.telegram.handlers.cleaner_admin import _parse_extras, EXTRAS_KEY
-    async with AsyncSessionLocal() as s:
-        setting = await s.get(GlobalSetting, EXTRAS_KEY)
-        extras = _parse_extras(setting.value if setting else None)
+    setting = await session.get(GlobalSetting, EXTRAS_KEY)
+    extras = _parse_extras(setting.value if setting else None)
 
     rows = []
     for i, (label, amount) in enumerate(extras):
@@ -613,7 +607,7 @@ async def cleaner_task_extra_ask(callback: CallbackQuery):
 
 
 @router.callback_query(F.data.startswith("cleaner:task:quickpay:"))
-async def cleaner_task_quickpay(callback: CallbackQuery):
+async def cleaner_task_quickpay(callback: CallbackQuery, session: AsyncSession):
     """Быстрое начисление стандартной доп. услуги — без одобрения админа."""
     parts = callback.data.split(":")
     task_id = int(parts[3])
@@ -626,14 +620,13 @@ async def cleaner_task_quickpay(callback: CallbackQuery):
     from app.core.config import settings
     from app.telegram.auth.admin import get_all_users
 
-    db_user_id = await resolve_user_db_id(None, callback.from_user.id)
+    db_user_id = await resolve_user_db_id(session, callback.from_user.id)
     if not db_user_id:
         await callback.answer("Ошибка", show_alert=True)
         return
 
-    async with AsyncSessionLocal() as s:
-        setting = await s.get(GlobalSetting, EXTRAS_KEY)
-        extras = _parse_extras(setting.value if setting else None)
+    setting = await session.get(GlobalSetting, EXTRAS_KEY)
+    extras = _parse_extras(setting.value if setting else None)
 
     if extra_idx >= len(extras):
         await callback.answer("Услуга не найдена", show_alert=True)
@@ -641,22 +634,21 @@ async def cleaner_task_quickpay(callback: CallbackQuery):
 
     label, amount = extras[extra_idx]
 
-    async with AsyncSessionLocal() as s:
-        period_key = __import__("datetime").date.today().strftime("%Y-%m")
-        s.add(CleaningPaymentLedger(
-            task_id=task_id,
-            cleaner_user_id=db_user_id,
-            entry_type=CleaningPaymentEntryType.ADJUSTMENT,
-            amount=Decimal(amount),
-            period_key=period_key,
-            status=PaymentStatus.ACCRUED,
-            comment=f"{label} — задача #{task_id}",
-            created_at=datetime.now(timezone.utc),
-        ))
-        await s.commit()
+    period_key = __import__("datetime").date.today().strftime("%Y-%m")
+    session.add(CleaningPaymentLedger(
+        task_id=task_id,
+        cleaner_user_id=db_user_id,
+        entry_type=CleaningPaymentEntryType.ADJUSTMENT,
+        amount=Decimal(amount),
+        period_key=period_key,
+        status=PaymentStatus.ACCRUED,
+        comment=f"{label} — задача #{task_id}",
+        created_at=datetime.now(timezone.utc),
+    ))
+    await session.commit()
 
     # Уведомляем администраторов
-    users = await get_all_users()
+    users = await get_all_users(session)
     admin_ids = {u.telegram_id for u in users if u.role in {UserRole.ADMIN, UserRole.OWNER} and u.telegram_id}
     admin_ids.add(settings.telegram_chat_id)
     name = callback.from_user.first_name or "Уборщица"
@@ -717,7 +709,7 @@ async def cleaner_task_extra_desc_received(message: Message):
 
 
 @router.message(lambda m: m.from_user and m.from_user.id in _awaiting_extra_amount and m.text)
-async def cleaner_task_extra_amount_received(message: Message):
+async def cleaner_task_extra_amount_received(message: Message, session: AsyncSession):
     tg_id = message.from_user.id
     state = _awaiting_extra_amount.pop(tg_id, None)
     if state is None:
@@ -734,14 +726,14 @@ async def cleaner_task_extra_amount_received(message: Message):
         _awaiting_extra_amount[tg_id] = state
         return
 
-    db_user_id = await resolve_user_db_id(None, tg_id)
+    db_user_id = await resolve_user_db_id(session, tg_id)
     name = message.from_user.first_name or "Уборщица"
 
     from app.core.config import settings
     from app.models import UserRole
     from app.telegram.auth.admin import get_all_users
 
-    users = await get_all_users()
+    users = await get_all_users(session)
     admin_ids = {u.telegram_id for u in users if u.role in {UserRole.ADMIN, UserRole.OWNER} and u.telegram_id}
     admin_ids.add(settings.telegram_chat_id)
 
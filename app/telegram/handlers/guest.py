@@ -11,9 +11,9 @@ from aiogram.types import (
     InlineKeyboardButton,
 )
 from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import joinedload
 
-from app.database import AsyncSessionLocal
 from app.models import Booking, BookingStatus, User, GlobalSetting
 from app.telegram.auth.admin import (
     add_user,
@@ -28,9 +28,10 @@ from app.telegram.menus.guest import (
     guest_showcase_menu_keyboard,
     request_contact_keyboard,
 )
+from app.telegram.state.store import StateDict, state_store
 from app.core.messages import messages
 from app.core.config import settings
-from app.utils.phone import normalize_phone, phones_match
+from app.utils.phone import normalize_phone, phone_last10
 from app.services.booking_service import BookingService
 from app.services.notification_service import send_safe
 
@@ -39,8 +40,8 @@ logger = logging.getLogger(__name__)
 
 _feedback_waiting_users: dict[int, str] = {}
 _pay_receipt_waiting_users: dict[int, int] = {}
-_guest_auth_state: dict[int, bool] = {}
-_guest_context_state: dict[int, str] = {}  # showcase | guest_cabinet
+_guest_auth_state: StateDict = StateDict(state_store, "guest_auth")
+_guest_context_state: StateDict = StateDict(state_store, "guest_context")  # showcase | guest_cabinet
 
 FEEDBACK_CATEGORIES = {
     "booking": "Бронирование",
@@ -147,6 +148,11 @@ async def ensure_guest_auth(callback: CallbackQuery) -> bool:
     return False
 
 
+def _user_phone_key(user: User) -> str:
+    """Ключ для поиска броней гостя (Booking.guest_phone_last10)."""
+    return user.phone_last10 or phone_last10(user.phone)
+
+
 async def get_setting_value(session, key: str, default: str = "") -> str:
     setting = await session.get(GlobalSetting, key)
     return setting.value if setting and setting.value else default
@@ -189,19 +195,18 @@ async def show_guest_menu(message: Message):
 
 
 @router.message(Command("about"))
-async def cmd_about(message: Message):
+async def cmd_about(message: Message, session: AsyncSession):
     """Команда /about — О базе отдыха."""
-    async with AsyncSessionLocal() as session:
-        about_text = await get_setting_value(
-            session,
-            "guest_showcase_about",
-            f"<b>{settings.project_name}</b> — база отдыха рядом с Архызом, "
-            "в спокойной локации немного в стороне от посёлка.\n\n"
-            "На территории 3 домика для 2–6 гостей. Во всех есть Wi-Fi, горячая вода, "
-            "постельное бельё, полотенца, кухня с посудой, мангал и парковка.\n\n"
-            "Подойдёт тем, кто хочет отдыхать не в центре, а в более тихом месте "
-            "недалеко от курорта и горных маршрутов.",
-        )
+    about_text = await get_setting_value(
+        session,
+        "guest_showcase_about",
+        f"<b>{settings.project_name}</b> — база отдыха рядом с Архызом, "
+        "в спокойной локации немного в стороне от посёлка.\n\n"
+        "На территории 3 домика для 2–6 гостей. Во всех есть Wi-Fi, горячая вода, "
+        "постельное бельё, полотенца, кухня с посудой, мангал и парковка.\n\n"
+        "Подойдёт тем, кто хочет отдыхать не в центре, а в более тихом месте "
+        "недалеко от курорта и горных маршрутов.",
+    )
     keyboard = InlineKeyboardMarkup(
         inline_keyboard=[[InlineKeyboardButton(text="🔙 Меню", callback_data="guest:showcase:menu")]]
     )
@@ -216,20 +221,19 @@ async def cmd_dates(message: Message):
 
 
 @router.message(Command("location"))
-async def cmd_location(message: Message):
+async def cmd_location(message: Message, session: AsyncSession):
     """Команда /location — Где мы находимся."""
-    async with AsyncSessionLocal() as session:
-        setting = await session.get(GlobalSetting, "coords")
-        coords = setting.value if setting and setting.value else settings.project_coords
-
-        location_text = await get_setting_value(
-            session,
-            "guest_showcase_location",
-            f"📍 <b>Где мы находимся</b>\n\n"
-            f"{settings.project_name} расположена рядом с Архызом, в спокойной локации "
-            "немного в стороне от посёлка.\n\n"
-            f"Координаты для навигатора:\n<code>{coords}</code>",
-        )
+    setting = await session.get(GlobalSetting, "coords")
+    coords = setting.value if setting and setting.value else settings.project_coords
+
+    location_text = await get_setting_value(
+        session,
+        "guest_showcase_location",
+        f"📍 <b>Где мы находимся</b>\n\n"
+        f"{settings.project_name} расположена рядом с Архызом, в спокойной локации "
+        "немного в стороне от посёлка.\n\n"
+        f"Координаты для навигатора:\n<code>{coords}</code>",
+    )
 
     rows = [[InlineKeyboardButton(text="📍 Открыть в Яндекс.Картах", url=f"https://yandex.ru/maps/?text={coords}")]]
     rows.append([InlineKeyboardButton(text="🔙 Меню", callback_data="guest:showcase:menu")])
@@ -260,7 +264,7 @@ async def cmd_login(message: Message):
 
 
 @router.message(Command("booking"))
-async def cmd_booking(message: Message):
+async def cmd_booking(message: Message, session: AsyncSession):
     """Команда /booking — Моя бронь."""
     user_id = message.from_user.id
     if not is_guest_authorized(user_id):
@@ -272,30 +276,29 @@ async def cmd_booking(message: Message):
         )
         return
 
-    async with AsyncSessionLocal() as session:
-        booking = await get_active_booking(session, user_id)
-        if not booking:
-            await message.answer("❌ Активная бронь не найдена.")
-            return
+    booking = await get_active_booking(session, user_id)
+    if not booking:
+        await message.answer("❌ Активная бронь не найдена.")
+        return
 
-        house = booking.house
-        text = messages.booking_card(
-            house_name=house.name if house else "—",
-            check_in=booking.check_in,
-            check_out=booking.check_out,
-            guests_count=booking.guests_count,
-            total_price=int(booking.total_price) if booking.total_price else 0,
-            advance_amount=int(booking.advance_amount) if booking.advance_amount else 0,
-            status=booking.status,
-        )
-        keyboard = InlineKeyboardMarkup(
-            inline_keyboard=[[InlineKeyboardButton(text="🔙 Меню", callback_data="guest:menu")]]
-        )
-        await message.answer(text, reply_markup=keyboard, parse_mode="HTML")
+    house = booking.house
+    text = messages.booking_card(
+        house_name=house.name if house else "—",
+        check_in=booking.check_in,
+        check_out=booking.check_out,
+        guests_count=booking.guests_count,
+        total_price=int(booking.total_price) if booking.total_price else 0,
+        advance_amount=int(booking.advance_amount) if booking.advance_amount else 0,
+        status=booking.status,
+    )
+    keyboard = InlineKeyboardMarkup(
+        inline_keyboard=[[InlineKeyboardButton(text="🔙 Меню", callback_data="guest:menu")]]
+    )
+    await message.answer(text, reply_markup=keyboard, parse_mode="HTML")
 
 
 @router.message(F.contact)
-async def handle_contact(message: Message):
+async def handle_contact(message: Message, session: AsyncSession):
     """Обработка контакта для входа"""
     contact = message.contact
 
@@ -310,54 +313,45 @@ async def handle_contact(message: Message):
     logger.info(f"Guest login attempt: {clean_phone} (user_id={message.from_user.id})")
 
     # Поиск брони
-    async with AsyncSessionLocal() as session:
-        # Ищем активные брони, где телефон совпадает
-        # Примечание: в БД телефоны могут быть записаны по-разному.
-        # В идеале в БД тоже хранить чистые номера.
-        # Пока используем ILIKE c % для гибкости или точное совпадение если мы уверены.
-        # Попробуем найти точное или частичное совпадение.
-
-        # Для простоты ищем where phone like %clean_phone% OR clean_phone in phone
-        # Но SQLite 'LIKE' is simpler.
-
-        # Сделаем выборку всех активных и проверим в python (безопаснее для форматов)
-        query = select(Booking).where(
-            Booking.status.in_([BookingStatus.CONFIRMED, BookingStatus.PAID])
+    # Ищем активную бронь с тем же телефоном: индексное равенство по
+    # последним 10 цифрам (та же логика, что в phones_match)
+    query = (
+        select(Booking)
+        .where(
+            Booking.guest_phone_last10 == phone_last10(clean_phone),
+            Booking.status.in_([BookingStatus.CONFIRMED, BookingStatus.PAID]),
         )
-        result = await session.execute(query)
-        bookings = result.scalars().all()
-
-        found_booking = None
-        for booking in bookings:
-            if phones_match(clean_phone, booking.guest_phone):
-                found_booking = booking
-                break
-
-        if found_booking:
-            # УСПЕХ!
-            await add_user(
-                telegram_id=message.from_user.id,
-                role=UserRole.GUEST,
-                name=contact.first_name or "Гость",
-                phone=clean_phone,
-            )
-            set_guest_auth(message.from_user.id, True)
-            set_guest_context(message.from_user.id, "guest_cabinet")
+        .limit(1)
+    )
+    result = await session.execute(query)
+    found_booking = result.scalars().first()
+
+    if found_booking:
+        # УСПЕХ!
+        await add_user(
+            telegram_id=message.from_user.id,
+            role=UserRole.GUEST,
+            name=contact.first_name or "Гость",
+            phone=clean_phone,
+            session=session,
+        )
+        set_guest_auth(message.from_user.id, True)
+        set_guest_context(message.from_user.id, "guest_cabinet")
 
-            await message.answer(
-                messages.welcome_success(message.from_user.first_name),
-                reply_markup=ReplyKeyboardRemove(),  # Убираем кнопку контакта
-            )
-            await show_guest_menu(message)
+        await message.answer(
+            messages.welcome_success(message.from_user.first_name),
+            reply_markup=ReplyKeyboardRemove(),  # Убираем кнопку контакта
+        )
+        await show_guest_menu(message)
 
-        else:
-            # НЕ НАЙДЕНО
-            set_guest_auth(message.from_user.id, False)
-            set_guest_context(message.from_user.id, "showcase")
-            await message.answer(
-                messages.BOOKING_NOT_FOUND,
-                reply_markup=ReplyKeyboardRemove(),
-            )
+    else:
+        # НЕ НАЙДЕНО
+        set_guest_auth(message.from_user.id, False)
+        set_guest_context(message.from_user.id, "showcase")
+        await message.answer(
+            messages.BOOKING_NOT_FOUND,
+            reply_markup=ReplyKeyboardRemove(),
+        )
 
 
 @router.callback_query(F.data == "guest:auth")
@@ -374,27 +368,26 @@ async def guest_auth_prompt(callback: CallbackQuery):
 
 
 @router.callback_query(F.data == "guest:showcase:about")
-async def guest_showcase_about(callback: CallbackQuery):
+async def guest_showcase_about(callback: CallbackQuery, session: AsyncSession):
     if not await ensure_guest_context(callback, "showcase"):
         return
-    async with AsyncSessionLocal() as session:
-        about_text = await get_setting_value(
-            session,
-            "guest_showcase_about",
-            f"<b>{settings.project_name}</b> — база отдыха рядом с Архызом, "
-            "в спокойной локации немного в стороне от посёлка.\n\n"
-            "На территории 3 домика для 2–6 гостей. Во всех есть Wi-Fi, горячая вода, "
-            "постельное бельё, полотенца, кухня с посудой, мангал и парковка.\n\n"
-            "Подойдёт тем, кто хочет отдыхать не в центре, а в более тихом месте "
-            "недалеко от курорта и горных маршрутов.",
-        )
+    about_text = await get_setting_value(
+        session,
+        "guest_showcase_about",
+        f"<b>{settings.project_name}</b> — база отдыха рядом с Архызом, "
+        "в спокойной локации немного в стороне от посёлка.\n\n"
+        "На территории 3 домика для 2–6 гостей. Во всех есть Wi-Fi, горячая вода, "
+        "постельное бельё, полотенца, кухня с посудой, мангал и парковка.\n\n"
+        "Подойдёт тем, кто хочет отдыхать не в центре, а в более тихом месте "
+        "недалеко от курорта и горных маршрутов.",
+    )
     keyboard = InlineKeyboardMarkup(inline_keyboard=build_showcase_section_rows("about"))
     await safe_edit(callback, about_text, reply_markup=keyboard, parse_mode="HTML")
     await callback.answer()
 
 
 @router.callback_query(F.data == "guest:showcase:houses")
-async def guest_showcase_houses(callback: CallbackQuery):
+async def guest_showcase_houses(callback: CallbackQuery, session: AsyncSession):
     if not await ensure_guest_context(callback, "showcase"):
         return
 
@@ -402,38 +395,37 @@ async def guest_showcase_houses(callback: CallbackQuery):
     from app.services.pricing_service import PricingService
     from app.data.house_descriptions import get_display_description
 
-    async with AsyncSessionLocal() as db:
-        houses = await HouseService.get_all_houses(db)
+    houses = await HouseService.get_all_houses(session)
 
-        if not houses:
-            text = "🏕 <b>Наши домики</b>\n\nИнформация о домиках скоро появится."
-            keyboard = InlineKeyboardMarkup(
-                inline_keyboard=build_showcase_section_rows("houses")
-            )
-            await safe_edit(callback, text, reply_markup=keyboard, parse_mode="HTML")
-            await callback.answer()
-            return
+    if not houses:
+        text = "🏕 <b>Наши домики</b>\n\nИнформация о домиках скоро появится."
+        keyboard = InlineKeyboardMarkup(
+            inline_keyboard=build_showcase_section_rows("houses")
+        )
+        await safe_edit(callback, text, reply_markup=keyboard, parse_mode="HTML")
+        await callback.answer()
+        return
 
-        text = "🏕 <b>Наши домики</b>\n\n"
-        for house in houses:
-            price_info = await PricingService.get_display_price(db, house.id)
-            price = price_info["final_price"]
-            base = price_info["price"]
-
-            desc = get_display_description(house.name, house.description)
-
-            text += f"🏠 <b>{house.name}</b>  ·  до {house.capacity} гостей\n"
-            if desc:
-                text += f"{desc}\n"
-            if price:
-                if price_info["discount_percent"]:
-                    text += (
-                        f"💰 <b>{price:,} ₽/сут</b>  <s>{base:,} ₽</s>"
-                        f"  <i>−{price_info['discount_percent']}%</i>\n"
-                    )
-                else:
-                    text += f"💰 от <b>{price:,} ₽/сут</b>\n"
-            text += "\n"
+    text = "🏕 <b>Наши домики</b>\n\n"
+    for house in houses:
+        price_info = await PricingService.get_display_price(session, house.id)
+        price = price_info["final_price"]
+        base = price_info["price"]
+
+        desc = get_display_description(house.name, house.description)
+
+        text += f"🏠 <b>{house.name}</b>  ·  до {house.capacity} гостей\n"
+        if desc:
+            text += f"{desc}\n"
+        if price:
+            if price_info["discount_percent"]:
+                text += (
+                    f"💰 <b>{price:,} ₽/сут</b>  <s>{base:,} ₽</s>"
+                    f"  <i>−{price_info['discount_percent']}%</i>\n"
+                )
+            else:
+                text += f"💰 от <b>{price:,} ₽/сут</b>\n"
+        text += "\n"
 
     keyboard_rows = []
     for house in houses:
@@ -454,7 +446,7 @@ async def guest_showcase_houses(callback: CallbackQuery):
 
 
 @router.callback_query(F.data.startswith("guest:house:"))
-async def guest_house_detail(callback: CallbackQuery):
+async def guest_house_detail(callback: CallbackQuery, session: AsyncSession):
     """Детальная карточка домика с фото"""
     if not await ensure_guest_context(callback, "showcase"):
         return
@@ -465,13 +457,12 @@ async def guest_house_detail(callback: CallbackQuery):
     from app.services.pricing_service import PricingService
     from app.data.house_descriptions import get_full_description
 
-    async with AsyncSessionLocal() as db:
-        house = await HouseService.get_house_by_id(db, house_id)
-        if not house:
-            await callback.answer("Домик не найден")
-            return
+    house = await HouseService.get_house_by_id(session, house_id)
+    if not house:
+        await callback.answer("Домик не найден")
+        return
 
-        price_info = await PricingService.get_display_price(db, house.id)
+    price_info = await PricingService.get_display_price(session, house.id)
 
     price = price_info["final_price"]
     base = price_info["price"]
@@ -521,22 +512,21 @@ async def guest_house_detail(callback: CallbackQuery):
 
 
 @router.callback_query(F.data == "guest:showcase:faq")
-async def guest_showcase_faq(callback: CallbackQuery):
+async def guest_showcase_faq(callback: CallbackQuery, session: AsyncSession):
     if not await ensure_guest_context(callback, "showcase"):
         return
     if not settings.guest_feature_faq:
         await callback.answer("Раздел FAQ временно недоступен", show_alert=True)
         return
-    async with AsyncSessionLocal() as session:
-        text = await get_setting_value(
-            session,
-            "guest_showcase_faq",
-            "❓ <b>Популярные вопросы</b>\n\n"
-            "• Как забронировать? — Нажмите «Проверить даты и забронировать».\n"
-            "• Когда заезд/выезд? — Обычно заезд после 14:00, выезд до 12:00.\n"
-            "• Можно с детьми? — Да, условия зависят от домика.\n"
-            "• Где уточнить детали? — Через кнопку «Связаться с нами».",
-        )
+    text = await get_setting_value(
+        session,
+        "guest_showcase_faq",
+        "❓ <b>Популярные вопросы</b>\n\n"
+        "• Как забронировать? — Нажмите «Проверить даты и забронировать».\n"
+        "• Когда заезд/выезд? — Обычно заезд после 14:00, выезд до 12:00.\n"
+        "• Можно с детьми? — Да, условия зависят от домика.\n"
+        "• Где уточнить детали? — Через кнопку «Связаться с нами».",
+    )
 
     rows = [[InlineKeyboardButton(text="✍️ Задать свой вопрос", callback_data="guest:feedback:start")]]
     rows.extend(build_showcase_section_rows("faq"))
@@ -546,22 +536,20 @@ async def guest_showcase_faq(callback: CallbackQuery):
 
 
 @router.callback_query(F.data == "guest:showcase:location")
-async def guest_showcase_location(callback: CallbackQuery):
+async def guest_showcase_location(callback: CallbackQuery, session: AsyncSession):
     if not await ensure_guest_context(callback, "showcase"):
         return
-    async with AsyncSessionLocal() as session:
-        setting = await session.get(GlobalSetting, "coords")
-        coords = setting.value if setting and setting.value else settings.project_coords
-
-    async with AsyncSessionLocal() as session:
-        location_text = await get_setting_value(
-            session,
-            "guest_showcase_location",
-            f"📍 <b>Где мы находимся</b>\n\n"
-            f"{settings.project_name} расположена рядом с Архызом, в спокойной локации "
-            "немного в стороне от посёлка.\n\n"
-            f"Координаты для навигатора:\n<code>{coords}</code>",
-        )
+    setting = await session.get(GlobalSetting, "coords")
+    coords = setting.value if setting and setting.value else settings.project_coords
+
+    location_text = await get_setting_value(
+        session,
+        "guest_showcase_location",
+        f"📍 <b>Где мы находимся</b>\n\n"
+        f"{settings.project_name} расположена рядом с Архызом, в спокойной локации "
+        "немного в стороне от посёлка.\n\n"
+        f"Координаты для навигатора:\n<code>{coords}</code>",
+    )
 
     text = location_text
     rows = [[InlineKeyboardButton(text="📍 Открыть в Яндекс.Картах", url=f"https://yandex.ru/maps/?text={coords}")]]
@@ -605,13 +593,13 @@ async def guest_feedback_choose_category(callback: CallbackQuery):
 
 
 @router.message(StateFilter(None), F.text)
-async def guest_feedback_message(message: Message):
+async def guest_feedback_message(message: Message, session: AsyncSession):
     if not message.from_user or message.from_user.id not in _feedback_waiting_users:
         return
 
     category = _feedback_waiting_users.pop(message.from_user.id)
 
-    users = await get_all_users()
+    users = await get_all_users(session)
     admin_ids = {u.telegram_id for u in users if u.role in {UserRole.ADMIN, UserRole.OWNER} and u.telegram_id}
     admin_ids.add(settings.telegram_chat_id)
 
@@ -630,106 +618,98 @@ async def guest_feedback_message(message: Message):
 
 
 @router.callback_query(F.data == "guest:my_booking")
-async def my_booking(callback: CallbackQuery):
+async def my_booking(callback: CallbackQuery, session: AsyncSession):
     if not await ensure_guest_auth(callback):
         return
     """Показать детали брони"""
     user_id = callback.from_user.id
 
-    async with AsyncSessionLocal() as session:
-        # 1. Получаем телефон пользователя
-        user_result = await session.execute(
-            select(User).where(User.telegram_id == user_id)
-        )
-        user = user_result.scalar_one_or_none()
-
-        if not user or not user.phone:
-            await callback.answer(
-                "❌ Ошибка авторизации. Телефон не найден.", show_alert=True
-            )
-            return
+    # 1. Получаем телефон пользователя
+    user_result = await session.execute(
+        select(User).where(User.telegram_id == user_id)
+    )
+    user = user_result.scalar_one_or_none()
 
-        # 2. Ищем бронь (активную)
-        # Снова нечеткий поиск по телефону, или точный если мы уверены
-        clean_user_phone = user.phone
-
-        today = date.today()
-        query = (
-            select(Booking)
-            .options(joinedload(Booking.house))
-            .where(
-                Booking.status.in_([BookingStatus.CONFIRMED, BookingStatus.PAID]),
-                Booking.check_out >= today,
-            )
-            .order_by(Booking.check_in)
+    if not user or not user.phone:
+        await callback.answer(
+            "❌ Ошибка авторизации. Телефон не найден.", show_alert=True
         )
-        result = await session.execute(query)
-        bookings = result.scalars().all()
+        return
 
-        found_booking = None
-        for b in bookings:
-            if phones_match(clean_user_phone, b.guest_phone):
-                found_booking = b
-                break
+    # 2. Ищем бронь (активную) — индексный поиск по телефону
+    today = date.today()
+    query = (
+        select(Booking)
+        .options(joinedload(Booking.house))
+        .where(
+            Booking.guest_phone_last10 == _user_phone_key(user),
+            Booking.status.in_([BookingStatus.CONFIRMED, BookingStatus.PAID]),
+            Booking.check_out >= today,
+        )
+        .order_by(Booking.check_in)
+        .limit(1)
+    )
+    result = await session.execute(query)
+    found_booking = result.scalars().first()
 
-        if not found_booking:
-            await callback.answer("❌ Активная бронь не найдена", show_alert=True)
-            return
+    if not found_booking:
+        await callback.answer("❌ Активная бронь не найдена", show_alert=True)
+        return
 
-        # 3. Формируем карточку
-        b = found_booking
-        remainder = b.total_price - b.advance_amount
-        status_emoji = "✅" if b.status == BookingStatus.PAID else "⏳"
-
-        text = messages.booking_card(
-            house_name=b.house.name,
-            check_in=b.check_in.strftime("%d.%m"),
-            check_out=b.check_out.strftime("%d.%m"),
-            guests=b.guests_count,
-            total=int(b.total_price),
-            paid=int(b.advance_amount),
-            remainder=int(remainder),
-            status_emoji=status_emoji,
-        )
+    # 3. Формируем карточку
+    b = found_booking
+    remainder = b.total_price - b.advance_amount
+    status_emoji = "✅" if b.status == BookingStatus.PAID else "⏳"
+
+    text = messages.booking_card(
+        house_name=b.house.name,
+        check_in=b.check_in.strftime("%d.%m"),
+        check_out=b.check_out.strftime("%d.%m"),
+        guests=b.guests_count,
+        total=int(b.total_price),
+        paid=int(b.advance_amount),
+        remainder=int(remainder),
+        status_emoji=status_emoji,
+    )
 
-        # G10.5 polish: для PAID скрываем «оплатить остаток», показываем
-        # «✅ Полностью оплачено» (дисэйблнутая кнопка-метка).
-        is_fully_paid = (
-            b.status == BookingStatus.PAID
-            and remainder <= 0
-        )
-        if is_fully_paid:
-            pay_row = [
+    # G10.5 polish: для PAID скрываем «оплатить остаток», показываем
+    # «✅ Полностью оплачено» (дисэйблнутая кнопка-метка).
+    is_fully_paid = (
+        b.status == BookingStatus.PAID
+        and remainder <= 0
+    )
+    if is_fully_paid:
+        pay_row = [
+            InlineKeyboardButton(
+                text="✅ Оплата подтверждена", callback_data="guest:pay"
+            )
+        ]
+    else:
+        pay_row = [
+            InlineKeyboardButton(
+                text="💳 Оплатить остаток", callback_data="guest:pay"
+            )
+        ]
+    keyboard = InlineKeyboardMarkup(
+        inline_keyboard=[
+            pay_row,
+            [
                 InlineKeyboardButton(
-                    text="✅ Оплата подтверждена", callback_data="guest:pay"
-                )
-            ]
-        else:
-            pay_row = [
+                    text="🔑 Инструкция", callback_data="guest:instruction"
+                ),
+                InlineKeyboardButton(text="📶 Wi-Fi", callback_data="guest:wifi"),
+            ],
+            [
                 InlineKeyboardButton(
-                    text="💳 Оплатить остаток", callback_data="guest:pay"
+                    text="🚫 Отменить бронь",
+                    callback_data=f"guest:cancel:start:{b.id}",
                 )
-            ]
-        keyboard = InlineKeyboardMarkup(
-            inline_keyboard=[
-                pay_row,
-                [
-                    InlineKeyboardButton(
-                        text="🔑 Инструкция", callback_data="guest:instruction"
-                    ),
-                    InlineKeyboardButton(text="📶 Wi-Fi", callback_data="guest:wifi"),
-                ],
-                [
-                    InlineKeyboardButton(
-                        text="🚫 Отменить бронь",
-                        callback_data=f"guest:cancel:start:{b.id}",
-                    )
-                ],
-                [InlineKeyboardButton(text="🔙 Назад", callback_data="guest:menu")],
-            ]
-        )
+            ],
+            [InlineKeyboardButton(text="🔙 Назад", callback_data="guest:menu")],
+        ]
+    )
 
-        await safe_edit(callback, text, reply_markup=keyboard, parse_mode="HTML")
+    await safe_edit(callback, text, reply_markup=keyboard, parse_mode="HTML")
 
 
 async def get_active_booking(session, user_id: int):
@@ -745,12 +725,11 @@ async def get_active_booking(session, user_id: int):
     if not user or not user.phone:
         return None
 
-    clean_user_phone = user.phone
-
     query = (
         select(Booking)
         .options(joinedload(Booking.house))
         .where(
+            Booking.guest_phone_last10 == _user_phone_key(user),
             Booking.status.in_(
                 [
                     BookingStatus.CONFIRMED,
@@ -758,11 +737,11 @@ async def get_active_booking(session, user_id: int):
                     BookingStatus.CHECKING_IN,
                     BookingStatus.CHECKED_IN,
                 ]
-            )
+            ),
         )
     )
     result = await session.execute(query)
-    bookings = [b for b in result.scalars().all() if phones_match(clean_user_phone, b.guest_phone)]
+    bookings = result.scalars().all()
 
     if not bookings:
         return None
@@ -778,7 +757,7 @@ async def get_active_booking(session, user_id: int):
 
 
 @router.callback_query(F.data == "guest:instruction")
-async def guest_instruction(callback: CallbackQuery):
+async def guest_instruction(callback: CallbackQuery, session: AsyncSession):
     if not await ensure_guest_auth(callback):
         return
     """Инструкция по заселению (time-gate настраивается через GlobalSetting
@@ -790,135 +769,131 @@ async def guest_instruction(callback: CallbackQuery):
         is_instruction_open,
     )
 
-    async with AsyncSessionLocal() as session:
-        booking = await get_active_booking(session, callback.from_user.id)
-
-        if not booking:
-            await callback.answer("❌ Бронь не найдена", show_alert=True)
-            return
+    booking = await get_active_booking(session, callback.from_user.id)
 
-        open_hours = await get_guest_instruction_open_hours(session)
+    if not booking:
+        await callback.answer("❌ Бронь не найдена", show_alert=True)
+        return
 
-        check_in_dt = datetime.combine(booking.check_in, dtime.min)
-        hours_to_checkin = (check_in_dt - datetime.now()).total_seconds() / 3600
+    open_hours = await get_guest_instruction_open_hours(session)
 
-        if not is_instruction_open(hours_to_checkin, open_hours):
-            # Считаем «дней до заезда» для UX-сообщения
-            days_to_checkin = max(0, int(hours_to_checkin // 24))
-            await callback.message.edit_text(
-                f"🔒 <b>Инструкция будет доступна за {open_hours} ч до заезда.</b>\n\n"
-                f"До заезда осталось: <b>~{days_to_checkin} дн.</b>",
-                reply_markup=InlineKeyboardMarkup(
-                    inline_keyboard=[[InlineKeyboardButton(text="🔙 Назад", callback_data="guest:my_booking")]]
-                ),
-                parse_mode="HTML",
-            )
-            await callback.answer()
-            return
+    check_in_dt = datetime.combine(booking.check_in, dtime.min)
+    hours_to_checkin = (check_in_dt - datetime.now()).total_seconds() / 3600
 
-        instruction = (
-            booking.house.checkin_instruction
-            or "Инструкция формируется, свяжитесь с администратором."
+    if not is_instruction_open(hours_to_checkin, open_hours):
+        # Считаем «дней до заезда» для UX-сообщения
+        days_to_checkin = max(0, int(hours_to_checkin // 24))
+        await callback.message.edit_text(
+            f"🔒 <b>Инструкция будет доступна за {open_hours} ч до заезда.</b>\n\n"
+            f"До заезда осталось: <b>~{days_to_checkin} дн.</b>",
+            reply_markup=InlineKeyboardMarkup(
+                inline_keyboard=[[InlineKeyboardButton(text="🔙 Назад", callback_data="guest:my_booking")]]
+            ),
+            parse_mode="HTML",
         )
+        await callback.answer()
+        return
 
-        text = (
-            f"🔑 <b>Инструкция по заселению: {booking.house.name}</b>\n\n"
-            f"{instruction}\n\n"
-            f"<i>(Эта информация открывается за {open_hours} ч до заезда)</i>"
-        )
+    instruction = (
+        booking.house.checkin_instruction
+        or "Инструкция формируется, свяжитесь с администратором."
+    )
 
-        keyboard = InlineKeyboardMarkup(
-            inline_keyboard=[
-                [
-                    InlineKeyboardButton(
-                        text="🔙 Назад", callback_data="guest:my_booking"
-                    )
-                ],
-            ]
-        )
-        await safe_edit(callback, text, reply_markup=keyboard, parse_mode="HTML")
+    text = (
+        f"🔑 <b>Инструкция по заселению: {booking.house.name}</b>\n\n"
+        f"{instruction}\n\n"
+        f"<i>(Эта информация открывается за {open_hours} ч до заезда)</i>"
+    )
+
+    keyboard = InlineKeyboardMarkup(
+        inline_keyboard=[
+            [
+                InlineKeyboardButton(
+                    text="🔙 Назад", callback_data="guest:my_booking"
+                )
+            ],
+        ]
+    )
+    await safe_edit(callback, text, reply_markup=keyboard, parse_mode="HTML")
 
 
 @router.callback_query(F.data == "guest:wifi")
-async def guest_wifi(callback: CallbackQuery):
+async def guest_wifi(callback: CallbackQuery, session: AsyncSession):
     if not await ensure_guest_auth(callback):
         return
     """Wi-Fi"""
-    async with AsyncSessionLocal() as session:
-        booking = await get_active_booking(session, callback.from_user.id)
+    booking = await get_active_booking(session, callback.from_user.id)
 
-        if not booking:
-            await callback.answer("❌ Бронь не найдена", show_alert=True)
-            return
+    if not booking:
+        await callback.answer("❌ Бронь не найдена", show_alert=True)
+        return
 
-        wifi_info = booking.house.wifi_info or "Информация о Wi-Fi не задана."
+    wifi_info = booking.house.wifi_info or "Информация о Wi-Fi не задана."
 
-        text = messages.wifi_info(booking.house.name, wifi_info)
-        keyboard = InlineKeyboardMarkup(
-            inline_keyboard=[
-                [
-                    InlineKeyboardButton(
-                        text="🔙 Назад", callback_data="guest:my_booking"
-                    )
-                ],
-            ]
-        )
-        await safe_edit(callback, text, reply_markup=keyboard, parse_mode="HTML")
+    text = messages.wifi_info(booking.house.name, wifi_info)
+    keyboard = InlineKeyboardMarkup(
+        inline_keyboard=[
+            [
+                InlineKeyboardButton(
+                    text="🔙 Назад", callback_data="guest:my_booking"
+                )
+            ],
+        ]
+    )
+    await safe_edit(callback, text, reply_markup=keyboard, parse_mode="HTML")
 
 
 @router.callback_query(F.data == "guest:directions")
-async def guest_directions(callback: CallbackQuery):
+async def guest_directions(callback: CallbackQuery, session: AsyncSession):
     if not await ensure_guest_auth(callback):
         return
     """Как добраться"""
-    async with AsyncSessionLocal() as session:
-        # Получаем глобальные координаты
-        setting = await session.get(GlobalSetting, "coords")
-        coords = setting.value if setting and setting.value else settings.project_coords
+    # Получаем глобальные координаты
+    setting = await session.get(GlobalSetting, "coords")
+    coords = setting.value if setting and setting.value else settings.project_coords
 
-        text = messages.directions(coords)
+    text = messages.directions(coords)
 
-        keyboard = InlineKeyboardMarkup(
-            inline_keyboard=[
-                [
-                    InlineKeyboardButton(
-                        text="📍 Открыть в Яндекс.Картах",
-                        url=f"https://yandex.ru/maps/?text={coords}",
-                    )
-                ],
-                [InlineKeyboardButton(text="🔙 Назад", callback_data="guest:menu")],
-            ]
-        )
-        await safe_edit(callback, text, reply_markup=keyboard, parse_mode="HTML")
+    keyboard = InlineKeyboardMarkup(
+        inline_keyboard=[
+            [
+                InlineKeyboardButton(
+                    text="📍 Открыть в Яндекс.Картах",
+                    url=f"https://yandex.ru/maps/?text={coords}",
+                )
+            ],
+            [InlineKeyboardButton(text="🔙 Назад", callback_data="guest:menu")],
+        ]
+    )
+    await safe_edit(callback, text, reply_markup=keyboard, parse_mode="HTML")
 
 
 @router.callback_query(F.data == "guest:rules")
-async def guest_rules(callback: CallbackQuery):
+async def guest_rules(callback: CallbackQuery, session: AsyncSession):
     if not await ensure_guest_auth(callback):
         return
     """Правила проживания"""
-    async with AsyncSessionLocal() as session:
-        # Получаем глобальные правила
-        setting = await session.get(GlobalSetting, "rules")
-
-        default_rules = (
-            "1. Заезд после 14:00, выезд до 12:00.\n"
-            "2. Соблюдайте тишину после 22:00.\n"
-            "3. Курение в доме запрещено."
-        )
-        rules = setting.value if setting and setting.value else default_rules
+    # Получаем глобальные правила
+    setting = await session.get(GlobalSetting, "rules")
 
-        text = messages.rules_content(rules)
-        keyboard = InlineKeyboardMarkup(
-            inline_keyboard=[
-                [InlineKeyboardButton(text="🔙 Назад", callback_data="guest:menu")],
-            ]
-        )
-        await safe_edit(callback, text, reply_markup=keyboard, parse_mode="HTML")
+    default_rules = (
+        "1. Заезд после 14:00, выезд до 12:00.\n"
+        "2. Соблюдайте тишину после 22:00.\n"
+        "3. Курение в доме запрещено."
+    )
+    rules = setting.value if setting and setting.value else default_rules
+
+    text = messages.rules_content(rules)
+    keyboard = InlineKeyboardMarkup(
+        inline_keyboard=[
+            [InlineKeyboardButton(text="🔙 Назад", callback_data="guest:menu")],
+        ]
+    )
+    await safe_edit(callback, text, reply_markup=keyboard, parse_mode="HTML")
 
 
 @router.callback_query(F.data == "guest:pay")
-async def guest_pay(callback: CallbackQuery):
+async def guest_pay(callback: CallbackQuery, session: AsyncSession):
     if not await ensure_guest_auth(callback):
         return
     """Оплата — двухэтапная (G10.6): задаток при бронировании + остаток
@@ -929,9 +904,8 @@ async def guest_pay(callback: CallbackQuery):
         payment_stage,
     )
 
-    async with AsyncSessionLocal() as session:
-        booking = await get_active_booking(session, callback.from_user.id)
-        advance_percent = await get_guest_advance_percent(session)
+    booking = await get_active_booking(session, callback.from_user.id)
+    advance_percent = await get_guest_advance_percent(session)
 
     if not booking:
         await callback.answer("❌ Активная бронь не найдена", show_alert=True)
@@ -1024,14 +998,13 @@ async def guest_pay(callback: CallbackQuery):
 
 
 @router.callback_query(F.data == "guest:pay:receipt")
-async def guest_pay_receipt_start(callback: CallbackQuery):
+async def guest_pay_receipt_start(callback: CallbackQuery, session: AsyncSession):
     if not await ensure_guest_auth(callback):
         return
-    async with AsyncSessionLocal() as session:
-        booking = await get_active_booking(session, callback.from_user.id)
-        if not booking:
-            await callback.answer("❌ Активная бронь не найдена", show_alert=True)
-            return
+    booking = await get_active_booking(session, callback.from_user.id)
+    if not booking:
+        await callback.answer("❌ Активная бронь не найдена", show_alert=True)
+        return
 
     _pay_receipt_waiting_users[callback.from_user.id] = booking.id
     await callback.message.answer(
@@ -1050,6 +1023,7 @@ def _is_pay_receipt_waiting(message: Message) -> bool:
 
 
 async def _send_pay_receipt_to_admins(
+    session: AsyncSession,
     message: Message,
     booking_id: int,
     file_id: str,
@@ -1062,7 +1036,7 @@ async def _send_pay_receipt_to_admins(
         get_guest_advance_percent,
     )
 
-    users = await get_all_users()
+    users = await get_all_users(session)
     admin_ids = {u.telegram_id for u in users if u.role in {UserRole.ADMIN, UserRole.OWNER} and u.telegram_id}
     admin_ids.add(settings.telegram_chat_id)
 
@@ -1070,20 +1044,19 @@ async def _send_pay_receipt_to_admins(
     advance_btn_label = "✅ Задаток"
     full_btn_label = "✅ Полная оплата"
     info_lines = []
-    async with AsyncSessionLocal() as session:
-        booking = await session.get(Booking, booking_id)
-        percent = await get_guest_advance_percent(session)
-        if booking:
-            total_i = int(booking.total_price or 0)
-            paid_i = int(booking.advance_amount or 0)
-            required_advance = compute_advance_amount(total_i, percent)
-            remainder = max(0, total_i - paid_i)
-            info_lines.append(f"Всего: {total_i:,} ₽")
-            info_lines.append(f"Уже оплачено: {paid_i:,} ₽")
-            info_lines.append(f"Задаток ({percent}%): {required_advance:,} ₽")
-            info_lines.append(f"Остаток: {remainder:,} ₽")
-            advance_btn_label = f"✅ Задаток ({required_advance:,} ₽)"
-            full_btn_label = f"✅ Полная (+{remainder:,} ₽)"
+    booking = await session.get(Booking, booking_id)
+    percent = await get_guest_advance_percent(session)
+    if booking:
+        total_i = int(booking.total_price or 0)
+        paid_i = int(booking.advance_amount or 0)
+        required_advance = compute_advance_amount(total_i, percent)
+        remainder = max(0, total_i - paid_i)
+        info_lines.append(f"Всего: {total_i:,} ₽")
+        info_lines.append(f"Уже оплачено: {paid_i:,} ₽")
+        info_lines.append(f"Задаток ({percent}%): {required_advance:,} ₽")
+        info_lines.append(f"Остаток: {remainder:,} ₽")
+        advance_btn_label = f"✅ Задаток ({required_advance:,} ₽)"
+        full_btn_label = f"✅ Полная (+{remainder:,} ₽)"
 
     caption_user = message.caption or "(без комментария)"
     text = (
@@ -1125,7 +1098,7 @@ async def _send_pay_receipt_to_admins(
 
 
 @router.message(F.photo, _is_pay_receipt_waiting)
-async def guest_pay_receipt_photo(message: Message):
+async def guest_pay_receipt_photo(message: Message, session: AsyncSession):
     booking_id = _pay_receipt_waiting_users.get(message.from_user.id)
     if not booking_id:
         return
@@ -1133,12 +1106,12 @@ async def guest_pay_receipt_photo(message: Message):
     _pay_receipt_waiting_users.pop(message.from_user.id, None)
     file_id = message.photo[-1].file_id
 
-    await _send_pay_receipt_to_admins(message, booking_id, file_id, is_photo=True)
+    await _send_pay_receipt_to_admins(session, message, booking_id, file_id, is_photo=True)
     await message.answer("✅ Чек отправлен администратору на проверку.")
 
 
 @router.message(F.document, _is_pay_receipt_waiting)
-async def guest_pay_receipt_document(message: Message):
+async def guest_pay_receipt_document(message: Message, session: AsyncSession):
     """PDF / любая выписка из банка как document. Принимаем pdf/jpeg/png по
     `mime_type`, остальные документы вежливо отклоняем."""
     booking_id = _pay_receipt_waiting_users.get(message.from_user.id)
@@ -1166,11 +1139,12 @@ async def guest_pay_receipt_document(message: Message):
         return
 
     _pay_receipt_waiting_users.pop(message.from_user.id, None)
-    await _send_pay_receipt_to_admins(message, booking_id, doc.file_id, is_photo=False)
+    await _send_pay_receipt_to_admins(session, message, booking_id, doc.file_id, is_photo=False)
     await message.answer("✅ Чек отправлен администратору на проверку.")
 
 
 async def _admin_approve_payment(
+    session: AsyncSession,
     callback: CallbackQuery,
     *,
     full_payment: bool,
@@ -1191,11 +1165,10 @@ async def _admin_approve_payment(
         await callback.answer("Bad callback", show_alert=True)
         return
 
-    async with AsyncSessionLocal() as session:
-        percent = await get_guest_advance_percent(session)
-        booking, label, became_paid = await BookingService.record_payment(
-            session, booking_id, full_payment=full_payment, advance_percent=percent
-        )
+    percent = await get_guest_advance_percent(session)
+    booking, label, became_paid = await BookingService.record_payment(
+        session, booking_id, full_payment=full_payment, advance_percent=percent
+    )
 
     if booking is None:
         await callback.answer("Бронь не найдена", show_alert=True)
@@ -1220,20 +1193,20 @@ async def _admin_approve_payment(
 
 
 @router.callback_query(F.data.startswith("guest:pay:approve_advance:"))
-async def guest_pay_approve_advance(callback: CallbackQuery):
-    await _admin_approve_payment(callback, full_payment=False)
+async def guest_pay_approve_advance(callback: CallbackQuery, session: AsyncSession):
+    await _admin_approve_payment(session, callback, full_payment=False)
 
 
 @router.callback_query(F.data.startswith("guest:pay:approve_full:"))
-async def guest_pay_approve_full(callback: CallbackQuery):
-    await _admin_approve_payment(callback, full_payment=True)
+async def guest_pay_approve_full(callback: CallbackQuery, session: AsyncSession):
+    await _admin_approve_payment(session, callback, full_payment=True)
 
 
 # Legacy callback (старые уведомления админам, отправленные до G10.6 deploy)
 # трактуем как «полная оплата» — оригинальное поведение.
 @router.callback_query(F.data.startswith("guest:pay:approve:"))
-async def guest_pay_approve_legacy(callback: CallbackQuery):
-    await _admin_approve_payment(callback, full_payment=True)
+async def guest_pay_approve_legacy(callback: CallbackQuery, session: AsyncSession):
+    await _admin_approve_payment(session, callback, full_payment=True)
 
 
 @router.callback_query(F.data.startswith("guest:pay:reject:"))
@@ -1255,8 +1228,8 @@ async def guest_pay_reject(callback: CallbackQuery):
 
 
 @router.callback_query(F.data == "guest:logout")
-async def guest_logout(callback: CallbackQuery):
-    removed = await remove_guest_user(callback.from_user.id)
+async def guest_logout(callback: CallbackQuery, session: AsyncSession):
+    removed = await remove_guest_user(callback.from_user.id, session=session)
     if callback.from_user:
         set_guest_auth(callback.from_user.id, False)
         set_guest_context(callback.from_user.id, "showcase")
@@ -1278,22 +1251,21 @@ async def guest_logout(callback: CallbackQuery):
 
 
 @router.callback_query(F.data == "guest:partners")
-async def guest_partners(callback: CallbackQuery):
+async def guest_partners(callback: CallbackQuery, session: AsyncSession):
     if not await ensure_guest_auth(callback):
         return
     if not settings.guest_feature_partners:
         await callback.answer("Раздел партнёров временно недоступен", show_alert=True)
         return
-    async with AsyncSessionLocal() as session:
-        partners_text = await get_setting_value(
-            session,
-            "guest_partners_v1",
-            "🤝 <b>Партнёры</b>\n\n"
-            "<b>Инструкторы</b> — обучение/сопровождение на склонах.\n"
-            "<b>Квадроциклы</b> — маршруты и прокат по согласованию.\n"
-            "<b>Активности</b> — подскажем, чем заняться в Архызе.\n\n"
-            "Чтобы подобрать вариант под даты проживания — отправьте запрос администратору.",
-        )
+    partners_text = await get_setting_value(
+        session,
+        "guest_partners_v1",
+        "🤝 <b>Партнёры</b>\n\n"
+        "<b>Инструкторы</b> — обучение/сопровождение на склонах.\n"
+        "<b>Квадроциклы</b> — маршруты и прокат по согласованию.\n"
+        "<b>Активности</b> — подскажем, чем заняться в Архызе.\n\n"
+        "Чтобы подобрать вариант под даты проживания — отправьте запрос администратору.",
+    )
 
     keyboard = InlineKeyboardMarkup(
         inline_keyboard=[
@@ -39,12 +39,12 @@ from app.telegram.auth.admin import (
     add_user,
     get_all_users,
     is_admin,
-    refresh_users_cache,
 )
 from app.telegram.menus.guest import request_contact_keyboard
 from app.telegram.state.availability import availability_states
 from app.utils.phone import normalize_phone
 from app.services.notification_service import send_safe
+from app.services.telegram_dispatcher import Priority
 
 
 router = Router()
@@ -143,7 +143,7 @@ async def _send_admin_booking_notification(
         ]]
     )
     for aid in admin_ids:
-        await send_safe(bot, aid, text, reply_markup=kb, context=f"new_booking admin={aid}")
+        await send_safe(bot, aid, text, reply_markup=kb, context=f"new_booking admin={aid}", priority=Priority.HIGH)
 
 
 async def _ask_guests_count(message_or_callback, house_id: int):
@@ -276,7 +276,6 @@ async def guest_book_contact(message: Message):
         name=name,
         phone=clean_phone,
     )
-    await refresh_users_cache()
 
     # помечаем авторизованным в guest-state — чтобы личный кабинет открылся
     # после подтверждения брони
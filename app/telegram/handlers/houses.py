@@ -615,7 +615,8 @@ async def sync_house_prices_to_platforms(callback: CallbackQuery):
 
     async with AsyncSessionLocal() as db:
         house = await HouseService.get_house_by_id(db, house_id)
-        results = await sync_all_platforms(db, house_id=house_id)
+        # Ручной синк — отправляем цены даже без изменений
+        results = await sync_all_platforms(db, house_id=house_id, force=True)
 
     summary = format_sync_results(results)
     text = f"🔄 <b>Синхронизация цен: {house.name}</b>\n\n{summary}"
@@ -635,7 +636,7 @@ async def sync_all_houses_prices(callback: CallbackQuery):
     await callback.answer("🔄 Синхронизируем все домики...")
 
     async with AsyncSessionLocal() as db:
-        results = await sync_all_platforms(db)
+        results = await sync_all_platforms(db, force=True)
 
     summary = format_sync_results(results)
     text = f"🔄 <b>Синхронизация всех домиков</b>\n\n{summary}"
@@ -2,11 +2,25 @@
 Команды управления планировщиком
 """
 
+import html
+from datetime import datetime, timedelta
+
 from aiogram import Router
 from aiogram.filters import Command
 from aiogram.types import Message
 
 from app.services.scheduler_service import scheduler_service
+from app.services.scheduler_history import SchedulerHistoryService, scheduler_history
+from app.services.sheets_sync_coordinator import sheets_sync_coordinator
+from app.services.telegram_dispatcher import telegram_dispatcher
+from app.services.outbox_service import outbox_worker
+from app.services.channel_push_queue import channel_push_queue
+from app.services.avito_inbox_service import AvitoInboxService, avito_inbox_worker
+from app.services.cleaning_sla_timers import sla_timers
+from app.telegram.state.store import state_store
+from app.database import AsyncSessionLocal
+from app.models import JobRunOutcome
+from app.telegram.auth.admin import is_admin
 from app.core.config import settings
 
 router = Router()
@@ -42,9 +56,77 @@ async def scheduler_status(message: Message):
         status_text += f"• <b>{job.name}</b>\n"
         status_text += f"  Следующий запуск: {next_run}\n\n"
 
+    status_text += "История запусков и ошибки: /scheduler_runs\n\n"
+
     status_text += "<b>Настройки:</b>\n"
     status_text += f"• Avito: каждые {settings.avito_sync_interval_minutes} мин\n"
-    status_text += f"• Sheets: каждые {settings.sheets_sync_interval_minutes} мин"
+    status_text += f"• Sheets: каждые {settings.sheets_sync_interval_minutes} мин\n\n"
+
+    sync_stats = sheets_sync_coordinator.stats()
+    status_text += "<b>Очередь синка Sheets:</b>\n"
+    status_text += f"• В очереди: {sync_stats['queue_depth']}\n"
+    status_text += (
+        f"• Запросов/прогонов: {sync_stats['requests_total']}/{sync_stats['runs_total']} "
+        f"(склейка ×{sync_stats['coalescing_ratio']})\n\n"
+    )
+
+    tg_stats = telegram_dispatcher.stats()
+    status_text += "<b>Очередь отправки Telegram:</b>\n"
+    status_text += f"• В очереди: {tg_stats['queue_depth']} (в работе: {tg_stats['in_flight']})\n"
+    status_text += (
+        f"• Отправлено/ошибок: {tg_stats['sent_total']}/{tg_stats['failed_total']}, "
+        f"RetryAfter: {tg_stats['retry_after_total']}\n"
+    )
+    if tg_stats["latency_avg_ms"] is not None:
+        status_text += (
+            f"• Задержка: avg {tg_stats['latency_avg_ms']} мс, "
+            f"p95 {tg_stats['latency_p95_ms']} мс\n"
+        )
+
+    outbox_stats = outbox_worker.stats()
+    status_text += "\n<b>Outbox (Avito-календарь, уведомления):</b>\n"
+    status_text += (
+        f"• {'🟢 работает' if outbox_stats['running'] else '🔴 остановлен'}, "
+        f"выполнено: {outbox_stats['processed_total']}, "
+        f"склеено: {outbox_stats['superseded_total']}\n"
+    )
+    status_text += (
+        f"• Повторов: {outbox_stats['retried_total']}, "
+        f"отказов: {outbox_stats['failed_total']}\n"
+    )
+
+    push_stats = channel_push_queue.stats()
+    status_text += "\n<b>Пуши календарей/цен на площадки:</b>\n"
+    status_text += (
+        f"• Отправлено: {push_stats['pushed_total']}, "
+        f"без изменений: {push_stats['unchanged_total']}, "
+        f"склеено: {push_stats['coalesced_total']}, "
+        f"ошибок: {push_stats['failed_total']}\n"
+    )
+
+    inbox_stats = avito_inbox_worker.stats()
+    status_text += "\n<b>Webhook Avito (inbox):</b>\n"
+    status_text += (
+        f"• Обработано: {inbox_stats['processed_total']}, "
+        f"в dead-letter: {inbox_stats['dead_total']} — подробнее /avito_inbox\n"
+    )
+
+    state_stats = state_store.stats()
+    hit_ratio = state_stats["hit_ratio"]
+    status_text += "\n<b>Состояние диалогов:</b>\n"
+    status_text += (
+        f"• Записей: {state_stats['size']}/{state_stats['max_entries']}, "
+        f"попаданий: {f'{hit_ratio:.0%}' if hit_ratio is not None else '—'}\n"
+        f"• Вытеснено: по TTL {state_stats['evicted_expired']}, "
+        f"по лимиту {state_stats['evicted_size']}\n"
+    )
+
+    sla_stats = sla_timers.stats()
+    status_text += "\n<b>SLA задач уборки:</b>\n"
+    status_text += (
+        f"• Таймеров: {sla_stats['scheduled']}, сработало: {sla_stats['fired_total']}, "
+        f"эскалировано: {sla_stats['escalated_total']}"
+    )
 
     await message.answer(status_text, parse_mode="HTML")
 
@@ -68,3 +150,104 @@ async def resume_scheduler(message: Message):
         "▶️ <b>Планировщик возобновлен</b>\n\nАвтосинхронизация работает",
         parse_mode="HTML",
     )
+
+
+@router.message(Command("avito_inbox"))
+async def avito_inbox_status(message: Message):
+    """Очередь webhook Avito: бэклог, задержка обработки, dead-letter"""
+    if not is_admin(message.from_user.id):
+        return
+
+    async with AsyncSessionLocal() as session:
+        backlog = await AvitoInboxService.backlog(session)
+        dead = await AvitoInboxService.dead_letters(session, limit=5)
+    stats = avito_inbox_worker.stats()
+
+    text = "📥 <b>Webhook Avito (inbox)</b>\n\n"
+    text += f"• Воркер: {'🟢 работает' if stats['running'] else '🔴 остановлен'}\n"
+    text += f"• В очереди: {backlog['pending']}"
+    if backlog["oldest_pending_age_s"] is not None:
+        text += f" (старейшее ждёт {backlog['oldest_pending_age_s']} с)"
+    text += "\n"
+    if stats["lag_avg_s"] is not None:
+        text += (
+            f"• Задержка обработки: avg {stats['lag_avg_s']} с, "
+            f"max {stats['lag_max_s']} с\n"
+        )
+    text += (
+        f"• Обработано: {stats['processed_total']}, "
+        f"повторов: {stats['retried_total']}\n"
+    )
+    text += f"• Dead-letter: {backlog['dead']}\n"
+
+    for row in dead:
+        error = html.escape((row.last_error or "")[:120])
+        text += f"\n#{row.id} {row.event_type} (бронь {row.booking_key or '—'}): <code>{error}</code>"
+    if backlog["dead"]:
+        text += "\n\nВернуть в очередь: /avito_inbox_retry"
+
+    await message.answer(text, parse_mode="HTML")
+
+
+@router.message(Command("avito_inbox_retry"))
+async def avito_inbox_retry(message: Message):
+    """Вернуть события из dead-letter в очередь"""
+    if not is_admin(message.from_user.id):
+        return
+
+    async with AsyncSessionLocal() as session:
+        count = await AvitoInboxService.requeue_dead(session)
+    avito_inbox_worker.wake()
+    await message.answer(f"🔁 Возвращено в очередь: {count}")
+
+
+def _format_ms(value) -> str:
+    if value is None:
+        return "—"
+    return f"{value / 1000:.1f} с" if value >= 1000 else f"{value} мс"
+
+
+@router.message(Command("scheduler_runs"))
+async def scheduler_runs(message: Message):
+    """История запусков задач за сутки: исходы, длительность, пропуски"""
+    if not is_admin(message.from_user.id):
+        return
+
+    # Записи из памяти — в БД, чтобы отчёт был актуальным
+    await scheduler_history.flush()
+    since = datetime.utcnow() - timedelta(hours=24)
+    async with AsyncSessionLocal() as session:
+        summary = await SchedulerHistoryService.summary(session, since)
+        last_runs = await SchedulerHistoryService.last_runs(session)
+        errors = await SchedulerHistoryService.recent_errors(session, limit=5)
+
+    if not summary and not last_runs:
+        await message.answer("📊 <b>История запусков пуста</b>", parse_mode="HTML")
+        return
+
+    names = {job.id: job.name for job in scheduler_service.get_jobs()}
+    text = "📊 <b>Запуски задач за 24 ч</b> (наложение — пропуск, пока шёл прошлый прогон)\n"
+    for row in summary:
+        job_id = row["job_id"]
+        last = last_runs.get(job_id)
+        status = "—"
+        if last is not None:
+            mark = "✅" if last.outcome == JobRunOutcome.OK else "❌"
+            status = f"{mark} {last.started_at.strftime('%d.%m %H:%M')} UTC"
+        text += f"\n• <b>{html.escape(names.get(job_id, job_id))}</b> — {status}\n"
+        text += (
+            f"  запусков {row['runs']}, ошибок {row['errors']}, "
+            f"наложений {row['skipped']}, просрочено {row['missed']}; "
+            f"avg {_format_ms(row['avg_ms'])} / max {_format_ms(row['max_ms'])}\n"
+        )
+
+    if errors:
+        text += "\n<b>Последние ошибки:</b>"
+        for run in errors:
+            error = html.escape((run.error or "")[:120])
+            text += (
+                f"\n{run.started_at.strftime('%d.%m %H:%M')} {html.escape(run.job_id)}: "
+                f"<code>{error}</code>"
+            )
+
+    await message.answer(text, parse_mode="HTML")
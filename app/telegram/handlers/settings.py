@@ -212,7 +212,7 @@ async def apply_booking_window(callback: CallbackQuery):
     # Получаем маппинг домов
     from app.core.config import settings
     from app.services.avito_api_service import avito_api_service
-    import asyncio
+    from app.services.channel_push_queue import channel_push_queue
 
     item_house_mapping = {}
     for pair in settings.avito_item_ids.split(","):
@@ -227,9 +227,12 @@ async def apply_booking_window(callback: CallbackQuery):
     for item_id, house_id in item_house_mapping.items():
         try:
             # Вызываем метод обновления календаря
-            result = await asyncio.to_thread(
-                avito_api_service.update_calendar_intervals, item_id
-            )
+            try:
+                result = await avito_api_service.update_calendar_intervals(item_id)
+            finally:
+                # Интервалы отправлены в обход очереди пушей — сбрасываем
+                # сохранённый хэш, иначе следующий пуш сочтётся «без изменений»
+                await channel_push_queue.invalidate("avito", item_id, "calendar")
             if result:
                 success_count += 1
             else:
@@ -483,7 +486,8 @@ async def pricing_settings(callback: CallbackQuery):
         "💰 <b>Настройки ценообразования</b>\n\n"
         f"<b>Авто-скидки (горящие):</b> {auto_disc}\n"
         f"  Завтра: -{settings.auto_discount_tomorrow_percent}%\n"
-        f"  Послезавтра: -{settings.auto_discount_day_after_percent}%\n\n"
+        f"  Послезавтра и далее: -{settings.auto_discount_day_after_percent}%\n"
+        f"  Окно: {settings.auto_discount_days_ahead} дн.\n\n"
         f"<b>Авто-синхр. цен → Авито:</b> {avito_sync}\n\n"
         "<i>Цикл запускается в 09:00 и 18:00:\n"
         "1) Проверка загруженности → авто-скидки\n"
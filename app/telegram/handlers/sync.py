@@ -5,12 +5,8 @@
 from aiogram import Router
 from aiogram.filters import Command
 from aiogram.types import Message
-from sqlalchemy import select
-from sqlalchemy.orm import joinedload
 
-from app.database import AsyncSessionLocal
-from app.models import Booking
-from app.services.sheets_service import sheets_service
+from app.services.sheets_sync_coordinator import sheets_sync_coordinator
 from app.core.config import settings
 
 router = Router()
@@ -22,32 +18,18 @@ async def sync_to_sheets(message: Message):
 
     await message.answer("🔄 Начинаю синхронизацию с Google Sheets...")
 
-    try:
-        # Получаем все брони из БД
-        async with AsyncSessionLocal() as session:
-            stmt = (
-                select(Booking)
-                .options(joinedload(Booking.house))
-                .order_by(Booking.check_in)
-            )
-            result = await session.execute(stmt)
-            bookings = result.scalars().all()
-
-        # Синхронизируем с Google Sheets
-        sheets_service.sync_bookings_to_sheet(bookings)
-        sheets_service.create_dashboard(bookings)
+    # Через координатор: не пересекается с фоновым синком
+    success = await sheets_sync_coordinator.sync_now("manual", force=True, full=True)
 
+    if success:
         await message.answer(
             f"✅ <b>Синхронизация завершена!</b>\n\n"
-            f"📊 Обновлено броней: {len(bookings)}\n"
             f"📋 Листы: Все брони, Dashboard\n\n"
             f"Используйте /sheet для получения ссылки на таблицу"
         )
-
-    except Exception as e:
+    else:
         await message.answer(
-            f"❌ <b>Ошибка синхронизации:</b>\n\n"
-            f"<code>{str(e)}</code>\n\n"
+            f"❌ <b>Ошибка синхронизации</b> (подробности в логах)\n\n"
             f"Проверьте:\n"
             f"• Файл google-credentials.json в корне проекта\n"
             f"• ID таблицы в .env\n"
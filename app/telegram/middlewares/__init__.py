@@ -2,6 +2,8 @@
 Telegram bot middlewares
 """
 
+from .db_session import DbSessionMiddleware
+from .metrics import HandlerMetricsMiddleware
 from .sync_middleware import AutoSyncMiddleware
 
-__all__ = ["AutoSyncMiddleware"]
+__all__ = ["AutoSyncMiddleware", "DbSessionMiddleware", "HandlerMetricsMiddleware"]
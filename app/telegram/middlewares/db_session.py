@@ -0,0 +1,55 @@
+"""
+Middleware с одной сессией БД на апдейт Telegram
+"""
+
+import logging
+from typing import Any, Awaitable, Callable, Dict
+
+from aiogram import BaseMiddleware
+from aiogram.types import TelegramObject
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+
+from app.database import AsyncSessionLocal
+
+logger = logging.getLogger(__name__)
+
+
+class DbSessionMiddleware(BaseMiddleware):
+    """
+    Открывает одну AsyncSession на апдейт и кладёт её в data["session"]
+
+    Хэндлеры получают её аргументом `session: AsyncSession` и передают
+    в хелперы (resolve_user_db_id, get_active_booking, ...), вместо того
+    чтобы открывать по сессии на каждый запрос. Соединение берётся из пула
+    лениво — при первом обращении к БД, поэтому апдейты без запросов
+    соединение не занимают.
+
+    После хэндлера незакоммиченные изменения коммитятся, при исключении
+    (в хэндлере или при коммите) — откатываются, исключение пробрасывается.
+    """
+
+    def __init__(self, session_factory: async_sessionmaker[AsyncSession] | None = None):
+        self.session_factory = session_factory or AsyncSessionLocal
+
+    async def __call__(
+        self,
+        handler: Callable[[TelegramObject, Dict[str, Any]], Awaitable[Any]],
+        event: TelegramObject,
+        data: Dict[str, Any],
+    ) -> Any:
+        async with self.session_factory() as session:
+            data["session"] = session
+            try:
+                result = await handler(event, data)
+            except Exception:
+                await session.rollback()
+                raise
+            if session.in_transaction():
+                try:
+                    await session.commit()
+                except Exception as e:
+                    # Запись потеряна — апдейт не считается обработанным
+                    logger.error(f"DB session commit failed: {e}", exc_info=True)
+                    await session.rollback()
+                    raise
+            return result
@@ -0,0 +1,42 @@
+"""
+Middleware с метриками обработки апдейтов Telegram
+"""
+
+import time
+from typing import Any, Awaitable, Callable, Dict
+
+from aiogram import BaseMiddleware
+from aiogram.types import TelegramObject
+
+from app.core import metrics
+
+
+class HandlerMetricsMiddleware(BaseMiddleware):
+    """
+    Латентность хэндлеров по модулю-роутеру (guest, cleaner_payments, ...)
+
+    Регистрируется как inner middleware на dispatcher — aiogram применяет её
+    к хэндлерам всех вложенных роутеров, и в data уже есть найденный handler.
+    """
+
+    def __init__(self, event: str):
+        self.event = event
+
+    async def __call__(
+        self,
+        handler: Callable[[TelegramObject, Dict[str, Any]], Awaitable[Any]],
+        event: TelegramObject,
+        data: Dict[str, Any],
+    ) -> Any:
+        handler_object = data.get("handler")
+        module = getattr(getattr(handler_object, "callback", None), "__module__", None) or "unknown"
+        router = module.rsplit(".", 1)[-1]
+
+        start = time.perf_counter()
+        try:
+            return await handler(event, data)
+        except Exception:
+            metrics.TELEGRAM_HANDLER_ERRORS.inc(router, self.event)
+            raise
+        finally:
+            metrics.TELEGRAM_HANDLER_DURATION.observe(time.perf_counter() - start, router, self.event)
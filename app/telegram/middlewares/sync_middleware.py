@@ -8,7 +8,7 @@ from typing import Callable, Dict, Any, Awaitable
 from aiogram import BaseMiddleware
 from aiogram.types import TelegramObject, Message, CallbackQuery
 
-from app.services.sheets_service import sheets_service
+from app.services.sheets_sync_coordinator import sheets_sync_coordinator
 
 logger = logging.getLogger(__name__)
 
@@ -36,13 +36,10 @@ class AutoSyncMiddleware(BaseMiddleware):
 
 
         # Trigger sync before handling the message (non-blocking)
-        # sync_if_needed will check cache and skip if not needed
+        # Coordinator debounces bursts; force=False keeps the TTL cache check
         if isinstance(event, (Message, CallbackQuery)):
             try:
-                # Don't await - run in background to not delay message processing
-                import asyncio
-
-                asyncio.create_task(sheets_service.sync_if_needed())
+                sheets_sync_coordinator.request_sync("user_interaction", force=False)
             except Exception as e:
                 # Don't let sync errors break message handling
                 logger.error(f"Auto-sync error: {e}")
@@ -1,19 +1,15 @@
+from typing import Optional
+
 from app.avito.schemas import AvitoWebhookEvent
 from app.core.config import settings
-from fastapi import Request
-
-
-from typing import Optional
 from app.models import Booking
+from app.services.telegram_dispatcher import telegram_dispatcher
 
 
 async def notify_new_avito_event(
     event: AvitoWebhookEvent,
-    request: Request,
     booking: Optional[Booking] = None,
-) -> None:
-    bot = request.app.state.bot
-
+) -> bool:
     text = (
         "<b>📩 Новое событие с Avito</b>\n\n"
         f"<b>Тип:</b> {event.event_type}\n"
@@ -21,7 +17,8 @@ async def notify_new_avito_event(
         f"<pre>{event.payload}</pre>"
     )
 
-    await bot.send_message(
-        chat_id=settings.telegram_chat_id,
-        text=text,
+    return await telegram_dispatcher.send(
+        settings.telegram_chat_id,
+        text,
+        context="avito_webhook",
     )
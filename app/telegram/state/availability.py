@@ -1,6 +1,9 @@
+import dataclasses
 import datetime
 from dataclasses import dataclass
 
+from app.telegram.state.store import StateDict, state_store
+
 
 @dataclass
 class AvailabilityState:
@@ -10,5 +13,10 @@ class AvailabilityState:
     waiting_for_guest_name: bool = False
 
 
-# user_id -> state
-availability_states: dict[int, AvailabilityState] = {}
+# user_id -> state (после изменения полей присваивать заново — так оно сохранится)
+availability_states: StateDict = StateDict(
+    state_store,
+    "availability",
+    encode=dataclasses.asdict,
+    decode=lambda data: AvailabilityState(**data),
+)
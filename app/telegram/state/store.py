@@ -0,0 +1,454 @@
+"""
+Хранилище состояния диалогов бота
+
+Один бэкенд обслуживает FSM aiogram (StateStoreStorage) и ad-hoc словари
+хэндлеров (StateDict: availability_states, авторизация/контекст гостя).
+Запись живёт TTL секунд с момента последней записи; сверх max_entries
+вытесняются самые давно использованные.
+
+MemoryStateStore держит всё в памяти процесса. SqliteStateStore поверх
+неё отложенно, пачками раз в flush_interval, пишет изменения в таблицу
+telegram_state и поднимает их при старте — диалоги переживают рестарт,
+а чтения не ходят в БД.
+"""
+
+import asyncio
+import datetime
+import json
+import logging
+import time
+from collections import OrderedDict
+from collections.abc import MutableMapping
+from decimal import Decimal
+from typing import Any, Callable, Dict, Iterator, Optional
+
+from aiogram.fsm.state import State
+from aiogram.fsm.storage.base import BaseStorage, StateType, StorageKey
+from sqlalchemy import delete, insert, select
+
+from app.core.config import settings
+from app.models import TelegramState
+
+logger = logging.getLogger(__name__)
+
+_MISSING = object()
+_EPOCH = datetime.datetime(1970, 1, 1)
+_SWEEP_INTERVAL_SECONDS = 60
+_DELETE_CHUNK = 500
+
+
+def _json_default(value):
+    if isinstance(value, datetime.datetime):
+        return {"__datetime__": value.isoformat()}
+    if isinstance(value, datetime.date):
+        return {"__date__": value.isoformat()}
+    if isinstance(value, Decimal):
+        return {"__decimal__": str(value)}
+    raise TypeError(f"{type(value).__name__} is not JSON serializable")
+
+
+def _json_object_hook(obj: dict):
+    if len(obj) == 1:
+        if "__date__" in obj:
+            return datetime.date.fromisoformat(obj["__date__"])
+        if "__datetime__" in obj:
+            return datetime.datetime.fromisoformat(obj["__datetime__"])
+        if "__decimal__" in obj:
+            return Decimal(obj["__decimal__"])
+    return obj
+
+
+def dumps(value: Any) -> str:
+    """JSON с датами и Decimal (их кладут в FSM-данные хэндлеры броней)"""
+    return json.dumps(value, default=_json_default, ensure_ascii=False)
+
+
+def loads(raw: str) -> Any:
+    return json.loads(raw, object_hook=_json_object_hook)
+
+
+class MemoryStateStore:
+    """Состояние в памяти процесса: TTL + LRU-лимит + метрики"""
+
+    def __init__(
+        self,
+        ttl_seconds: Optional[float] = None,
+        max_entries: Optional[int] = None,
+        clock: Callable[[], float] = time.time,
+    ):
+        self.ttl = settings.telegram_state_ttl_seconds if ttl_seconds is None else ttl_seconds
+        self.max_entries = (
+            settings.telegram_state_max_entries if max_entries is None else max_entries
+        )
+        self._clock = clock
+        # (namespace, key) -> [value, expires_at]; порядок — от давно использованных
+        self._entries: "OrderedDict[tuple[str, str], list]" = OrderedDict()
+        self._codecs: Dict[str, tuple[Optional[Callable], Optional[Callable]]] = {}
+
+        # Метрики
+        self.hits = 0
+        self.misses = 0
+        self.evicted_expired = 0
+        self.evicted_size = 0
+
+    def register(self, namespace: str, encode: Optional[Callable] = None, decode: Optional[Callable] = None):
+        """Кодек значений namespace для сохранения (value <-> JSON-совместимое)"""
+        self._codecs[namespace] = (encode, decode)
+
+    def get(self, namespace: str, key: str, default: Any = None) -> Any:
+        k = (namespace, key)
+        entry = self._entries.get(k)
+        if entry is None:
+            self.misses += 1
+            return default
+        if entry[1] <= self._clock():
+            self._drop(k)
+            self.evicted_expired += 1
+            self.misses += 1
+            return default
+        self._entries.move_to_end(k)
+        self.hits += 1
+        return entry[0]
+
+    def set(self, namespace: str, key: str, value: Any):
+        k = (namespace, key)
+        self._entries[k] = [value, self._clock() + self.ttl]
+        self._entries.move_to_end(k)
+        self._written(k)
+        while len(self._entries) > self.max_entries:
+            oldest, _ = self._entries.popitem(last=False)
+            self.evicted_size += 1
+            self._removed(oldest)
+
+    def delete(self, namespace: str, key: str) -> bool:
+        k = (namespace, key)
+        if k not in self._entries:
+            return False
+        self._drop(k)
+        return True
+
+    def keys(self, namespace: str) -> list[str]:
+        now = self._clock()
+        return [k for (ns, k), entry in self._entries.items() if ns == namespace and entry[1] > now]
+
+    def expire(self) -> int:
+        """Удаляет все просроченные записи (а не только встреченные в get)"""
+        now = self._clock()
+        expired = [k for k, entry in self._entries.items() if entry[1] <= now]
+        for k in expired:
+            self._drop(k)
+        self.evicted_expired += len(expired)
+        return len(expired)
+
+    def _drop(self, k: tuple[str, str]):
+        del self._entries[k]
+        self._removed(k)
+
+    # Точки расширения для бэкендов с сохранением
+    def _written(self, k: tuple[str, str]):
+        pass
+
+    def _removed(self, k: tuple[str, str]):
+        pass
+
+    async def start(self):
+        pass
+
+    async def flush(self) -> int:
+        return 0
+
+    async def stop(self):
+        pass
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "backend": "memory",
+            "size": len(self._entries),
+            "max_entries": self.max_entries,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": round(self.hits / lookups, 3) if lookups else None,
+            "evicted_expired": self.evicted_expired,
+            "evicted_size": self.evicted_size,
+        }
+
+
+class SqliteStateStore(MemoryStateStore):
+    """Память + отложенная пакетная запись в таблицу telegram_state"""
+
+    def __init__(self, session_factory=None, flush_interval: Optional[float] = None, **kwargs):
+        super().__init__(**kwargs)
+        self._session_factory = session_factory
+        self.flush_interval = (
+            settings.telegram_state_flush_interval_seconds if flush_interval is None else flush_interval
+        )
+        # (namespace, key) -> True (записать текущее значение) / False (удалить)
+        self._dirty: Dict[tuple[str, str], bool] = {}
+        self._runner: Optional[asyncio.Task] = None
+        self._flush_lock = asyncio.Lock()
+        self._last_sweep = 0.0
+
+        # Метрики
+        self.loaded = 0
+        self.flushed_total = 0
+        self.flush_errors = 0
+
+    @property
+    def session_factory(self):
+        if self._session_factory is None:
+            from app.database import AsyncSessionLocal
+
+            self._session_factory = AsyncSessionLocal
+        return self._session_factory
+
+    def _written(self, k):
+        self._dirty[k] = True
+
+    def _removed(self, k):
+        self._dirty[k] = False
+
+    def _to_epoch(self, value: datetime.datetime) -> float:
+        return (value - _EPOCH).total_seconds()
+
+    def _from_epoch(self, value: float) -> datetime.datetime:
+        return _EPOCH + datetime.timedelta(seconds=value)
+
+    async def load(self) -> int:
+        """Поднимает непросроченные записи; свежие записи в памяти не перетирает"""
+        now = self._clock()
+        async with self.session_factory() as session:
+            result = await session.execute(
+                select(TelegramState)
+                .where(TelegramState.expires_at > self._from_epoch(now))
+                .order_by(TelegramState.expires_at)
+            )
+            rows = result.scalars().all()
+
+        # Идём от свежих к старым, ставя каждую в начало: старые вытесняются первыми
+        loaded = 0
+        for row in reversed(rows[-self.max_entries:]):
+            k = (row.namespace, row.key)
+            if k in self._entries:
+                continue
+            _, decode = self._codecs.get(row.namespace, (None, None))
+            try:
+                value = loads(row.value)
+                if decode is not None:
+                    value = decode(value)
+            except Exception as e:
+                logger.warning(f"Skipping unreadable state {k}: {e}")
+                continue
+            self._entries[k] = [value, self._to_epoch(row.expires_at)]
+            self._entries.move_to_end(k, last=False)
+            loaded += 1
+        while len(self._entries) > self.max_entries:
+            oldest, _ = self._entries.popitem(last=False)
+            self.evicted_size += 1
+            self._removed(oldest)
+        self.loaded += loaded
+        return loaded
+
+    def _encode(self, k: tuple[str, str], entry: list) -> Optional[dict]:
+        encode, _ = self._codecs.get(k[0], (None, None))
+        try:
+            value = encode(entry[0]) if encode is not None else entry[0]
+            raw = dumps(value)
+        except Exception as e:
+            logger.error(f"State {k} is not serializable, kept in memory only: {e}")
+            return None
+        return {
+            "namespace": k[0],
+            "key": k[1],
+            "value": raw,
+            "expires_at": self._from_epoch(entry[1]),
+        }
+
+    async def flush(self) -> int:
+        """Записывает накопленные изменения одной транзакцией"""
+        async with self._flush_lock:
+            if not self._dirty:
+                return 0
+            dirty, self._dirty = self._dirty, {}
+
+            rows = []
+            by_namespace: Dict[str, list[str]] = {}
+            for k, alive in dirty.items():
+                by_namespace.setdefault(k[0], []).append(k[1])
+                entry = self._entries.get(k) if alive else None
+                if entry is not None:
+                    row = self._encode(k, entry)
+                    if row is not None:
+                        rows.append(row)
+
+            try:
+                async with self.session_factory() as session:
+                    for namespace, keys in by_namespace.items():
+                        for i in range(0, len(keys), _DELETE_CHUNK):
+                            await session.execute(
+                                delete(TelegramState).where(
+                                    TelegramState.namespace == namespace,
+                                    TelegramState.key.in_(keys[i:i + _DELETE_CHUNK]),
+                                )
+                            )
+                    if rows:
+                        await session.execute(insert(TelegramState), rows)
+                    await session.commit()
+            except Exception:
+                # Вернуть в очередь, не перетирая более свежие пометки
+                for k, alive in dirty.items():
+                    self._dirty.setdefault(k, alive)
+                self.flush_errors += 1
+                raise
+
+            self.flushed_total += len(dirty)
+            return len(dirty)
+
+    async def purge_expired(self) -> int:
+        async with self.session_factory() as session:
+            result = await session.execute(
+                delete(TelegramState).where(
+                    TelegramState.expires_at <= self._from_epoch(self._clock())
+                )
+            )
+            await session.commit()
+            return result.rowcount or 0
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(self.flush_interval)
+            try:
+                await self.flush()
+                if time.monotonic() - self._last_sweep > _SWEEP_INTERVAL_SECONDS:
+                    self._last_sweep = time.monotonic()
+                    self.expire()
+                    await self.purge_expired()
+            except Exception as e:
+                logger.error(f"Telegram state flush failed: {e}", exc_info=True)
+
+    async def start(self):
+        if self._runner is not None and not self._runner.done():
+            return
+        try:
+            loaded = await self.load()
+            logger.info(f"✅ Telegram state restored: {loaded} entries")
+        except Exception as e:
+            logger.error(f"Telegram state restore failed: {e}", exc_info=True)
+        self._runner = asyncio.get_running_loop().create_task(self._run())
+
+    async def stop(self):
+        if self._runner is not None:
+            self._runner.cancel()
+            try:
+                await self._runner
+            except asyncio.CancelledError:
+                pass
+            self._runner = None
+        try:
+            await self.flush()
+        except Exception as e:
+            logger.error(f"Telegram state final flush failed: {e}")
+
+    def stats(self) -> dict:
+        return {
+            **super().stats(),
+            "backend": "sqlite",
+            "pending_writes": len(self._dirty),
+            "loaded": self.loaded,
+            "flushed_total": self.flushed_total,
+            "flush_errors": self.flush_errors,
+        }
+
+
+class StateDict(MutableMapping):
+    """Словарь user_id -> значение поверх хранилища (замена модульных dict)"""
+
+    def __init__(
+        self,
+        store: MemoryStateStore,
+        namespace: str,
+        encode: Optional[Callable] = None,
+        decode: Optional[Callable] = None,
+        key_type: Callable[[str], Any] = int,
+    ):
+        self.store = store
+        self.namespace = namespace
+        self.key_type = key_type
+        store.register(namespace, encode, decode)
+
+    def __getitem__(self, key):
+        value = self.store.get(self.namespace, str(key), _MISSING)
+        if value is _MISSING:
+            raise KeyError(key)
+        return value
+
+    def __setitem__(self, key, value):
+        self.store.set(self.namespace, str(key), value)
+
+    def __delitem__(self, key):
+        if not self.store.delete(self.namespace, str(key)):
+            raise KeyError(key)
+
+    def __iter__(self) -> Iterator:
+        return iter([self.key_type(k) for k in self.store.keys(self.namespace)])
+
+    def __len__(self) -> int:
+        return len(self.store.keys(self.namespace))
+
+
+class StateStoreStorage(BaseStorage):
+    """FSM-хранилище aiogram поверх того же хранилища"""
+
+    STATE_NAMESPACE = "fsm_state"
+    DATA_NAMESPACE = "fsm_data"
+
+    def __init__(self, store: MemoryStateStore):
+        self.store = store
+        store.register(self.STATE_NAMESPACE)
+        store.register(self.DATA_NAMESPACE)
+
+    @staticmethod
+    def _key(key: StorageKey) -> str:
+        return ":".join(
+            str(part)
+            for part in (
+                key.bot_id,
+                key.chat_id,
+                key.user_id,
+                key.thread_id,
+                key.business_connection_id,
+                key.destiny,
+            )
+        )
+
+    async def set_state(self, key: StorageKey, state: StateType = None) -> None:
+        value = state.state if isinstance(state, State) else state
+        if value is None:
+            self.store.delete(self.STATE_NAMESPACE, self._key(key))
+        else:
+            self.store.set(self.STATE_NAMESPACE, self._key(key), value)
+
+    async def get_state(self, key: StorageKey) -> Optional[str]:
+        return self.store.get(self.STATE_NAMESPACE, self._key(key))
+
+    async def set_data(self, key: StorageKey, data: Dict[str, Any]) -> None:
+        if data:
+            self.store.set(self.DATA_NAMESPACE, self._key(key), data.copy())
+        else:
+            self.store.delete(self.DATA_NAMESPACE, self._key(key))
+
+    async def get_data(self, key: StorageKey) -> Dict[str, Any]:
+        return dict(self.store.get(self.DATA_NAMESPACE, self._key(key)) or {})
+
+    async def close(self) -> None:
+        await self.store.flush()
+
+
+def create_state_store() -> MemoryStateStore:
+    if settings.telegram_state_backend == "memory":
+        return MemoryStateStore()
+    return SqliteStateStore()
+
+
+# Глобальный экземпляр
+state_store = create_state_store()
@@ -0,0 +1,179 @@
+"""
+Бенчмарк индексов таблицы bookings на синтетической БД.
+
+Создаёт SQLite-файл со схемой bookings (как в app.models), заливает
+N броней (по умолчанию 100k), прогоняет горячие формы запросов
+без составных индексов и с ними (те же, что в миграции c3d4e5f6a7b8)
+и печатает EXPLAIN QUERY PLAN и медианное время.
+
+Запуск:
+    python scripts/bench_booking_indexes.py [--bookings 100000] [--houses 20]
+"""
+
+import argparse
+import os
+import random
+import sqlite3
+import statistics
+import tempfile
+import time
+from datetime import date, timedelta
+
+SCHEMA = """
+CREATE TABLE bookings (
+    id INTEGER PRIMARY KEY,
+    house_id INTEGER NOT NULL,
+    guest_name VARCHAR NOT NULL,
+    guest_phone VARCHAR NOT NULL,
+    guest_phone_last10 VARCHAR,
+    check_in DATE NOT NULL,
+    check_out DATE NOT NULL,
+    guests_count INTEGER NOT NULL,
+    total_price NUMERIC(10, 2) NOT NULL,
+    status VARCHAR(11) NOT NULL,
+    source VARCHAR(14) NOT NULL,
+    external_id VARCHAR,
+    created_at DATETIME NOT NULL,
+    updated_at DATETIME NOT NULL
+);
+CREATE INDEX ix_bookings_external_id ON bookings (external_id);
+CREATE INDEX ix_bookings_guest_phone_last10 ON bookings (guest_phone_last10);
+"""
+
+# Должно совпадать с alembic/versions/c3d4e5f6a7b8_add_booking_composite_indexes.py
+COMPOSITE_INDEXES = """
+CREATE INDEX ix_bookings_house_dates ON bookings (house_id, check_in, check_out);
+CREATE INDEX ix_bookings_status_check_in ON bookings (status, check_in);
+CREATE INDEX ix_bookings_status_check_out ON bookings (status, check_out);
+CREATE UNIQUE INDEX uq_bookings_source_external_id ON bookings (source, external_id);
+"""
+
+STATUSES = ["NEW", "CONFIRMED", "PAID", "CHECKING_IN", "CHECKED_IN", "COMPLETED", "CANCELLED"]
+# Реалистичное распределение: большая часть истории — завершённые/отменённые
+STATUS_WEIGHTS = [3, 8, 6, 1, 1, 60, 21]
+SOURCES = ["AVITO", "DIRECT", "YANDEX_TRAVEL"]
+
+TODAY = date(2026, 7, 1)
+ACTIVE = "('NEW', 'CONFIRMED', 'PAID', 'CHECKING_IN', 'CHECKED_IN')"
+
+# (название, SQL, параметры) — повторяют запросы из сервисов/джобов
+QUERIES = [
+    (
+        # Свободные даты — худший случай: без индекса просматривается вся таблица
+        "check_availability / overlap guard",
+        "SELECT id FROM bookings WHERE house_id = ? AND status != 'CANCELLED' "
+        "AND check_in < ? AND check_out > ? LIMIT 1",
+        (7, str(TODAY + timedelta(days=402)), str(TODAY + timedelta(days=400))),
+    ),
+    (
+        "/availability (house, window)",
+        f"SELECT check_in, check_out FROM bookings WHERE house_id = ? AND status IN {ACTIVE} "
+        "AND check_out > ? AND check_in < ?",
+        (7, str(TODAY), str(TODAY + timedelta(days=90))),
+    ),
+    (
+        "notifier rule (check_in = day)",
+        f"SELECT id FROM bookings WHERE status IN {ACTIVE} AND check_in = ?",
+        (str(TODAY + timedelta(days=1)),),
+    ),
+    (
+        "notifier rule (check_out = day)",
+        f"SELECT id FROM bookings WHERE status IN {ACTIVE} AND check_out = ?",
+        (str(TODAY),),
+    ),
+    (
+        "auto-discount (house busy tomorrow)",
+        "SELECT id FROM bookings WHERE house_id = ? AND check_in <= ? AND check_out > ? "
+        "AND status NOT IN ('CANCELLED', 'COMPLETED')",
+        (7, str(TODAY + timedelta(days=1)), str(TODAY + timedelta(days=1))),
+    ),
+    (
+        "Avito lookup (source, external_id)",
+        "SELECT id FROM bookings WHERE external_id = ? AND source = 'AVITO'",
+        ("avito-50001",),
+    ),
+]
+
+
+def populate(conn: sqlite3.Connection, bookings: int, houses: int) -> None:
+    rng = random.Random(42)
+    rows = []
+    for i in range(1, bookings + 1):
+        # Брони за ~5 лет в прошлое и год вперёд
+        check_in = TODAY + timedelta(days=rng.randint(-5 * 365, 365))
+        nights = rng.randint(1, 7)
+        source = rng.choice(SOURCES)
+        phone = f"7999{rng.randint(0, 9_999_999):07d}"
+        rows.append(
+            (
+                i,
+                rng.randint(1, houses),
+                f"Guest {i}",
+                phone,
+                phone[-10:],
+                str(check_in),
+                str(check_in + timedelta(days=nights)),
+                rng.randint(1, 4),
+                5000 * nights,
+                rng.choices(STATUSES, STATUS_WEIGHTS)[0],
+                source,
+                f"{source.lower()}-{i}" if source != "DIRECT" else None,
+                "2026-01-01 00:00:00",
+                "2026-01-01 00:00:00",
+            )
+        )
+    conn.executemany(
+        "INSERT INTO bookings VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)", rows
+    )
+    conn.commit()
+
+
+def run_queries(conn: sqlite3.Connection, repeat: int) -> dict:
+    results = {}
+    for name, sql, params in QUERIES:
+        plan = [row[3] for row in conn.execute(f"EXPLAIN QUERY PLAN {sql}", params)]
+        timings = []
+        for _ in range(repeat):
+            started = time.perf_counter()
+            conn.execute(sql, params).fetchall()
+            timings.append((time.perf_counter() - started) * 1000)
+        results[name] = (plan, statistics.median(timings))
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--bookings", type=int, default=100_000)
+    parser.add_argument("--houses", type=int, default=20)
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        conn = sqlite3.connect(os.path.join(tmp, "bench.db"))
+        conn.executescript(SCHEMA)
+
+        started = time.perf_counter()
+        populate(conn, args.bookings, args.houses)
+        print(f"Populated {args.bookings} bookings / {args.houses} houses "
+              f"in {time.perf_counter() - started:.1f}s\n")
+
+        conn.execute("ANALYZE")
+        before = run_queries(conn, args.repeat)
+
+        conn.executescript(COMPOSITE_INDEXES)
+        conn.execute("ANALYZE")
+        after = run_queries(conn, args.repeat)
+        conn.close()
+
+    for name, _sql, _params in QUERIES:
+        plan_before, ms_before = before[name]
+        plan_after, ms_after = after[name]
+        speedup = ms_before / ms_after if ms_after else float("inf")
+        print(f"== {name}")
+        print(f"   before: {ms_before:8.3f} ms  | {'; '.join(plan_before)}")
+        print(f"   after:  {ms_after:8.3f} ms  | {'; '.join(plan_after)}")
+        print(f"   speedup: x{speedup:.1f}\n")
+
+
+if __name__ == "__main__":
+    main()
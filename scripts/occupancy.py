@@ -0,0 +1,59 @@
+"""
+Обслуживание таблицы занятости house_day_occupancy.
+
+Запуск:
+    python scripts/occupancy.py check              # сверка с bookings
+    python scripts/occupancy.py rebuild [--house N] # пересчёт из bookings
+"""
+import argparse
+import asyncio
+import os
+import sys
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from app.database import AsyncSessionLocal  # noqa: E402
+from app.services.occupancy_service import OccupancyService  # noqa: E402
+
+SAMPLE = 10
+
+
+async def check() -> int:
+    async with AsyncSessionLocal() as session:
+        report = await OccupancyService.check(session)
+
+    if report["ok"]:
+        print("✅ house_day_occupancy совпадает с bookings")
+        return 0
+
+    print(f"❌ Расхождение: не хватает {len(report['missing'])}, лишних {len(report['extra'])}")
+    for title, rows in (("Не хватает", report["missing"]), ("Лишние", report["extra"])):
+        for house_id, day, booking_id in rows[:SAMPLE]:
+            print(f"   {title}: house={house_id} day={day} booking={booking_id}")
+    print("   Исправить: python scripts/occupancy.py rebuild")
+    return 1
+
+
+async def rebuild(house_id) -> int:
+    async with AsyncSessionLocal() as session:
+        count = await OccupancyService.rebuild(session, house_id=house_id)
+    scope = f"домика {house_id}" if house_id is not None else "всех домиков"
+    print(f"✅ Занятость {scope} пересчитана, ночей: {count}")
+    return 0
+
+
+async def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    sub = parser.add_subparsers(dest="command", required=True)
+    sub.add_parser("check", help="сверить занятость с bookings")
+    rebuild_parser = sub.add_parser("rebuild", help="пересчитать занятость из bookings")
+    rebuild_parser.add_argument("--house", type=int, default=None, help="только этот домик")
+    args = parser.parse_args()
+
+    if args.command == "check":
+        return await check()
+    return await rebuild(args.house)
+
+
+if __name__ == "__main__":
+    sys.exit(asyncio.run(main()))
@@ -14,11 +14,6 @@ from app.models import House, Booking
 async def main():
     print("Verifying availability check...")
     
-    # Mock syncing to avoid side effects
-    async def mock_sync():
-        print("   [Mock] Google Sheets sync skipped")
-    booking_service.sync_all_to_sheets = mock_sync
-    
     async with AsyncSessionLocal() as session:
         # 1. Get a house
         result = await session.execute(select(House))
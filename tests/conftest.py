@@ -19,6 +19,11 @@ os.environ.setdefault(
 )
 os.environ.setdefault("TELEGRAM_CHAT_ID", "1")
 
+# aiogram при импорте ставит политику event loop uvloop (если он установлен).
+# Импортируем до первого теста: смена политики посреди сессии оставляет
+# следующие async-тесты без event loop.
+import aiogram  # noqa: E402,F401
+
 
 @pytest.fixture(scope="session")
 def event_loop():
@@ -28,6 +33,29 @@ def event_loop():
     loop.close()
 
 
+@pytest.fixture
+async def db_engine(tmp_path):
+    """Движок на пустой SQLite-базе во временном каталоге со всеми таблицами."""
+    from sqlalchemy.ext.asyncio import create_async_engine
+
+    import app.models  # noqa: F401 — регистрирует таблицы в Base.metadata
+    from app.database import Base
+
+    engine = create_async_engine(f"sqlite+aiosqlite:///{tmp_path / 'test.db'}")
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+    yield engine
+    await engine.dispose()
+
+
+@pytest.fixture
+def Session(db_engine):
+    """Фабрика сессий поверх `db_engine` (как AsyncSessionLocal в приложении)."""
+    from sqlalchemy.ext.asyncio import async_sessionmaker
+
+    return async_sessionmaker(db_engine, expire_on_commit=False)
+
+
 @pytest.fixture
 def sample_booking_data():
     """Sample data for booking creation"""
@@ -0,0 +1,83 @@
+"""Тесты set-based PricingService.check_and_apply_auto_discounts."""
+from datetime import date, timedelta
+
+import pytest
+from sqlalchemy import event, select
+
+from app.core.config import settings
+from app.models import Booking, BookingStatus, House, HouseDiscount
+from app.services.pricing_service import PricingService
+
+
+@pytest.fixture
+async def db(Session):
+    today = date.today()
+    async with Session() as s:
+        busy = House(name="Busy", capacity=2, base_price=5000)
+        free = House(name="Free", capacity=2, base_price=6000)
+        no_price = House(name="NoPrice", capacity=2, base_price=0)
+        s.add_all([busy, free, no_price])
+        await s.flush()
+        s.add_all([
+            # Занят ночи +1 и +2
+            Booking(
+                house_id=busy.id, guest_name="G", guest_phone="+79990000000",
+                check_in=today + timedelta(days=1), check_out=today + timedelta(days=3),
+                guests_count=2, status=BookingStatus.CONFIRMED,
+            ),
+            # Отменённая бронь не занимает даты
+            Booking(
+                house_id=free.id, guest_name="G", guest_phone="+79990000001",
+                check_in=today + timedelta(days=1), check_out=today + timedelta(days=4),
+                guests_count=2, status=BookingStatus.CANCELLED,
+            ),
+            # Уже есть авто-скидка на +2
+            HouseDiscount(
+                house_id=free.id, label="old", discount_percent=15,
+                date_from=today + timedelta(days=2), date_to=today + timedelta(days=2),
+                is_auto=True, is_active=True,
+            ),
+        ])
+        await s.commit()
+        yield s
+
+
+async def test_creates_missing_discounts_for_window(db, db_engine):
+    statements: list[str] = []
+
+    def _count(conn, cursor, statement, *args):
+        statements.append(statement)
+
+    event.listen(db_engine.sync_engine, "before_cursor_execute", _count)
+    applied = await PricingService.check_and_apply_auto_discounts(db, days_ahead=4)
+    event.remove(db_engine.sync_engine, "before_cursor_execute", _count)
+
+    today = date.today()
+    got = sorted((d["house"], (d["date"] - today).days, d["percent"]) for d in applied)
+    tomorrow = settings.auto_discount_tomorrow_percent
+    later = settings.auto_discount_day_after_percent
+    assert got == [
+        ("Busy", 3, later),
+        ("Busy", 4, later),
+        ("Free", 1, tomorrow),
+        ("Free", 3, later),
+        ("Free", 4, later),
+    ]
+    assert all(d["discount_id"] for d in applied)
+
+    # houses + bookings + discounts, затем одна вставка
+    selects = [s for s in statements if s.lstrip().upper().startswith("SELECT")]
+    assert len(selects) == 3
+
+    # Повторный прогон ничего не создаёт
+    assert await PricingService.check_and_apply_auto_discounts(db, days_ahead=4) == []
+    total = (await db.execute(select(HouseDiscount).where(HouseDiscount.is_auto.is_(True)))).scalars().all()
+    assert len(total) == 6
+
+
+async def test_default_window_comes_from_settings(db, monkeypatch):
+    monkeypatch.setattr(settings, "auto_discount_days_ahead", 1)
+    applied = await PricingService.check_and_apply_auto_discounts(db)
+    assert [(d["house"], d["percent"]) for d in applied] == [
+        ("Free", settings.auto_discount_tomorrow_percent)
+    ]
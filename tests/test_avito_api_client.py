@@ -0,0 +1,145 @@
+"""Тесты асинхронного AvitoAPIService против локального aiohttp-сервера:
+ретраи на 429/5xx, single-flight токен, обновление токена после 401."""
+import asyncio
+
+import pytest
+from aiohttp import web
+from aiohttp.test_utils import TestServer
+
+from app.services.avito_api_service import AvitoAPIError, AvitoAPIService
+
+
+class _FakeAvito:
+    def __init__(self):
+        self.token_calls = 0
+        self.booking_calls = 0
+        self.booking_failures: list[int] = []  # статусы, которые вернуть до успеха
+        self.valid_tokens = {"token-1"}
+        self.bookings_payload: list = [{"avito_booking_id": 1}]
+        self.pushed_intervals: list = []  # тела POST /intervals
+
+    def app(self) -> web.Application:
+        app = web.Application()
+        app.router.add_post("/token", self.token)
+        app.router.add_get(
+            "/realty/v1/accounts/{user_id}/items/{item_id}/bookings", self.bookings
+        )
+        app.router.add_post("/realty/v1/items/intervals", self.intervals)
+        return app
+
+    async def token(self, request):
+        self.token_calls += 1
+        await asyncio.sleep(0.01)
+        return web.json_response(
+            {"access_token": f"token-{self.token_calls}", "expires_in": 3600}
+        )
+
+    async def bookings(self, request):
+        self.booking_calls += 1
+        if request.headers.get("Authorization") not in {
+            f"Bearer {t}" for t in self.valid_tokens
+        }:
+            return web.Response(status=401)
+        if self.booking_failures:
+            status = self.booking_failures.pop(0)
+            return web.Response(status=status, headers={"Retry-After": "0"})
+        return web.json_response({"bookings": self.bookings_payload})
+
+    async def intervals(self, request):
+        self.pushed_intervals.append(await request.json())
+        return web.json_response({"result": "success"})
+
+
+@pytest.fixture
+async def avito():
+    fake = _FakeAvito()
+    server = TestServer(fake.app())
+    await server.start_server()
+    service = AvitoAPIService()
+    service.BASE_URL = str(server.make_url("")).rstrip("/")
+    service.backoff_base_seconds = 0.001
+    yield fake, service
+    await service.close()
+    await server.close()
+
+
+async def test_retries_on_429_and_5xx(avito):
+    fake, service = avito
+    fake.booking_failures = [429, 503]
+
+    data = await service.get_bookings(1, "2026-01-01", "2026-02-01")
+
+    assert data["bookings"] == [{"avito_booking_id": 1}]
+    assert fake.booking_calls == 3
+
+
+async def test_gives_up_after_max_attempts(avito):
+    fake, service = avito
+    service.max_attempts = 2
+    fake.booking_failures = [500, 500, 500]
+
+    with pytest.raises(AvitoAPIError) as exc:
+        await service.get_bookings(1, "2026-01-01", "2026-02-01")
+    assert exc.value.status == 500
+    assert fake.booking_calls == 2
+
+
+async def test_token_refresh_is_single_flight(avito):
+    fake, service = avito
+
+    results = await asyncio.gather(
+        *(service.get_bookings_for_period(item_id) for item_id in range(10))
+    )
+
+    assert all(r == [{"avito_booking_id": 1}] for r in results)
+    assert fake.token_calls == 1
+
+
+async def test_revoked_token_is_refreshed_once(avito):
+    fake, service = avito
+    await service.ensure_token()
+    fake.valid_tokens = {"token-2"}
+
+    data = await service.get_bookings(1, "2026-01-01", "2026-02-01")
+
+    assert data["bookings"]
+    assert fake.token_calls == 2
+
+
+async def test_unblock_and_refresh_read_check_in_check_out(avito):
+    from datetime import date, timedelta
+
+    from app.core.config import settings
+
+    fake, service = avito
+    today = date.today()
+
+    def day(n: int) -> str:
+        return (today + timedelta(days=n)).isoformat()
+
+    window_end = day(settings.booking_window_days)
+    # Формат ответа Avito: check_in/check_out; бронь без дат пропускается
+    fake.bookings_payload = [
+        {"avito_booking_id": 1, "check_in": day(2), "check_out": day(4)},
+        {"avito_booking_id": 2, "check_in": day(6), "check_out": day(8)},
+        {"avito_booking_id": 3},
+    ]
+
+    assert await service.unblock_dates(1, day(6), day(8), raise_permanent=True) is True
+    assert await service.update_calendar_intervals(1) is True
+
+    unblocked, refreshed = fake.pushed_intervals
+    # Отменённая бронь 6–8 освобождена, бронь 2–4 осталась занятой
+    assert unblocked == {
+        "item_id": 1,
+        "source": "EasyCamp",
+        "intervals": [
+            {"date_start": day(0), "date_end": day(2), "open": 1},
+            {"date_start": day(4), "date_end": window_end, "open": 1},
+        ],
+    }
+    assert refreshed["intervals"] == [
+        {"date_start": day(0), "date_end": day(2), "open": 1},
+        {"date_start": day(4), "date_end": day(6), "open": 1},
+        {"date_start": day(8), "date_end": window_end, "open": 1},
+    ]
@@ -0,0 +1,145 @@
+"""Тесты входящей очереди webhook Avito."""
+import json
+from datetime import datetime, timedelta
+from unittest.mock import AsyncMock, patch
+
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from sqlalchemy import select
+
+from app.core.config import settings
+from app.models import AvitoWebhookInbox, InboxStatus
+from app.services.avito_inbox_service import AvitoInboxService, AvitoInboxWorker
+
+
+def _event(booking_id, n: int) -> dict:
+    return {"event_type": "booking_updated", "event_time": n, "payload": {"avito_booking_id": booking_id}}
+
+
+async def _accept(Session, event: dict):
+    async with Session() as session:
+        return await AvitoInboxService.accept(session, json.dumps(event).encode(), event)
+
+
+async def _rows(Session) -> list[AvitoWebhookInbox]:
+    async with Session() as session:
+        result = await session.execute(select(AvitoWebhookInbox).order_by(AvitoWebhookInbox.id))
+        return list(result.scalars().all())
+
+
+async def test_repeated_delivery_is_stored_once(Session):
+    event = _event(101, 1)
+    row, is_new = await _accept(Session, event)
+    assert is_new is True
+    assert row.booking_key == "101"
+
+    # Тот же JSON с другим порядком ключей — дубль
+    reordered = {"payload": event["payload"], "event_time": 1, "event_type": "booking_updated"}
+    again, is_new = await _accept(Session, reordered)
+    assert is_new is False
+    assert again.id == row.id
+    assert len(await _rows(Session)) == 1
+
+
+def test_endpoint_stores_event_without_processing(Session):
+    from app.avito.webhook import router
+
+    app = FastAPI()
+    app.include_router(router)
+    event = _event(7, 1)
+
+    with patch("app.database.AsyncSessionLocal", Session), \
+            patch("app.services.avito_inbox_service.process_avito_event") as process, \
+            patch.object(settings, "avito_webhook_secret", ""):
+        client = TestClient(app)
+        first = client.post("/avito/webhook", json=event)
+        second = client.post("/avito/webhook", json=event)
+
+    assert first.status_code == 200
+    assert first.json()["status"] == "accepted"
+    assert second.json() == {"status": "duplicate", "inbox_id": first.json()["inbox_id"]}
+    process.assert_not_called()
+
+
+async def test_events_of_one_booking_are_processed_in_order(Session):
+    for event in (_event(1, 1), _event(2, 1), _event(1, 2)):
+        await _accept(Session, event)
+
+    calls = []
+    fail_once = {"pending": True}
+
+    async def processor(event):
+        key = (event["payload"]["avito_booking_id"], event["event_time"])
+        if key == (1, 1) and fail_once["pending"]:
+            fail_once["pending"] = False
+            raise RuntimeError("avito 503")
+        calls.append(key)
+
+    worker = AvitoInboxWorker(session_factory=Session, processor=processor)
+    assert await worker.run_once() == 2
+    # Бронь 1 ждёт повтора первого события, бронь 2 не ждёт
+    assert calls == [(2, 1)]
+    assert [r.status for r in await _rows(Session)] == [
+        InboxStatus.PENDING, InboxStatus.DONE, InboxStatus.PENDING
+    ]
+
+    async with Session() as session:
+        first = await session.get(AvitoWebhookInbox, 1)
+        assert first.attempts == 1 and "avito 503" in first.last_error
+        first.next_attempt_at = datetime.utcnow() - timedelta(seconds=1)
+        await session.commit()
+
+    assert await worker.run_once() == 2
+    assert calls == [(2, 1), (1, 1), (1, 2)]
+    assert all(r.status == InboxStatus.DONE for r in await _rows(Session))
+    assert worker.stats()["lag_avg_s"] is not None
+
+
+async def test_dead_letter_and_requeue(Session, monkeypatch):
+    monkeypatch.setattr(settings, "avito_inbox_max_attempts", 1)
+    await _accept(Session, _event(1, 1))
+    await _accept(Session, _event(2, 1))
+
+    async def processor(event):
+        if event["payload"]["avito_booking_id"] == 1:
+            raise ValueError("field required")  # событие не разобрать
+        raise RuntimeError("timeout")
+
+    worker = AvitoInboxWorker(session_factory=Session, processor=processor)
+    assert await worker.run_once() == 2
+    rows = await _rows(Session)
+    assert [r.status for r in rows] == [InboxStatus.DEAD, InboxStatus.DEAD]
+    assert rows[0].last_error.startswith("invalid event")
+
+    async with Session() as session:
+        backlog = await AvitoInboxService.backlog(session)
+        assert backlog == {"pending": 0, "dead": 2, "oldest_pending_age_s": None}
+        assert await AvitoInboxService.requeue_dead(session) == 2
+
+    worker.processor = AsyncMock()
+    assert await worker.run_once() == 2
+    assert all(r.status == InboxStatus.DONE for r in await _rows(Session))
+
+
+async def test_backoff_rows_do_not_starve_newer_bookings(Session, monkeypatch):
+    monkeypatch.setattr(settings, "avito_inbox_batch_size", 2)
+    # Старшие события: бронь 1 (три события) и бронь 2 — обе ждут повтора
+    for event in (_event(1, 1), _event(1, 2), _event(2, 1), _event(1, 3), _event(3, 1)):
+        await _accept(Session, event)
+    async with Session() as session:
+        for row_id in (1, 3):
+            row = await session.get(AvitoWebhookInbox, row_id)
+            row.attempts = 1
+            row.next_attempt_at = datetime.utcnow() + timedelta(hours=1)
+        await session.commit()
+
+    calls = []
+
+    async def processor(event):
+        calls.append((event["payload"]["avito_booking_id"], event["event_time"]))
+
+    worker = AvitoInboxWorker(session_factory=Session, processor=processor)
+    assert await worker.run_once() == 1
+    # Бронь 3 обработана, хотя перед ней в очереди пачка событий на backoff
+    assert calls == [(3, 1)]
+    assert [r.status for r in await _rows(Session)] == [InboxStatus.PENDING] * 4 + [InboxStatus.DONE]
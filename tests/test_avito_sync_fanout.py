@@ -0,0 +1,78 @@
+"""Тесты параллельного синка объявлений Avito (sync_all_avito_items)."""
+import asyncio
+from datetime import date, timedelta
+
+import pytest
+from sqlalchemy import select
+
+from app.models import Booking, House
+from app.services import avito_sync_service
+
+
+@pytest.fixture
+async def session_factory(Session, monkeypatch):
+    async with Session() as s:
+        s.add_all([House(name=f"H{i}", capacity=2, base_price=5000) for i in (1, 2, 3)])
+        await s.commit()
+
+    monkeypatch.setattr(avito_sync_service, "AsyncSessionLocal", Session)
+    monkeypatch.setattr(avito_sync_service, "_db_apply_lock", asyncio.Lock())
+    return Session
+
+
+def _payload(avito_id: int) -> dict:
+    check_in = date.today() + timedelta(days=10 + avito_id * 5)
+    return {
+        "avito_booking_id": avito_id,
+        "check_in": check_in.isoformat(),
+        "check_out": (check_in + timedelta(days=2)).isoformat(),
+        "status": "active",
+        "contact": {"name": f"Guest {avito_id}", "phone": "+79990000000"},
+    }
+
+
+async def test_items_are_fetched_concurrently(session_factory, monkeypatch):
+    in_flight = 0
+    max_in_flight = 0
+
+    async def fake_fetch(item_id: int):
+        nonlocal in_flight, max_in_flight
+        in_flight += 1
+        max_in_flight = max(max_in_flight, in_flight)
+        await asyncio.sleep(0.05)
+        in_flight -= 1
+        if item_id == 30:
+            raise RuntimeError("avito down")
+        return [_payload(item_id)]
+
+    monkeypatch.setattr(
+        avito_sync_service.avito_api_service, "get_bookings_for_period", fake_fetch
+    )
+    monkeypatch.setattr(avito_sync_service.settings, "avito_sync_concurrency", 2)
+
+    stats = await avito_sync_service.sync_all_avito_items({10: 1, 20: 2, 30: 3})
+
+    assert max_in_flight == 2
+    assert stats["total"] == 2
+    assert len(stats["new_bookings"]) == 2
+    assert stats["errors"] == 1
+
+    items = {i["item_id"]: i for i in stats["items"]}
+    assert set(items) == {10, 20, 30}
+    assert items[10]["new"] == 1 and items[10]["fetch_ms"] >= 40
+    assert items[30]["errors"] == 1 and items[30]["apply_ms"] == 0
+    assert stats["duration_ms"] > 0
+
+    async with session_factory() as s:
+        rows = (await s.execute(select(Booking.external_id, Booking.house_id))).all()
+    assert sorted(rows) == [("10", 1), ("20", 2)]
+
+
+def test_format_item_timings():
+    line = avito_sync_service.format_item_timings(
+        [
+            {"item_id": 1, "fetch_ms": 120.4, "apply_ms": 8.2, "errors": 0},
+            {"item_id": 2, "fetch_ms": 300.0, "apply_ms": 0.0, "errors": 1},
+        ]
+    )
+    assert line == "1: 120+8ms, 2: 300+0ms (1 err)"
@@ -0,0 +1,114 @@
+"""Тесты бэкапов БД (локальный бэкенд, без сети)."""
+import asyncio
+import gzip
+import sqlite3
+import threading
+import time
+
+import pytest
+
+from app.core import metrics
+from app.core.config import settings
+from app.services import backup_service
+from app.services.backup_service import LocalBackupBackend
+
+
+@pytest.fixture
+def live_db(tmp_path):
+    path = tmp_path / "live.db"
+    conn = sqlite3.connect(path)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("CREATE TABLE t (id INTEGER PRIMARY KEY, payload TEXT)")
+    conn.executemany("INSERT INTO t (payload) VALUES (?)", [("x" * 200,)] * 2000)
+    conn.commit()
+    conn.close()
+    return str(path)
+
+
+async def test_snapshot_is_consistent_under_concurrent_writes(tmp_path, live_db, monkeypatch):
+    monkeypatch.setattr(settings, "backup_compression", "gzip")
+    stop = threading.Event()
+
+    def writer():
+        conn = sqlite3.connect(live_db, timeout=5)
+        while not stop.is_set():
+            conn.execute("INSERT INTO t (payload) VALUES ('y')")
+            conn.commit()
+        conn.close()
+
+    thread = threading.Thread(target=writer)
+    thread.start()
+    try:
+        backend = LocalBackupBackend(str(tmp_path / "backups"))
+        result = await backup_service.backup_database(backend=backend, db_path=live_db)
+    finally:
+        stop.set()
+        thread.join()
+
+    assert result is not None and result.name.endswith(".db.gz")
+    assert backend.list() == [result.name]
+    assert result.compressed_bytes < result.snapshot_bytes
+    assert metrics.BACKUP_SIZE_BYTES.value("snapshot") == result.snapshot_bytes
+
+    restored = tmp_path / "restored.db"
+    with gzip.open(tmp_path / "backups" / result.name) as src:
+        restored.write_bytes(src.read())
+    conn = sqlite3.connect(restored)
+    assert conn.execute("PRAGMA integrity_check").fetchone()[0] == "ok"
+    assert conn.execute("SELECT count(*) FROM t").fetchone()[0] >= 2000
+    conn.close()
+
+
+async def test_retention_keeps_newest_snapshots(tmp_path, live_db, monkeypatch):
+    monkeypatch.setattr(settings, "backup_retention_count", 2)
+    backups = tmp_path / "backups"
+    backups.mkdir()
+    for stamp in ("20250101_030000.db", "20250102_030000.db.gz", "20250103_030000.db.gz"):
+        (backups / f"easycamp_backup_{stamp}").write_bytes(b"old")
+    (backups / "unrelated.txt").write_text("keep me")
+
+    backend = LocalBackupBackend(str(backups))
+    result = await backup_service.backup_database(backend=backend, db_path=live_db)
+
+    assert result.pruned == 2
+    assert backend.list() == [result.name, "easycamp_backup_20250103_030000.db.gz"]
+    assert (backups / "unrelated.txt").exists()
+
+
+async def test_restore_latest_from_local_backend(tmp_path, live_db, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    backend = LocalBackupBackend(str(tmp_path / "backups"))
+    await backup_service.backup_database(backend=backend, db_path=live_db)
+
+    target = tmp_path / "fresh" / "easycamp.db"
+    monkeypatch.setattr(settings, "database_url", f"sqlite+aiosqlite:///{target}")
+    await backup_service.restore_latest_backup(backend=backend)
+
+    conn = sqlite3.connect(target)
+    assert conn.execute("SELECT count(*) FROM t").fetchone()[0] == 2000
+    conn.close()
+
+
+async def test_restore_gives_up_after_timeout(tmp_path, live_db, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    release = threading.Event()
+
+    class HangingBackend(LocalBackupBackend):
+        def download(self, name, dest_path):
+            release.wait(5)  # Drive, который не отвечает
+            super().download(name, dest_path)
+
+    backend = HangingBackend(str(tmp_path / "backups"))
+    await backup_service.backup_database(backend=backend, db_path=live_db)
+    target = tmp_path / "fresh" / "easycamp.db"
+    monkeypatch.setattr(settings, "database_url", f"sqlite+aiosqlite:///{target}")
+
+    started = time.monotonic()
+    await backup_service.restore_latest_backup(backend=backend, timeout=0.2)
+    assert time.monotonic() - started < 2
+
+    # Запоздавшая загрузка не подменяет файл, с которым приложение уже стартовало
+    target.write_bytes(b"fresh database")
+    release.set()
+    await asyncio.sleep(0.5)
+    assert target.read_bytes() == b"fresh database"
@@ -0,0 +1,112 @@
+"""Тесты очереди пушей календарей/цен на площадки."""
+import asyncio
+from datetime import date, timedelta
+from unittest.mock import AsyncMock, MagicMock
+
+from app.core.config import settings
+from app.services import channel_push_queue as push_queue_module
+from app.services.avito_api_service import AvitoAPIService, avito_api_service
+from app.services.channel_push_queue import (
+    FAILED,
+    PUSHED,
+    UNCHANGED,
+    ChannelPushQueue,
+    collapse_price_ranges,
+)
+from app.telegram.handlers.settings import apply_booking_window
+
+
+def test_collapse_price_ranges():
+    start = date(2026, 3, 10)
+    prices = [{"date": start + timedelta(days=i), "price": p} for i, p in enumerate([5000, 5000, 5000, 6000, 6000])]
+    # Пропуск дня разрывает диапазон даже при той же цене
+    prices.append({"date": start + timedelta(days=6), "price": 6000})
+
+    assert collapse_price_ranges(prices) == [
+        {"date_from": "2026-03-10", "date_to": "2026-03-12", "price": 5000},
+        {"date_from": "2026-03-13", "date_to": "2026-03-14", "price": 6000},
+        {"date_from": "2026-03-16", "date_to": "2026-03-16", "price": 6000},
+    ]
+
+
+async def test_unchanged_payload_is_not_pushed_again(Session):
+    sender = AsyncMock(return_value=True)
+    queue = ChannelPushQueue(session_factory=Session)
+    payload = [{"date_start": "2026-03-10", "date_end": "2026-09-06", "open": 1}]
+
+    assert await queue.push("avito", 1, "calendar", payload, sender) == PUSHED
+    assert await queue.push("avito", 1, "calendar", list(payload), sender) == UNCHANGED
+    assert sender.await_count == 1
+
+    # Состояние переживает рестарт (хранится в БД)
+    restarted = ChannelPushQueue(session_factory=Session)
+    assert await restarted.push("avito", 1, "calendar", payload, sender) == UNCHANGED
+    assert await restarted.push("avito", 1, "calendar", payload, sender, force=True) == PUSHED
+    # Другая цель — независима
+    assert await restarted.push("avito", 2, "calendar", payload, sender) == PUSHED
+
+    await restarted.invalidate("avito", 1)
+    assert await restarted.push("avito", 1, "calendar", payload, sender) == PUSHED
+    assert sender.await_count == 4
+
+
+async def test_failed_push_is_not_remembered(Session):
+    queue = ChannelPushQueue(session_factory=Session)
+    assert await queue.push("avito", 1, "prices", [1], AsyncMock(return_value=False)) == FAILED
+
+    sender = AsyncMock(return_value=True)
+    assert await queue.push("avito", 1, "prices", [1], sender) == PUSHED
+    sender.assert_awaited_once()
+
+
+async def test_manual_intervals_push_invalidates_stored_hash(Session, monkeypatch):
+    queue = ChannelPushQueue(session_factory=Session)
+    monkeypatch.setattr(push_queue_module, "channel_push_queue", queue)
+    monkeypatch.setattr(settings, "avito_item_ids", "101:1")
+    monkeypatch.setattr(avito_api_service, "update_calendar_intervals", AsyncMock(return_value=True))
+    sender = AsyncMock(return_value=True)
+    payload = [{"date_start": "2026-03-10", "date_end": "2026-09-06", "open": 1}]
+    assert await queue.push("avito", 101, "calendar", payload, sender) == PUSHED
+
+    callback = MagicMock(answer=AsyncMock(), message=MagicMock(edit_text=AsyncMock()))
+    await apply_booking_window(callback)
+
+    # Avito теперь хранит другие интервалы — тот же payload уходит снова
+    assert await queue.push("avito", 101, "calendar", payload, sender) == PUSHED
+    assert sender.await_count == 2
+
+
+async def test_pending_changes_are_merged_into_one_push(Session):
+    gate = asyncio.Event()
+    sent = []
+
+    async def sender(payload):
+        sent.append(payload)
+        if payload == "v1":
+            await gate.wait()
+        return True
+
+    queue = ChannelPushQueue(session_factory=Session)
+    first = asyncio.create_task(queue.push("avito", 1, "calendar", "v1", sender))
+    while not sent:
+        await asyncio.sleep(0)
+
+    # Пока v1 в полёте, приходят v2 и v3 — уйдёт только v3
+    second = asyncio.create_task(queue.push("avito", 1, "calendar", "v2", sender))
+    third = asyncio.create_task(queue.push("avito", 1, "calendar", "v3", sender))
+    await asyncio.sleep(0)
+    gate.set()
+
+    assert await asyncio.gather(first, second, third) == [PUSHED, PUSHED, PUSHED]
+    assert sent == ["v1", "v3"]
+    assert queue.stats()["coalesced_total"] == 1
+
+
+def test_calendar_intervals_are_deterministic():
+    today = date(2026, 3, 1)
+    booking = type("B", (), {"check_in": date(2026, 3, 5), "check_out": date(2026, 3, 8)})()
+    intervals = AvitoAPIService.build_calendar_intervals([booking], today=today)
+
+    assert intervals[0] == {"date_start": "2026-03-01", "date_end": "2026-03-05", "open": 1}
+    assert intervals[1]["date_start"] == "2026-03-08"
+    assert AvitoAPIService.build_calendar_intervals([booking], today=today) == intervals
@@ -0,0 +1,100 @@
+"""Тесты таймеров SLA задач уборки."""
+import asyncio
+from datetime import date, datetime, timedelta, timezone
+
+import pytest
+from sqlalchemy import select
+
+from app.jobs import cleaning_sla_monitor
+from app.models import CleaningTask, CleaningTaskStatus
+from app.services import cleaning_task_service
+from app.services.cleaning_sla_timers import SlaDeadlineTimers
+from app.services.cleaning_task_service import CleaningTaskService
+
+
+class Dispatcher:
+    def __init__(self):
+        self.sent = []
+
+    async def send_many(self, chat_ids, text, **kwargs):
+        self.sent.append(kwargs["context"])
+
+
+@pytest.fixture
+def Session(Session, monkeypatch):
+    monkeypatch.setattr(cleaning_sla_monitor, "AsyncSessionLocal", Session)
+    return Session
+
+
+@pytest.fixture
+def dispatcher(monkeypatch):
+    dispatcher = Dispatcher()
+    monkeypatch.setattr(cleaning_sla_monitor, "telegram_dispatcher", dispatcher)
+    return dispatcher
+
+
+@pytest.fixture
+def timers(Session, monkeypatch):
+    timers = SlaDeadlineTimers(
+        escalate=cleaning_sla_monitor.escalate_overdue_tasks,
+        session_factory=Session,
+        grace_seconds=0.05,
+    )
+    monkeypatch.setattr(cleaning_task_service, "sla_timers", timers)
+    return timers
+
+
+def _task(booking_id: int, deadline=None) -> CleaningTask:
+    return CleaningTask(
+        booking_id=booking_id, house_id=1, scheduled_date=date(2026, 11, 10),
+        status=CleaningTaskStatus.PENDING, confirm_deadline_at=deadline,
+    )
+
+
+async def test_timer_escalates_right_after_deadline_and_transition_cancels_it(
+    Session, dispatcher, timers
+):
+    deadline = datetime.now(timezone.utc) + timedelta(seconds=0.2)
+    async with Session() as session:
+        overdue, accepted = _task(1), _task(2)
+        session.add_all([overdue, accepted])
+        await session.flush()
+        CleaningTaskService.set_confirm_deadline(overdue, deadline)
+        CleaningTaskService.set_confirm_deadline(accepted, deadline)
+        assert timers.stats()["scheduled"] == 2
+
+        assert await CleaningTaskService.transition_status(
+            session, accepted, CleaningTaskStatus.ACCEPTED
+        )
+        await session.commit()
+    assert timers.stats()["scheduled"] == 1
+
+    await asyncio.sleep(0.6)
+
+    async with Session() as session:
+        statuses = dict((await session.execute(select(CleaningTask.id, CleaningTask.status))).all())
+    assert statuses == {overdue.id: CleaningTaskStatus.ESCALATED, accepted.id: CleaningTaskStatus.ACCEPTED}
+    assert dispatcher.sent == [f"sla_escalation task={overdue.id}"]
+    assert timers.stats() == {"scheduled": 0, "fired_total": 1, "escalated_total": 1}
+
+
+async def test_restore_on_start_and_sweep_is_idempotent(Session, dispatcher, timers):
+    now = datetime.now(timezone.utc)
+    async with Session() as session:
+        session.add_all([
+            _task(1, now - timedelta(minutes=5)),   # просрочена, пока процесс лежал
+            _task(2, now + timedelta(hours=2)),
+            _task(3, None),
+        ])
+        await session.commit()
+
+    # Страховочный проход эскалирует просроченную ровно один раз
+    assert await cleaning_sla_monitor.escalate_overdue_tasks() == 1
+    assert await cleaning_sla_monitor.escalate_overdue_tasks() == 0
+    assert len(dispatcher.sent) == 1
+
+    # При старте таймер ставится только PENDING-задаче с дедлайном
+    assert await timers.start() == 1
+    assert timers.stats()["scheduled"] == 1
+    await timers.stop()
+    assert timers.stats()["scheduled"] == 0
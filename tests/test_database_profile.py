@@ -0,0 +1,72 @@
+"""Тесты профиля движка БД: pragmas SQLite, таймаут запроса, лог медленных запросов."""
+import logging
+
+import pytest
+from sqlalchemy import text
+from sqlalchemy.exc import OperationalError
+
+from app.core.config import settings
+from app.database import create_engine_from_settings, engine_kwargs
+
+# Рекурсивный CTE, который считает заметно дольше любого таймаута в тестах
+_SLOW_SQL = (
+    "WITH RECURSIVE c(x) AS (SELECT 1 UNION ALL SELECT x + 1 FROM c WHERE x < 50000000) "
+    "SELECT count(*) FROM c"
+)
+
+
+def _profile(tmp_path, **overrides):
+    data = {"database_url": f"sqlite+aiosqlite:///{tmp_path / 'test.db'}"}
+    data.update(overrides)
+    return settings.model_copy(update=data)
+
+
+async def test_sqlite_pragmas_applied(tmp_path):
+    engine = create_engine_from_settings(_profile(tmp_path))
+    async with engine.connect() as conn:
+        journal = (await conn.execute(text("PRAGMA journal_mode"))).scalar()
+        synchronous = (await conn.execute(text("PRAGMA synchronous"))).scalar()
+        busy = (await conn.execute(text("PRAGMA busy_timeout"))).scalar()
+        cache = (await conn.execute(text("PRAGMA cache_size"))).scalar()
+        temp_store = (await conn.execute(text("PRAGMA temp_store"))).scalar()
+    await engine.dispose()
+
+    assert journal == "wal"
+    assert synchronous == 1  # NORMAL
+    assert busy == settings.db_sqlite_busy_timeout_ms
+    assert cache == -settings.db_sqlite_cache_size_kib
+    assert temp_store == 2  # MEMORY
+
+
+async def test_statement_timeout_interrupts_long_query(tmp_path):
+    engine = create_engine_from_settings(_profile(tmp_path, db_statement_timeout_ms=50))
+    async with engine.connect() as conn:
+        with pytest.raises(OperationalError, match="interrupted"):
+            await conn.execute(text(_SLOW_SQL))
+        # Соединение остаётся рабочим, обычные запросы не прерываются
+        assert (await conn.execute(text("SELECT 1"))).scalar() == 1
+    await engine.dispose()
+
+
+async def test_slow_query_log_is_opt_in(tmp_path, caplog):
+    sql = "WITH RECURSIVE c(x) AS (SELECT 1 UNION ALL SELECT x + 1 FROM c WHERE x < 200000) SELECT count(*) FROM c"
+    caplog.set_level(logging.WARNING, logger="app.database")
+
+    engine = create_engine_from_settings(_profile(tmp_path))
+    async with engine.connect() as conn:
+        await conn.execute(text(sql))
+    await engine.dispose()
+    assert "Slow query" not in caplog.text
+
+    engine = create_engine_from_settings(
+        _profile(tmp_path, db_slow_query_log=True, db_slow_query_threshold_ms=0)
+    )
+    async with engine.connect() as conn:
+        await conn.execute(text(sql))
+    await engine.dispose()
+    assert "Slow query" in caplog.text
+
+
+def test_echo_off_by_default_and_memory_db_has_no_pool_size():
+    kwargs = engine_kwargs(settings.model_copy(update={"database_url": "sqlite+aiosqlite://"}))
+    assert kwargs == {"echo": False}
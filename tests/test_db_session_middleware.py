@@ -0,0 +1,69 @@
+"""Тесты DbSessionMiddleware: одна сессия БД на апдейт Telegram."""
+import pytest
+from sqlalchemy import event, select
+from sqlalchemy.exc import IntegrityError
+
+from app.models import User, UserRole
+from app.telegram.auth.admin import resolve_user_db_id
+from app.telegram.middlewares import DbSessionMiddleware
+
+
+def _count_checkouts(engine) -> list:
+    checkouts = []
+    event.listen(engine.sync_engine.pool, "checkout", lambda *a: checkouts.append(1))
+    return checkouts
+
+
+async def test_helpers_share_one_connection_per_update(db_engine, Session):
+    async with Session() as session:
+        session.add(User(telegram_id=42, role=UserRole.CLEANER, name="Анна"))
+        await session.commit()
+
+    checkouts = _count_checkouts(db_engine)
+    seen = []
+
+    async def handler(event, data):
+        session = data["session"]
+        seen.append(await resolve_user_db_id(session, 42))
+        seen.append(await resolve_user_db_id(session, 43))
+
+    await DbSessionMiddleware(Session)(handler, object(), {})
+    assert seen == [1, None]
+    assert len(checkouts) == 1
+
+
+async def test_changes_committed_after_handler(Session):
+    async def handler(event, data):
+        data["session"].add(User(telegram_id=7, role=UserRole.GUEST, name="G"))
+        return "ok"
+
+    assert await DbSessionMiddleware(Session)(handler, object(), {}) == "ok"
+    async with Session() as session:
+        assert (await session.execute(select(User.telegram_id))).scalars().all() == [7]
+
+
+async def test_rollback_on_handler_error(Session):
+    async def handler(event, data):
+        data["session"].add(User(telegram_id=8, role=UserRole.GUEST, name="G"))
+        await data["session"].flush()
+        raise RuntimeError("boom")
+
+    with pytest.raises(RuntimeError):
+        await DbSessionMiddleware(Session)(handler, object(), {})
+    async with Session() as session:
+        assert (await session.execute(select(User))).scalars().all() == []
+
+
+async def test_commit_failure_is_raised(Session):
+    async def handler(event, data):
+        session = data["session"]
+        session.add(User(telegram_id=9, role=UserRole.GUEST, name="G"))
+        await session.flush()
+        # Дубликат telegram_id отложен до коммита middleware
+        session.add(User(telegram_id=9, role=UserRole.GUEST, name="G2"))
+        return "ok"
+
+    with pytest.raises(IntegrityError):
+        await DbSessionMiddleware(Session)(handler, object(), {})
+    async with Session() as session:
+        assert (await session.execute(select(User))).scalars().all() == []
@@ -0,0 +1,107 @@
+"""Тесты публичного `/api/houses/availability-matrix`.
+
+Собираем минимальный FastAPI app только с houses-роутером и подменяем
+`get_db` на тестовую SQLite (фикстура `Session` из conftest).
+"""
+from datetime import date, timedelta
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from sqlalchemy import event
+
+from app.api.houses import get_db, router as houses_router
+from app.models import (
+    Booking,
+    BookingSource,
+    BookingStatus,
+    House,
+    HouseDiscount,
+    HousePrice,
+)
+
+
+@pytest.fixture
+async def client(Session):
+
+    async with Session() as s:
+        h1 = House(name="H1", capacity=2, base_price=5000)
+        h2 = House(name="H2", capacity=4, base_price=8000)
+        s.add_all([h1, h2])
+        await s.flush()
+        s.add_all([
+            HousePrice(
+                house_id=h2.id, label="Лето", price_per_night=10000,
+                date_from=date(2026, 7, 2), date_to=date(2026, 7, 3),
+            ),
+            HouseDiscount(
+                house_id=None, label="Всем", discount_percent=10,
+                date_from=date(2026, 7, 1), date_to=date(2026, 7, 1),
+            ),
+            Booking(
+                house_id=h1.id, guest_name="G", guest_phone="+79990000000",
+                check_in=date(2026, 6, 30), check_out=date(2026, 7, 2),
+                guests_count=2, status=BookingStatus.CONFIRMED,
+                source=BookingSource.DIRECT,
+            ),
+            Booking(
+                house_id=h2.id, guest_name="G", guest_phone="+79990000001",
+                check_in=date(2026, 7, 1), check_out=date(2026, 7, 3),
+                guests_count=2, status=BookingStatus.CANCELLED,
+                source=BookingSource.DIRECT,
+            ),
+        ])
+        await s.commit()
+
+    async def _override():
+        async with Session() as session:
+            yield session
+
+    app = FastAPI()
+    app.include_router(houses_router)
+    app.dependency_overrides[get_db] = _override
+    with TestClient(app) as c:
+        yield c
+
+
+def test_matrix_grid(client):
+    r = client.get("/api/houses/availability-matrix?from=2026-07-01&to=2026-07-04")
+    assert r.status_code == 200
+    data = r.json()
+    assert data["dates"] == ["2026-07-01", "2026-07-02", "2026-07-03"]
+
+    h1, h2 = data["houses"]
+    assert h1["name"] == "H1"
+    assert h1["available"] == [False, True, True]
+    assert h1["price"] == [5000, 5000, 5000]
+    assert h1["final_price"] == [4500, 5000, 5000]
+    assert h1["discount_percent"] == [10, 0, 0]
+
+    # Отменённая бронь не занимает даты
+    assert h2["available"] == [True, True, True]
+    assert h2["price"] == [8000, 10000, 10000]
+
+
+def test_matrix_rejects_bad_period(client):
+    r = client.get("/api/houses/availability-matrix?from=2026-07-04&to=2026-07-01")
+    assert r.status_code == 422
+    r = client.get("/api/houses/availability-matrix?from=2026-01-01&to=2028-01-01")
+    assert r.status_code == 422
+
+
+def test_matrix_query_count_is_constant(client, db_engine):
+    statements: list[str] = []
+
+    def _count(conn, cursor, statement, *args):
+        statements.append(statement)
+
+    event.listen(db_engine.sync_engine, "before_cursor_execute", _count)
+    start = date(2026, 1, 1)
+    end = start + timedelta(days=365)
+    r = client.get(f"/api/houses/availability-matrix?from={start}&to={end}")
+    event.remove(db_engine.sync_engine, "before_cursor_execute", _count)
+
+    assert r.status_code == 200
+    assert len(r.json()["dates"]) == 365
+    # houses + bookings + seasonal prices + discounts
+    assert len(statements) == 4
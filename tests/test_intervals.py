@@ -0,0 +1,69 @@
+"""Тесты алгебры диапазонов дат (app.domain.intervals)."""
+import random
+from datetime import date, timedelta
+
+from app.domain import intervals
+from app.services.avito_api_service import AvitoAPIService
+
+D = date(2026, 3, 1)
+
+
+def r(a: int, b: int):
+    return D + timedelta(days=a), D + timedelta(days=b)
+
+
+def _days(ranges) -> set:
+    return {start + timedelta(days=i) for start, end in ranges for i in range((end - start).days)}
+
+
+def test_merge_joins_overlapping_and_adjacent_and_drops_empty():
+    assert intervals.merge([r(5, 7), r(0, 2), r(2, 3), r(6, 9), r(4, 4)]) == [r(0, 3), r(5, 9)]
+    assert intervals.merge([]) == []
+
+
+def test_clip_to_window():
+    assert intervals.clip([r(-3, 2), r(4, 6), r(9, 12)], *r(0, 10)) == [r(0, 2), r(4, 6), r(9, 10)]
+    assert intervals.clip([r(-3, 0), r(10, 12)], *r(0, 10)) == []
+
+
+def test_subtract():
+    assert intervals.subtract([r(0, 10)], [r(2, 4), r(3, 5), r(8, 12)]) == [r(0, 2), r(5, 8)]
+    assert intervals.subtract([r(0, 3), r(5, 8)], [r(-1, 10)]) == []
+    assert intervals.subtract([r(0, 3)], []) == [r(0, 3)]
+
+
+def test_free_gaps_in_window():
+    busy = [r(3, 5), r(-2, 1), r(4, 7), r(20, 30)]
+    assert list(intervals.free_gaps(busy, *r(0, 15))) == [r(1, 3), r(7, 15)]
+    assert list(intervals.free_gaps([], *r(0, 5))) == [r(0, 5)]
+    assert list(intervals.free_gaps([r(0, 5)], *r(0, 5))) == []
+
+
+def test_matches_day_by_day_model_on_random_input():
+    rng = random.Random(7)
+    for _ in range(200):
+        busy = []
+        for _ in range(rng.randint(0, 8)):
+            start = rng.randint(-10, 40)
+            busy.append(r(start, start + rng.randint(0, 6)))
+        window = r(0, 30)
+        window_days = _days([window])
+        busy_days = _days(busy)
+
+        assert _days(intervals.merge(busy)) == busy_days
+        assert _days(intervals.free_gaps(busy, *window)) == window_days - busy_days
+        assert _days(intervals.subtract([window], busy)) == window_days - busy_days
+        mask = intervals.availability_mask(busy, *window)
+        assert {D + timedelta(days=i) for i, free in enumerate(mask) if free} == window_days - busy_days
+
+
+def test_avito_payload_is_clipped_to_booking_window(monkeypatch):
+    from app.core.config import settings
+
+    monkeypatch.setattr(settings, "booking_window_days", 10)
+    # Бронь за пределами окна не должна растягивать свободный интервал за окно
+    payload = AvitoAPIService.free_intervals_payload([r(2, 4), r(15, 20)], today=D)
+    assert payload == [
+        {"date_start": "2026-03-01", "date_end": "2026-03-03", "open": 1},
+        {"date_start": "2026-03-05", "date_end": "2026-03-11", "open": 1},
+    ]
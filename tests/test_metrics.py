@@ -0,0 +1,119 @@
+"""Тесты метрик процесса и эндпоинта /metrics."""
+import time
+from types import SimpleNamespace
+
+import pytest
+from apscheduler.events import EVENT_JOB_ERROR, EVENT_JOB_EXECUTED, EVENT_JOB_SUBMITTED
+from fastapi import Depends, FastAPI
+from fastapi.testclient import TestClient
+from sqlalchemy import text
+
+from app.api.metrics import router as metrics_router
+from app.core import metrics
+from app.core.config import settings
+from app.middleware.request_logger import RequestLoggerMiddleware
+from app.services.scheduler_service import SchedulerService
+
+
+def test_histogram_renders_cumulative_buckets():
+    registry = metrics.Registry()
+    hist = registry.register(
+        metrics.Histogram("demo_seconds", "Demo", ("route",), buckets=(0.1, 1.0))
+    )
+    counter = registry.register(metrics.Counter("demo_total", "Demo", ("name",)))
+    for value in (0.05, 0.1, 0.5, 3.0):
+        hist.observe(value, "/a")
+    counter.inc('say "hi"')
+
+    lines = registry.render().splitlines()
+    assert 'demo_seconds_bucket{route="/a",le="0.1"} 2' in lines
+    assert 'demo_seconds_bucket{route="/a",le="1"} 3' in lines
+    assert 'demo_seconds_bucket{route="/a",le="+Inf"} 4' in lines
+    assert 'demo_seconds_sum{route="/a"} 3.65' in lines
+    assert 'demo_seconds_count{route="/a"} 4' in lines
+    assert 'demo_total{name="say \\"hi\\""} 1' in lines
+    assert "# TYPE demo_seconds histogram" in lines
+
+
+def test_http_route_latency_and_db_queries(db_engine, Session, monkeypatch):
+    metrics.install_db_metrics(db_engine)
+
+    async def get_session():
+        async with Session() as session:
+            yield session
+
+    app = FastAPI()
+    app.add_middleware(RequestLoggerMiddleware)
+    app.include_router(metrics_router)
+
+    @app.get("/items/{item_id}")
+    async def item(item_id: int, session=Depends(get_session)):
+        for _ in range(3):
+            await session.execute(text("SELECT 1"))
+        return {"id": item_id}
+
+    route = "/items/{item_id}"
+    before = metrics.HTTP_REQUEST_DB_QUERIES.count(route)
+    monkeypatch.setattr(settings, "metrics_token", "")
+    with TestClient(app) as client:
+        assert client.get("/items/1").status_code == 200
+        assert client.get("/items/2").status_code == 200
+        body = client.get("/metrics").text
+
+    assert metrics.HTTP_REQUEST_DURATION.count("GET", route, "200") >= 2
+    assert metrics.HTTP_REQUEST_DB_QUERIES.count(route) == before + 2
+    series = metrics.HTTP_REQUEST_DB_QUERIES._series[(route,)]
+    assert series[1] >= 6  # по 3 запроса на вызов
+    # Сырые пути в метки не попадают
+    assert 'route="/items/{item_id}"' in body and "/items/1" not in body
+
+
+def test_metrics_token(monkeypatch):
+    app = FastAPI()
+    app.include_router(metrics_router)
+    monkeypatch.setattr(settings, "metrics_token", "s3cret")
+    client = TestClient(app)
+    assert client.get("/metrics").status_code == 401
+    assert client.get("/metrics", headers={"Authorization": "Bearer s3cret"}).status_code == 200
+
+
+def test_scheduler_job_outcomes_are_recorded():
+    service = SchedulerService()
+    job = "test_job_metrics"
+
+    service._on_job_event(SimpleNamespace(code=EVENT_JOB_SUBMITTED, job_id=job))
+    service._on_job_event(SimpleNamespace(code=EVENT_JOB_EXECUTED, job_id=job))
+    service._on_job_event(SimpleNamespace(code=EVENT_JOB_SUBMITTED, job_id=job))
+    service._on_job_event(SimpleNamespace(code=EVENT_JOB_ERROR, job_id=job))
+
+    assert metrics.SCHEDULER_JOB_DURATION.count(job) == 2
+    assert metrics.SCHEDULER_JOB_RUNS.value(job, "ok") == 1
+    assert metrics.SCHEDULER_JOB_RUNS.value(job, "error") == 1
+
+
+def test_per_request_collection_cost_is_small():
+    # То, что middleware делает на каждый запрос: контекст счётчика БД + две записи
+    n = 20000
+    start = time.perf_counter()
+    for _ in range(n):
+        token, counter = metrics.begin_db_query_count()
+        metrics.end_db_query_count(token)
+        metrics.HTTP_REQUEST_DURATION.observe(0.012, "GET", "/bench", "200")
+        metrics.HTTP_REQUEST_DB_QUERIES.observe(counter[0], "/bench")
+    per_request = (time.perf_counter() - start) / n
+    assert per_request < 50e-6
+
+
+async def test_telegram_handler_latency_by_router():
+    from app.telegram.middlewares import HandlerMetricsMiddleware
+
+    async def guest_handler(event, data):
+        raise RuntimeError("boom")
+
+    middleware = HandlerMetricsMiddleware("callback_query")
+    data = {"handler": SimpleNamespace(callback=guest_handler)}
+    with pytest.raises(RuntimeError):
+        await middleware(guest_handler, object(), data)
+
+    assert metrics.TELEGRAM_HANDLER_DURATION.count("test_metrics", "callback_query") == 1
+    assert metrics.TELEGRAM_HANDLER_ERRORS.value("test_metrics", "callback_query") == 1
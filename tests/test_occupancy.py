@@ -0,0 +1,144 @@
+"""Тесты материализованной занятости house_day_occupancy."""
+from datetime import date, timedelta
+
+import pytest
+from sqlalchemy import delete, select
+
+from app.models import Booking, BookingStatus, House, HouseDayOccupancy
+from app.services.booking_service import BookingService
+from app.services.occupancy_service import OccupancyService
+
+D = date(2026, 11, 1)
+
+
+def d(n: int) -> date:
+    return D + timedelta(days=n)
+
+
+@pytest.fixture
+async def db(Session):
+    async with Session() as session:
+        session.add_all([House(id=1, name="H1", capacity=2), House(id=2, name="H2", capacity=2)])
+        await session.commit()
+        yield session
+
+
+def _booking(house_id=1, check_in=0, check_out=2, status=BookingStatus.CONFIRMED) -> Booking:
+    return Booking(
+        house_id=house_id, guest_name="G", guest_phone="+79990000000",
+        check_in=d(check_in), check_out=d(check_out), guests_count=1, status=status,
+    )
+
+
+async def _rows(db) -> set:
+    result = await db.execute(
+        select(HouseDayOccupancy.house_id, HouseDayOccupancy.day, HouseDayOccupancy.booking_id)
+    )
+    return {tuple(row) for row in result.all()}
+
+
+async def test_rows_follow_booking_writes(db):
+    booking = _booking(check_in=0, check_out=3)
+    db.add_all([booking, _booking(house_id=2, status=BookingStatus.CANCELLED)])
+    await db.commit()
+    # День выезда не занят, отменённая бронь строк не даёт
+    assert await _rows(db) == {(1, d(0), booking.id), (1, d(1), booking.id), (1, d(2), booking.id)}
+
+    booking.house_id = 2
+    booking.check_out = d(1)
+    await db.commit()
+    assert await _rows(db) == {(2, d(0), booking.id)}
+
+    booking.status = BookingStatus.CANCELLED
+    await db.commit()
+    assert await _rows(db) == set()
+
+    booking.status = BookingStatus.CONFIRMED
+    await db.commit()
+    await db.delete(booking)
+    await db.commit()
+    assert await _rows(db) == set()
+
+
+async def test_unrelated_edit_keeps_rows(db):
+    booking = _booking()
+    db.add(booking)
+    await db.commit()
+    before = await _rows(db)
+
+    booking.guest_name = "Other"
+    await db.commit()
+    assert await _rows(db) == before
+
+
+async def test_check_availability_uses_occupancy(db):
+    booking = _booking(check_in=2, check_out=5)
+    db.add(booking)
+    await db.commit()
+
+    assert await BookingService.check_availability(db, 1, d(0), d(2)) is True
+    assert await BookingService.check_availability(db, 1, d(4), d(6)) is False
+    assert await BookingService.check_availability(db, 1, d(4), d(6), exclude_booking_id=booking.id) is True
+    assert await BookingService.check_availability(db, 2, d(2), d(5)) is True
+    assert [h.id for h in await BookingService.get_available_houses(db, d(3), d(4))] == [2]
+
+    masks = await OccupancyService.availability(db, [1, 2], d(0), d(6))
+    assert masks == {1: [True, True, False, False, False, True], 2: [True] * 6}
+
+
+async def test_check_detects_drift_and_rebuild_fixes_it(db):
+    booking = _booking(check_in=0, check_out=2)
+    db.add(booking)
+    await db.commit()
+    assert (await OccupancyService.check(db))["ok"] is True
+
+    # Запись в обход ORM: строки не обновились
+    await db.execute(delete(HouseDayOccupancy).where(HouseDayOccupancy.day == d(1)))
+    await db.execute(
+        HouseDayOccupancy.__table__.insert().values(house_id=2, day=d(9), booking_id=999)
+    )
+    await db.commit()
+
+    report = await OccupancyService.check(db)
+    assert report["ok"] is False
+    assert report["missing"] == [(1, d(1), booking.id)]
+    assert report["extra"] == [(2, d(9), 999)]
+
+    assert await OccupancyService.rebuild(db) == 2
+    assert (await OccupancyService.check(db))["ok"] is True
+
+
+async def test_ensure_populated_after_create_all_on_existing_db(tmp_path):
+    """База до house_day_occupancy: create_all создаёт таблицу пустой, старт её заполняет."""
+    from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+
+    from app.database import Base
+
+    engine = create_async_engine(f"sqlite+aiosqlite:///{tmp_path / 'legacy.db'}")
+    legacy_tables = [t for name, t in Base.metadata.tables.items() if name != "house_day_occupancy"]
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all, tables=legacy_tables)
+    Session = async_sessionmaker(engine, expire_on_commit=False)
+    async with Session() as session:
+        session.add(House(id=1, name="H1", capacity=2))
+        await session.flush()
+        # Старая версия приложения: брони писались без строк занятости
+        await session.execute(Booking.__table__.insert().values(
+            id=1, house_id=1, guest_name="G", guest_phone="+79990000000",
+            check_in=d(0), check_out=d(2), guests_count=1, status=BookingStatus.CONFIRMED,
+        ))
+        await session.commit()
+
+    try:
+        async with engine.begin() as conn:
+            await conn.run_sync(Base.metadata.create_all)
+        async with Session() as session:
+            assert await BookingService.check_availability(session, 1, d(1), d(3)) is True
+
+            assert await OccupancyService.ensure_populated(session) == 2
+            assert await OccupancyService.first_conflict(session, 1, d(1), d(3)) == 1
+            assert (await OccupancyService.check(session))["ok"] is True
+            # Повторный старт ничего не пересчитывает
+            assert await OccupancyService.ensure_populated(session) == 0
+    finally:
+        await engine.dispose()
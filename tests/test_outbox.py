@@ -0,0 +1,172 @@
+"""Тесты outbox побочных эффектов броней."""
+from datetime import date, datetime, timedelta
+from unittest.mock import AsyncMock, patch
+
+import pytest
+from sqlalchemy import select
+
+from app.core.config import settings
+from app.models import Booking, BookingStatus, House, OutboxEvent, OutboxStatus
+from app.schemas.booking import BookingCreate
+from app.services.booking_service import BookingService
+from app.services.channel_push_queue import channel_push_queue
+from app.services.avito_api_service import AvitoAPIError, avito_api_service
+from app.services.outbox_service import (
+    KIND_AVITO_BLOCK,
+    KIND_AVITO_UNBLOCK,
+    OutboxService,
+    OutboxWorker,
+    PermanentOutboxError,
+    _booking_from_payload,
+)
+
+
+async def _create_booking(Session) -> int:
+    async with Session() as session:
+        house = House(name="H1", capacity=2)
+        session.add(house)
+        await session.commit()
+        booking = await BookingService.create_booking(
+            session,
+            BookingCreate(
+                house_id=house.id,
+                guest_name="Guest",
+                guest_phone="+79990000000",
+                check_in=date.today() + timedelta(days=10),
+                check_out=date.today() + timedelta(days=12),
+                guests_count=2,
+                total_price=1000,
+            ),
+        )
+        return booking.id
+
+
+async def _events(Session) -> list[OutboxEvent]:
+    async with Session() as session:
+        return (await session.execute(select(OutboxEvent).order_by(OutboxEvent.id))).scalars().all()
+
+
+@pytest.fixture(autouse=True)
+def _no_sheets(monkeypatch):
+    monkeypatch.setattr(BookingService, "_safe_background_sheets_sync", AsyncMock())
+
+
+async def test_side_effects_are_written_with_booking_not_called_inline(Session):
+    with patch("app.services.avito_api_service.avito_api_service") as avito:
+        booking_id = await _create_booking(Session)
+        async with Session() as session:
+            assert await BookingService.cancel_booking(session, booking_id) is True
+        avito.block_dates.assert_not_called()
+        avito.unblock_dates.assert_not_called()
+
+    events = await _events(Session)
+    assert [e.kind for e in events] == [KIND_AVITO_BLOCK, KIND_AVITO_UNBLOCK]
+    assert all(e.status == OutboxStatus.PENDING for e in events)
+    assert events[0].target_key == events[1].target_key
+
+
+async def test_worker_coalesces_events_of_one_target(Session):
+    booking_id = await _create_booking(Session)
+    async with Session() as session:
+        await BookingService.cancel_booking(session, booking_id)
+        # Повторная отмена не ставит событие второй раз
+        await BookingService.cancel_booking(session, booking_id)
+
+    calls = []
+
+    def record(kind):
+        async def handler(payload):
+            calls.append((kind, payload["booking_id"]))
+            return True
+        return handler
+
+    worker = OutboxWorker(
+        session_factory=Session,
+        handlers={KIND_AVITO_BLOCK: record("block"), KIND_AVITO_UNBLOCK: record("unblock")},
+    )
+    assert await worker.run_once() == 1
+    assert calls == [("unblock", booking_id)]
+
+    statuses = [e.status for e in await _events(Session)]
+    assert statuses == [OutboxStatus.SUPERSEDED, OutboxStatus.DONE]
+    assert await worker.run_once() == 0
+
+
+async def test_failed_event_is_retried_with_backoff_then_gives_up(Session, monkeypatch):
+    monkeypatch.setattr(settings, "outbox_max_attempts", 2)
+    await _create_booking(Session)
+
+    handler = AsyncMock(side_effect=RuntimeError("avito 503"))
+    worker = OutboxWorker(session_factory=Session, handlers={KIND_AVITO_BLOCK: handler})
+
+    assert await worker.run_once() == 1
+    [event] = await _events(Session)
+    assert event.status == OutboxStatus.PENDING
+    assert event.attempts == 1
+    assert event.next_attempt_at > datetime.utcnow()
+    assert "avito 503" in event.last_error
+
+    # Ещё не созрело — не берётся
+    assert await worker.run_once() == 0
+
+    async with Session() as session:
+        stored = await session.get(OutboxEvent, event.id)
+        stored.next_attempt_at = datetime.utcnow() - timedelta(seconds=1)
+        await session.commit()
+
+    assert await worker.run_once() == 1
+    [event] = await _events(Session)
+    assert event.status == OutboxStatus.FAILED
+    assert worker.stats()["failed_total"] == 1
+
+
+async def test_permanent_error_fails_without_retry(Session, monkeypatch):
+    monkeypatch.setattr(settings, "outbox_max_attempts", 5)
+    await _create_booking(Session)
+
+    handler = AsyncMock(side_effect=PermanentOutboxError("Avito rejected block (status 409)"))
+    worker = OutboxWorker(session_factory=Session, handlers={KIND_AVITO_BLOCK: handler})
+
+    assert await worker.run_once() == 1
+    [event] = await _events(Session)
+    assert event.status == OutboxStatus.FAILED
+    assert event.attempts == 1
+    assert "status 409" in event.last_error
+    assert worker.stats()["retried_total"] == 0
+
+
+@pytest.mark.parametrize("status, retryable", [(409, False), (403, False), (429, True), (503, True)])
+async def test_avito_block_separates_permanent_errors(Session, monkeypatch, status, retryable):
+    monkeypatch.setattr(settings, "avito_item_ids", "555:1")
+    monkeypatch.setattr(channel_push_queue, "invalidate", AsyncMock())
+    monkeypatch.setattr(
+        avito_api_service, "_request", AsyncMock(side_effect=AvitoAPIError(status, "{}"))
+    )
+    booking = _booking_from_payload({
+        "booking_id": 1, "house_id": 1, "guest_name": "G", "source": "direct",
+        "check_in": "2026-11-01", "check_out": "2026-11-03",
+    })
+
+    if retryable:
+        assert await BookingService._block_avito_dates(booking) is False
+    else:
+        with pytest.raises(PermanentOutboxError):
+            await BookingService._block_avito_dates(booking)
+
+
+async def test_enqueue_is_idempotent(Session):
+    async with Session() as session:
+        session.add(House(id=1, name="H", capacity=2))
+        booking = Booking(
+            house_id=1, guest_name="G", guest_phone="+79990000000",
+            check_in=date(2026, 11, 1), check_out=date(2026, 11, 3),
+            guests_count=1, status=BookingStatus.CONFIRMED,
+        )
+        session.add(booking)
+        await session.flush()
+        first = await OutboxService.enqueue_avito_unblock(session, booking)
+        second = await OutboxService.enqueue_avito_unblock(session, booking)
+        await session.commit()
+
+    assert first is second
+    assert len(await _events(Session)) == 1
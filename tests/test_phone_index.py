@@ -0,0 +1,80 @@
+"""Тесты индексного матчинга гость ↔ бронь по последним 10 цифрам телефона."""
+from datetime import date, timedelta
+from unittest.mock import AsyncMock, patch
+
+import pytest
+from sqlalchemy import event, select
+
+from app.models import Booking, BookingStatus, House, User, UserRole
+from app.services.notification_service import NotificationRule, NotificationService
+from app.services.telegram_dispatcher import telegram_dispatcher
+from app.telegram.handlers.guest import get_active_booking
+
+
+@pytest.fixture
+async def session(Session):
+    async with Session() as s:
+        house = House(name="H1", capacity=2)
+        s.add(house)
+        await s.flush()
+        today = date.today()
+        s.add_all([
+            User(telegram_id=100, role=UserRole.GUEST, name="Anna", phone="79991234567"),
+            User(telegram_id=200, role=UserRole.GUEST, name="Boris", phone="+7 999 000-00-01"),
+            Booking(
+                house_id=house.id, guest_name="Anna", guest_phone="8 (999) 123-45-67",
+                check_in=today + timedelta(days=3), check_out=today + timedelta(days=5),
+                guests_count=2, status=BookingStatus.CONFIRMED,
+            ),
+            # Телефон-«подстрока» другого номера: старый fallback матчил его ошибочно
+            Booking(
+                house_id=house.id, guest_name="X", guest_phone="999000",
+                check_in=today + timedelta(days=3), check_out=today + timedelta(days=4),
+                guests_count=1, status=BookingStatus.CONFIRMED,
+            ),
+        ])
+        await s.commit()
+        yield s
+
+
+def test_last10_is_filled_on_write():
+    booking = Booking(guest_phone="+7 (999) 123-45-67")
+    assert booking.guest_phone_last10 == "9991234567"
+    booking.guest_phone = ""
+    assert booking.guest_phone_last10 is None
+
+    user = User(phone="89991234567")
+    assert user.phone_last10 == "9991234567"
+
+
+async def test_get_active_booking_uses_indexed_equality(session, db_engine):
+    statements: list[str] = []
+
+    def _capture(conn, cursor, statement, *args):
+        statements.append(statement)
+
+    event.listen(db_engine.sync_engine, "before_cursor_execute", _capture)
+    booking = await get_active_booking(session, 100)
+    event.remove(db_engine.sync_engine, "before_cursor_execute", _capture)
+
+    assert booking.guest_name == "Anna"
+    assert "guest_phone_last10 = ?" in statements[-1]
+    assert await get_active_booking(session, 200) is None
+
+
+async def test_notify_guests_matches_only_exact_last10(session):
+    bookings = (await session.execute(select(Booking).order_by(Booking.id))).scalars().all()
+    rule = NotificationRule(
+        name="test",
+        reference_field="check_in",
+        days_offset=3,
+        recipient_type="guest",
+        message_func=lambda bs, user: f"hi {user.name}",
+    )
+
+    bot = AsyncMock()
+    with patch.object(telegram_dispatcher, "_bot", bot):
+        await NotificationService()._notify_guests(session, bookings, rule)
+
+    bot.send_message.assert_awaited_once()
+    assert bot.send_message.await_args.kwargs["chat_id"] == 100
@@ -0,0 +1,102 @@
+"""Тесты PricingService.get_price_range: сезонные цены, скидки и
+постоянное число запросов независимо от длины периода."""
+from datetime import date, timedelta
+
+from sqlalchemy import event
+
+from app.models import House, HouseDiscount, HousePrice
+from app.services.pricing_service import PricingService
+
+
+async def _seed(session) -> House:
+    house = House(name="H1", capacity=2, base_price=5000)
+    other = House(name="H2", capacity=2, base_price=9000)
+    session.add_all([house, other])
+    await session.flush()
+    session.add_all([
+        HousePrice(
+            house_id=house.id, label="Лето", price_per_night=7000,
+            date_from=date(2026, 7, 1), date_to=date(2026, 7, 10),
+        ),
+        HousePrice(
+            house_id=other.id, label="Чужая", price_per_night=1,
+            date_from=date(2026, 7, 1), date_to=date(2026, 7, 31),
+        ),
+        HouseDiscount(
+            house_id=house.id, label="Горящее", discount_percent=20,
+            date_from=date(2026, 7, 5), date_to=date(2026, 7, 5),
+        ),
+        HouseDiscount(
+            house_id=None, label="Глобальная", discount_percent=10,
+            date_from=date(2026, 7, 4), date_to=date(2026, 7, 6),
+        ),
+        HouseDiscount(
+            house_id=house.id, label="Выключена", discount_percent=50,
+            date_from=date(2026, 7, 1), date_to=date(2026, 7, 31), is_active=False,
+        ),
+    ])
+    await session.commit()
+    return house
+
+
+async def test_price_range_resolves_season_and_best_discount(Session):
+    async with Session() as session:
+        house = await _seed(session)
+        days = await PricingService.get_price_range(
+            session, house.id, date(2026, 6, 30), date(2026, 7, 12)
+        )
+
+    assert len(days) == 12
+    by_date = {d["date"]: d for d in days}
+    assert by_date[date(2026, 6, 30)]["price"] == 5000
+    assert by_date[date(2026, 6, 30)]["season_label"] is None
+    assert by_date[date(2026, 7, 1)]["price"] == 7000
+    assert by_date[date(2026, 7, 4)]["discount_percent"] == 10
+    assert by_date[date(2026, 7, 5)]["discount_percent"] == 20
+    assert by_date[date(2026, 7, 5)]["discount_label"] == "Горящее"
+    assert by_date[date(2026, 7, 5)]["final_price"] == 5600
+    assert by_date[date(2026, 7, 11)]["price"] == 5000
+
+
+async def test_price_range_matches_single_day_lookup(Session):
+    async with Session() as session:
+        house = await _seed(session)
+        start = date(2026, 6, 28)
+        days = await PricingService.get_price_range(
+            session, house.id, start, start + timedelta(days=20)
+        )
+        for info in days:
+            single = await PricingService.get_price_for_date(session, house.id, info["date"])
+            assert single == info
+
+
+async def test_price_range_query_count_is_constant(db_engine, Session):
+    statements: list[str] = []
+
+    def _count(conn, cursor, statement, *args):
+        if statement.lstrip().upper().startswith("SELECT"):
+            statements.append(statement)
+
+    event.listen(db_engine.sync_engine, "before_cursor_execute", _count)
+    async with Session() as session:
+        house = await _seed(session)
+        session.expunge_all()
+        await PricingService.get_price_range(
+            session, house.id, date(2026, 1, 1), date(2027, 1, 1)
+        )
+    assert len(statements) <= 3
+
+
+async def test_stay_total_uses_range(Session):
+    async with Session() as session:
+        house = await _seed(session)
+        stay = await PricingService.calculate_stay_total(
+            session, house.id, date(2026, 7, 4), date(2026, 7, 6)
+        )
+    # 7000 * 0.9 + 7000 * 0.8
+    assert stay == {
+        "total": 6300 + 5600,
+        "total_without_discount": 14000,
+        "nights": 2,
+        "avg_per_night": (6300 + 5600) // 2,
+    }
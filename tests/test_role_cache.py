@@ -0,0 +1,86 @@
+"""Тесты кеша ролей Telegram-пользователей."""
+import pytest
+from sqlalchemy import event
+
+from app.models import User, UserRole
+from app.telegram.auth import admin
+
+
+@pytest.fixture
+async def Session(Session, monkeypatch):
+    monkeypatch.setattr(admin, "AsyncSessionLocal", Session)
+    await admin.refresh_users_cache()
+    return Session
+
+
+async def test_env_admins_parsed_once(monkeypatch):
+    monkeypatch.setattr(admin, "_env_admins", None)
+    monkeypatch.setenv("ADMIN_TELEGRAM_IDS", "11, 12")
+    ids = admin.reload_env_admins()
+    assert {11, 12} <= ids
+
+    monkeypatch.setenv("ADMIN_TELEGRAM_IDS", "13")
+    assert admin.is_admin(11) and not admin.is_admin(13)
+    assert admin.get_env_admins() is ids
+
+    admin.reload_env_admins()
+    assert admin.is_admin(13) and not admin.is_admin(11)
+
+
+async def test_writes_update_cache_without_full_reload(db_engine, Session):
+    selects = []
+    event.listen(
+        db_engine.sync_engine, "before_cursor_execute",
+        lambda conn, cursor, statement, *a: selects.append(statement)
+        if statement.startswith("SELECT users.telegram_id, users.role") else None,
+    )
+
+    assert await admin.add_user(501, UserRole.CLEANER, "Анна") is True
+    assert await admin.add_user(502, UserRole.GUEST, "Гость") is True
+    assert admin.is_cleaner(501) and admin.is_guest(502)
+    assert admin.get_cache_version() == 2
+
+    assert await admin.remove_guest_user(501) is False
+    assert await admin.remove_user(501) is True
+    assert not admin.is_cleaner(501)
+    assert await admin.remove_guest_user(502) is True
+    assert not admin.is_guest(502)
+
+    assert admin.get_cache_version() == 4
+    assert selects == []
+    assert await admin.sync_users_cache() is False
+
+
+async def test_other_process_write_is_detected(Session):
+    await admin.add_user(601, UserRole.ADMIN, "Админ")
+
+    # Другой процесс: пишет в users и поднимает версию в той же транзакции
+    async with Session() as session:
+        session.add(User(telegram_id=602, role=UserRole.CLEANER, name="Б"))
+        await admin._bump_cache_version(session)
+        await session.commit()
+
+    assert not admin.is_cleaner(602)
+    # Собственная запись после чужой не маскирует отставание кеша
+    await admin.add_user(603, UserRole.GUEST, "Г")
+    assert admin.get_cache_version() == 1
+
+    assert await admin.sync_users_cache() is True
+    assert admin.is_cleaner(602) and admin.is_admin(601) and admin.is_guest(603)
+    assert admin.get_cache_version() == 3
+    assert await admin.sync_users_cache() is False
+
+
+async def test_writes_use_update_session(db_engine, Session):
+    checkouts = []
+    event.listen(db_engine.sync_engine.pool, "checkout", lambda *a: checkouts.append(1))
+
+    async with Session() as session:
+        assert await admin.add_user(701, UserRole.GUEST, "Гость", session=session) is True
+        assert [u.telegram_id for u in await admin.get_all_users(session)] == [701]
+        assert await admin.get_user_name(701, session) == "Гость"
+        assert await admin.remove_guest_user(701, session=session) is True
+
+    # Одно соединение на всё — сессия апдейта, своих не открывалось
+    assert len(checkouts) == 1
+    assert not admin.is_guest(701)
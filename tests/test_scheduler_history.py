@@ -0,0 +1,112 @@
+"""Тесты истории запусков и политик задач планировщика."""
+import asyncio
+from datetime import datetime, timedelta
+from types import SimpleNamespace
+
+from apscheduler.events import (
+    EVENT_JOB_ERROR,
+    EVENT_JOB_EXECUTED,
+    EVENT_JOB_MAX_INSTANCES,
+    EVENT_JOB_SUBMITTED,
+)
+from apscheduler.triggers.cron import CronTrigger
+from apscheduler.triggers.interval import IntervalTrigger
+from sqlalchemy import select
+
+from app.core.config import settings
+from app.models import JobRunOutcome, SchedulerJobRun
+from app.services.scheduler_history import SchedulerHistoryRecorder, SchedulerHistoryService
+from app.services.scheduler_service import SchedulerService
+
+
+async def _noop():
+    pass
+
+
+async def test_runs_and_overlap_skips_are_persisted(Session):
+    service = SchedulerService(history=SchedulerHistoryRecorder(session_factory=Session))
+    job = "avito_sync"
+
+    service._on_job_event(SimpleNamespace(code=EVENT_JOB_SUBMITTED, job_id=job))
+    # Следующий запуск пришёл, пока первый ещё идёт
+    service._on_job_event(
+        SimpleNamespace(code=EVENT_JOB_MAX_INSTANCES, job_id=job, scheduled_run_times=[None])
+    )
+    service._on_job_event(SimpleNamespace(code=EVENT_JOB_EXECUTED, job_id=job))
+    service._on_job_event(SimpleNamespace(code=EVENT_JOB_SUBMITTED, job_id=job))
+    service._on_job_event(
+        SimpleNamespace(code=EVENT_JOB_ERROR, job_id=job, exception=RuntimeError("Avito 503"))
+    )
+    await service.history.stop()
+
+    async with Session() as session:
+        rows = (await session.execute(select(SchedulerJobRun).order_by(SchedulerJobRun.id))).scalars().all()
+        summary = await SchedulerHistoryService.summary(session, datetime.utcnow() - timedelta(hours=1))
+        last = await SchedulerHistoryService.last_runs(session)
+
+    assert [row.outcome for row in rows] == [
+        JobRunOutcome.SKIPPED, JobRunOutcome.OK, JobRunOutcome.ERROR,
+    ]
+    assert rows[1].duration_ms is not None and rows[1].finished_at >= rows[1].started_at
+    assert "Avito 503" in rows[2].error
+    assert summary == [
+        {"job_id": job, "runs": 3, "errors": 1, "skipped": 1, "missed": 0,
+         "avg_ms": summary[0]["avg_ms"], "max_ms": summary[0]["max_ms"]}
+    ]
+    assert last[job].outcome == JobRunOutcome.ERROR
+
+
+def test_job_policies_defaults_overrides_and_jitter(monkeypatch):
+    monkeypatch.setattr(settings, "scheduler_cron_jitter_seconds", 45)
+    monkeypatch.setattr(settings, "scheduler_job_policies", {
+        "avito_sync": {"max_instances": 2, "misfire_grace_time": 60},
+        "db_backup": {"jitter": 0, "catch_up": False},
+    })
+    service = SchedulerService()
+    service._add_job(_noop, IntervalTrigger(minutes=10), id="avito_sync", name="Avito")
+    service._add_job(_noop, CronTrigger(hour=9, minute=0), id="cleaner_advance_notify", name="9am")
+    service._add_job(_noop, CronTrigger(hour=3, minute=0), id="db_backup", name="Backup")
+    jobs = {job.id: job for job in service.get_jobs()}
+
+    assert jobs["avito_sync"].max_instances == 2
+    assert jobs["avito_sync"].misfire_grace_time == 60
+    assert jobs["avito_sync"].trigger.jitter is None
+    assert jobs["cleaner_advance_notify"].max_instances == 1
+    assert jobs["cleaner_advance_notify"].coalesce is True
+    assert jobs["cleaner_advance_notify"].trigger.jitter == 45
+    assert jobs["db_backup"].trigger.jitter is None
+    assert service._catch_up == {
+        "avito_sync": False, "cleaner_advance_notify": True, "db_backup": False,
+    }
+
+
+async def test_cron_runs_missed_during_restart_are_caught_up(Session, monkeypatch):
+    monkeypatch.setattr(settings, "scheduler_catchup_minutes", 180)
+    service = SchedulerService(history=SchedulerHistoryRecorder(session_factory=Session))
+    now = datetime.now(service.scheduler.timezone)
+    fire = (now - timedelta(hours=1)).replace(minute=0, second=0, microsecond=0)
+    for job_id in ("missed_job", "done_job", "new_job"):
+        service._add_job(
+            _noop, CronTrigger(hour=fire.hour, minute=0), id=job_id, name=job_id
+        )
+
+    async with Session() as session:
+        session.add_all([
+            # Прошлый запуск — вчера: сегодняшний пропущен во время простоя
+            SchedulerJobRun(job_id="missed_job", outcome=JobRunOutcome.OK,
+                            started_at=datetime.utcnow() - timedelta(days=1, hours=1)),
+            # Сегодняшний уже выполнен до рестарта
+            SchedulerJobRun(job_id="done_job", outcome=JobRunOutcome.OK,
+                            started_at=datetime.utcnow() - timedelta(minutes=30)),
+        ])
+        await session.commit()
+
+    service.scheduler.start(paused=True)
+    try:
+        assert await service.catch_up_missed() == ["missed_job"]
+        jobs = {job.id: job for job in service.get_jobs()}
+        assert jobs["missed_job"].next_run_time <= datetime.now(service.scheduler.timezone)
+        assert jobs["done_job"].next_run_time > now
+    finally:
+        service.scheduler.shutdown(wait=False)
+        await asyncio.sleep(0)
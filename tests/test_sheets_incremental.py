@@ -0,0 +1,134 @@
+"""Тесты инкрементальной синхронизации листа «Все брони».
+
+Google API не трогаем: подменяем worksheet на MagicMock и проверяем,
+какие строки уходят в batch_update.
+"""
+from datetime import date, datetime
+from decimal import Decimal
+from types import SimpleNamespace
+from unittest.mock import MagicMock
+
+import pytest
+
+from app.models import BookingSource, BookingStatus
+from app.services.sheets_service import GoogleSheetsService
+
+
+def _booking(booking_id: int, check_in: date, updated_at: datetime, **kw):
+    data = dict(
+        id=booking_id,
+        check_in=check_in,
+        check_out=date(check_in.year, check_in.month, check_in.day + 2),
+        guest_name=f"Guest {booking_id}",
+        guest_phone="+79990000000",
+        house=SimpleNamespace(name="Домик"),
+        guests_count=2,
+        total_price=Decimal("10000"),
+        advance_amount=Decimal("0"),
+        commission=Decimal("0"),
+        prepayment_owner=Decimal("0"),
+        status=BookingStatus.CONFIRMED,
+        source=BookingSource.DIRECT,
+        created_at=datetime(2026, 1, 1, 12, 0),
+        updated_at=updated_at,
+    )
+    data.update(kw)
+    return SimpleNamespace(**data)
+
+
+@pytest.fixture
+def service():
+    svc = GoogleSheetsService()
+    svc.client = MagicMock()
+    svc.spreadsheet = MagicMock()
+    worksheet = MagicMock()
+    worksheet.row_count = 1000
+    svc.spreadsheet.worksheet.return_value = worksheet
+    return svc, worksheet
+
+
+def _sent_rows(worksheet) -> dict[str, list]:
+    ranges = worksheet.batch_update.call_args.args[0]
+    return {r["range"]: r["values"][0] for r in ranges}
+
+
+def test_full_sync_builds_sorted_row_index(service):
+    svc, ws = service
+    b1 = _booking(1, date(2026, 7, 10), datetime(2026, 1, 1))
+    b2 = _booking(2, date(2026, 7, 1), datetime(2026, 1, 2))
+
+    svc.sync_bookings_to_sheet([b1, b2])
+
+    ws.clear.assert_called_once()
+    data = ws.batch_update.call_args.args[0][0]["values"]
+    assert [row[0] for row in data[1:]] == [2, 1]
+    assert svc._row_index == {2: 2, 1: 3}
+    assert svc._high_water == datetime(2026, 1, 2)
+    # Лист уже существовал — форматирование не применяется
+    svc.spreadsheet.batch_update.assert_not_called()
+
+
+def test_incremental_sends_only_changed_rows(service):
+    svc, ws = service
+    b1 = _booking(1, date(2026, 7, 1), datetime(2026, 1, 1))
+    b2 = _booking(2, date(2026, 7, 5), datetime(2026, 1, 1))
+    svc.sync_bookings_to_sheet([b1, b2])
+    ws.reset_mock()
+
+    changed = _booking(2, date(2026, 7, 5), datetime(2026, 1, 3), status=BookingStatus.PAID)
+    new = _booking(3, date(2026, 6, 1), datetime(2026, 1, 3))
+    # b1 прочитан повторно из-за запаса по updated_at, но не изменился
+    sent = svc.sync_bookings_incremental([b1, changed, new], {1, 2, 3})
+
+    assert sent == 2
+    ws.batch_update.assert_called_once()
+    rows = _sent_rows(ws)
+    assert set(rows) == {"A3:N3", "A4:N4"}
+    assert rows["A3:N3"][11] == "Оплата внесена"
+    assert rows["A4:N4"][0] == 3
+    assert rows["A4:N4"][9] == "=H4-I4-K4 "
+    ws.clear.assert_not_called()
+    assert svc._high_water == datetime(2026, 1, 3)
+
+
+def test_incremental_noop_makes_no_api_call(service):
+    svc, ws = service
+    b1 = _booking(1, date(2026, 7, 1), datetime(2026, 1, 1))
+    svc.sync_bookings_to_sheet([b1])
+    ws.reset_mock()
+
+    assert svc.sync_bookings_incremental([b1], {1}) == 0
+    ws.batch_update.assert_not_called()
+
+
+def test_deleted_rows_are_blanked_and_reused(service):
+    svc, ws = service
+    b1 = _booking(1, date(2026, 7, 1), datetime(2026, 1, 1))
+    b2 = _booking(2, date(2026, 7, 5), datetime(2026, 1, 1))
+    svc.sync_bookings_to_sheet([b1, b2])
+    ws.reset_mock()
+
+    svc.sync_bookings_incremental([], {2})
+    rows = _sent_rows(ws)
+    assert rows == {"A2:N2": [""] * 14}
+    assert 1 not in svc._row_index
+    ws.reset_mock()
+
+    new = _booking(5, date(2026, 8, 1), datetime(2026, 1, 5))
+    svc.sync_bookings_incremental([new], {2, 5})
+    rows = _sent_rows(ws)
+    assert list(rows) == ["A2:N2"]
+    assert svc._row_index[5] == 2
+
+
+def test_failed_write_resets_index(service):
+    svc, ws = service
+    b1 = _booking(1, date(2026, 7, 1), datetime(2026, 1, 1))
+    svc.sync_bookings_to_sheet([b1])
+    ws.batch_update.side_effect = RuntimeError("quota")
+
+    with pytest.raises(RuntimeError):
+        svc.sync_bookings_incremental(
+            [_booking(1, date(2026, 7, 2), datetime(2026, 1, 2))], {1}
+        )
+    assert not svc.has_row_index
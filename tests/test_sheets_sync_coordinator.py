@@ -0,0 +1,105 @@
+"""Тесты SheetsSyncCoordinator: склейка, один синк в полёте, хвостовой прогон."""
+import asyncio
+
+from app.services.sheets_sync_coordinator import SheetsSyncCoordinator
+
+
+class _FakeSync:
+    def __init__(self, duration: float = 0.0):
+        self.duration = duration
+        self.calls: list[bool] = []
+        self.full_calls: list[bool] = []
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self.started = asyncio.Event()
+
+    async def __call__(self, force: bool, full: bool) -> bool:
+        self.calls.append(force)
+        self.full_calls.append(full)
+        self.in_flight += 1
+        self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        self.started.set()
+        try:
+            await asyncio.sleep(self.duration)
+        finally:
+            self.in_flight -= 1
+        return True
+
+
+async def test_burst_is_coalesced_into_one_run():
+    sync = _FakeSync()
+    coordinator = SheetsSyncCoordinator(sync_func=sync, debounce_seconds=0.01)
+
+    for _ in range(10):
+        coordinator.request_sync("test")
+    assert coordinator.queue_depth == 10
+
+    await coordinator.drain()
+    assert sync.calls == [True]
+    assert coordinator.queue_depth == 0
+    assert coordinator.stats()["coalescing_ratio"] == 10.0
+
+
+async def test_changes_during_sync_trigger_trailing_run():
+    sync = _FakeSync(duration=0.05)
+    coordinator = SheetsSyncCoordinator(sync_func=sync, debounce_seconds=0.01)
+
+    coordinator.request_sync("first")
+    await sync.started.wait()
+    # Синк в полёте — новые уведомления не запускают параллельный синк
+    coordinator.request_sync("mid-1")
+    coordinator.request_sync("mid-2")
+
+    await coordinator.drain()
+    assert len(sync.calls) == 2
+    assert sync.max_in_flight == 1
+    assert coordinator.runs_total == 2
+
+
+async def test_force_flag_is_merged():
+    sync = _FakeSync()
+    coordinator = SheetsSyncCoordinator(sync_func=sync, debounce_seconds=0.01)
+
+    coordinator.request_sync("ttl-only", force=False)
+    await coordinator.drain()
+    coordinator.request_sync("ttl-only", force=False)
+    coordinator.request_sync("change", force=True)
+    await coordinator.drain()
+
+    assert sync.calls == [False, True]
+
+
+async def test_full_flag_is_merged_and_reset():
+    sync = _FakeSync()
+    coordinator = SheetsSyncCoordinator(sync_func=sync, debounce_seconds=0.01)
+
+    coordinator.request_sync("booking_change")
+    assert await coordinator.sync_now("manual", full=True) is True
+    coordinator.request_sync("booking_change")
+    await coordinator.drain()
+
+    assert sync.full_calls == [True, False]
+
+
+async def test_sync_now_waits_for_covering_run():
+    sync = _FakeSync(duration=0.01)
+    coordinator = SheetsSyncCoordinator(sync_func=sync, debounce_seconds=0.01)
+
+    results = await asyncio.gather(
+        coordinator.sync_now("a"), coordinator.sync_now("b")
+    )
+    assert results == [True, True]
+    assert len(sync.calls) == 1
+
+
+async def test_failed_run_does_not_stop_coordinator():
+    calls = []
+
+    async def failing(force: bool, full: bool) -> bool:
+        calls.append(force)
+        raise RuntimeError("boom")
+
+    coordinator = SheetsSyncCoordinator(sync_func=failing, debounce_seconds=0.01)
+    assert await coordinator.sync_now("a") is False
+    assert await coordinator.sync_now("b") is False
+    assert coordinator.failures_total == 2
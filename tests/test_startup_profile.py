@@ -0,0 +1,86 @@
+"""Тесты профиля старта и ленивых импортов интеграций."""
+import os
+import subprocess
+import sys
+from pathlib import Path
+
+import pytest
+
+from app.core import metrics
+from app.core.startup import StartupProfile
+
+
+class Clock:
+    def __init__(self):
+        self.now = 100.0
+
+    def __call__(self):
+        return self.now
+
+
+async def test_phases_are_recorded_and_optional_failures_logged():
+    clock = Clock()
+    profile = StartupProfile(clock=clock)
+
+    async def load():
+        clock.now += 0.25
+        return 7
+
+    async def broken():
+        clock.now += 0.5
+        raise RuntimeError("drive unavailable")
+
+    assert await profile.run("state_store", load()) == 7
+    assert await profile.run("restore", broken(), required=False) is None
+    with pytest.raises(RuntimeError):
+        await profile.run("init_db", broken())
+    profile.mark("ready")
+
+    assert profile.phases == {"state_store": 0.25, "restore": 0.5, "init_db": 0.5, "ready": 1.25}
+    assert profile.summary() == "state_store=250ms, restore=500ms, init_db=500ms, ready=1250ms"
+    assert metrics.STARTUP_PHASE.value("ready") == 1.25
+
+
+async def test_first_update_is_recorded_once():
+    clock = Clock()
+    profile = StartupProfile(clock=clock)
+    handled = []
+
+    async def handler(event, data):
+        clock.now += 0.1
+        handled.append(event)
+        return "ok"
+
+    clock.now += 0.4
+    assert await profile.first_update_middleware(handler, "u1", {}) == "ok"
+    assert await profile.first_update_middleware(handler, "u2", {}) == "ok"
+    assert handled == ["u1", "u2"]
+    assert profile.phases["first_update"] == pytest.approx(0.5)
+
+
+def test_heavy_integrations_are_not_imported_at_startup():
+    heavy = [
+        "gspread",
+        "googleapiclient",
+        "google.oauth2",
+        "requests",
+        "app.services.avito_api_service",
+        "app.services.yandex_travel_api_service",
+    ]
+    code = (
+        "import sys, app.main; "
+        f"print('loaded:' + ','.join(m for m in {heavy!r} if m in sys.modules))"
+    )
+    env = {**os.environ, "DATABASE_URL": "sqlite+aiosqlite:///:memory:"}
+    result = subprocess.run(
+        [sys.executable, "-c", code],
+        cwd=Path(__file__).resolve().parent.parent,
+        env=env,
+        capture_output=True,
+        text=True,
+        timeout=120,
+    )
+    assert result.returncode == 0, result.stderr
+    # Логи приложения тоже пишутся в stdout — берём только строку-маркер
+    loaded = [line for line in result.stdout.splitlines() if line.startswith("loaded:")]
+    assert loaded == ["loaded:"]
@@ -0,0 +1,112 @@
+"""Тесты хранилища состояния диалогов бота."""
+import dataclasses
+from datetime import date
+from decimal import Decimal
+
+from aiogram.fsm.state import State, StatesGroup
+from aiogram.fsm.storage.base import StorageKey
+from sqlalchemy import select
+
+from app.models import TelegramState
+from app.telegram.state.availability import AvailabilityState
+from app.telegram.state.store import (
+    MemoryStateStore,
+    SqliteStateStore,
+    StateDict,
+    StateStoreStorage,
+)
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1_800_000_000.0
+
+    def __call__(self):
+        return self.now
+
+
+class EditStates(StatesGroup):
+    editing_price = State()
+
+
+def _availability(store) -> StateDict:
+    return StateDict(
+        store,
+        "availability",
+        encode=dataclasses.asdict,
+        decode=lambda data: AvailabilityState(**data),
+    )
+
+
+def test_ttl_and_size_cap_evict_with_metrics():
+    clock = Clock()
+    store = MemoryStateStore(ttl_seconds=60, max_entries=2, clock=clock)
+    auth = StateDict(store, "guest_auth")
+
+    auth[1] = True
+    auth[2] = True
+    assert auth.get(1) is True  # 1 теперь используется позже, чем 2
+    auth[3] = True
+    assert 2 not in auth and sorted(auth) == [1, 3]
+
+    clock.now += 61
+    assert auth.get(1) is None
+    assert len(auth) == 0
+
+    stats = store.stats()
+    assert stats["evicted_size"] == 1
+    assert stats["evicted_expired"] == 1
+    assert stats["hits"] == 1 and stats["misses"] >= 2
+
+
+async def test_writes_are_batched_and_survive_restart(Session):
+    clock = Clock()
+    store = SqliteStateStore(session_factory=Session, ttl_seconds=3600, clock=clock)
+    states = _availability(store)
+    states[10] = AvailabilityState(check_in=date(2026, 7, 1))
+    state = states[10]
+    state.check_out = date(2026, 7, 3)
+    states[10] = state
+    states[11] = AvailabilityState()
+    del states[11]
+
+    # До flush в БД ничего нет, затем — одна актуальная строка
+    async with Session() as session:
+        assert (await session.execute(select(TelegramState))).scalars().all() == []
+    assert store.stats()["pending_writes"] == 2
+    assert await store.flush() == 2
+    assert await store.flush() == 0
+
+    restarted = SqliteStateStore(session_factory=Session, ttl_seconds=3600, clock=clock)
+    restored = _availability(restarted)
+    assert await restarted.load() == 1
+    assert restored[10] == AvailabilityState(check_in=date(2026, 7, 1), check_out=date(2026, 7, 3))
+    assert 11 not in restored
+
+    # Просроченные записи не поднимаются и вычищаются из таблицы
+    clock.now += 3601
+    late = SqliteStateStore(session_factory=Session, clock=clock)
+    assert await late.load() == 0
+    assert await late.purge_expired() == 1
+
+
+async def test_fsm_storage_round_trip(Session):
+    store = SqliteStateStore(session_factory=Session, clock=Clock())
+    storage = StateStoreStorage(store)
+    key = StorageKey(bot_id=1, chat_id=5, user_id=5)
+
+    await storage.set_state(key, EditStates.editing_price)
+    await storage.set_data(key, {"booking_id": 7, "new_check_in": date(2026, 8, 1), "price": Decimal("99.50")})
+    await storage.close()
+
+    restored = StateStoreStorage(SqliteStateStore(session_factory=Session, clock=Clock()))
+    await restored.store.load()
+    assert await restored.get_state(key) == EditStates.editing_price.state
+    assert await restored.get_data(key) == {
+        "booking_id": 7, "new_check_in": date(2026, 8, 1), "price": Decimal("99.50"),
+    }
+
+    await restored.set_state(key, None)
+    await restored.set_data(key, {})
+    assert await restored.get_state(key) is None
+    assert await restored.get_data(key) == {}
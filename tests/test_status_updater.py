@@ -0,0 +1,80 @@
+"""Тесты set-based обновления статусов броней."""
+from datetime import date, timedelta
+
+import pytest
+from sqlalchemy import event, select
+
+from app.jobs.status_updater_job import StatusChange, apply_status_transitions
+from app.models import Booking, BookingStatus, House, HouseDayOccupancy
+
+TODAY = date(2026, 11, 10)
+
+
+def d(n: int) -> date:
+    return TODAY + timedelta(days=n)
+
+
+@pytest.fixture
+async def Session(Session):
+    async with Session() as session:
+        session.add(House(id=1, name="H1", capacity=2))
+        await session.commit()
+    return Session
+
+
+def _booking(booking_id, status, check_in, check_out) -> Booking:
+    return Booking(
+        id=booking_id, house_id=1, guest_name="G", guest_phone="+79990000000",
+        check_in=d(check_in), check_out=d(check_out), guests_count=1, status=status,
+    )
+
+
+async def test_transitions_are_set_based_and_match_rules(db_engine, Session):
+    async with Session() as session:
+        session.add_all([
+            _booking(1, BookingStatus.CONFIRMED, 0, 2),     # день заезда
+            _booking(2, BookingStatus.PAID, -1, 2),         # уже живёт
+            _booking(3, BookingStatus.CHECKING_IN, -1, 1),  # прошла ночь после заезда
+            _booking(4, BookingStatus.CHECKED_IN, -3, 0),   # день выезда
+            _booking(5, BookingStatus.NEW, 5, 7),           # будущая — без изменений
+            _booking(6, BookingStatus.CHECKING_IN, 0, 1),   # заезд сегодня — ждёт ночь
+            _booking(7, BookingStatus.CANCELLED, 0, 2),
+            _booking(8, BookingStatus.COMPLETED, -30, -28),
+            # Один прогон — не более одного перехода (как было при обходе по одной)
+            _booking(9, BookingStatus.CONFIRMED, -5, -2),
+        ])
+        await session.commit()
+        occupancy_before = set((await session.execute(select(HouseDayOccupancy.__table__))).all())
+
+    statements = []
+
+    def listener(conn, cursor, statement, *a):
+        statements.append(statement.split()[0])
+
+    event.listen(db_engine.sync_engine, "before_cursor_execute", listener)
+    async with Session() as session:
+        async with session.begin():
+            changes = await apply_status_transitions(session, TODAY)
+    event.remove(db_engine.sync_engine, "before_cursor_execute", listener)
+
+    assert statements == ["UPDATE", "UPDATE", "UPDATE"]
+    assert sorted(changes, key=lambda c: c.booking_id) == [
+        StatusChange(1, 1, d(0), d(2), BookingStatus.CHECKING_IN),
+        StatusChange(2, 1, d(-1), d(2), BookingStatus.CHECKED_IN),
+        StatusChange(3, 1, d(-1), d(1), BookingStatus.CHECKED_IN),
+        StatusChange(4, 1, d(-3), d(0), BookingStatus.COMPLETED),
+    ]
+
+    async with Session() as session:
+        statuses = dict((await session.execute(select(Booking.id, Booking.status))).all())
+        occupancy_after = set((await session.execute(select(HouseDayOccupancy.__table__))).all())
+    assert statuses[5] == BookingStatus.NEW
+    assert statuses[6] == BookingStatus.CHECKING_IN
+    assert statuses[7] == BookingStatus.CANCELLED
+    assert statuses[9] == BookingStatus.CONFIRMED
+    assert occupancy_after == occupancy_before
+
+    # Повторный прогон в тот же день ничего не меняет
+    async with Session() as session:
+        async with session.begin():
+            assert await apply_status_transitions(session, TODAY) == []
@@ -0,0 +1,130 @@
+"""Тесты очереди исходящих сообщений Telegram."""
+import asyncio
+import time
+from unittest.mock import AsyncMock, MagicMock, patch
+
+from aiogram.exceptions import TelegramRetryAfter
+
+from app.services.notification_service import send_safe
+from app.services.telegram_dispatcher import Priority, TelegramDispatcher, telegram_dispatcher
+
+
+def _dispatcher(bot, **kwargs):
+    params = dict(global_rate=1000, chat_rate=1000, group_rate_per_minute=60000, concurrency=4)
+    params.update(kwargs)
+    return TelegramDispatcher(bot=bot, **params)
+
+
+async def test_high_priority_overtakes_bulk():
+    sent: list[str] = []
+    bot = AsyncMock()
+    bot.send_message.side_effect = lambda **kw: sent.append(kw["text"])
+    dispatcher = _dispatcher(bot, concurrency=1)
+
+    # Очередь наполняется до первого переключения на воркер
+    futures = [dispatcher.submit(i, f"bulk-{i}", priority=Priority.BULK) for i in range(1, 4)]
+    futures.append(dispatcher.submit(99, "alert", priority=Priority.HIGH))
+    assert all(await asyncio.gather(*futures))
+    await dispatcher.close()
+
+    assert sent[0] == "alert"
+    assert dispatcher.stats()["sent_total"] == 4
+
+
+async def test_per_chat_budget_spaces_messages():
+    stamps: list[float] = []
+    bot = AsyncMock()
+    bot.send_message.side_effect = lambda **kw: stamps.append(time.monotonic())
+    dispatcher = _dispatcher(bot, chat_rate=20)  # не чаще раза в 50 мс
+
+    assert await dispatcher.send_many([7, 7, 7], "hi") == 3
+    await dispatcher.close()
+
+    gaps = [b - a for a, b in zip(stamps, stamps[1:])]
+    assert all(gap >= 0.045 for gap in gaps)
+
+
+async def test_retry_after_pauses_and_retries():
+    bot = AsyncMock()
+    bot.send_message.side_effect = [
+        TelegramRetryAfter(method=MagicMock(), message="flood", retry_after=0),
+        None,
+    ]
+    dispatcher = _dispatcher(bot)
+
+    assert await dispatcher.send(5, "hi") is True
+    await dispatcher.close()
+
+    assert bot.send_message.await_count == 2
+    stats = dispatcher.stats()
+    assert stats["retry_after_total"] == 1
+    assert stats["sent_total"] == 1
+    assert stats["latency_p95_ms"] is not None
+
+
+async def test_failure_resolves_false_and_worker_survives():
+    bot = AsyncMock()
+    bot.send_message.side_effect = [RuntimeError("chat not found"), None]
+    dispatcher = _dispatcher(bot, concurrency=1)
+
+    assert await dispatcher.send(1, "a") is False
+    assert await dispatcher.send(2, "b") is True
+    await dispatcher.close()
+    assert dispatcher.stats()["failed_total"] == 1
+
+
+async def test_send_safe_routes_shared_bot_through_dispatcher():
+    bot = AsyncMock()
+    with patch.object(telegram_dispatcher, "_bot", bot):
+        assert await send_safe(None, 42, "hi", priority=Priority.HIGH)
+    bot.send_message.assert_awaited_once()
+
+    # Отдельный экземпляр бота отправляет напрямую
+    own_bot = AsyncMock()
+    assert await send_safe(own_bot, 42, "hi")
+    own_bot.send_message.assert_awaited_once()
+
+
+async def test_rate_limited_chat_does_not_hold_workers():
+    sent: list[tuple[int, str, float]] = []
+    bot = AsyncMock()
+    bot.send_message.side_effect = lambda **kw: sent.append(
+        (kw["chat_id"], kw["text"], time.monotonic())
+    )
+    # Группа админов: не чаще раза в 200 мс
+    dispatcher = _dispatcher(bot, group_rate_per_minute=300, concurrency=2)
+
+    started = time.monotonic()
+    backlog = [dispatcher.submit(-100, f"digest-{i}", priority=Priority.BULK) for i in range(4)]
+    await asyncio.sleep(0.05)  # первое ушло, остальные ждут бюджет группы
+    assert await dispatcher.send(7, "sla", priority=Priority.HIGH) is True
+    assert await dispatcher.send(8, "reply") is True
+    assert time.monotonic() - started < 0.15
+
+    assert all(await asyncio.gather(*backlog))
+    await dispatcher.drain()
+    await dispatcher.close()
+
+    group = [(text, at) for chat_id, text, at in sent if chat_id == -100]
+    assert [text for text, _ in group] == [f"digest-{i}" for i in range(4)]
+    gaps = [b - a for (_, a), (_, b) in zip(group, group[1:])]
+    assert all(gap >= 0.19 for gap in gaps)
+    assert dispatcher.stats()["queue_depth"] == 0
+
+
+async def test_idle_lanes_are_released_after_budget_refills():
+    sent: list[tuple[int, float]] = []
+    bot = AsyncMock()
+    bot.send_message.side_effect = lambda **kw: sent.append((kw["chat_id"], time.monotonic()))
+    dispatcher = _dispatcher(bot, chat_rate=20)  # не чаще раза в 50 мс
+
+    assert await dispatcher.send_many(range(1, 51), "hi") == 50
+    # Лимит чата ещё не восстановился: повтор ждёт его в той же очереди
+    assert await dispatcher.send(1, "again") is True
+    first, again = [at for chat_id, at in sent if chat_id == 1]
+    assert again - first >= 0.045
+
+    await asyncio.sleep(0.1)
+    assert dispatcher._lanes == {}
+    assert await dispatcher.send(1, "later") is True
+    await dispatcher.close()
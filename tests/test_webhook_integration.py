@@ -52,12 +52,14 @@ class TestWebhookIntegration:
         assert response.status_code == 401
         assert response.json()["error"] == "Invalid signature"
     
-    def test_warn_mode_allows_invalid_signature(self, test_client):
+    def test_warn_mode_allows_invalid_signature(self, test_client, Session, monkeypatch):
         """
         SMOKE TEST: In warn mode with invalid signature,
         webhook should return 200 (logs warning, but allows request through).
         """
         client, mock_settings = test_client
+        # The webhook stores the event in the inbox - use the test database
+        monkeypatch.setattr("app.database.AsyncSessionLocal", Session)
         mock_settings.avito_webhook_mode = "warn"
         mock_settings.avito_webhook_secret = "real_secret"
         
@@ -69,7 +71,7 @@ class TestWebhookIntegration:
             headers={"X-Avito-Signature": "invalid_signature_here"}
         )
         
-        # This tests signature mode only, not full processing path.
-        # Downstream 400/500 is acceptable — we're verifying warn mode
-        # doesn't reject with 401 like enforce mode would.
-        assert response.status_code != 401, f"Unexpected 401 in warn mode: {response.text}"
+        # Warn mode lets the request through to the inbox; processing
+        # itself happens later in the background worker.
+        assert response.status_code == 200, response.text
+        assert response.json()["status"] == "accepted"